@@ -0,0 +1,64 @@
+"""
+Memory and comparison cost of metamodel nodes, on generated filter terms such as e.c1 > 1. As in generated workloads,
+the terms repeat: there are 100 columns and 1000 literals.
+
+    python -m benchmark.metamodel
+
+Reports the bytes tracemalloc sees allocated per node and the time to build a node, when the terms are first built and
+when they are built again while the first are alive, then the time to hash and to compare two equal, separately built
+lists of terms.
+"""
+import timeit
+import tracemalloc
+from typing import Callable, Dict, List
+
+from model.metamodel import BinaryExpression, OperandExpression, ColumnAliasExpression, ColumnReferenceExpression, \
+    LiteralExpression, IntegerLiteral, GreaterThanBinaryOperator, Expression
+
+# nodes in each term
+TERM_NODES = 7
+
+
+def terms(names: List[str], values: List[int]) -> List[Expression]:
+    return [BinaryExpression(OperandExpression(ColumnAliasExpression("e", ColumnReferenceExpression(name))),
+                             OperandExpression(LiteralExpression(IntegerLiteral(value))),
+                             GreaterThanBinaryOperator())
+            for name, value in zip(names, values)]
+
+
+def allocated(build: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        built = build()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del built
+    return after - before
+
+
+def run(count: int = 10_000) -> Dict[str, float]:
+    # the names and integers are allocated up front, so that only the nodes are counted
+    names = [f"c{i % 100}" for i in range(count)]
+    values = [i % 1000 for i in range(count)]
+    nodes = count * TERM_NODES
+
+    # built once, the terms share their repeated subtrees; built again, while the first are alive, all of them
+    results = {
+        "bytes/node": allocated(lambda: terms(names, values)) / nodes,
+        "build us/node": min(timeit.repeat(lambda: terms(names, values), number=5, repeat=5)) / 5 / nodes * 1e6,
+    }
+    built = terms(names, values)
+    results["again bytes/node"] = allocated(lambda: terms(names, values)) / nodes
+    results["again us/node"] = min(timeit.repeat(lambda: terms(names, values), number=5, repeat=5)) / 5 / nodes * 1e6
+
+    other = terms(names, values)
+    results["eq us"] = min(timeit.repeat(lambda: built == other, number=10, repeat=3)) / 10 * 1e6
+    results["hash us"] = min(timeit.repeat(lambda: hash(tuple(built)), number=10, repeat=3)) / 10 * 1e6
+    return results
+
+
+if __name__ == "__main__":
+    for name, value in run().items():
+        print(f"{name:<20}{value:12.1f}")
@@ -0,0 +1,65 @@
+"""
+Micro-benchmarks of Parser.parse on generated lambdas, with the parse cache disabled.
+
+    python -m benchmark.parser
+
+For each shape the time per AST node should stay flat as the lambda grows.
+"""
+import timeit
+from typing import Callable, Dict, List, Tuple
+
+from dsl.parser import Parser, ParseType
+from model.schema import Table
+
+
+def _lambda(source: str) -> Callable:
+    namespace = {}
+    exec(f"f = {source}", namespace)
+    return namespace["f"]
+
+
+def wide_extend(width: int) -> Tuple[Callable, Table]:
+    table = Table("t", {f"c{i}": int for i in range(width)})
+    return _lambda("lambda e: [" + ", ".join(f"(x{i} := e.c{i} + {i})" for i in range(width)) + "]"), table
+
+
+def nested_filter(depth: int) -> Tuple[Callable, Table]:
+    table = Table("t", {f"c{i}": int for i in range(depth + 1)})
+    body = "e.c0 > 0"
+    for i in range(1, depth + 1):
+        body = f"({body} {'and' if i % 2 else 'or'} not e.c{i} == {i})"
+    return _lambda("lambda e: " + body), table
+
+
+def flat_filter(terms: int) -> Tuple[Callable, Table]:
+    table = Table("t", {f"c{i}": int for i in range(terms)})
+    return _lambda("lambda e: " + " and ".join(f"e.c{i} < {i}" for i in range(terms))), table
+
+
+SHAPES: Dict[str, Tuple[Callable[[int], Tuple[Callable, Table]], ParseType, List[int]]] = {
+    "wide extend": (wide_extend, ParseType.extend, [50, 100, 200, 500]),
+    "nested filter": (nested_filter, ParseType.filter, [25, 50, 100, 200]),
+    "flat filter": (flat_filter, ParseType.filter, [100, 1000, 5000]),
+}
+
+
+def run(number: int = 5) -> Dict[str, Dict[int, float]]:
+    maxsize = Parser.cache.info().maxsize
+    Parser.cache.resize(0)
+    try:
+        results = {}
+        for name, (shape, ptype, sizes) in SHAPES.items():
+            results[name] = {}
+            for size in sizes:
+                func, table = shape(size)
+                seconds = min(timeit.repeat(lambda: Parser.parse(func, [Table(table.table, table.columns.copy())], ptype), number=number, repeat=3))
+                results[name][size] = seconds / number
+        return results
+    finally:
+        Parser.cache.resize(maxsize)
+
+
+if __name__ == "__main__":
+    for name, timings in run().items():
+        for size, seconds in timings.items():
+            print(f"{name:<16}{size:>6}{seconds * 1e3:10.2f} ms{seconds * 1e6 / size:10.1f} us/term")
@@ -0,0 +1,185 @@
+"""
+Benchmark suite timing each stage of turning a LegendQL query into an executable:
+
+    parse:<ptype>   Parser.parse of every lambda of the query, cold (parse cache disabled), grouped by ParseType
+    build           building the query's clause list through LegendQL, with the parse cache warm
+    optimize        the default Optimizer's rewrite of the clause list
+    emit            PureRuntime.executable_to_string of the clause list
+
+    python -m benchmark.suite [--samples N] [--only PREFIX] [--output results.json] [--compare baseline.json]
+
+Reports the median and p99 of each stage in microseconds and the peak memory it allocates. A stage that fails
+(e.g. a RecursionError on a stress shape, or a clause the dialect cannot emit) is reported with its error instead of timings.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from dataclasses import dataclass, asdict, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmark.workloads import Workload, workloads
+from dialect.purerelation.dialect import NonExecutablePureRuntime
+from dsl.parser import Parser, ParseType
+from model.schema import Table
+from optimizer.optimizer import optimize
+
+
+@dataclass
+class StageResult:
+    workload: str
+    stage: str
+    samples: int = 0
+    median_us: Optional[float] = None
+    p99_us: Optional[float] = None
+    peak_bytes: Optional[int] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class SuiteResult:
+    commit: Optional[str]
+    python: str
+    results: List[StageResult] = field(default_factory=list)
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+
+def measure(workload: str, stage: str, operation: Callable[[], object], samples: int) -> StageResult:
+    try:
+        # one untimed run, also to find out whether the stage works at all
+        operation()
+        timings = []
+        for _ in range(samples):
+            start = time.perf_counter_ns()
+            operation()
+            timings.append((time.perf_counter_ns() - start) / 1000)
+
+        tracemalloc.start()
+        try:
+            operation()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    except Exception as e:
+        return StageResult(workload, stage, error=_error(e))
+
+    return StageResult(workload, stage, samples, percentile(timings, 0.5), percentile(timings, 0.99), peak)
+
+
+def record_parses(workload: Workload) -> List[Tuple[Callable, List[Table], ParseType]]:
+    # build the query once, keeping every call LegendQL makes to the Parser
+    calls = []
+    parse = Parser.parse
+
+    def recording(func, tables, ptype):
+        calls.append((func, [Table(t.table, t.columns.copy()) for t in tables], ptype))
+        return parse(func, tables, ptype)
+
+    Parser.parse = staticmethod(recording)
+    try:
+        workload.build()
+    finally:
+        Parser.parse = staticmethod(parse)
+    return calls
+
+
+def run_workload(workload: Workload, samples: int) -> List[StageResult]:
+    results = []
+
+    by_type: Dict[ParseType, List[Tuple[Callable, List[Table]]]] = defaultdict(list)
+    for func, tables, ptype in record_parses(workload):
+        by_type[ptype].append((func, tables))
+
+    maxsize = Parser.cache.info().maxsize
+    Parser.cache.resize(0)
+    try:
+        for ptype, calls in by_type.items():
+            def parse_all(calls=calls, ptype=ptype):
+                for func, tables in calls:
+                    Parser.parse(func, [Table(t.table, t.columns.copy()) for t in tables], ptype)
+            results.append(measure(workload.name, f"parse:{ptype.value}", parse_all, samples))
+    finally:
+        Parser.cache.resize(maxsize)
+
+    results.append(measure(workload.name, "build", workload.build, samples))
+
+    runtime = NonExecutablePureRuntime("local::Runtime")
+    try:
+        internal = workload.build()._internal
+    except Exception as e:
+        results.append(StageResult(workload.name, "optimize", error=_error(e)))
+        results.append(StageResult(workload.name, "emit", error=_error(e)))
+    else:
+        clauses = internal._clauses
+        results.append(measure(workload.name, "optimize", lambda: optimize(clauses, internal._database), samples))
+        results.append(measure(workload.name, "emit", lambda: runtime.executable_to_string(clauses), samples))
+    return results
+
+
+def run(samples: int = 50, only: str = "") -> SuiteResult:
+    suite = SuiteResult(_commit(), platform.python_version())
+    for name, workload in workloads().items():
+        if name.startswith(only):
+            # stress shapes are expensive, fewer samples give a stable enough median
+            suite.results.extend(run_workload(workload, max(3, samples // 10) if workload.stress else samples))
+    return suite
+
+
+def compare(current: SuiteResult, baseline: dict) -> List[Tuple[str, str, Optional[float]]]:
+    medians = {(r["workload"], r["stage"]): r["median_us"] for r in baseline["results"]}
+    ratios = []
+    for r in current.results:
+        before = medians.get((r.workload, r.stage))
+        ratios.append((r.workload, r.stage, r.median_us / before if before and r.median_us else None))
+    return ratios
+
+
+def _error(e: Exception) -> str:
+    return f"{type(e).__name__}: {e}"[:200]
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: List[str]) -> None:
+    arguments = argparse.ArgumentParser(description="LegendQL parser and compiler benchmarks")
+    arguments.add_argument("--samples", type=int, default=50)
+    arguments.add_argument("--only", default="", help="only run the workloads whose name starts with this")
+    arguments.add_argument("--output", help="save the results as JSON")
+    arguments.add_argument("--compare", help="JSON results of an earlier run to compare the medians with")
+    options = arguments.parse_args(argv)
+
+    suite = run(options.samples, options.only)
+    ratios = {}
+    if options.compare:
+        with open(options.compare) as f:
+            ratios = {(w, s): ratio for w, s, ratio in compare(suite, json.load(f))}
+
+    print(f"{'workload':<24}{'stage':<18}{'median us':>12}{'p99 us':>12}{'peak KiB':>10}{'vs base':>9}")
+    for r in suite.results:
+        if r.error:
+            print(f"{r.workload:<24}{r.stage:<18}  {r.error[:60]}")
+            continue
+        ratio = ratios.get((r.workload, r.stage))
+        print(f"{r.workload:<24}{r.stage:<18}{r.median_us:12.1f}{r.p99_us:12.1f}{r.peak_bytes / 1024:10.1f}"
+              + (f"{ratio:8.2f}x" if ratio else ""))
+
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(asdict(suite), f, indent=2)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,58 @@
+"""
+Compares the cost of building the same query through the AST Parser and through the symbolic Tracer.
+
+    python -m benchmark.tracing [number]
+
+The Parser is timed twice: cold, with its parse cache cleared before every query, and warm, where every lambda is
+already cached. The Tracer has no cache.
+"""
+import sys
+import timeit
+
+from dsl.functions import aggregate, count, sum
+from dsl.parser import Parser
+from model.schema import Table, Database
+from ql.legendql import LegendQL
+
+
+def _table() -> Table:
+    return Table("employee", {"id": int, "name": str, "dept_id": int, "salary": float, "benefits": float, "title": str})
+
+
+def parsed_query() -> LegendQL:
+    table = _table()
+    return (LegendQL.from_table(Database("employee", [table]), table, tracing=False)
+            .filter(lambda e: e.salary > 10 and not e.title == "CEO")
+            .extend(lambda e: [(cost := e.salary + e.benefits), (bonus := cost * 2)])
+            .group_by(lambda e: aggregate([e.dept_id], [total := sum(e.cost), staff := count(e.id)]))
+            .order_by(lambda e: [-e.total]))
+
+
+def traced_query() -> LegendQL:
+    table = _table()
+    return (LegendQL.from_table(Database("employee", [table]), table, tracing=True)
+            .filter(lambda e: (e.salary > 10) & ~(e.title == "CEO"))
+            .extend(lambda e: [(e.salary + e.benefits).alias("cost"), (e.cost * 2).alias("bonus")])
+            .group_by(lambda e: aggregate([e.dept_id], [sum(e.cost).alias("total"), count(e.id).alias("staff")]))
+            .order_by(lambda e: [-e.total]))
+
+
+def _cold_parsed_query() -> LegendQL:
+    Parser.cache.clear()
+    return parsed_query()
+
+
+def run(number: int = 2000) -> dict:
+    if parsed_query()._internal._clauses != traced_query()._internal._clauses:
+        raise ValueError("The parsed and traced queries differ")
+
+    results = {}
+    for name, query in [("parser (cold)", _cold_parsed_query), ("parser (warm)", parsed_query), ("tracer", traced_query)]:
+        query()
+        results[name] = min(timeit.repeat(query, number=number, repeat=5)) / number
+    return results
+
+
+if __name__ == "__main__":
+    for name, seconds in run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000).items():
+        print(f"{name:<16}{seconds * 1e6:10.1f} us/query")
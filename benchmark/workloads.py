@@ -0,0 +1,190 @@
+"""
+Query shapes for the benchmark suite: the examples of dsl/examples.py and generated stress shapes.
+
+Each workload builds its query from fresh tables every time it is called, so that it can be run repeatedly.
+"""
+from dataclasses import dataclass
+from typing import Callable, Dict, List
+
+from dsl.functions import over, avg, rows, aggregate, unbounded, count, left, sum
+from model.schema import Table, Database
+from ql.legendql import LegendQL
+
+
+@dataclass(frozen=True)
+class Workload:
+    name: str
+    build: Callable[[], LegendQL]
+    stress: bool = False
+
+
+def _employees() -> Table:
+    return Table("employees", {"id": int, "name": str, "title": str, "country": str, "dept_id": str, "salary": float,
+                               "start_date": str, "benefits": str, "location": str})
+
+
+def _departments() -> Table:
+    return Table("department", {"id": int, "name": str, "city": str, "code": str, "location": str})
+
+
+def _locations() -> Table:
+    return Table("location", {"id": int, "name": str, "country": str, "code": str})
+
+
+def _from(table: Table, *others: Table) -> LegendQL:
+    return LegendQL.from_table(Database("db", [table, *others]), table)
+
+
+def fluent_join() -> LegendQL:
+    emp_table, dep_table = _employees(), _departments()
+    return (_from(emp_table, dep_table)
+            .filter(lambda r: r.id > 10)
+            .left_join(_from(dep_table), lambda e, d: (
+                e.dept_id == d.id,
+                (department_name := d.name, department_id := d.id)))
+            .extend(lambda r: [
+                (ids := r.id + r.dept_id),
+                (avg_val := over(r.location, avg(r.salary), sort=[r.name, -r.location], frame=rows(0, unbounded())))])
+            .group_by(lambda r: aggregate(
+                [r.id, r.name],
+                (sum_salary := sum(r.salary), count_dept := count(r.department_name)),
+                having=sum_salary > 100_000))
+            .filter(lambda r: r.id > 100)
+            .extend(lambda r: (calc_col := r.id + r.sum_salary)))
+
+
+def prql() -> LegendQL:
+    return (_from(_employees())
+            .filter(lambda e: e.start_date > '2021-01-01')
+            .extend(lambda e: [
+                (gross_salary := e.salary + 10),
+                (gross_cost := gross_salary + e.benefits)])
+            .filter(lambda e: e.gross_cost > 0)
+            .group_by(lambda e: aggregate(
+                [e.title, e.country],
+                [avg_gross_salary := avg(e.gross_salary), sum_gross_cost := sum(e.gross_cost)],
+                having=sum_gross_cost > 100_000))
+            .extend(lambda e: (new_id := f"{e.title}_{e.country}"))
+            .extend(lambda e: (country_code := left(e.country, 2)))
+            .order_by(lambda e: [e.sum_gross_cost, -e.country])
+            .limit(10))
+
+
+def window() -> LegendQL:
+    return _from(_employees()).extend(lambda r: (avg_val := over(r.location, avg(r.salary))))
+
+
+def aggregates() -> LegendQL:
+    return (_from(_employees())
+            .group_by(lambda r: aggregate([r.title, r.dept_id], avg_salary := avg(r.salary)))
+            .order_by(lambda r: [-r.avg_salary]))
+
+
+def joins() -> LegendQL:
+    emp_table, dep_table, loc_table = _employees(), _departments(), _locations()
+    return (_from(emp_table, dep_table, loc_table)
+            .left_join(_from(dep_table), lambda e, d: (e.dept_id == d.id, [(new_dept_id := d.id), (new_dept_name := d.name)]))
+            .left_join(_from(loc_table), lambda d, l: (d.city == l.id, (new_loc_id := l.id, new_loc_name := l.name, new_loc_code := l.code))))
+
+
+def rename_select() -> LegendQL:
+    return (_from(_departments())
+            .rename(lambda d: (new_dept_id := d.id, new_dept_name := d.name))
+            .select(lambda d: [d.new_dept_id, d.new_dept_name, d.city])
+            .take(5, 10))
+
+
+def _lambda(source: str) -> Callable:
+    namespace = {}
+    exec(f"f = {source}", namespace)
+    return namespace["f"]
+
+
+def wide_extend(width: int = 500) -> Callable[[], LegendQL]:
+    extend = _lambda("lambda e: [" + ", ".join(f"(x{i} := e.c{i % 10} * {i})" for i in range(width)) + "]")
+
+    def build() -> LegendQL:
+        return _from(Table("t", {f"c{i}": int for i in range(10)})).extend(extend)
+    return build
+
+
+def many_joins(ways: int = 50) -> Callable[[], LegendQL]:
+    # conditions only: the Pure dialect can't write the projection of a join, and the emit stage would fail
+    joins_ = [_lambda(f"lambda a, b: a.k == b.id{i}") for i in range(ways)]
+
+    def build() -> LegendQL:
+        tables = [Table(f"t{i}", {f"id{i}": int, f"value{i}": int}) for i in range(ways)]
+        lq = _from(Table("root", {"k": int}), *tables)
+        for table, join in zip(tables, joins_):
+            lq = lq.left_join(_from(table), join)
+        return lq
+    return build
+
+
+def long_filter(terms: int = 10_000) -> Callable[[], LegendQL]:
+    filter_ = _lambda("lambda e: " + " and ".join(f"e.c{i % 10} > {i}" for i in range(terms)))
+
+    def build() -> LegendQL:
+        return _from(Table("t", {f"c{i}": int for i in range(10)})).filter(filter_)
+    return build
+
+
+def nested_sum(terms: int = 300) -> Callable[[], LegendQL]:
+    # a sum folds left: an expression as deep as it has terms, about as deep as the decoder goes
+    extend = _lambda("lambda e: [(x := " + " + ".join(f"e.c{i % 10} * {i}" for i in range(terms)) + ")]")
+
+    def build() -> LegendQL:
+        return _from(Table("t", {f"c{i}": int for i in range(10)})).extend(extend)
+    return build
+
+
+def nested_if(depth: int = 300) -> Callable[[], LegendQL]:
+    extend = _lambda("lambda e: [(x := " + " else ".join(f"{i} if e.c{i % 10} > {i}" for i in range(depth)) + " else 0)]")
+
+    def build() -> LegendQL:
+        return _from(Table("t", {f"c{i}": int for i in range(10)})).extend(extend)
+    return build
+
+
+def long_chain(length: int = 100) -> Callable[[], LegendQL]:
+    steps = [(_lambda(f"lambda e: e.c{i % 10} > {i}"), _lambda(f"lambda e: (x{i} := e.c{i % 10} + {i})")) for i in range(length)]
+
+    def build() -> LegendQL:
+        lq = _from(Table("t", {f"c{i}": int for i in range(10)}))
+        for filter_, extend in steps:
+            lq = lq.filter(filter_).extend(extend)
+        return lq
+    return build
+
+
+def forks(variants: int = 200) -> Callable[[], LegendQL]:
+    # a variant per region of one persistent base query of 20 clauses, each capturing its region
+    steps = [(_lambda(f"lambda e: e.c{i % 10} > {i}"), _lambda(f"lambda e: (x{i} := e.c{i % 10} + {i})")) for i in range(10)]
+    regions = [_lambda(f"lambda e, region={i}: e.c0 == region") for i in range(variants)]
+
+    def build() -> LegendQL:
+        table = Table("t", {f"c{i}": int for i in range(10)})
+        base = LegendQL.from_table(Database("db", [table]), table, persistent=True)
+        for filter_, extend in steps:
+            base = base.filter(filter_).extend(extend)
+        return [base.filter(region) for region in regions][-1]
+    return build
+
+
+def workloads() -> Dict[str, Workload]:
+    shapes: List[Workload] = [
+        Workload("examples/fluent_join", fluent_join),
+        Workload("examples/prql", prql),
+        Workload("examples/window", window),
+        Workload("examples/aggregates", aggregates),
+        Workload("examples/joins", joins),
+        Workload("examples/rename_select", rename_select),
+        Workload("stress/extend_500", wide_extend(500), stress=True),
+        Workload("stress/join_50", many_joins(50), stress=True),
+        Workload("stress/filter_10k", long_filter(10_000), stress=True),
+        Workload("stress/sum_300", nested_sum(300), stress=True),
+        Workload("stress/if_300", nested_if(300), stress=True),
+        Workload("stress/chain_200", long_chain(100), stress=True),
+        Workload("stress/fork_200", forks(200), stress=True),
+    ]
+    return {w.name: w for w in shapes}
@@ -1,27 +1,69 @@
 from abc import ABC
 from dataclasses import dataclass
-from typing import Set, List
+from datetime import date, datetime
+from typing import Set, List, Dict, Tuple, Type
 
 from model.metamodel import ExecutionVisitor, JoinClause, LimitClause, DistinctClause, GroupByClause, ExtendClause, \
     SelectionClause, FilterClause, FunctionExpression, LiteralExpression, BinaryExpression, \
-    UnaryExpression, OperandExpression, BooleanLiteral, StringLiteral, IntegerLiteral, Runtime, \
+    UnaryExpression, OperandExpression, BooleanLiteral, StringLiteral, IntegerLiteral, FloatLiteral, Runtime, \
     OrBinaryOperator, AndBinaryOperator, LessThanEqualsBinaryOperator, LessThanBinaryOperator, \
     GreaterThanEqualsBinaryOperator, GreaterThanBinaryOperator, NotEqualsBinaryOperator, EqualsBinaryOperator, \
     NotUnaryOperator, InnerJoinType, LeftJoinType, ColumnAliasExpression, \
     CountFunction, JoinExpression, Clause, FromClause, AddBinaryOperator, \
-    MultiplyBinaryOperator, SubtractBinaryOperator, DivideBinaryOperator, OffsetClause, RenameClause, \
+    MultiplyBinaryOperator, SubtractBinaryOperator, DivideBinaryOperator, OffsetClause, RenameClause, SliceClause, TopClause, \
     OrderByExpression, IfExpression, ColumnReferenceExpression, DateLiteral, GroupByExpression, \
     ComputedColumnAliasExpression, VariableAliasExpression, MapReduceExpression, LambdaExpression, AverageFunction, \
-    AscendingOrderType, DescendingOrderType, OrderByClause, ModuloFunction, ExponentFunction
+    AscendingOrderType, DescendingOrderType, OrderByClause, ModuloFunction, ExponentFunction, ParameterExpression
+from model.parameters import find_parameters, bind_parameters, to_literal
+from dialect.purerelation.emitter import PureEmitter
+
+
+@dataclass(frozen=True)
+class PureTemplate:
+    clauses: List[Clause]
+    parameters: Dict[str, ParameterExpression]
+    # the executable split around its parameters: text, name, text, name, .., text
+    segments: Tuple[str, ...]
+
+    def to_string(self, values: Dict[str, str]) -> str:
+        return "".join(values[segment] if i % 2 else segment for i, segment in enumerate(self.segments))
+
+    def to_lambda(self, types: Dict[str, Type]) -> str:
+        # the executable as a Pure lambda taking its parameters, e.g. {min_id:Integer[1]|#>{db.t}#->filter(..)}
+        declarations = ", ".join(f"{name}:{pure_type(types[name])}[1]" for name in self.parameters)
+        return "{" + declarations + "|" + self.to_string({name: "$" + name for name in self.parameters}) + "}"
+
+
+def pure_type(type_: Type) -> str:
+    for python_type, name in [(bool, "Boolean"), (int, "Integer"), (float, "Float"), (str, "String"), (datetime, "DateTime"), (date, "StrictDate")]:
+        if issubclass(type_, python_type):
+            return name
+    raise ValueError(f"No Pure type for {type_}")
 
 
 @dataclass
 class PureRuntime(Runtime, ABC):
     name: str
 
+    def identity(self) -> str:
+        return f"{super().identity()}:{self.name}"
+
     def executable_to_string(self, clauses: List[Clause]) -> str:
+        return self._to_string(clauses, PureRelationExpressionVisitor(self))
+
+    def _to_string(self, clauses: List[Clause], visitor: "PureRelationExpressionVisitor") -> str:
+        return PureEmitter(visitor).emit_query(clauses, self)
+
+    def prepare(self, clauses: List[Clause]) -> PureTemplate:
+        executable = self._to_string(clauses, _PureTemplateVisitor(self))
+        return PureTemplate(clauses, find_parameters(clauses), tuple(executable.split("\0")))
+
+    def eval_prepared[T](self, prepared: PureTemplate, parameters: Dict[str, object]) -> T:
+        return self.eval(bind_parameters(prepared.clauses, parameters))
+
+    def prepared_to_string(self, prepared: PureTemplate, parameters: Dict[str, object]) -> str:
         visitor = PureRelationExpressionVisitor(self)
-        return "->".join(map(lambda clause: clause.visit(visitor, ""), clauses)) + self.visit(visitor, "")
+        return prepared.to_string({name: to_literal(value).visit(visitor, "") for name, value in parameters.items()})
 
 class NonExecutablePureRuntime(PureRuntime):
     def eval(self, clauses: List[Clause]) -> str:
@@ -29,6 +71,7 @@ class NonExecutablePureRuntime(PureRuntime):
 
 @dataclass
 class PureRelationExpressionVisitor(ExecutionVisitor):
+    # writes the leaves: the nodes made of others are written by PureEmitter, without recursion
     runtime: PureRuntime
 
     def visit_runtime(self, val: PureRuntime, parameter: str) -> str:
@@ -40,20 +83,25 @@ class PureRelationExpressionVisitor(ExecutionVisitor):
     def visit_integer_literal(self, val: IntegerLiteral, parameter: str) -> str:
         return str(val.value())
 
+    def visit_float_literal(self, val: FloatLiteral, parameter: str) -> str:
+        # Pure floats have a decimal point: 1e-05 is written 1.0e-05
+        mantissa, e, exponent = repr(val.value()).partition("e")
+        return mantissa + ("" if "." in mantissa else ".0") + e + exponent
+
     def visit_string_literal(self, val: StringLiteral, parameter: str) -> str:
         return "'" + val.value() + "'"
 
     def visit_boolean_literal(self, val: BooleanLiteral, parameter: str) -> str:
-        return str(val.value())
+        return "true" if val.value() else "false"
 
     def visit_operand_expression(self, val: OperandExpression, parameter: str) -> str:
-        return val.expression.visit(self, "")
+        return PureEmitter(self).emit(val)
     
     def visit_unary_expression(self, val: UnaryExpression, parameter: str) -> str:
-        return val.operator.visit(self, "") + val.expression.visit(self, "")
+        return PureEmitter(self).emit(val)
 
     def visit_binary_expression(self, val: BinaryExpression, parameter: str) -> str:
-        return val.left.visit(self, "") + val.operator.visit(self, "") + val.right.visit(self, "")
+        return PureEmitter(self).emit(val)
     
     def visit_not_unary_operator(self, val: NotUnaryOperator, parameter: str) -> str:
         return "!"
@@ -95,28 +143,28 @@ class PureRelationExpressionVisitor(ExecutionVisitor):
         return "/"
     
     def visit_literal_expression(self, val: LiteralExpression, parameter: str) -> str:
-        return val.literal.visit(self, "")
+        return PureEmitter(self).emit(val)
 
     def visit_variable_alias_expression(self, val: VariableAliasExpression, parameter: str) -> str:
         return "$" + val.alias
 
+    def visit_parameter_expression(self, val: ParameterExpression, parameter: str) -> str:
+        return "$" + val.name
+
     def visit_computed_column_alias_expression(self, val: ComputedColumnAliasExpression, parameter: str) -> str:
-        return val.alias + ":" + val.expression.visit(self, "")
+        return PureEmitter(self).emit(val)
 
     def visit_column_alias_expression(self, val: ColumnAliasExpression, parameter: str) -> str:
-        return "$" + val.alias + "." + val.reference.visit(self, "")
+        return PureEmitter(self).emit(val)
 
     def visit_function_expression(self, val: FunctionExpression, parameter: str) -> str:
-        #TODO: AJH: this probably isn't right
-        parameters = list(map(lambda expr: expr.visit(self, ""), val.parameters))
-        function_string = val.function.visit(self, ",".join(parameters[1:]))
-        return parameters[0] + function_string
+        return PureEmitter(self).emit(val)
 
     def visit_map_reduce_expression(self, val: MapReduceExpression, parameter: str) -> str:
-        return val.map_expression.visit(self, "") + " : " + val.reduce_expression.visit(self, "")
+        return PureEmitter(self).emit(val)
 
     def visit_lambda_expression(self, val: LambdaExpression, parameter: str) -> str:
-        return ", ".join(val.parameters) + " | " + val.expression.visit(self, "")
+        return PureEmitter(self).emit(val)
 
     def visit_count_function(self, val: CountFunction, parameter: str) -> str:
         return "->count()"
@@ -131,37 +179,34 @@ class PureRelationExpressionVisitor(ExecutionVisitor):
         return f"->pow({parameter})"
 
     def visit_filter_clause(self, val: FilterClause, parameter: str) -> str:
-        return "filter(" + val.expression.visit(self, "") + ")"
+        return PureEmitter(self).emit(val)
 
     def visit_selection_clause(self, val: SelectionClause, parameter: str) -> str:
-        return "select(~[" + ", ".join(map(lambda expr: expr.visit(self, ""), val.expressions)) + "])"
+        return PureEmitter(self).emit(val)
 
     def visit_extend_clause(self, val: ExtendClause, parameter: str) -> str:
-        return "extend(~[" + ", ".join(map(lambda expr: expr.visit(self, ""), val.expressions)) + "])"
+        return PureEmitter(self).emit(val)
 
     def visit_group_by_clause(self, val: GroupByClause, parameter: str) -> str:
-        return "groupBy(" + val.expression.visit(self, "") + ")"
+        return PureEmitter(self).emit(val)
 
     def visit_group_by_expression(self, val: GroupByExpression, parameter: str) -> str:
-        selections = "~[" + ", ".join(map(lambda selection: selection.visit(self, ""), val.selections)) + "]"
-        expressions = "~[" + ", ".join(map(lambda expression: expression.visit(self, ""), val.expressions)) + "]"
-        having = ", " + val.having.visit(self, "") if val.having else ""
-        return selections + ", " + expressions + having
+        return PureEmitter(self).emit(val)
 
     def visit_distinct_clause(self, val: DistinctClause, parameter: str) -> str:
-        return "distinct(~[" + ", ".join(map(lambda expr: expr.visit(self, ""), val.expressions)) + "])"
+        return PureEmitter(self).emit(val)
 
     def visit_order_by_clause(self, val: OrderByClause, parameter: str) -> str:
-        return "sort([" + ", ".join(map(lambda expr: expr.visit(self, ""), val.ordering)) + "])"
+        return PureEmitter(self).emit(val)
 
     def visit_limit_clause(self, val: LimitClause, parameter: str) -> str:
-        return "limit(" + val.value.visit(self, "") + ")"
+        return PureEmitter(self).emit(val)
 
     def visit_join_expression(self, val: JoinExpression, parameter: str) -> str:
-        return "{" + val.on.visit(self, "") + "}"
+        return PureEmitter(self).emit(val)
 
     def visit_join_clause(self, val: JoinClause, parameter: str) -> str:
-        return "join(" + val.from_clause.visit(self, "")  + ", " + val.join_type.visit(self, "") + ", " + val.on_clause.visit(self, "") + ")"
+        return PureEmitter(self).emit(val)
 
     def visit_inner_join_type(self, val: InnerJoinType, parameter: str) -> str:
         return "JoinKind.INNER"
@@ -176,10 +221,10 @@ class PureRelationExpressionVisitor(ExecutionVisitor):
         return val.name
 
     def visit_if_expression(self, val: IfExpression, parameter: str) -> str:
-        return f"if({val.test.visit(self, parameter)}, | {val.body.visit(self, parameter)}, | {val.orelse.visit(self, parameter)})"
+        return PureEmitter(self).emit(val)
 
     def visit_order_by_expression(self, val: OrderByExpression, parameter: str) -> str:
-        return f"~{val.expression.visit(self, parameter)}->{val.direction.visit(self, parameter)}()"
+        return PureEmitter(self).emit(val)
 
     def visit_ascending_order_type(self, val: AscendingOrderType, parameter: str) -> str:
         return "ascending"
@@ -188,13 +233,16 @@ class PureRelationExpressionVisitor(ExecutionVisitor):
         return "descending"
 
     def visit_rename_clause(self, val: RenameClause, parameter: str) -> str:
-        renames = []
-        for columnAlias in val.columnAliases:
-            renames.append(f"rename(~{columnAlias.reference.visit(self, parameter)}, ~{columnAlias.alias})")
-        return "->".join(renames)
+        return PureEmitter(self).emit(val)
 
     def visit_offset_clause(self, val: OffsetClause, parameter: str) -> str:
-        return f"drop({val.value.visit(self, parameter)})"
+        return PureEmitter(self).emit(val)
+
+    def visit_slice_clause(self, val: SliceClause, parameter: str) -> str:
+        return PureEmitter(self).emit(val)
+
+    def visit_top_clause(self, val: TopClause, parameter: str) -> str:
+        return PureEmitter(self).emit(val)
 
     def visit_in_binary_operator(self, self1, parameter: str) -> str:
         raise NotImplementedError()
@@ -212,4 +260,10 @@ class PureRelationExpressionVisitor(ExecutionVisitor):
         raise NotImplementedError()
 
     def visit_bitwise_or_binary_operator(self, self1, parameter: str) -> str:
-        raise NotImplementedError()
\ No newline at end of file
+        raise NotImplementedError()
+
+
+class _PureTemplateVisitor(PureRelationExpressionVisitor):
+    # marks where each parameter goes so that PureRuntime.prepare can split the executable around them
+    def visit_parameter_expression(self, val: ParameterExpression, parameter: str) -> str:
+        return "\0" + val.name + "\0"
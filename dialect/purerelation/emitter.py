@@ -0,0 +1,263 @@
+"""
+Writes clauses as Pure into one buffer, walking their expressions with an explicit stack rather than recursively, so
+that neither the depth of an expression nor the length of the clause list is bounded by the recursion limit, and
+each piece of text is copied once.
+
+The expressions and clauses made of others are written here. Leaves, such as literals, operators, column names and
+parameters, are written by the visitor, whose subclasses may write them differently.
+"""
+from typing import Callable, Dict, List, Union
+
+from model.metamodel import Node, ExecutionVisitor, Runtime, Clause, FilterClause, SelectionClause, ExtendClause, \
+    GroupByClause, GroupByExpression, DistinctClause, OrderByClause, LimitClause, JoinExpression, JoinClause, \
+    RenameClause, OffsetClause, SliceClause, TopClause, OperandExpression, UnaryExpression, BinaryExpression, \
+    LiteralExpression, ComputedColumnAliasExpression, ColumnAliasExpression, FunctionExpression, MapReduceExpression, \
+    LambdaExpression, IfExpression, OrderByExpression, CountFunction, AverageFunction, ModuloFunction, ExponentFunction, \
+    OrBinaryOperator, AndBinaryOperator, EqualsBinaryOperator, NotEqualsBinaryOperator, GreaterThanBinaryOperator, \
+    GreaterThanEqualsBinaryOperator, LessThanBinaryOperator, LessThanEqualsBinaryOperator, AddBinaryOperator, \
+    SubtractBinaryOperator, MultiplyBinaryOperator, DivideBinaryOperator
+
+# text to write, or a node to write
+Piece = Union[str, Node]
+# writes the text a node starts with, and pushes what follows it, last first
+Expansion = Callable[["PureEmitter", Node, Callable[[str], None], Callable[[Piece], None]], None]
+
+# how tightly Pure binds each binary operator: an operand of an operator binding tighter is written in parentheses
+_PRECEDENCE: Dict[type, int] = {
+    OrBinaryOperator: 1, AndBinaryOperator: 2,
+    EqualsBinaryOperator: 3, NotEqualsBinaryOperator: 3, GreaterThanBinaryOperator: 3,
+    GreaterThanEqualsBinaryOperator: 3, LessThanBinaryOperator: 3, LessThanEqualsBinaryOperator: 3,
+    AddBinaryOperator: 4, SubtractBinaryOperator: 4, MultiplyBinaryOperator: 5, DivideBinaryOperator: 5,
+}
+# the operators for which a op (b op c) is (a op b) op c
+_ASSOCIATIVE = (OrBinaryOperator, AndBinaryOperator, AddBinaryOperator, MultiplyBinaryOperator)
+
+
+class PureEmitter:
+    def __init__(self, visitor: ExecutionVisitor):
+        self.visitor = visitor
+
+    def emit(self, root: Node) -> str:
+        return self._write([root])
+
+    def emit_query(self, clauses: List[Clause], runtime: Runtime) -> str:
+        pending: List[Piece] = [runtime.visit(self.visitor, "")]
+        _push_joined(pending.append, clauses, "->")
+        return self._write(pending)
+
+    def _write(self, pending: List[Piece]) -> str:
+        # pending is a stack: the piece written next is the last
+        buffer: List[str] = []
+        # the text of each leaf written, by id: nodes are interned, the same operators and columns come back often
+        leaves: Dict[int, str] = {}
+        write, push, pop = buffer.append, pending.append, pending.pop
+        visitor, expansions = self.visitor, _EXPANSIONS
+        while pending:
+            piece = pop()
+            if type(piece) is str:
+                write(piece)
+                continue
+            expand = expansions.get(type(piece))
+            if expand is None:
+                text = leaves.get(id(piece))
+                if text is None:
+                    text = leaves[id(piece)] = piece.visit(visitor, "")
+                write(text)
+            else:
+                expand(self, piece, write, push)
+        return "".join(buffer)
+
+
+def _push_joined(push: Callable[[Piece], None], nodes: List[Node], separator: str) -> None:
+    for n in range(len(nodes) - 1, -1, -1):
+        push(nodes[n])
+        if n:
+            push(separator)
+
+
+def _function(emitter: PureEmitter, val: FunctionExpression, write, push) -> None:
+    # the first parameter is what the function applies to, the others are its arguments: $x->mod(2)
+    function, arguments = val.function, val.parameters[1:]
+    if type(function) in (ModuloFunction, ExponentFunction):
+        push(")")
+        _push_joined(push, arguments, ",")
+        push("->mod(" if type(function) is ModuloFunction else "->pow(")
+    elif type(function) in (CountFunction, AverageFunction):
+        push(function.visit(emitter.visitor, ""))
+    else:
+        push(function.visit(emitter.visitor, ",".join(emitter.emit(a) for a in arguments)))
+    push(val.parameters[0])
+
+
+def _clause(start: str, field: str, end: str) -> Expansion:
+    # the clauses written as a function of one of their fields
+    def expand(emitter: PureEmitter, val: Node, write, push) -> None:
+        write(start)
+        push(end)
+        push(getattr(val, field))
+    return expand
+
+
+def _list_clause(start: str, field: str) -> Expansion:
+    # the clauses written as a function of a list of their fields
+    def expand(emitter: PureEmitter, val: Node, write, push) -> None:
+        write(start)
+        push("])")
+        _push_joined(push, getattr(val, field), ", ")
+    return expand
+
+
+def _group_by(emitter: PureEmitter, val: GroupByExpression, write, push) -> None:
+    write("~[")
+    if val.having:
+        push(val.having)
+        push(", ")
+    push("]")
+    _push_joined(push, val.expressions, ", ")
+    push("], ~[")
+    _push_joined(push, val.selections, ", ")
+
+
+def _top(emitter: PureEmitter, val: TopClause, write, push) -> None:
+    # Pure has no top-N function: the engine is left to run the sort and the limit as one
+    write("sort([")
+    push(")")
+    push(val.value)
+    push("])->limit(")
+    _push_joined(push, val.ordering, ", ")
+
+
+def _join(emitter: PureEmitter, val: JoinClause, write, push) -> None:
+    write("join(")
+    push(")")
+    push(val.on_clause)
+    push(", ")
+    push(val.join_type)
+    push(", ")
+    push(val.from_clause)
+
+
+def _rename(emitter: PureEmitter, val: RenameClause, write, push) -> None:
+    aliases = val.columnAliases
+    for n in range(len(aliases) - 1, -1, -1):
+        push(", ~" + aliases[n].alias + ")")
+        push(aliases[n].reference)
+        push("->rename(~" if n else "rename(~")
+
+
+def _slice(emitter: PureEmitter, val: SliceClause, write, push) -> None:
+    write("slice(")
+    push(")")
+    push(val.stop)
+    push(", ")
+    push(val.start)
+
+
+def _binary(emitter: PureEmitter, val: BinaryExpression, write, push) -> None:
+    # the operands unwrapped here: a turn of the loop less for each
+    operator = type(val.operator)
+    _push_operand(push, val.right, operator, True)
+    push(val.operator)
+    _push_operand(push, val.left, operator, False)
+
+
+def _push_operand(push: Callable[[Piece], None], operand: Node, operator: type, right: bool) -> None:
+    # the operand of a binary operator, in parentheses when Pure would otherwise bind it to its neighbours
+    operand = operand.expression if type(operand) is OperandExpression else operand
+    if type(operand) is not BinaryExpression:
+        push(operand)
+        return
+    inner, outer = _PRECEDENCE.get(type(operand.operator)), _PRECEDENCE.get(operator)
+    if inner is None or outer is None or inner < outer:
+        parenthesized = True
+    elif inner > outer:
+        parenthesized = False
+    else:
+        # of equal precedence: comparisons don't chain, and only associative operators regroup to the right
+        parenthesized = outer == _PRECEDENCE[EqualsBinaryOperator] or (right and not (type(operand.operator) is operator and operator in _ASSOCIATIVE))
+    if parenthesized:
+        push(")")
+        push(operand)
+        push("(")
+    else:
+        push(operand)
+
+
+def _unary(emitter: PureEmitter, val: UnaryExpression, write, push) -> None:
+    operand = val.expression.expression if type(val.expression) is OperandExpression else val.expression
+    # ! binds tighter than any binary operator
+    if type(operand) is BinaryExpression:
+        push(")")
+        push(operand)
+        push("(")
+    else:
+        push(operand)
+    push(val.operator)
+
+
+def _computed_column_alias(emitter: PureEmitter, val: ComputedColumnAliasExpression, write, push) -> None:
+    write(val.alias + ":")
+    push(val.expression)
+
+
+def _column_alias(emitter: PureEmitter, val: ColumnAliasExpression, write, push) -> None:
+    # the reference is a column name: written right away rather than pushed
+    write("$" + val.alias + "." + val.reference.visit(emitter.visitor, ""))
+
+
+def _map_reduce(emitter: PureEmitter, val: MapReduceExpression, write, push) -> None:
+    push(val.reduce_expression)
+    push(" : ")
+    push(val.map_expression)
+
+
+def _lambda(emitter: PureEmitter, val: LambdaExpression, write, push) -> None:
+    write(", ".join(val.parameters) + " | ")
+    push(val.expression)
+
+
+def _if(emitter: PureEmitter, val: IfExpression, write, push) -> None:
+    write("if(")
+    push(")")
+    push(val.orelse)
+    push(", | ")
+    push(val.body)
+    push(", | ")
+    push(val.test)
+
+
+def _order_by(emitter: PureEmitter, val: OrderByExpression, write, push) -> None:
+    write("~")
+    push("()")
+    push(val.direction)
+    push("->")
+    push(val.expression)
+
+
+_EXPANSIONS: Dict[type, Expansion] = {
+    FilterClause: _clause("filter(", "expression", ")"),
+    SelectionClause: _list_clause("select(~[", "expressions"),
+    ExtendClause: _list_clause("extend(~[", "expressions"),
+    GroupByClause: _clause("groupBy(", "expression", ")"),
+    GroupByExpression: _group_by,
+    DistinctClause: _list_clause("distinct(~[", "expressions"),
+    OrderByClause: _list_clause("sort([", "ordering"),
+    LimitClause: _clause("limit(", "value", ")"),
+    OffsetClause: _clause("drop(", "value", ")"),
+    SliceClause: _slice,
+    TopClause: _top,
+    JoinClause: _join,
+    JoinExpression: _clause("{", "on", "}"),
+    RenameClause: _rename,
+    OperandExpression: lambda emitter, val, write, push: push(val.expression),
+    UnaryExpression: _unary,
+    BinaryExpression: _binary,
+    LiteralExpression: lambda emitter, val, write, push: write(val.literal.visit(emitter.visitor, "")),
+    ComputedColumnAliasExpression: _computed_column_alias,
+    ColumnAliasExpression: _column_alias,
+    FunctionExpression: _function,
+    MapReduceExpression: _map_reduce,
+    LambdaExpression: _lambda,
+    IfExpression: _if,
+    OrderByExpression: _order_by,
+}
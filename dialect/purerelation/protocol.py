@@ -0,0 +1,264 @@
+"""
+The executable as the Pure protocol JSON the execution server runs: the value specifications grammarToJson/lambda
+returns for the text PureRelationExpressionVisitor writes, built here so that a query is sent without being parsed.
+"""
+from typing import Callable, List, Optional
+
+from model.metamodel import ExecutionVisitor, Runtime, Clause, JoinClause, LimitClause, DistinctClause, GroupByClause, \
+    ExtendClause, SelectionClause, FilterClause, FunctionExpression, LiteralExpression, BinaryExpression, \
+    UnaryExpression, OperandExpression, BooleanLiteral, StringLiteral, IntegerLiteral, FloatLiteral, OrBinaryOperator, \
+    AndBinaryOperator, LessThanEqualsBinaryOperator, LessThanBinaryOperator, GreaterThanEqualsBinaryOperator, \
+    GreaterThanBinaryOperator, NotEqualsBinaryOperator, EqualsBinaryOperator, NotUnaryOperator, InnerJoinType, \
+    LeftJoinType, ColumnAliasExpression, CountFunction, JoinExpression, FromClause, AddBinaryOperator, \
+    MultiplyBinaryOperator, SubtractBinaryOperator, DivideBinaryOperator, OffsetClause, RenameClause, SliceClause, \
+    TopClause, OrderByExpression, IfExpression, ColumnReferenceExpression, DateLiteral, GroupByExpression, \
+    ComputedColumnAliasExpression, VariableAliasExpression, MapReduceExpression, LambdaExpression, AverageFunction, \
+    AscendingOrderType, DescendingOrderType, OrderByClause, ModuloFunction, ExponentFunction, ParameterExpression
+
+
+def to_protocol(clauses: List[Clause], runtime: Runtime) -> dict:
+    # the lambda of no parameters running the clauses on the runtime
+    visitor = PureProtocolVisitor()
+    relation = None
+    for clause in clauses:
+        relation = clause.visit(visitor, relation)
+    return _lambda([], runtime.visit(visitor, relation))
+
+
+def _func(function: str, *parameters: dict) -> dict:
+    return {"_type": "func", "function": function, "parameters": list(parameters)}
+
+
+def _var(name: str) -> dict:
+    return {"_type": "var", "name": name}
+
+
+def _lambda(parameters: List[str], body: dict) -> dict:
+    return {"_type": "lambda", "body": [body], "parameters": [_var(p) for p in parameters]}
+
+
+def _collection(values: List[dict]) -> dict:
+    return {"_type": "collection", "multiplicity": {"lowerBound": len(values), "upperBound": len(values)}, "values": values}
+
+
+def _col_spec(name: str, function1: Optional[dict] = None, function2: Optional[dict] = None) -> dict:
+    value = {"name": name}
+    if function1 is not None:
+        value["function1"] = function1
+    if function2 is not None:
+        value["function2"] = function2
+    return {"_type": "classInstance", "type": "colSpec", "value": value}
+
+
+def _col_spec_array(col_specs: List[dict]) -> dict:
+    return {"_type": "classInstance", "type": "colSpecArray", "value": {"colSpecs": col_specs}}
+
+
+def _element(path: str) -> dict:
+    return {"_type": "packageableElementPtr", "fullPath": path}
+
+
+# what the operators return: how they apply to their operands
+Apply = Callable[..., dict]
+
+
+class PureProtocolVisitor(ExecutionVisitor):
+    # clauses are visited with the relation they apply to, and return the relation they make of it
+
+    def visit_runtime(self, val: Runtime, parameter: dict) -> dict:
+        return _func("from", parameter, _element(val.name))
+
+    def visit_from_clause(self, val: FromClause, parameter: Optional[dict]) -> dict:
+        return {"_type": "classInstance", "type": ">", "value": {"path": [val.database, val.table]}}
+
+    def visit_integer_literal(self, val: IntegerLiteral, parameter: str) -> dict:
+        return {"_type": "integer", "value": val.value()}
+
+    def visit_float_literal(self, val: FloatLiteral, parameter: str) -> dict:
+        return {"_type": "float", "value": val.value()}
+
+    def visit_string_literal(self, val: StringLiteral, parameter: str) -> dict:
+        return {"_type": "string", "value": val.value()}
+
+    def visit_date_literal(self, val: DateLiteral, parameter: str) -> dict:
+        return {"_type": "strictDate", "value": val.value().isoformat()}
+
+    def visit_boolean_literal(self, val: BooleanLiteral, parameter: str) -> dict:
+        return {"_type": "boolean", "value": val.value()}
+
+    def visit_operand_expression(self, val: OperandExpression, parameter: str) -> dict:
+        return val.expression.visit(self, parameter)
+
+    def visit_not_unary_operator(self, val: NotUnaryOperator, parameter: str) -> Apply:
+        return lambda operand: _func("not", operand)
+
+    def visit_equals_binary_operator(self, val: EqualsBinaryOperator, parameter: str) -> Apply:
+        return lambda left, right: _func("equal", left, right)
+
+    def visit_not_equals_binary_operator(self, val: NotEqualsBinaryOperator, parameter: str) -> Apply:
+        # the grammar parses a != b as !(a == b)
+        return lambda left, right: _func("not", _func("equal", left, right))
+
+    def visit_greater_than_binary_operator(self, val: GreaterThanBinaryOperator, parameter: str) -> Apply:
+        return lambda left, right: _func("greaterThan", left, right)
+
+    def visit_greater_than_equals_operator(self, val: GreaterThanEqualsBinaryOperator, parameter: str) -> Apply:
+        return lambda left, right: _func("greaterThanEqual", left, right)
+
+    def visit_less_than_binary_operator(self, val: LessThanBinaryOperator, parameter: str) -> Apply:
+        return lambda left, right: _func("lessThan", left, right)
+
+    def visit_less_than_equals_binary_operator(self, val: LessThanEqualsBinaryOperator, parameter: str) -> Apply:
+        return lambda left, right: _func("lessThanEqual", left, right)
+
+    def visit_and_binary_operator(self, val: AndBinaryOperator, parameter: str) -> Apply:
+        return lambda left, right: _func("and", left, right)
+
+    def visit_or_binary_operator(self, val: OrBinaryOperator, parameter: str) -> Apply:
+        return lambda left, right: _func("or", left, right)
+
+    # the grammar parses +, - and * as functions of the collection of their operands
+    def visit_add_binary_operator(self, val: AddBinaryOperator, parameter: str) -> Apply:
+        return lambda left, right: _func("plus", _collection([left, right]))
+
+    def visit_multiply_binary_operator(self, val: MultiplyBinaryOperator, parameter: str) -> Apply:
+        return lambda left, right: _func("times", _collection([left, right]))
+
+    def visit_subtract_binary_operator(self, val: SubtractBinaryOperator, parameter: str) -> Apply:
+        return lambda left, right: _func("minus", _collection([left, right]))
+
+    def visit_divide_binary_operator(self, val: DivideBinaryOperator, parameter: str) -> Apply:
+        return lambda left, right: _func("divide", left, right)
+
+    def visit_literal_expression(self, val: LiteralExpression, parameter: str) -> dict:
+        return val.literal.visit(self, parameter)
+
+    def visit_parameter_expression(self, val: ParameterExpression, parameter: str) -> dict:
+        return _var(val.name)
+
+    def visit_unary_expression(self, val: UnaryExpression, parameter: str) -> dict:
+        return val.operator.visit(self, parameter)(val.expression.visit(self, parameter))
+
+    def visit_binary_expression(self, val: BinaryExpression, parameter: str) -> dict:
+        return val.operator.visit(self, parameter)(val.left.visit(self, parameter), val.right.visit(self, parameter))
+
+    def visit_variable_alias_expression(self, val: VariableAliasExpression, parameter: str) -> dict:
+        return _var(val.alias)
+
+    def visit_computed_column_alias_expression(self, val: ComputedColumnAliasExpression, parameter: str) -> dict:
+        if isinstance(val.expression, MapReduceExpression):
+            return _col_spec(val.alias, val.expression.map_expression.visit(self, parameter), val.expression.reduce_expression.visit(self, parameter))
+        return _col_spec(val.alias, val.expression.visit(self, parameter))
+
+    def visit_column_alias_expression(self, val: ColumnAliasExpression, parameter: str) -> dict:
+        return {"_type": "property", "property": val.reference.name, "parameters": [_var(val.alias)]}
+
+    def visit_function_expression(self, val: FunctionExpression, parameter: str) -> dict:
+        return _func(val.function.visit(self, parameter), *(p.visit(self, parameter) for p in val.parameters))
+
+    def visit_map_reduce_expression(self, val: MapReduceExpression, parameter: str) -> dict:
+        raise ValueError("A map and reduce is only written as the aggregate of a group_by")
+
+    def visit_lambda_expression(self, val: LambdaExpression, parameter: str) -> dict:
+        return _lambda(val.parameters, val.expression.visit(self, parameter))
+
+    def visit_count_function(self, val: CountFunction, parameter: str) -> str:
+        return "count"
+
+    def visit_average_function(self, val: AverageFunction, parameter: str) -> str:
+        return "average"
+
+    def visit_modulo_function(self, val: ModuloFunction, parameter: str) -> str:
+        return "mod"
+
+    def visit_exponent_function(self, val: ExponentFunction, parameter: str) -> str:
+        return "pow"
+
+    def visit_filter_clause(self, val: FilterClause, parameter: dict) -> dict:
+        return _func("filter", parameter, val.expression.visit(self, ""))
+
+    def visit_selection_clause(self, val: SelectionClause, parameter: dict) -> dict:
+        return _func("select", parameter, _col_spec_array([e.visit(self, "") for e in val.expressions]))
+
+    def visit_extend_clause(self, val: ExtendClause, parameter: dict) -> dict:
+        return _func("extend", parameter, _col_spec_array([e.visit(self, "") for e in val.expressions]))
+
+    def visit_group_by_clause(self, val: GroupByClause, parameter: dict) -> dict:
+        return _func("groupBy", parameter, *val.expression.visit(self, ""))
+
+    def visit_group_by_expression(self, val: GroupByExpression, parameter: str) -> List[dict]:
+        parameters = [_col_spec_array([s.visit(self, parameter) for s in val.selections]),
+                      _col_spec_array([e.visit(self, parameter) for e in val.expressions])]
+        if val.having:
+            parameters.append(val.having.visit(self, parameter))
+        return parameters
+
+    def visit_distinct_clause(self, val: DistinctClause, parameter: dict) -> dict:
+        return _func("distinct", parameter, _col_spec_array([e.visit(self, "") for e in val.expressions]))
+
+    def visit_order_by_clause(self, val: OrderByClause, parameter: dict) -> dict:
+        return _func("sort", parameter, _collection([o.visit(self, "") for o in val.ordering]))
+
+    def visit_limit_clause(self, val: LimitClause, parameter: dict) -> dict:
+        return _func("limit", parameter, val.value.visit(self, ""))
+
+    def visit_join_expression(self, val: JoinExpression, parameter: str) -> dict:
+        return val.on.visit(self, parameter)
+
+    def visit_join_clause(self, val: JoinClause, parameter: dict) -> dict:
+        return _func("join", parameter, val.from_clause.visit(self, None), val.join_type.visit(self, ""), val.on_clause.visit(self, ""))
+
+    def visit_inner_join_type(self, val: InnerJoinType, parameter: str) -> dict:
+        return {"_type": "property", "property": "INNER", "parameters": [_element("JoinKind")]}
+
+    def visit_left_join_type(self, val: LeftJoinType, parameter: str) -> dict:
+        return {"_type": "property", "property": "LEFT", "parameters": [_element("JoinKind")]}
+
+    def visit_column_reference_expression(self, val: ColumnReferenceExpression, parameter: str) -> dict:
+        return _col_spec(val.name)
+
+    def visit_if_expression(self, val: IfExpression, parameter: str) -> dict:
+        # the branches are lambdas of no parameters: if(test, | body, | orelse)
+        return _func("if", val.test.visit(self, parameter), _lambda([], val.body.visit(self, parameter)), _lambda([], val.orelse.visit(self, parameter)))
+
+    def visit_order_by_expression(self, val: OrderByExpression, parameter: str) -> dict:
+        return _func(val.direction.visit(self, parameter), val.expression.visit(self, parameter))
+
+    def visit_ascending_order_type(self, val: AscendingOrderType, parameter: str) -> str:
+        return "ascending"
+
+    def visit_descending_order_type(self, val: DescendingOrderType, parameter: str) -> str:
+        return "descending"
+
+    def visit_rename_clause(self, val: RenameClause, parameter: dict) -> dict:
+        for alias in val.columnAliases:
+            parameter = _func("rename", parameter, alias.reference.visit(self, ""), _col_spec(alias.alias))
+        return parameter
+
+    def visit_offset_clause(self, val: OffsetClause, parameter: dict) -> dict:
+        return _func("drop", parameter, val.value.visit(self, ""))
+
+    def visit_slice_clause(self, val: SliceClause, parameter: dict) -> dict:
+        return _func("slice", parameter, val.start.visit(self, ""), val.stop.visit(self, ""))
+
+    def visit_top_clause(self, val: TopClause, parameter: dict) -> dict:
+        # Pure has no top-N function: the engine is left to run the sort and the limit as one
+        return self.visit_limit_clause(LimitClause(val.value), self.visit_order_by_clause(OrderByClause(val.ordering), parameter))
+
+    def visit_in_binary_operator(self, self1, parameter: str) -> Apply:
+        raise NotImplementedError()
+
+    def visit_not_in_binary_operator(self, self1, parameter: str) -> Apply:
+        raise NotImplementedError()
+
+    def visit_is_binary_operator(self, self1, parameter: str) -> Apply:
+        raise NotImplementedError()
+
+    def visit_is_not_binary_operator(self, self1, parameter: str) -> Apply:
+        raise NotImplementedError()
+
+    def visit_bitwise_and_binary_operator(self, self1, parameter: str) -> Apply:
+        raise NotImplementedError()
+
+    def visit_bitwise_or_binary_operator(self, self1, parameter: str) -> Apply:
+        raise NotImplementedError()
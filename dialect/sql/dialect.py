@@ -0,0 +1,359 @@
+from abc import ABC
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, List, Optional, Type
+
+from model.functions import SumFunction, AvgFunction, CountFunction as CountAggregation, LeftFunction, \
+    StringConcatFunction, OverFunction, RowsFunction, RangeFunction, UnboundedFunction, RankFunction, \
+    RowNumberFunction, LeadFunction, LagFunction
+from model.metamodel import ExecutionVisitor, JoinClause, LimitClause, DistinctClause, GroupByClause, ExtendClause, \
+    SelectionClause, FilterClause, FunctionExpression, LiteralExpression, BinaryExpression, \
+    UnaryExpression, OperandExpression, BooleanLiteral, StringLiteral, IntegerLiteral, FloatLiteral, Runtime, \
+    OrBinaryOperator, AndBinaryOperator, LessThanEqualsBinaryOperator, LessThanBinaryOperator, \
+    GreaterThanEqualsBinaryOperator, GreaterThanBinaryOperator, NotEqualsBinaryOperator, EqualsBinaryOperator, \
+    NotUnaryOperator, InnerJoinType, LeftJoinType, ColumnAliasExpression, \
+    CountFunction, JoinExpression, Clause, FromClause, AddBinaryOperator, \
+    MultiplyBinaryOperator, SubtractBinaryOperator, DivideBinaryOperator, OffsetClause, RenameClause, SliceClause, TopClause, \
+    OrderByExpression, IfExpression, ColumnReferenceExpression, DateLiteral, GroupByExpression, \
+    ComputedColumnAliasExpression, VariableAliasExpression, MapReduceExpression, LambdaExpression, AverageFunction, \
+    AscendingOrderType, DescendingOrderType, OrderByClause, ModuloFunction, ExponentFunction, ParameterExpression
+from model.parameters import find_parameters
+
+# what the parameters of the lambdas being written stand for: the relation of a join, or the value a reduce applies to
+Scope = Dict[str, str]
+
+
+@dataclass(frozen=True)
+class SqlTemplate:
+    clauses: List[Clause]
+    parameters: Dict[str, ParameterExpression]
+    # the statement, with each parameter written $name
+    sql: str
+
+
+@dataclass
+class SqlRuntime(Runtime, ABC):
+    def executable_to_string(self, clauses: List[Clause]) -> str:
+        return to_sql(clauses, self)
+
+    def prepare(self, clauses: List[Clause]) -> SqlTemplate:
+        return SqlTemplate(clauses, find_parameters(clauses), to_sql(clauses, self))
+
+    def empty(self, columns: Dict[str, Optional[Type]]) -> dict:
+        return {"columns": list(columns), "rows": []}
+
+
+class NonExecutableSqlRuntime(SqlRuntime):
+    def eval(self, clauses: List[Clause]) -> dict:
+        raise NotImplementedError()
+
+
+@dataclass(frozen=True)
+class SqlQuery:
+    # a SELECT being written: the sort, limit and offset of the clauses following it are merged into it, the other
+    # clauses select from it
+    body: str
+    # the table the query reads all of, when it does nothing else: selected from without a subquery
+    table: Optional[str] = None
+    order_by: Optional[str] = None
+    limit: Optional[int] = None
+    offset: Optional[int] = None
+
+    def to_string(self) -> str:
+        sql = self.body
+        if self.order_by is not None:
+            sql += " ORDER BY " + self.order_by
+        if self.limit is not None:
+            sql += f" LIMIT {self.limit}"
+        if self.offset is not None:
+            sql += f" OFFSET {self.offset}"
+        return sql
+
+    def source(self) -> str:
+        return self.table if self.table is not None else "(" + self.to_string() + ")"
+
+    def select(self, columns: str, rest: str = "") -> "SqlQuery":
+        return SqlQuery(f"SELECT {columns} FROM {self.source()}{rest}")
+
+    def sorted(self, order_by: str) -> "SqlQuery":
+        # a sort after a limit or an offset sorts the rows they kept
+        query = self if self.limit is None and self.offset is None else self.select("*")
+        return replace(query, table=None, order_by=order_by)
+
+    def sliced(self, offset: int, limit: Optional[int]) -> "SqlQuery":
+        # the rows from offset on of the ones the query keeps, at most limit of them: one LIMIT and OFFSET still
+        remaining = None if self.limit is None else max(self.limit - offset, 0)
+        limit = remaining if limit is None else limit if remaining is None else min(remaining, limit)
+        return replace(self, table=None, limit=limit, offset=(self.offset or 0) + offset or None)
+
+
+def to_sql(clauses: List[Clause], runtime: Runtime) -> str:
+    visitor = SqlExpressionVisitor()
+    query = None
+    for clause in clauses:
+        query = clause.visit(visitor, query)
+    return runtime.visit(visitor, query)
+
+
+def quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+# the functions of model.functions, which have no visit of their own, from the text of their arguments
+_FUNCTIONS: Dict[type, Callable[[List[str]], str]] = {
+    SumFunction: lambda arguments: f"sum({arguments[0]})",
+    AvgFunction: lambda arguments: f"avg({arguments[0]})",
+    CountAggregation: lambda arguments: f"count({arguments[0]})",
+    LeftFunction: lambda arguments: f"left({arguments[0]}, {arguments[1]})",
+    StringConcatFunction: lambda arguments: "concat(" + ", ".join(arguments) + ")",
+    RankFunction: lambda arguments: "rank()",
+    RowNumberFunction: lambda arguments: "row_number()",
+    LeadFunction: lambda arguments: "lead(" + ", ".join(arguments) + ")",
+    LagFunction: lambda arguments: "lag(" + ", ".join(arguments) + ")",
+}
+# the frames of a window: rows(start, end) counts rows from the current one, range(start, end) values of the sort
+_FRAMES = {RowsFunction: "ROWS", RangeFunction: "RANGE"}
+
+
+def _listed(expression: object) -> list:
+    return expression if isinstance(expression, list) else [expression]
+
+
+def _frame_bound(bound: object, unbounded: str) -> str:
+    # a bound of a frame: unbounded(), or an offset from the current row, before it when negative
+    if isinstance(bound, FunctionExpression) and type(bound.function) is UnboundedFunction:
+        return "UNBOUNDED " + unbounded
+    if not isinstance(bound, LiteralExpression) or not isinstance(bound.literal, IntegerLiteral):
+        raise ValueError(f"A window frame is bounded by integers or unbounded(): {bound}")
+    offset = bound.literal.value()
+    if offset == 0:
+        return "CURRENT ROW"
+    return f"{abs(offset)} {'PRECEDING' if offset < 0 else 'FOLLOWING'}"
+
+
+class SqlExpressionVisitor(ExecutionVisitor):
+    # writes DuckDB's SQL: clauses are visited with the SqlQuery they apply to, and return the one they make of it;
+    # expressions with the Scope of the lambdas they are in, and return their text
+
+    def visit_runtime(self, val: Runtime, parameter: SqlQuery) -> str:
+        return parameter.to_string()
+
+    def visit_from_clause(self, val: FromClause, parameter: Optional[SqlQuery]) -> SqlQuery:
+        # the table of the database the runtime connects to: the name of the Database is the Pure model's
+        return SqlQuery("SELECT * FROM " + quote(val.table), quote(val.table))
+
+    def visit_integer_literal(self, val: IntegerLiteral, parameter: Scope) -> str:
+        return str(val.value())
+
+    def visit_float_literal(self, val: FloatLiteral, parameter: Scope) -> str:
+        return repr(val.value())
+
+    def visit_string_literal(self, val: StringLiteral, parameter: Scope) -> str:
+        return "'" + val.value().replace("'", "''") + "'"
+
+    def visit_date_literal(self, val: DateLiteral, parameter: Scope) -> str:
+        return f"DATE '{val.value().isoformat()}'"
+
+    def visit_boolean_literal(self, val: BooleanLiteral, parameter: Scope) -> str:
+        return "TRUE" if val.value() else "FALSE"
+
+    def visit_operand_expression(self, val: OperandExpression, parameter: Scope) -> str:
+        return val.expression.visit(self, parameter)
+
+    def visit_not_unary_operator(self, val: NotUnaryOperator, parameter: Scope) -> str:
+        return "NOT"
+
+    def visit_equals_binary_operator(self, val: EqualsBinaryOperator, parameter: Scope) -> str:
+        return "="
+
+    def visit_not_equals_binary_operator(self, val: NotEqualsBinaryOperator, parameter: Scope) -> str:
+        return "<>"
+
+    def visit_greater_than_binary_operator(self, val: GreaterThanBinaryOperator, parameter: Scope) -> str:
+        return ">"
+
+    def visit_greater_than_equals_operator(self, val: GreaterThanEqualsBinaryOperator, parameter: Scope) -> str:
+        return ">="
+
+    def visit_less_than_binary_operator(self, val: LessThanBinaryOperator, parameter: Scope) -> str:
+        return "<"
+
+    def visit_less_than_equals_binary_operator(self, val: LessThanEqualsBinaryOperator, parameter: Scope) -> str:
+        return "<="
+
+    def visit_and_binary_operator(self, val: AndBinaryOperator, parameter: Scope) -> str:
+        return "AND"
+
+    def visit_or_binary_operator(self, val: OrBinaryOperator, parameter: Scope) -> str:
+        return "OR"
+
+    def visit_add_binary_operator(self, val: AddBinaryOperator, parameter: Scope) -> str:
+        return "+"
+
+    def visit_multiply_binary_operator(self, val: MultiplyBinaryOperator, parameter: Scope) -> str:
+        return "*"
+
+    def visit_subtract_binary_operator(self, val: SubtractBinaryOperator, parameter: Scope) -> str:
+        return "-"
+
+    def visit_divide_binary_operator(self, val: DivideBinaryOperator, parameter: Scope) -> str:
+        return "/"
+
+    def visit_literal_expression(self, val: LiteralExpression, parameter: Scope) -> str:
+        return val.literal.visit(self, parameter)
+
+    def visit_parameter_expression(self, val: ParameterExpression, parameter: Scope) -> str:
+        return "$" + val.name
+
+    def visit_unary_expression(self, val: UnaryExpression, parameter: Scope) -> str:
+        return f"({val.operator.visit(self, parameter)} {val.expression.visit(self, parameter)})"
+
+    def visit_binary_expression(self, val: BinaryExpression, parameter: Scope) -> str:
+        return f"({val.left.visit(self, parameter)} {val.operator.visit(self, parameter)} {val.right.visit(self, parameter)})"
+
+    def visit_variable_alias_expression(self, val: VariableAliasExpression, parameter: Scope) -> str:
+        if val.alias not in parameter:
+            raise ValueError(f"'{val.alias}' is not a value in SQL")
+        return parameter[val.alias]
+
+    def visit_computed_column_alias_expression(self, val: ComputedColumnAliasExpression, parameter: Scope) -> str:
+        return val.expression.visit(self, parameter) + " AS " + quote(val.alias)
+
+    def visit_column_alias_expression(self, val: ColumnAliasExpression, parameter: Scope) -> str:
+        # the column of a row: qualified by the relation the row is from in a join
+        column = val.reference.visit(self, parameter)
+        return parameter[val.alias] + "." + column if val.alias in parameter else column
+
+    def visit_function_expression(self, val: FunctionExpression, parameter: Scope) -> str:
+        if type(val.function) is OverFunction:
+            return self._window(val.parameters, parameter)
+        arguments = [p.visit(self, parameter) for p in val.parameters]
+        function = _FUNCTIONS.get(type(val.function))
+        return function(arguments) if function is not None else val.function.visit(self, arguments)
+
+    def _window(self, parameters: List[object], scope: Scope) -> str:
+        # over(partition, function, sort, frame), the sort and the frame optional: the function of the window of a row
+        partition, function, *rest = parameters
+        frame = rest.pop() if rest and isinstance(rest[-1], FunctionExpression) and type(rest[-1].function) in _FRAMES else None
+        window = ["PARTITION BY " + ", ".join(e.visit(self, scope) for e in _listed(partition))]
+        if rest:
+            window.append("ORDER BY " + ", ".join(e.visit(self, scope) for e in _listed(rest[0])))
+        if frame is not None:
+            start, end = frame.parameters
+            window.append(f"{_FRAMES[type(frame.function)]} BETWEEN {_frame_bound(start, 'PRECEDING')} AND {_frame_bound(end, 'FOLLOWING')}")
+        return f"{function.visit(self, scope)} OVER ({' '.join(window)})"
+
+    def visit_map_reduce_expression(self, val: MapReduceExpression, parameter: Scope) -> str:
+        # the reduce applied to what the map computes of each row: an aggregate of an expression
+        mapped = val.map_expression.visit(self, parameter)
+        reduce = val.reduce_expression
+        return reduce.expression.visit(self, {**parameter, reduce.parameters[0]: mapped})
+
+    def visit_lambda_expression(self, val: LambdaExpression, parameter: Scope) -> str:
+        return val.expression.visit(self, parameter)
+
+    def visit_count_function(self, val: CountFunction, parameter: List[str]) -> str:
+        return f"count({parameter[0]})"
+
+    def visit_average_function(self, val: AverageFunction, parameter: List[str]) -> str:
+        return f"avg({parameter[0]})"
+
+    def visit_modulo_function(self, val: ModuloFunction, parameter: List[str]) -> str:
+        return f"({parameter[0]} % {parameter[1]})"
+
+    def visit_exponent_function(self, val: ExponentFunction, parameter: List[str]) -> str:
+        return f"pow({parameter[0]}, {parameter[1]})"
+
+    def visit_filter_clause(self, val: FilterClause, parameter: SqlQuery) -> SqlQuery:
+        return parameter.select("*", " WHERE " + val.expression.visit(self, {}))
+
+    def visit_selection_clause(self, val: SelectionClause, parameter: SqlQuery) -> SqlQuery:
+        return parameter.select(", ".join(e.visit(self, {}) for e in val.expressions))
+
+    def visit_extend_clause(self, val: ExtendClause, parameter: SqlQuery) -> SqlQuery:
+        # DuckDB lets a column read the ones extended before it in the same select
+        return parameter.select("*, " + ", ".join(e.visit(self, {}) for e in val.expressions))
+
+    def visit_group_by_clause(self, val: GroupByClause, parameter: SqlQuery) -> SqlQuery:
+        return val.expression.visit(self, parameter)
+
+    def visit_group_by_expression(self, val: GroupByExpression, parameter: SqlQuery) -> SqlQuery:
+        keys = [s.visit(self, {}) for s in val.selections]
+        columns = ", ".join(keys + [e.visit(self, {}) for e in val.expressions])
+        query = parameter.select(columns, " GROUP BY " + ", ".join(keys) if keys else "")
+        # the having reads the aggregates by the names they are given
+        return query.select("*", " WHERE " + val.having.visit(self, {})) if val.having else query
+
+    def visit_distinct_clause(self, val: DistinctClause, parameter: SqlQuery) -> SqlQuery:
+        return parameter.select("DISTINCT " + ", ".join(e.visit(self, {}) for e in val.expressions))
+
+    def visit_order_by_clause(self, val: OrderByClause, parameter: SqlQuery) -> SqlQuery:
+        return parameter.sorted(", ".join(o.visit(self, {}) for o in val.ordering))
+
+    def visit_limit_clause(self, val: LimitClause, parameter: SqlQuery) -> SqlQuery:
+        return parameter.sliced(0, val.value.value())
+
+    def visit_join_expression(self, val: JoinExpression, parameter: Scope) -> str:
+        return val.on.visit(self, parameter)
+
+    def visit_join_clause(self, val: JoinClause, parameter: SqlQuery) -> SqlQuery:
+        # the lambda's rows are the relation joined so far, "l", and the table joined, "r"; the columns it names of
+        # the table are the ones added, all of them when it names none
+        on = val.on_clause
+        scope = dict(zip(on.parameters, ('"l"', '"r"')))
+        condition, columns = (on.expression[0], on.expression[1]) if isinstance(on.expression, list) else (on.expression, None)
+        selected = '"l".*, ' + (", ".join(c.reference.visit(self, scope) + " AS " + quote(c.alias) for c in columns) if columns else '"r".*')
+        return SqlQuery(f"SELECT {selected} FROM {parameter.source()} AS \"l\" {val.join_type.visit(self, scope)} "
+                        f"{quote(val.from_clause.table)} AS \"r\" ON {condition.visit(self, scope)}")
+
+    def visit_inner_join_type(self, val: InnerJoinType, parameter: Scope) -> str:
+        return "INNER JOIN"
+
+    def visit_left_join_type(self, val: LeftJoinType, parameter: Scope) -> str:
+        return "LEFT JOIN"
+
+    def visit_column_reference_expression(self, val: ColumnReferenceExpression, parameter: Scope) -> str:
+        return quote(val.name)
+
+    def visit_if_expression(self, val: IfExpression, parameter: Scope) -> str:
+        return f"CASE WHEN {val.test.visit(self, parameter)} THEN {val.body.visit(self, parameter)} ELSE {val.orelse.visit(self, parameter)} END"
+
+    def visit_order_by_expression(self, val: OrderByExpression, parameter: Scope) -> str:
+        return val.expression.visit(self, parameter) + " " + val.direction.visit(self, parameter)
+
+    def visit_ascending_order_type(self, val: AscendingOrderType, parameter: Scope) -> str:
+        return "ASC"
+
+    def visit_descending_order_type(self, val: DescendingOrderType, parameter: Scope) -> str:
+        return "DESC"
+
+    def visit_rename_clause(self, val: RenameClause, parameter: SqlQuery) -> SqlQuery:
+        renames = ", ".join(a.reference.visit(self, {}) + " AS " + quote(a.alias) for a in val.columnAliases)
+        return parameter.select(f"* RENAME ({renames})")
+
+    def visit_offset_clause(self, val: OffsetClause, parameter: SqlQuery) -> SqlQuery:
+        return parameter.sliced(val.value.value(), None)
+
+    def visit_slice_clause(self, val: SliceClause, parameter: SqlQuery) -> SqlQuery:
+        return parameter.sliced(val.start.value(), max(val.stop.value() - val.start.value(), 0))
+
+    def visit_top_clause(self, val: TopClause, parameter: SqlQuery) -> SqlQuery:
+        # DuckDB runs a sort followed by a limit as a top-N
+        return self.visit_limit_clause(LimitClause(val.value), self.visit_order_by_clause(OrderByClause(val.ordering), parameter))
+
+    def visit_in_binary_operator(self, self1, parameter: Scope) -> str:
+        raise NotImplementedError()
+
+    def visit_not_in_binary_operator(self, self1, parameter: Scope) -> str:
+        raise NotImplementedError()
+
+    def visit_is_binary_operator(self, self1, parameter: Scope) -> str:
+        raise NotImplementedError()
+
+    def visit_is_not_binary_operator(self, self1, parameter: Scope) -> str:
+        raise NotImplementedError()
+
+    def visit_bitwise_and_binary_operator(self, self1, parameter: Scope) -> str:
+        raise NotImplementedError()
+
+    def visit_bitwise_or_binary_operator(self, self1, parameter: Scope) -> str:
+        raise NotImplementedError()
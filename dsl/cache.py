@@ -0,0 +1,63 @@
+"""
+Memoization of parsed lambdas.
+
+Parsing a lambda means reading its source, running ast.parse and walking the tree. The result only depends on
+the lambda's code, the schema(s) of the input table(s) and the ParseType, so it can be cached and shared by every
+query that is built from the same lambda.
+"""
+from dataclasses import dataclass
+from types import CodeType
+from typing import Callable, Dict, Hashable, List, Optional, Tuple, Type
+
+from model.lru import LruCache
+from model.schema import Table
+
+
+@dataclass(frozen=True)
+class ParseCacheEntry:
+    result: object
+    table: str
+    columns: Dict[str, Optional[Type]]
+    # True when the parser returned (and mutated) the first input table rather than a new one
+    in_place: bool
+
+
+class ParseCache(LruCache[ParseCacheEntry]):
+    """
+    A thread-safe, bounded LRU cache of Parser results.
+
+    Entries are keyed on the lambda's code object, the ordered schema of every input table, the ParseType and the
+    types of the values the lambda captures.
+    The table a parse produces is stored as a snapshot so that a hit can replay its effect on the caller's table.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        super().__init__(maxsize)
+
+    @staticmethod
+    def key(func: Callable, tables: List[Table], ptype, captured: Dict[str, object] = None) -> Optional[Hashable]:
+        code = getattr(func, "__code__", None)
+        if not isinstance(code, CodeType):
+            return None
+        try:
+            schemas = tuple((t.table, tuple(t.columns.items())) for t in tables)
+            # captured values are parsed as typed parameters: their types matter, their values don't
+            parameters = tuple((name, type(value)) for name, value in (captured or {}).items())
+            key = (code, code.co_filename, schemas, ptype, parameters)
+            hash(key)
+        except TypeError:
+            # unhashable column types, don't cache
+            return None
+        return key
+
+    @staticmethod
+    def entry(result: object, tables: List[Table], new_table: Table) -> ParseCacheEntry:
+        return ParseCacheEntry(result, new_table.table, new_table.columns.copy(), len(tables) > 0 and new_table is tables[0])
+
+    @staticmethod
+    def replay(entry: ParseCacheEntry, tables: List[Table]) -> Tuple[object, Table]:
+        if entry.in_place:
+            table = tables[0]
+            table.columns = entry.columns.copy()
+            return entry.result, table
+        return entry.result, Table(entry.table, entry.columns.copy())
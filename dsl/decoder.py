@@ -0,0 +1,508 @@
+"""
+Bytecode decoder for the cloud-dataframe DSL.
+
+This module rebuilds the Python AST of a lambda from its code object, so the Parser can work on lambdas without
+reading (or even having) their source file. Only the expression subset used by the DSL is understood: attribute and
+name loads, constants, comparisons, arithmetic, boolean logic, conditional expressions, walrus assignments, lists,
+tuples, function calls and f-strings. Anything else raises a ValueError.
+"""
+import ast
+import dis
+import inspect
+from dataclasses import dataclass
+from types import CodeType
+from typing import Callable, List, Optional, Tuple
+
+
+class _Null:
+    # the NULL CPython pushes next to a callable before CALL
+    def __repr__(self):
+        return "NULL"
+
+
+NULL = _Null()
+
+_COMPARE_OPERATORS = {
+    "==": ast.Eq, "!=": ast.NotEq, "<": ast.Lt, "<=": ast.LtE, ">": ast.Gt, ">=": ast.GtE,
+}
+
+_BINARY_OPERATORS = {
+    "+": ast.Add, "-": ast.Sub, "*": ast.Mult, "/": ast.Div, "//": ast.FloorDiv, "%": ast.Mod, "**": ast.Pow,
+    "<<": ast.LShift, ">>": ast.RShift, "&": ast.BitAnd, "|": ast.BitOr, "^": ast.BitXor, "@": ast.MatMult,
+}
+
+_CONDITIONAL_JUMPS = {"POP_JUMP_IF_FALSE", "POP_JUMP_IF_TRUE", "POP_JUMP_IF_NONE", "POP_JUMP_IF_NOT_NONE"}
+_UNCONDITIONAL_JUMPS = {"JUMP_FORWARD", "JUMP", "JUMP_NO_INTERRUPT"}
+_RETURNS = {"RETURN_VALUE", "RETURN_CONST"}
+_IGNORED = {"RESUME", "NOP", "CACHE", "COPY_FREE_VARS", "MAKE_CELL", "TO_BOOL", "EXTENDED_ARG"}
+# the constants the Parser makes literals of. CPython folds constant arithmetic, 10 / 5 is the constant 2.0: other
+# constants are decoded from source, where the expression is as written
+_LITERALS = (type(None), bool, int, str)
+
+
+@dataclass
+class _Atom:
+    # a single test of a conditional expression: jump to target when bool(expression) == condition
+    expression: ast.expr
+    condition: bool
+    target: int
+    end: int
+
+
+class LambdaDecoder:
+    """
+    Decodes the code object of a lambda into an ast.Lambda.
+
+    The decoder runs the lambda's bytecode symbolically, with AST nodes on the value stack instead of values. Short
+    circuit boolean operators and conditional expressions are recovered from the shape of their jumps. Nodes are
+    given the source positions recorded in the code object (co_positions), so no source file is needed.
+    """
+
+    def __init__(self, code: CodeType):
+        self._code = code
+        self._instructions = list(dis.get_instructions(code))
+        self._index = {ins.offset: i for i, ins in enumerate(self._instructions)}
+        # keyword names of the next CALL (KW_NAMES, 3.12 only)
+        self._keyword_names: Tuple[str, ...] = ()
+        # jump target of every value context BoolOp, to flatten chains like `a and b and c`
+        self._bool_op_targets = {}
+
+    @staticmethod
+    def decode(func: Callable) -> ast.Lambda:
+        code = getattr(func, "__code__", None)
+        if not isinstance(code, CodeType):
+            raise ValueError(f"Cannot decode {func}: no code object")
+        return LambdaDecoder(code).lambda_node()
+
+    def lambda_node(self) -> ast.Lambda:
+        code = self._code
+        if code.co_flags & (inspect.CO_VARARGS | inspect.CO_VARKEYWORDS) or code.co_kwonlyargcount:
+            raise ValueError(f"Cannot decode lambda with *args, **kwargs or keyword only arguments: {code.co_name}")
+
+        try:
+            body, _, returned = self._run(0, len(self._instructions), [])
+        except (IndexError, KeyError, AttributeError) as e:
+            # a stack shape the decoder doesn't know
+            raise ValueError(f"Unsupported bytecode in {code.co_name}: {e!r}") from e
+        if not returned:
+            raise ValueError(f"Lambda did not return a value: {code.co_name}")
+
+        args = ast.arguments(posonlyargs=[], args=[ast.arg(arg=name) for name in code.co_varnames[:code.co_argcount]],
+                             kwonlyargs=[], kw_defaults=[], defaults=[])
+        node = ast.Lambda(args=args, body=body)
+        self._locate(node, self._instructions[0])
+        return ast.fix_missing_locations(node)
+
+    def _run(self, i: int, end: int, stack: List, stop_at_jump: bool = False, chain: Optional[dis.Instruction] = None) -> Tuple[Optional[ast.expr], int, bool]:
+        """
+        Symbolically execute instructions [i, end). Returns the top of the stack, the index execution stopped at and
+        whether the code returned. With a chain, execution also stops at the next link of that boolean operation.
+        """
+        instructions = self._instructions
+        while i < end:
+            ins = instructions[i]
+            name = ins.opname
+
+            if name in _IGNORED:
+                i += 1
+                continue
+
+            if name == "RETURN_VALUE":
+                return stack.pop(), i + 1, True
+
+            if name == "RETURN_CONST":
+                return self._constant(ins.argval, ins), i + 1, True
+
+            if name == "COPY" and ins.arg == 1:
+                j = self._skip(i + 1)
+                nxt = instructions[j]
+                if nxt.opname in ("STORE_FAST", "STORE_DEREF", "STORE_FAST_LOAD_FAST"):
+                    # walrus: (target := value)
+                    target = nxt.argval[0] if nxt.opname == "STORE_FAST_LOAD_FAST" else nxt.argval
+                    value = stack.pop()
+                    stack.append(self._node(ast.NamedExpr(target=self._node(ast.Name(id=target, ctx=ast.Store()), nxt), value=value), ins))
+                    if nxt.opname == "STORE_FAST_LOAD_FAST":
+                        stack.append(self._node(ast.Name(id=nxt.argval[1], ctx=ast.Load()), nxt))
+                    i = j + 1
+                    continue
+                if nxt.opname in ("POP_JUMP_IF_FALSE", "POP_JUMP_IF_TRUE"):
+                    if chain is not None and nxt.opname == chain.opname and nxt.argval == chain.argval:
+                        return stack.pop(), i, False
+                    i = self._bool_op(j, end, stack)
+                    continue
+                raise ValueError(f"Unsupported bytecode sequence at {ins.offset}: COPY 1, {nxt.opname}")
+
+            if name in _CONDITIONAL_JUMPS:
+                if stop_at_jump:
+                    return None, i, False
+                i, returned = self._if_exp(i, end, stack)
+                if returned:
+                    return stack.pop(), i, True
+                continue
+
+            i = self._step(ins, stack)
+
+        return (stack[-1] if stack else None), i, False
+
+    def _step(self, ins: dis.Instruction, stack: List) -> int:
+        name = ins.opname
+        arg = ins.arg
+
+        if name in ("LOAD_FAST", "LOAD_FAST_CHECK", "LOAD_DEREF", "LOAD_NAME", "LOAD_CLOSURE"):
+            stack.append(self._node(ast.Name(id=ins.argval, ctx=ast.Load()), ins))
+        elif name == "LOAD_FAST_LOAD_FAST":
+            for local in ins.argval:
+                stack.append(self._node(ast.Name(id=local, ctx=ast.Load()), ins))
+        elif name == "LOAD_GLOBAL":
+            if arg & 1:
+                stack.append(NULL)
+            stack.append(self._node(ast.Name(id=ins.argval, ctx=ast.Load()), ins))
+        elif name == "LOAD_CONST":
+            stack.append(self._constant(ins.argval, ins))
+        elif name == "LOAD_ATTR":
+            value = stack.pop()
+            if arg & 1:
+                stack.append(NULL)
+            stack.append(self._node(ast.Attribute(value=value, attr=ins.argval, ctx=ast.Load()), ins))
+        elif name == "PUSH_NULL":
+            stack.append(NULL)
+        elif name == "COMPARE_OP":
+            right = stack.pop()
+            left = stack.pop()
+            op = ins.argrepr.removeprefix("bool(").removesuffix(")")
+            if op not in _COMPARE_OPERATORS:
+                raise ValueError(f"Unsupported comparison operator {ins.argrepr}")
+            stack.append(self._node(ast.Compare(left=left, ops=[_COMPARE_OPERATORS[op]()], comparators=[right]), ins))
+        elif name == "IS_OP":
+            right = stack.pop()
+            left = stack.pop()
+            stack.append(self._node(ast.Compare(left=left, ops=[ast.IsNot() if arg else ast.Is()], comparators=[right]), ins))
+        elif name == "CONTAINS_OP":
+            right = stack.pop()
+            left = stack.pop()
+            stack.append(self._node(ast.Compare(left=left, ops=[ast.NotIn() if arg else ast.In()], comparators=[right]), ins))
+        elif name == "BINARY_OP":
+            right = stack.pop()
+            left = stack.pop()
+            if ins.argrepr not in _BINARY_OPERATORS:
+                raise ValueError(f"Unsupported binary operator {ins.argrepr}")
+            stack.append(self._node(ast.BinOp(left=left, op=_BINARY_OPERATORS[ins.argrepr](), right=right), ins))
+        elif name == "BINARY_SUBSCR":
+            index = stack.pop()
+            value = stack.pop()
+            stack.append(self._node(ast.Subscript(value=value, slice=index, ctx=ast.Load()), ins))
+        elif name == "UNARY_NEGATIVE":
+            stack.append(self._node(ast.UnaryOp(op=ast.USub(), operand=stack.pop()), ins))
+        elif name == "UNARY_NOT":
+            stack.append(self._node(ast.UnaryOp(op=ast.Not(), operand=stack.pop()), ins))
+        elif name == "UNARY_INVERT":
+            stack.append(self._node(ast.UnaryOp(op=ast.Invert(), operand=stack.pop()), ins))
+        elif name == "CALL_INTRINSIC_1" and ins.argrepr == "INTRINSIC_UNARY_POSITIVE":
+            stack.append(self._node(ast.UnaryOp(op=ast.UAdd(), operand=stack.pop()), ins))
+        elif name in ("BUILD_LIST", "BUILD_TUPLE", "BUILD_SET"):
+            elts = self._pop(stack, arg)
+            if name == "BUILD_LIST":
+                stack.append(self._node(ast.List(elts=elts, ctx=ast.Load()), ins))
+            elif name == "BUILD_TUPLE":
+                stack.append(self._node(ast.Tuple(elts=elts, ctx=ast.Load()), ins))
+            else:
+                stack.append(self._node(ast.Set(elts=elts), ins))
+        elif name in ("LIST_EXTEND", "SET_UPDATE"):
+            # constant lists and sets are built as an empty container extended with a constant tuple
+            values = stack.pop()
+            container = stack[-arg]
+            if not isinstance(values, (ast.Tuple, ast.List, ast.Set)):
+                raise ValueError(f"Unsupported unpacking in {container}")
+            container.elts.extend(values.elts)
+        elif name in ("LIST_APPEND", "SET_ADD"):
+            # long displays are built one element at a time
+            value = stack.pop()
+            stack[-arg].elts.append(value)
+        elif name == "CALL_INTRINSIC_1" and ins.argrepr == "INTRINSIC_LIST_TO_TUPLE":
+            elts = stack.pop().elts
+            stack.append(self._node(ast.Tuple(elts=elts, ctx=ast.Load()), ins))
+        elif name == "KW_NAMES":
+            self._keyword_names = ins.argval
+        elif name in ("CALL", "CALL_KW"):
+            if name == "CALL_KW":
+                names = tuple(e.value for e in stack.pop().elts)
+            else:
+                names, self._keyword_names = self._keyword_names, ()
+            values = self._pop(stack, arg)
+            # the callable sits next to a NULL, below it in 3.12 and above it in 3.13
+            first, second = stack.pop(), stack.pop()
+            if (first is NULL) == (second is NULL):
+                raise ValueError(f"Unsupported call at offset {ins.offset}")
+            func = second if first is NULL else first
+            positional = values[:len(values) - len(names)]
+            keywords = [ast.keyword(arg=n, value=v) for n, v in zip(names, values[len(values) - len(names):])]
+            stack.append(self._node(ast.Call(func=func, args=positional, keywords=keywords), ins))
+        elif name == "FORMAT_VALUE":
+            spec = stack.pop() if arg & 0x04 else None
+            conversion = {0: -1, 1: ord("s"), 2: ord("r"), 3: ord("a")}[arg & 0x03]
+            stack.append(self._formatted(stack.pop(), conversion, spec, ins))
+        elif name == "CONVERT_VALUE":
+            value = stack.pop()
+            stack.append(_Converted(value, {1: ord("s"), 2: ord("r"), 3: ord("a")}[arg]))
+        elif name in ("FORMAT_SIMPLE", "FORMAT_WITH_SPEC"):
+            spec = stack.pop() if name == "FORMAT_WITH_SPEC" else None
+            value = stack.pop()
+            conversion = -1
+            if isinstance(value, _Converted):
+                value, conversion = value.value, value.conversion
+            stack.append(self._formatted(value, conversion, spec, ins))
+        elif name == "BUILD_STRING":
+            values = self._pop(stack, arg)
+            stack.append(self._node(ast.JoinedStr(values=values), ins))
+        else:
+            raise ValueError(f"Unsupported bytecode {name} at offset {ins.offset}")
+
+        return self._index[ins.offset] + 1
+
+    def _bool_op(self, i: int, end: int, stack: List) -> int:
+        """
+        Value context `left and right` / `left or right`: COPY 1, [TO_BOOL], POP_JUMP_IF_X target, POP_TOP, right, target:
+        """
+        jump = self._instructions[i]
+        target = self._index[jump.argval]
+        pop = self._skip(i + 1)
+        if self._instructions[pop].opname != "POP_TOP":
+            raise ValueError(f"Unsupported boolean operation at offset {jump.offset}")
+
+        op = ast.And() if jump.opname == "POP_JUMP_IF_FALSE" else ast.Or()
+        values = [stack.pop()]
+        while True:
+            # `a and b and c` is one chain of jumps to the same target, read it back into a single BoolOp link by
+            # link rather than recursively so that long chains don't exhaust the stack
+            right, stopped, _ = self._run(pop + 1, target, list(stack), chain=jump)
+            if isinstance(right, ast.BoolOp) and type(right.op) is type(op) and self._bool_op_targets.get(id(right)) == target:
+                values.extend(right.values)
+            else:
+                values.append(right)
+            if stopped == target:
+                break
+            link = self._skip(stopped + 1)
+            pop = self._skip(link + 1)
+            if stopped > target or self._instructions[pop].opname != "POP_TOP":
+                raise ValueError(f"Unsupported boolean operation at offset {jump.offset}")
+        node = self._node(ast.BoolOp(op=op, values=values), jump)
+        self._bool_op_targets[id(node)] = target
+        stack.append(node)
+        return target
+
+    def _if_exp(self, i: int, end: int, stack: List) -> Tuple[int, bool]:
+        """
+        `body if test else orelse`: the test is a run of conditional jumps to the body or to the else branch, the
+        body either returns or ends with an unconditional jump over the else branch.
+        """
+        atoms = [self._atom(i, stack.pop())]
+        while True:
+            segment = list(stack)
+            try:
+                _, j, returned = self._run(atoms[-1].end, end, segment, stop_at_jump=True)
+            except ValueError:
+                break
+            if returned or j >= end or self._instructions[j].opname not in _CONDITIONAL_JUMPS or len(segment) != len(stack) + 1:
+                break
+            atoms.append(self._atom(j, segment.pop()))
+
+        # the test can't be told apart from a conditional expression in the body by its jumps alone,
+        # so try the longest test first
+        error = ValueError(f"Unsupported conditional expression at offset {self._instructions[i].offset}")
+        for k in reversed(range(len(atoms))):
+            orelse = atoms[k].target
+            if orelse <= atoms[k].end or not self._ends_branch(orelse - 1):
+                continue
+            if not all(a.target <= atoms[k].end or a.target == orelse for a in atoms[:k + 1]):
+                continue
+            try:
+                return self._if_exp_branches(atoms[:k + 1], end, stack)
+            except ValueError as e:
+                error = e
+        raise error
+
+    def _if_exp_branches(self, atoms: List[_Atom], end: int, stack: List) -> Tuple[int, bool]:
+        orelse = atoms[-1].target
+        test = self._condition(atoms, orelse, False, atoms[-1].end)
+        location = self._instructions[atoms[0].end - 1]
+
+        last = self._instructions[orelse - 1]
+        if last.opname in _UNCONDITIONAL_JUMPS:
+            after = self._index[last.argval]
+            body, stopped, returned = self._run(atoms[-1].end, orelse - 1, list(stack))
+            if returned or stopped != orelse - 1:
+                raise ValueError(f"Unsupported conditional expression at offset {last.offset}")
+            alternative, stopped, returned = self._run(orelse, after, list(stack))
+            if returned or stopped != after:
+                raise ValueError(f"Unsupported conditional expression at offset {last.offset}")
+            stack.append(self._node(ast.IfExp(test=test, body=body, orelse=alternative), location))
+            return after, False
+
+        # both branches return: CPython copied whatever follows the conditional expression into each branch
+        body, stopped, returned = self._run(atoms[-1].end, orelse, list(stack))
+        if not returned or stopped != orelse:
+            raise ValueError(f"Unsupported conditional expression at offset {last.offset}")
+        alternative, after, returned = self._run(orelse, end, list(stack))
+        if not returned:
+            raise ValueError(f"Unsupported conditional expression at offset {last.offset}")
+        stack.append(self._merge(body, alternative, test, location))
+        return after, True
+
+    def _merge(self, body: ast.expr, alternative: ast.expr, test: ast.expr, location: dis.Instruction) -> ast.expr:
+        """
+        Fold the two copies of the code that followed a conditional expression back into one. The copies are built
+        from instructions with the same source positions, which tells them apart from code that only looks the same.
+        """
+        if type(body) is not type(alternative) or not self._same_location(body, alternative):
+            return self._node(ast.IfExp(test=test, body=body, orelse=alternative), location)
+
+        merged = None
+        for field, value in ast.iter_fields(body):
+            other = getattr(alternative, field)
+            if isinstance(value, list):
+                if len(value) != len(other):
+                    return self._node(ast.IfExp(test=test, body=body, orelse=alternative), location)
+                differences = [i for i, (v, o) in enumerate(zip(value, other)) if not self._same(v, o)]
+                if not differences:
+                    continue
+                if merged is not None or len(differences) > 1:
+                    return self._node(ast.IfExp(test=test, body=body, orelse=alternative), location)
+                merged = (field, differences[0])
+            elif not self._same(value, other):
+                if merged is not None:
+                    return self._node(ast.IfExp(test=test, body=body, orelse=alternative), location)
+                merged = (field, None)
+
+        if merged is None:
+            return body
+        field, index = merged
+        if index is None:
+            setattr(body, field, self._merge(getattr(body, field), getattr(alternative, field), test, location))
+        else:
+            getattr(body, field)[index] = self._merge(getattr(body, field)[index], getattr(alternative, field)[index], test, location)
+        return body
+
+    def _same(self, node, other) -> bool:
+        if not isinstance(node, ast.AST):
+            return node == other
+        if type(node) is not type(other) or not self._same_location(node, other):
+            return False
+        return all(self._same(v, getattr(other, f)) if not isinstance(v, list) else
+                   len(v) == len(getattr(other, f)) and all(self._same(a, b) for a, b in zip(v, getattr(other, f)))
+                   for f, v in ast.iter_fields(node))
+
+    @staticmethod
+    def _same_location(node: ast.AST, other: ast.AST) -> bool:
+        if "lineno" not in node._attributes:
+            # operators and contexts
+            return True
+        location = [getattr(node, a, None) for a in ("lineno", "col_offset", "end_lineno", "end_col_offset")]
+        return location[0] is not None and location == [getattr(other, a, None) for a in ("lineno", "col_offset", "end_lineno", "end_col_offset")]
+
+    def _atom(self, i: int, expression: ast.expr) -> _Atom:
+        ins = self._instructions[i]
+        if ins.opname in ("POP_JUMP_IF_NONE", "POP_JUMP_IF_NOT_NONE"):
+            none = self._node(ast.Constant(value=None), ins)
+            expression = self._node(ast.Compare(left=expression, ops=[ast.Is()], comparators=[none]), ins)
+        condition = ins.opname in ("POP_JUMP_IF_TRUE", "POP_JUMP_IF_NONE")
+        return _Atom(expression, condition, self._index[ins.argval], i + 1)
+
+    def _condition(self, atoms: List[_Atom], target: int, condition: bool, fallthrough: int) -> ast.expr:
+        """
+        Rebuild the expression for a run of atoms that jumps to target when it evaluates to condition and otherwise
+        falls through to fallthrough. This inverts CPython's compiler_jump_if.
+        """
+        if len(atoms) == 1:
+            atom = atoms[0]
+            if atom.target != target:
+                raise ValueError(f"Unsupported conditional expression: jump to {atom.target} expected {target}")
+            return atom.expression if atom.condition == condition else self._negate(atom.expression)
+
+        values = []
+        start = 0
+        inner_target = None
+        for i in range(len(atoms)):
+            atom = atoms[i]
+            if inner_target is None:
+                if atom.target not in (target, fallthrough):
+                    continue
+            elif atom.target != inner_target:
+                continue
+            if i == len(atoms) - 1 or not all(a.target <= atom.end or a.target == atom.target for a in atoms[start:i + 1]):
+                continue
+            if inner_target is None:
+                inner_target = atom.target
+            values.append(atoms[start:i + 1])
+            start = i + 1
+        values.append(atoms[start:])
+
+        if inner_target is None or len(values) < 2:
+            raise ValueError("Unsupported conditional expression")
+
+        # the operands of `or` jump on True, the operands of `and` on False
+        inner_condition = condition if inner_target == target else not condition
+        op = ast.Or() if inner_condition else ast.And()
+        expressions = [self._condition(v, inner_target, inner_condition, v[-1].end) for v in values[:-1]]
+        expressions.append(self._condition(values[-1], target, condition, fallthrough))
+        return ast.BoolOp(op=op, values=expressions)
+
+    def _ends_branch(self, i: int) -> bool:
+        return self._instructions[i].opname in _RETURNS or self._instructions[i].opname in _UNCONDITIONAL_JUMPS
+
+    def _skip(self, i: int) -> int:
+        while self._instructions[i].opname in _IGNORED:
+            i += 1
+        return i
+
+    def _constant(self, value, ins: dis.Instruction) -> ast.expr:
+        if isinstance(value, tuple):
+            return self._node(ast.Tuple(elts=[self._constant(v, ins) for v in value], ctx=ast.Load()), ins)
+        if isinstance(value, frozenset):
+            return self._node(ast.Set(elts=[self._constant(v, ins) for v in value]), ins)
+        if not isinstance(value, _LITERALS):
+            raise ValueError(f"Unsupported constant {value!r} at offset {ins.offset}")
+        return self._node(ast.Constant(value=value), ins)
+
+    def _formatted(self, value: ast.expr, conversion: int, spec, ins: dis.Instruction) -> ast.expr:
+        if spec is not None and not isinstance(spec, ast.JoinedStr):
+            spec = self._node(ast.JoinedStr(values=[spec]), ins)
+        formatted = self._node(ast.FormattedValue(value=value, conversion=conversion, format_spec=spec), ins)
+        return formatted
+
+    @staticmethod
+    def _negate(expression: ast.expr) -> ast.expr:
+        if isinstance(expression, ast.Compare) and len(expression.ops) == 1 and isinstance(expression.ops[0], ast.Is):
+            return ast.Compare(left=expression.left, ops=[ast.IsNot()], comparators=expression.comparators)
+        return ast.UnaryOp(op=ast.Not(), operand=expression)
+
+    @staticmethod
+    def _pop(stack: List, count: int) -> List:
+        if count == 0:
+            return []
+        values = stack[-count:]
+        del stack[-count:]
+        if any(v is NULL for v in values):
+            raise ValueError("Unsupported bytecode: NULL on the value stack")
+        return values
+
+    @staticmethod
+    def _node[N: ast.AST](node: N, ins: dis.Instruction) -> N:
+        LambdaDecoder._locate(node, ins)
+        return node
+
+    @staticmethod
+    def _locate(node: ast.AST, ins: dis.Instruction) -> None:
+        positions = ins.positions
+        if positions is None or positions.lineno is None:
+            return
+        node.lineno = positions.lineno
+        node.end_lineno = positions.end_lineno
+        node.col_offset = positions.col_offset
+        node.end_col_offset = positions.end_col_offset
+
+
+@dataclass
+class _Converted:
+    value: ast.expr
+    conversion: int
+
@@ -83,6 +83,11 @@ class OverFunction:
         qualify: Optional[bool] = None):
         pass
 
+@dataclass
+class ParameterFunction:
+    def __init__(self, name: str, type_: Optional[type] = None):
+        pass
+
 aggregate = AggregateFunction
 over = OverFunction
 unbounded = UnboundedFunction
@@ -96,3 +101,4 @@ rank = RankFunction
 lead = LeadFunction
 lag = LagFunction
 row_number = RowNumberFunction
+param = ParameterFunction
@@ -5,23 +5,28 @@ This module provides utilities for parsing Python lambda functions
 and converting them to SQL expressions.
 """
 import ast
-import importlib
 import inspect
 from _ast import operator, arg
+from datetime import date, datetime
 from enum import Enum
 from typing import Callable, List, Union, Dict, Tuple
 
+from dsl.cache import ParseCache
+from dsl.decoder import LambdaDecoder
+from dsl.registry import FunctionRegistry
 from model.functions import StringConcatFunction
 from model.metamodel import Expression, BinaryExpression, BinaryOperator, \
     ColumnReferenceExpression, BooleanLiteral, IfExpression, OrderByExpression, \
     FunctionExpression, \
-    OperandExpression, AndBinaryOperator, OrBinaryOperator, IntegerLiteral, StringLiteral, EqualsBinaryOperator, \
+    OperandExpression, AndBinaryOperator, OrBinaryOperator, EqualsBinaryOperator, \
     NotEqualsBinaryOperator, LessThanBinaryOperator, LessThanEqualsBinaryOperator, GreaterThanBinaryOperator, \
     GreaterThanEqualsBinaryOperator, InBinaryOperator, NotInBinaryOperator, IsBinaryOperator, IsNotBinaryOperator, \
     AddBinaryOperator, SubtractBinaryOperator, MultiplyBinaryOperator, DivideBinaryOperator, BitwiseOrBinaryOperator, \
     BitwiseAndBinaryOperator, DateLiteral, GroupByExpression, \
     DescendingOrderType, ComputedColumnAliasExpression, AscendingOrderType, ColumnAliasExpression, LambdaExpression, \
-    VariableAliasExpression, MapReduceExpression, UnaryExpression, NotUnaryOperator, ModuloFunction, ExponentFunction
+    VariableAliasExpression, MapReduceExpression, UnaryExpression, NotUnaryOperator, ModuloFunction, ExponentFunction, \
+    ParameterExpression, LiteralExpression
+from model.parameters import to_literal
 from model.schema import Table
 
 class ParseType(Enum):
@@ -36,6 +41,12 @@ class ParseType(Enum):
     over = "over"
 
 class Parser:
+    # parsed lambdas keyed on code object, input schema(s) and ParseType; see dsl.cache
+    cache: ParseCache = ParseCache()
+    # the metamodel Function each DSL function call is parsed into; see dsl.registry
+    functions: FunctionRegistry = FunctionRegistry.from_dsl()
+    # the types a param(name, type) may declare
+    _parameter_types = {"int": int, "float": float, "str": str, "bool": bool, "date": date, "datetime": datetime}
 
     @staticmethod
     def parse[E: Expression](func: Callable, tables: [Table], ptype: ParseType) -> Tuple[Union[E, List[E], Table]]:
@@ -54,9 +65,25 @@ class Parser:
         Returns:
             An Expression or list of Expressions representing the lambda function
         """
+        key = ParseCache.key(func, tables, ptype, Parser.captured(func))
+        if key is None:
+            return Parser._parse(func, tables, ptype)
+
+        entry = Parser.cache.get(key)
+        if entry is not None:
+            return ParseCache.replay(entry, tables)
+
+        result = Parser._parse(func, tables, ptype)
+        Parser.cache.put(key, ParseCache.entry(result[0], tables, result[1]))
+        return result
+
+    @staticmethod
+    def _parse[E: Expression](func: Callable, tables: [Table], ptype: ParseType) -> Tuple[Union[E, List[E], Table]]:
         # Get the source code of the lambda function
         lambda_node = Parser._get_lambda_node(func)
-        lambda_args = lambda_node.args.args
+        # arguments with a default are captured values, not rows
+        lambda_args = lambda_node.args.args[:func.__code__.co_argcount - len(func.__defaults__ or ())]
+        lambda_node = _CapturedVariables(Parser._free_values(func)).visit(lambda_node)
 
         match ptype:
             case ParseType.select:
@@ -94,8 +121,39 @@ class Parser:
             case _:
                 raise ValueError(f"Unknown ParseType: {ptype}")
 
+    @staticmethod
+    def captured(func: Callable) -> Dict[str, object]:
+        """
+        The values a lambda reads from its defaults, closure and globals that are parsed as ParameterExpressions.
+        As only their types are part of the parse, one lambda gives the same Expression whatever the values.
+        """
+        return {name: value for name, value in Parser._free_values(func).items() if type(value) in Parser._parameter_types.values()}
+
+    @staticmethod
+    def _free_values(func: Callable) -> Dict[str, object]:
+        # the values of the names a lambda reads from its defaults, closure and globals, whatever their types
+        code = func.__code__
+        values = {name: func.__globals__[name] for name in code.co_names if name in func.__globals__}
+        for name, cell in zip(code.co_freevars, func.__closure__ or ()):
+            try:
+                values[name] = cell.cell_contents
+            except ValueError:
+                # not assigned yet
+                pass
+        defaults = func.__defaults__ or ()
+        values.update(zip(code.co_varnames[code.co_argcount - len(defaults):code.co_argcount], defaults))
+        return values
+
     @staticmethod
     def _get_lambda_node(func):
+        try:
+            # rebuild the lambda from its bytecode, this needs no source file and finds the exact lambda
+            return LambdaDecoder.decode(func)
+        except ValueError:
+            return Parser._get_lambda_node_from_source(func)
+
+    @staticmethod
+    def _get_lambda_node_from_source(func):
         source_lines, _ = inspect.getsourcelines(func)
         source_text = ''.join(source_lines).strip().replace("\n", "")
 
@@ -207,10 +265,7 @@ class Parser:
             # note that there is only one arg for this lambda
             if isinstance(node.value, ast.Call):
                 map_expression = LambdaExpression(list(map(lambda a: a.arg, args)), Parser._parse_lambda_body(node.value.args[0], args, full_table))
-                # very brittle, lots more checks needed here
-                module = importlib.import_module("model.functions")
-                class_ = getattr(module, f"{node.value.func.id.title()}Function")
-                function_instance = class_()
+                function_instance = Parser.functions.lookup(node.value.func.id)()
                 function_argument = args[0].arg
                 reduce_expression = LambdaExpression(list(map(lambda a: a.arg, args)), FunctionExpression(function_instance, [VariableAliasExpression(function_argument)]))
                 return (ComputedColumnAliasExpression(computed_column, MapReduceExpression(map_expression, reduce_expression)), {computed_column: function_argument})
@@ -255,242 +310,270 @@ class Parser:
 
         raise NotImplementedError()
 
+    @staticmethod
+    def _parse_parameter(node: ast.Call) -> ParameterExpression:
+        # param("name") or param("name", int)
+        values = node.args + [kw.value for kw in node.keywords]
+        if not values or len(values) > 2 or not isinstance(values[0], ast.Constant) or not isinstance(values[0].value, str):
+            raise ValueError(f"A param requires a name and optionally a type: {ast.dump(node)}")
+        type_ = None
+        if len(values) == 2:
+            if not isinstance(values[1], ast.Name) or values[1].id not in Parser._parameter_types:
+                raise ValueError(f"Unsupported param type: {ast.dump(values[1])}")
+            type_ = Parser._parameter_types[values[1].id]
+        return ParameterExpression(values[0].value, type_)
+
     @staticmethod
     def _parse_lambda_body(node: ast.AST, args: [arg], new_table: Table, implicit_aliases: dict[str, str] = None) -> Expression:
         if node is None:
             raise ValueError("node in Parser._parse_expression is None")
 
-        if isinstance(node, ast.NamedExpr):
-            new_table.columns[node.target.id] = None
-            return ColumnAliasExpression(node.target.id, Parser._parse_lambda_body(node.value, args, new_table, implicit_aliases))
+        parse = Parser._node_parsers.get(type(node))
+        if parse is None:
+            raise ValueError(f"Unsupported expression: {ast.dump(node)}")
+        return parse(node, args, new_table, implicit_aliases)
 
-        if isinstance(node, ast.Compare):
-            # Handle comparison operations (e.g., x > 5, y == 'value')
-            left = Parser._parse_lambda_body(node.left, args, new_table, implicit_aliases)
+    @staticmethod
+    def _parse_named_expr(node: ast.NamedExpr, args: [arg], new_table: Table, implicit_aliases: dict[str, str]) -> Expression:
+        new_table.columns[node.target.id] = None
+        return ColumnAliasExpression(node.target.id, Parser._parse_lambda_body(node.value, args, new_table, implicit_aliases))
 
-            # We only handle the first comparator for simplicity
-            # In a real implementation, we would handle multiple comparators
-            op = node.ops[0]
-            right = Parser._parse_lambda_body(node.comparators[0], args, new_table, implicit_aliases)
+    @staticmethod
+    def _parse_compare(node: ast.Compare, args: [arg], new_table: Table, implicit_aliases: dict[str, str]) -> Expression:
+        # Handle comparison operations (e.g., x > 5, y == 'value')
+        left = Parser._parse_lambda_body(node.left, args, new_table, implicit_aliases)
 
-            comp_op = Parser._get_comparison_operator(op)
+        # We only handle the first comparator for simplicity
+        # In a real implementation, we would handle multiple comparators
+        right = Parser._parse_lambda_body(node.comparators[0], args, new_table, implicit_aliases)
 
-            # Ensure left and right are Expression objects, not lists or tuples
-            if isinstance(left, list) or isinstance(left, tuple):
-                raise ValueError(f"Unsupported Compare object {left}")
-            if isinstance(right, list) or isinstance(right, tuple):
-                raise ValueError(f"Unsupported Compare object {right}")
+        comp_op = Parser._get_comparison_operator(node.ops[0])
 
-            return BinaryExpression(left=OperandExpression(left), operator=comp_op, right=OperandExpression(right))
+        # Ensure left and right are Expression objects, not lists or tuples
+        if isinstance(left, list) or isinstance(left, tuple):
+            raise ValueError(f"Unsupported Compare object {left}")
+        if isinstance(right, list) or isinstance(right, tuple):
+            raise ValueError(f"Unsupported Compare object {right}")
 
-        elif isinstance(node, ast.BinOp):
-            # Handle binary operations (e.g., x + y, x - y, x * y)
-            left = Parser._parse_lambda_body(node.left, args, new_table, implicit_aliases)
-            right = Parser._parse_lambda_body(node.right, args, new_table, implicit_aliases)
+        return BinaryExpression(left=OperandExpression(left), operator=comp_op, right=OperandExpression(right))
 
-            if isinstance(node.op, ast.Mod):
-                return FunctionExpression(parameters=[left, right], function=ModuloFunction())
-            elif isinstance(node.op, ast.Pow):
-                return FunctionExpression(parameters=[left, right], function=ExponentFunction())
+    @staticmethod
+    def _parse_bin_op(node: ast.BinOp, args: [arg], new_table: Table, implicit_aliases: dict[str, str]) -> Expression:
+        # Handle binary operations (e.g., x + y, x - y, x * y)
+        left = Parser._parse_lambda_body(node.left, args, new_table, implicit_aliases)
+        right = Parser._parse_lambda_body(node.right, args, new_table, implicit_aliases)
 
-            comp_op = Parser._get_binary_operator(node.op)
+        function = Parser._binary_functions.get(type(node.op))
+        if function is not None:
+            return FunctionExpression(parameters=[left, right], function=function())
 
-            # Ensure left and right are Expression objects, not lists or tuples
-            if isinstance(left, list) or isinstance(left, tuple):
-                raise ValueError(f"Unsupported BinOp object {left}")
-            if isinstance(right, list) or isinstance(right, tuple):
-                raise ValueError(f"Unsupported BinOp object {right}")
+        comp_op = Parser._get_binary_operator(node.op)
 
-            return BinaryExpression(left=OperandExpression(left), operator=comp_op, right=OperandExpression(right))
+        # Ensure left and right are Expression objects, not lists or tuples
+        if isinstance(left, list) or isinstance(left, tuple):
+            raise ValueError(f"Unsupported BinOp object {left}")
+        if isinstance(right, list) or isinstance(right, tuple):
+            raise ValueError(f"Unsupported BinOp object {right}")
 
-        elif isinstance(node, ast.BoolOp):
-            # Handle boolean operations (e.g., x and y, x or y)
-            values = [Parser._parse_lambda_body(val, args, new_table, implicit_aliases) for val in node.values]
+        return BinaryExpression(left=OperandExpression(left), operator=comp_op, right=OperandExpression(right))
 
-            # Combine the values with the appropriate operator
-            comp_op = AndBinaryOperator() if isinstance(node.op, ast.And) else OrBinaryOperator()
+    @staticmethod
+    def _parse_bool_op(node: ast.BoolOp, args: [arg], new_table: Table, implicit_aliases: dict[str, str]) -> Expression:
+        # Handle boolean operations (e.g., x and y, x or y)
+        comp_op = AndBinaryOperator() if isinstance(node.op, ast.And) else OrBinaryOperator()
 
+        result = None
+        for value in node.values:
+            val = Parser._parse_lambda_body(value, args, new_table, implicit_aliases)
             # Ensure all values are Expression objects, not lists or tuples
-            processed_values = []
-            for val in values:
-                if isinstance(val, list) or isinstance(val, tuple):
-                    raise ValueError(f"Unsupported BoolOp object {val}")
-                else:
-                    processed_values.append(val)
-
-            # Start with the first two values
-            result = BinaryExpression(left=OperandExpression(processed_values[0]), operator=comp_op, right=OperandExpression(processed_values[1]))
-
-            # Add the remaining values
-            for value in processed_values[2:]:
-                result = BinaryExpression(left=OperandExpression(result), operator=comp_op, right=OperandExpression(value))
-
-            return result
-
-        elif isinstance(node, ast.Attribute):
-            # Handle column references (e.g. x.column_name)
-            if isinstance(node.value, ast.Name):
-                # validate the column name
-                if not new_table.validate_column(node.attr):
-                    raise ValueError(f"Column '{node.attr}' not found in table '{new_table}'")
-
-                return ColumnAliasExpression(alias=node.value.id, reference=ColumnReferenceExpression(name=node.attr))
-
-        elif isinstance(node, ast.Name):
-            if node.id == "True":
-                from model.metamodel import LiteralExpression
-                return LiteralExpression(BooleanLiteral(True))
-            elif node.id == "False":
-                from model.metamodel import LiteralExpression
-                return LiteralExpression(BooleanLiteral(False))
-            else:
-                alias = implicit_aliases.get(node.id, None) if implicit_aliases else None
-                if alias:
-                    return ColumnAliasExpression(alias, ColumnReferenceExpression(node.id))
-                return ColumnReferenceExpression(node.id)
-
-        elif isinstance(node, ast.Constant):
-            # Handle literal values (e.g., 5, 'value', True)
-            from model.metamodel import LiteralExpression
-            if isinstance(node.value, int):
-                return LiteralExpression(IntegerLiteral(node.value))
-            if isinstance(node.value, bool):
-                return LiteralExpression(BooleanLiteral(node.value))
-            if isinstance(node.value, str):
-                return LiteralExpression(StringLiteral(node.value))
-
-            raise ValueError(f"Cannot convert literal type {type(node.value)}")
-
-        elif isinstance(node, ast.UnaryOp):
-            # Handle unary operations (e.g., not x)
-            operand = Parser._parse_lambda_body(node.operand, args, new_table, implicit_aliases)
-
-            # Ensure operand is an Expression object, not a list or tuple
-            if isinstance(operand, list) or isinstance(operand, tuple):
-                # Use a fallback for list/tuple values in unary operations
-                raise ValueError(f"Unsupported expression to UnaryOp: {operand}")
-
-            if isinstance(node.op, ast.Not):
-                return UnaryExpression(operator=NotUnaryOperator(), expression=OperandExpression(operand))
-            else:
-                # Other unary operations (e.g., +, -)
-                # In a real implementation, we would handle this more robustly
-                return Parser._parse_lambda_body(node.operand, args, new_table, implicit_aliases)
-
-        elif isinstance(node, ast.IfExp):
-            # Handle conditional expressions (e.g., x if y else z)
-            # In a real implementation, we would handle this more robustly
-            test = Parser._parse_lambda_body(node.test, args, new_table, implicit_aliases)
-            body = Parser._parse_lambda_body(node.body, args, new_table, implicit_aliases)
-            orelse = Parser._parse_lambda_body(node.orelse, args, new_table, implicit_aliases)
+            if isinstance(val, list) or isinstance(val, tuple):
+                raise ValueError(f"Unsupported BoolOp object {val}")
+            # fold left: ((a op b) op c) ..
+            result = val if result is None else BinaryExpression(left=OperandExpression(result), operator=comp_op, right=OperandExpression(val))
 
-            # Ensure all values are Expression objects, not lists or tuples
-            if isinstance(test, list) or isinstance(test, tuple):
-                raise ValueError(f"Unsupported IfExp: {test}")
-            if isinstance(body, list) or isinstance(body, tuple):
-                raise ValueError(f"Unsupported IfExp: {body}")
-            if isinstance(orelse, list) or isinstance(orelse, tuple):
-                raise ValueError(f"Unsupported IfExp: {orelse}")
-
-            # Create a CASE WHEN expression
-            return IfExpression(test=test, body=body, orelse=orelse)
-
-        elif isinstance(node, ast.List):
-            # Handle tuples and lists (e.g., (1, 2, 3), [1, 2, 3])
-            # This is used for array returns in lambdas like lambda x: [x.name, x.age]
-            elements = []
-            for elt in node.elts:
-                elements.append(Parser._parse_lambda_body(elt, args, new_table, implicit_aliases))
-            return elements
+        return result
 
-        elif isinstance(node, ast.Tuple):
-            # Handle Join with rename ( x.col1 == y.col1, [ (x_col1 := x.col1 ), (y_col1 := y.col1 ) ]
-            elements = []
-            for elt in node.elts:
-                elements.append(Parser._parse_lambda_body(elt, args, new_table, implicit_aliases))
-            return elements
-
-        elif isinstance(node, ast.Call):
-            # Handle function calls (e.g., sum(x.col1 - x.col2))
-            args_list = []
-            # kwargs = {}
-
-            if isinstance(node.func, ast.Name):
-                # Parse the arguments to the function
-
-                for arg in node.args:
-                    parsed_arg = Parser._parse_lambda_body(arg, args, new_table, implicit_aliases)
-                    args_list.append(parsed_arg)
-
-                # Handle keyword arguments
-                # kwargs = {}
-                for kw in node.keywords:
-                    parsed_kw = Parser._parse_lambda_body(kw.value, args, new_table, implicit_aliases)
-                    # kwargs[kw.arg] = parsed_kw
-                    args_list.append(parsed_kw)
-
-            else:
-                ValueError(f"Unsupported function type: {node.func}")
-
-            if node.func.id == "date":
-                from model.metamodel import LiteralExpression
-                from datetime import date
-                # random use of date to prevent auto-format refactorings deleting the import
-                date(1999, 1, 1)
-                compiled = compile(ast.fix_missing_locations(ast.Expression(body=node)), '', 'eval')
-                val = eval(compiled, None, None)
-                return LiteralExpression(literal=DateLiteral(val))
-
-            #if node.func.id not in known_functions:
-            #    ValueError(f"Unknown function name: {node.func.id}")
-
-            # very brittle, lots more checks needed here
-            module = importlib.import_module("model.functions")
-            class_ = getattr(module, f"{node.func.id.title()}Function")
-            instance = class_()
-            return FunctionExpression(instance, parameters=args_list)
-
-        elif isinstance(node, ast.JoinedStr):
-            # Handle fstring (e.g. f"hello{blah}")
-            # In a real implementation, we would handle this more robustly
-            expr = []
-            for value in node.values:
-                if isinstance(value, ast.Constant):
-                    expr.append(Parser._parse_lambda_body(value, args, new_table, implicit_aliases))
-                elif isinstance(value, ast.FormattedValue):
-                    if value.format_spec is not None:
-                        raise ValueError(f"Format Spec Not Supported: {value.format_spec}")
-                    else:
-                        expr.append(Parser._parse_lambda_body(value.value, args, new_table, implicit_aliases))
-
-            return FunctionExpression(StringConcatFunction(), expr)
-
-        elif isinstance(node, ast.Subscript):
-            # Handle subscript operations (e.g., x[0], x['key'])
-            # In a real implementation, we would handle this more robustly
-            raise ValueError(f"Unsupported expression: {node}")
-
-        elif isinstance(node, ast.Dict):
-            # Handle dictionaries (e.g., {'a': 1, 'b': 2})
-            # In a real implementation, we would handle this more robustly
-            raise ValueError(f"Unsupported expression: {node}")
-
-        elif isinstance(node, ast.Set):
-            # Handle sets (e.g., {1, 2, 3})
-            # In a real implementation, we would handle this more robustly
-            raise ValueError(f"Unsupported expression: {node}")
-
-        elif isinstance(node, ast.ListComp) or isinstance(node, ast.SetComp) or isinstance(node, ast.DictComp) or isinstance(node, ast.GeneratorExp):
-            # Handle comprehensions (e.g., [x for x in y], {x: y for x in z})
-            # In a real implementation, we would handle this more robustly
-            raise ValueError(f"Unsupported expression: {node}")
-
-        else:
-            # Throw
-            raise ValueError(f"Unsupported expression: {ast.dump(node)}")
+    @staticmethod
+    def _parse_attribute(node: ast.Attribute, args: [arg], new_table: Table, implicit_aliases: dict[str, str]) -> Expression:
+        # Handle column references (e.g. x.column_name)
+        if isinstance(node.value, ast.Name):
+            # validate the column name
+            if not new_table.validate_column(node.attr):
+                raise ValueError(f"Column '{node.attr}' not found in table '{new_table}'")
+
+            return ColumnAliasExpression(alias=node.value.id, reference=ColumnReferenceExpression(name=node.attr))
 
         return ColumnReferenceExpression("PLACEHOLDER")
 
+    @staticmethod
+    def _parse_name(node: ast.Name, args: [arg], new_table: Table, implicit_aliases: dict[str, str]) -> Expression:
+        if node.id == "True":
+            return LiteralExpression(BooleanLiteral(True))
+        elif node.id == "False":
+            return LiteralExpression(BooleanLiteral(False))
+
+        alias = implicit_aliases.get(node.id, None) if implicit_aliases else None
+        if alias:
+            return ColumnAliasExpression(alias, ColumnReferenceExpression(node.id))
+        return ColumnReferenceExpression(node.id)
+
+    @staticmethod
+    def _parse_constant(node: ast.Constant, args: [arg], new_table: Table, implicit_aliases: dict[str, str]) -> Expression:
+        # Handle literal values (e.g., 5, 1.5, 'value', True)
+        return LiteralExpression(to_literal(node.value))
+
+    @staticmethod
+    def _parse_unary_op(node: ast.UnaryOp, args: [arg], new_table: Table, implicit_aliases: dict[str, str]) -> Expression:
+        # Handle unary operations (e.g., not x)
+        operand = Parser._parse_lambda_body(node.operand, args, new_table, implicit_aliases)
+
+        # Ensure operand is an Expression object, not a list or tuple
+        if isinstance(operand, list) or isinstance(operand, tuple):
+            # Use a fallback for list/tuple values in unary operations
+            raise ValueError(f"Unsupported expression to UnaryOp: {operand}")
+
+        if isinstance(node.op, ast.Not):
+            return UnaryExpression(operator=NotUnaryOperator(), expression=OperandExpression(operand))
+
+        # Other unary operations (e.g., +, -)
+        # In a real implementation, we would handle this more robustly
+        return operand
+
+    @staticmethod
+    def _parse_if_exp(node: ast.IfExp, args: [arg], new_table: Table, implicit_aliases: dict[str, str]) -> Expression:
+        # Handle conditional expressions (e.g., x if y else z)
+        # In a real implementation, we would handle this more robustly
+        test = Parser._parse_lambda_body(node.test, args, new_table, implicit_aliases)
+        body = Parser._parse_lambda_body(node.body, args, new_table, implicit_aliases)
+        orelse = Parser._parse_lambda_body(node.orelse, args, new_table, implicit_aliases)
+
+        # Ensure all values are Expression objects, not lists or tuples
+        if isinstance(test, list) or isinstance(test, tuple):
+            raise ValueError(f"Unsupported IfExp: {test}")
+        if isinstance(body, list) or isinstance(body, tuple):
+            raise ValueError(f"Unsupported IfExp: {body}")
+        if isinstance(orelse, list) or isinstance(orelse, tuple):
+            raise ValueError(f"Unsupported IfExp: {orelse}")
+
+        # Create a CASE WHEN expression
+        return IfExpression(test=test, body=body, orelse=orelse)
+
+    @staticmethod
+    def _parse_elements(node: Union[ast.List, ast.Tuple], args: [arg], new_table: Table, implicit_aliases: dict[str, str]) -> List[Expression]:
+        # Handle tuples and lists (e.g., (1, 2, 3), [1, 2, 3])
+        # This is used for array returns in lambdas like lambda x: [x.name, x.age]
+        # and Join with rename ( x.col1 == y.col1, [ (x_col1 := x.col1 ), (y_col1 := y.col1 ) ]
+        return [Parser._parse_lambda_body(elt, args, new_table, implicit_aliases) for elt in node.elts]
+
+    @staticmethod
+    def _parse_call(node: ast.Call, args: [arg], new_table: Table, implicit_aliases: dict[str, str]) -> Expression:
+        # Handle function calls (e.g., sum(x.col1 - x.col2))
+        if not isinstance(node.func, ast.Name):
+            raise ValueError(f"Unsupported function type: {ast.dump(node.func)}")
+
+        special = Parser._call_parsers.get(node.func.id)
+        if special is not None:
+            return special(node)
+
+        # look the function up first, so that unknown functions fail before their arguments are parsed
+        function = Parser.functions.lookup(node.func.id)
+
+        # Parse the arguments to the function, keyword arguments follow the positional ones
+        args_list = [Parser._parse_lambda_body(arg, args, new_table, implicit_aliases) for arg in node.args]
+        args_list.extend(Parser._parse_lambda_body(kw.value, args, new_table, implicit_aliases) for kw in node.keywords)
+
+        return FunctionExpression(function(), parameters=args_list)
+
+    @staticmethod
+    def _parse_date(node: ast.Call) -> Expression:
+        # evaluated once, when the lambda is parsed: a captured value would be a param, and the parse is shared by
+        # every value of the same type, see dsl.cache
+        if any(isinstance(n, (ast.Name, ast.Call)) for arg in [*node.args, *node.keywords] for n in ast.walk(arg)):
+            raise ValueError(f"Captured values are not supported in date(), capture the date instead: {ast.unparse(node)}")
+        compiled = compile(ast.fix_missing_locations(ast.Expression(body=node)), '', 'eval')
+        val = eval(compiled, {"date": date}, None)
+        return LiteralExpression(literal=DateLiteral(val))
+
+    @staticmethod
+    def _parse_joined_str(node: ast.JoinedStr, args: [arg], new_table: Table, implicit_aliases: dict[str, str]) -> Expression:
+        # Handle fstring (e.g. f"hello{blah}")
+        # In a real implementation, we would handle this more robustly
+        expr = []
+        for value in node.values:
+            if isinstance(value, ast.Constant):
+                expr.append(Parser._parse_lambda_body(value, args, new_table, implicit_aliases))
+            elif isinstance(value, ast.FormattedValue):
+                if value.format_spec is not None:
+                    raise ValueError(f"Format Spec Not Supported: {value.format_spec}")
+                else:
+                    expr.append(Parser._parse_lambda_body(value.value, args, new_table, implicit_aliases))
+
+        return FunctionExpression(StringConcatFunction(), expr)
+
+    @staticmethod
+    def _unsupported(node: ast.AST, args: [arg], new_table: Table, implicit_aliases: dict[str, str]) -> Expression:
+        # subscripts, dicts, sets and comprehensions
+        # In a real implementation, we would handle this more robustly
+        raise ValueError(f"Unsupported expression: {node}")
+
+    # how each kind of AST node in a lambda body is parsed
+    _node_parsers: Dict[type, Callable[[ast.AST, List[arg], Table, Dict[str, str]], Expression]] = {
+        ast.NamedExpr: _parse_named_expr,
+        ast.Compare: _parse_compare,
+        ast.BinOp: _parse_bin_op,
+        ast.BoolOp: _parse_bool_op,
+        ast.Attribute: _parse_attribute,
+        ast.Name: _parse_name,
+        ast.Constant: _parse_constant,
+        ast.UnaryOp: _parse_unary_op,
+        ast.IfExp: _parse_if_exp,
+        ast.List: _parse_elements,
+        ast.Tuple: _parse_elements,
+        ast.Call: _parse_call,
+        ast.JoinedStr: _parse_joined_str,
+        ast.Subscript: _unsupported,
+        ast.Dict: _unsupported,
+        ast.Set: _unsupported,
+        ast.ListComp: _unsupported,
+        ast.SetComp: _unsupported,
+        ast.DictComp: _unsupported,
+        ast.GeneratorExp: _unsupported,
+    }
+
+    # calls that are not metamodel functions
+    _call_parsers: Dict[str, Callable[[ast.Call], Expression]] = {
+        "param": _parse_parameter,
+        "date": _parse_date,
+    }
+
+    _comparison_operators: Dict[type, type] = {
+        ast.Eq: EqualsBinaryOperator,
+        ast.NotEq: NotEqualsBinaryOperator,
+        ast.Lt: LessThanBinaryOperator,
+        ast.LtE: LessThanEqualsBinaryOperator,
+        ast.Gt: GreaterThanBinaryOperator,
+        ast.GtE: GreaterThanEqualsBinaryOperator,
+        ast.In: InBinaryOperator,
+        ast.NotIn: NotInBinaryOperator,
+        ast.Is: IsBinaryOperator,
+        ast.IsNot: IsNotBinaryOperator,
+    }
+
+    _binary_operators: Dict[type, type] = {
+        ast.Add: AddBinaryOperator,
+        ast.Sub: SubtractBinaryOperator,
+        ast.Mult: MultiplyBinaryOperator,
+        ast.Div: DivideBinaryOperator,
+        ast.BitOr: BitwiseOrBinaryOperator,
+        ast.BitAnd: BitwiseAndBinaryOperator,
+    }
+
+    # binary operators that Pure spells as functions
+    _binary_functions: Dict[type, type] = {
+        ast.Mod: ModuloFunction,
+        ast.Pow: ExponentFunction,
+    }
+
     @staticmethod
     def _get_comparison_operator(op: ast.cmpop) -> BinaryOperator:
         """
@@ -502,43 +585,45 @@ class Parser:
         Returns:
             The equivalent SQL operator
         """
-        if isinstance(op, ast.Eq):
-            return EqualsBinaryOperator()
-        elif isinstance(op, ast.NotEq):
-            return NotEqualsBinaryOperator()
-        elif isinstance(op, ast.Lt):
-            return LessThanBinaryOperator()
-        elif isinstance(op, ast.LtE):
-            return LessThanEqualsBinaryOperator()
-        elif isinstance(op, ast.Gt):
-            return GreaterThanBinaryOperator()
-        elif isinstance(op, ast.GtE):
-            return GreaterThanEqualsBinaryOperator()
-        elif isinstance(op, ast.In):
-            return InBinaryOperator()
-        elif isinstance(op, ast.NotIn):
-            return NotInBinaryOperator()
-        elif isinstance(op, ast.Is):
-            return IsBinaryOperator()
-        elif isinstance(op, ast.IsNot):
-            return IsNotBinaryOperator()
-        else:
+        operator_ = Parser._comparison_operators.get(type(op))
+        if operator_ is None:
             raise ValueError(f"Unsupported comparison operator {op}")
+        return operator_()
 
     @staticmethod
     def _get_binary_operator(op: operator) -> BinaryOperator:
         # Map Python operators to Binary operators
-        if isinstance(op, ast.Add):
-            return AddBinaryOperator()
-        elif isinstance(op, ast.Sub):
-            return SubtractBinaryOperator()
-        elif isinstance(op, ast.Mult):
-            return MultiplyBinaryOperator()
-        elif isinstance(op, ast.Div):
-            return DivideBinaryOperator()
-        elif isinstance(op, ast.BitOr):
-            return BitwiseOrBinaryOperator()
-        elif isinstance(op, ast.BitAnd):
-            return BitwiseAndBinaryOperator()
-        else:
+        operator_ = Parser._binary_operators.get(type(op))
+        if operator_ is None:
             raise ValueError(f"Unsupported binary operator {op}")
+        return operator_()
+
+class _CapturedVariables(ast.NodeTransformer):
+    """
+    Rewrites each use of a captured variable into param(name, type), which the Parser turns into a ParameterExpression.
+    A variable of another type is an error: the name would otherwise be read as a column.
+    """
+
+    def __init__(self, values: Dict[str, object]):
+        self.values = values
+        self.type_names = {type_: name for name, type_ in Parser._parameter_types.items()}
+
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        if isinstance(node.ctx, ast.Load) and node.id in self.values:
+            type_name = self.type_names.get(type(self.values[node.id]))
+            if type_name is None:
+                raise ValueError(f"Cannot capture '{node.id}' of type {type(self.values[node.id]).__name__}: captured values must be one of "
+                                 f"{', '.join(Parser._parameter_types)}")
+            return ast.copy_location(ast.Call(func=ast.Name("param", ast.Load()), args=[ast.Constant(node.id), ast.Name(type_name, ast.Load())], keywords=[]), node)
+        return node
+
+    def visit_Call(self, node: ast.Call) -> ast.AST:
+        # the function being called is never a parameter, nor are the name and type of a declared one
+        if isinstance(node.func, ast.Name) and node.func.id == "param":
+            return node
+        node.args = [self.visit(a) for a in node.args]
+        node.keywords = [self.visit(k) for k in node.keywords]
+        return node
+
+    def visit_Attribute(self, node: ast.Attribute) -> ast.AST:
+        return node
@@ -0,0 +1,51 @@
+"""
+Registry of the functions that can be called inside a DSL lambda.
+
+Each entry maps the name a function is called by in a lambda (avg, left, over ..) to the metamodel Function that
+the call is parsed into. Every function in dsl.functions whose class has a namesake in model.functions is
+registered up front; others are added with FunctionRegistry.register, with no change to the Parser.
+"""
+import threading
+from typing import Dict, Optional, Type
+
+from model.metamodel import Function
+
+
+class FunctionRegistry:
+
+    def __init__(self, functions: Dict[str, Type[Function]] = None):
+        self._functions: Dict[str, Type[Function]] = dict(functions or {})
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def from_dsl() -> "FunctionRegistry":
+        import dsl.functions
+        import model.functions
+
+        functions = {}
+        for name, dsl_function in vars(dsl.functions).items():
+            function = getattr(model.functions, getattr(dsl_function, "__name__", ""), None)
+            if isinstance(dsl_function, type) and isinstance(function, type) and issubclass(function, Function):
+                functions[name] = function
+        return FunctionRegistry(functions)
+
+    def register(self, name: str, function: Type[Function]) -> None:
+        if not (isinstance(function, type) and issubclass(function, Function)):
+            raise ValueError(f"Not a metamodel Function: {function}")
+        with self._lock:
+            # copy on write so that lookups never need the lock
+            functions = dict(self._functions)
+            functions[name] = function
+            self._functions = functions
+
+    def lookup(self, name: str) -> Type[Function]:
+        function = self._functions.get(name)
+        if function is None:
+            raise ValueError(f"Unknown function: {name}")
+        return function
+
+    def get(self, name: str) -> Optional[Type[Function]]:
+        return self._functions.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._functions
@@ -0,0 +1,394 @@
+"""
+Symbolic tracing front end for the cloud-dataframe DSL.
+
+Instead of reading and walking the lambda's AST, the lambda is called once with proxy rows. The proxies overload
+Python's operators and record metamodel Expressions as the lambda runs. Because a traced lambda is simply called,
+it also works for lambdas created at runtime. A few things can't be overloaded and are spelled differently:
+
+    - `and`, `or` and `not` are written `&`, `|` and `~`
+    - `(name := expr)` is written `expr.alias("name")`
+    - `x if test else y` is not supported
+
+Values captured from defaults, the closure or globals are replaced by ParameterExpressions while tracing, as the
+Parser does.
+"""
+import builtins
+from dataclasses import fields
+from types import FunctionType, CellType
+from typing import Callable, List, Tuple, Union
+
+from model.metamodel import Expression, BinaryExpression, BinaryOperator, OperandExpression, LiteralExpression, \
+    ColumnReferenceExpression, ColumnAliasExpression, ComputedColumnAliasExpression, LambdaExpression, \
+    FunctionExpression, UnaryExpression, NotUnaryOperator, OrderByExpression, OrderType, AscendingOrderType, \
+    DescendingOrderType, EqualsBinaryOperator, NotEqualsBinaryOperator, \
+    LessThanBinaryOperator, LessThanEqualsBinaryOperator, GreaterThanBinaryOperator, GreaterThanEqualsBinaryOperator, \
+    AddBinaryOperator, SubtractBinaryOperator, MultiplyBinaryOperator, DivideBinaryOperator, AndBinaryOperator, \
+    OrBinaryOperator, ModuloFunction, ExponentFunction, GroupByExpression, MapReduceExpression, VariableAliasExpression, \
+    ParameterExpression
+from model.parameters import to_literal
+from model.schema import Table
+
+
+class Column:
+    """
+    Stands in for a value inside a traced lambda, wrapping the Expression that computes it.
+    """
+    __slots__ = ("expression",)
+
+    def __init__(self, expression: Expression):
+        self.expression = expression
+
+    def alias(self, name: str) -> "Aliased":
+        return Aliased(name, self)
+
+    def _binary(self, other, operator: BinaryOperator, reverse: bool = False) -> "Column":
+        left, right = (_to_expression(other), self.expression) if reverse else (self.expression, _to_expression(other))
+        return Column(BinaryExpression(left=OperandExpression(left), right=OperandExpression(right), operator=operator))
+
+    def _function(self, other, function, reverse: bool = False) -> "Column":
+        parameters = [_to_expression(other), self.expression] if reverse else [self.expression, _to_expression(other)]
+        return Column(FunctionExpression(function, parameters=parameters))
+
+    def __eq__(self, other):
+        return self._binary(other, EqualsBinaryOperator())
+
+    def __ne__(self, other):
+        return self._binary(other, NotEqualsBinaryOperator())
+
+    def __lt__(self, other):
+        return self._binary(other, LessThanBinaryOperator())
+
+    def __le__(self, other):
+        return self._binary(other, LessThanEqualsBinaryOperator())
+
+    def __gt__(self, other):
+        return self._binary(other, GreaterThanBinaryOperator())
+
+    def __ge__(self, other):
+        return self._binary(other, GreaterThanEqualsBinaryOperator())
+
+    def __add__(self, other):
+        return self._binary(other, AddBinaryOperator())
+
+    def __radd__(self, other):
+        return self._binary(other, AddBinaryOperator(), True)
+
+    def __sub__(self, other):
+        return self._binary(other, SubtractBinaryOperator())
+
+    def __rsub__(self, other):
+        return self._binary(other, SubtractBinaryOperator(), True)
+
+    def __mul__(self, other):
+        return self._binary(other, MultiplyBinaryOperator())
+
+    def __rmul__(self, other):
+        return self._binary(other, MultiplyBinaryOperator(), True)
+
+    def __truediv__(self, other):
+        return self._binary(other, DivideBinaryOperator())
+
+    def __rtruediv__(self, other):
+        return self._binary(other, DivideBinaryOperator(), True)
+
+    def __mod__(self, other):
+        return self._function(other, ModuloFunction())
+
+    def __rmod__(self, other):
+        return self._function(other, ModuloFunction(), True)
+
+    def __pow__(self, other):
+        return self._function(other, ExponentFunction())
+
+    def __rpow__(self, other):
+        return self._function(other, ExponentFunction(), True)
+
+    def __and__(self, other):
+        return self._binary(other, AndBinaryOperator())
+
+    def __rand__(self, other):
+        return self._binary(other, AndBinaryOperator(), True)
+
+    def __or__(self, other):
+        return self._binary(other, OrBinaryOperator())
+
+    def __ror__(self, other):
+        return self._binary(other, OrBinaryOperator(), True)
+
+    def __invert__(self):
+        return Column(UnaryExpression(operator=NotUnaryOperator(), expression=OperandExpression(self.expression)))
+
+    def __neg__(self):
+        return Ordered(DescendingOrderType(), self)
+
+    def __pos__(self):
+        return Ordered(AscendingOrderType(), self)
+
+    def __bool__(self):
+        raise ValueError("Traced lambdas can't use 'and', 'or', 'not' or 'if': use '&', '|' and '~' instead")
+
+    def __iter__(self):
+        raise ValueError(f"Traced lambdas can't iterate over {self.expression}")
+
+    __hash__ = None
+
+
+class Aliased:
+    __slots__ = ("name", "column")
+
+    def __init__(self, name: str, column: Column):
+        self.name = name
+        self.column = column
+
+
+class Ordered:
+    __slots__ = ("direction", "column")
+
+    def __init__(self, direction: OrderType, column: Column):
+        self.direction = direction
+        self.column = column
+
+
+class Aggregate:
+    __slots__ = ("columns", "functions", "having")
+
+    def __init__(self, columns, functions, having=None):
+        self.columns = columns
+        self.functions = functions
+        self.having = having
+
+
+class Row:
+    """
+    Stands in for the row parameter of a traced lambda: every attribute is a reference to that column.
+    """
+    __slots__ = ("_name",)
+
+    def __init__(self, name: str):
+        object.__setattr__(self, "_name", name)
+
+    def __getattr__(self, column: str) -> Column:
+        if column.startswith("__"):
+            raise AttributeError(column)
+        return Column(ColumnAliasExpression(alias=self._name, reference=ColumnReferenceExpression(name=column)))
+
+
+class TracedFunction:
+    """
+    Records a call to a DSL function (avg, count, left ..) as a FunctionExpression.
+    """
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __call__(self, *args, **kwargs) -> Column:
+        parameters = [_to_expression(a) for a in args] + [_to_expression(v) for v in kwargs.values()]
+        return Column(FunctionExpression(Tracer.function(self.name), parameters=parameters))
+
+
+def _to_expression(value) -> Union[Expression, List]:
+    if isinstance(value, Column):
+        return value.expression
+    if isinstance(value, Ordered):
+        # as in the Parser, a sign outside of order_by is dropped
+        return value.column.expression
+    if isinstance(value, Aliased):
+        return ColumnAliasExpression(value.name, value.column.expression)
+    if isinstance(value, (list, tuple)):
+        return [_to_expression(v) for v in value]
+    return LiteralExpression(to_literal(value))
+
+
+class Tracer:
+    """
+    Drop-in alternative to Parser.parse that calls the lambda with proxy rows instead of parsing its source.
+    """
+
+    @staticmethod
+    def parse[E: Expression](func: Callable, tables: [Table], ptype) -> Tuple[Union[E, List[E], Table]]:
+        from dsl.parser import ParseType
+
+        code = func.__code__
+        # arguments with a default are captured values, not rows
+        args = list(code.co_varnames[:code.co_argcount - len(func.__defaults__ or ())])
+
+        match ptype:
+            case ParseType.select:
+                Tracer._validate_args_length(args, 1)
+                new_table = Table(tables[0].table, {})
+                return (Tracer._select(Tracer._call(func, args), new_table), new_table)
+            case ParseType.filter:
+                Tracer._validate_args_length(args, 1)
+                new_table = tables[0]
+                return (LambdaExpression(args, Tracer._body(Tracer._call(func, args), args, new_table)), new_table)
+            case ParseType.extend:
+                Tracer._validate_args_length(args, 1)
+                new_table = tables[0]
+                return (Tracer._extend(Tracer._call(func, args), args, new_table), new_table)
+            case ParseType.join:
+                Tracer._validate_args_length(args, 2)
+                new_table = Table("_".join(map(lambda s: s.table, tables)), {})
+                for s in tables:
+                    new_table.columns.update(s.columns)
+                return (LambdaExpression(args, Tracer._body(Tracer._call(func, args), args, new_table)), new_table)
+            case ParseType.rename:
+                Tracer._validate_args_length(args, 1)
+                return (Tracer._rename(Tracer._call(func, args)), tables[0])
+            case ParseType.group_by:
+                Tracer._validate_args_length(args, 1)
+                new_table = tables[0]
+                return (Tracer._group_by(Tracer._call(func, args), args, new_table), new_table)
+            case ParseType.order_by:
+                Tracer._validate_args_length(args, 1)
+                return (Tracer._order_by(Tracer._call(func, args)), tables[0])
+            case ParseType.over:
+                raise NotImplementedError()
+            case _:
+                raise ValueError(f"Unknown ParseType: {ptype}")
+
+    @staticmethod
+    def function(name: str):
+        from dsl.parser import Parser
+        return Parser.functions.lookup(name)()
+
+    @staticmethod
+    def parameter(name: str, type_: type = None) -> Column:
+        return Column(ParameterExpression(name, type_))
+
+    @staticmethod
+    def _call(func: Callable, args: List[str]):
+        return Tracer._traceable(func)(*map(Row, args))
+
+    @staticmethod
+    def _traceable(func: Callable) -> Callable:
+        # swap the DSL functions and captured values the lambda refers to for recording ones, leaving it untouched
+        from dsl.parser import Parser
+
+        code = func.__code__
+        captured = {name: Column(ParameterExpression(name, type(value))) for name, value in Parser.captured(func).items()}
+        namespace = {"__builtins__": func.__globals__.get("__builtins__", builtins)}
+        for name in code.co_names:
+            if name == "aggregate":
+                namespace[name] = Aggregate
+            elif name == "param":
+                namespace[name] = Tracer.parameter
+            elif name in Parser.functions:
+                namespace[name] = TracedFunction(name)
+            elif name in captured:
+                namespace[name] = captured[name]
+            elif name in func.__globals__:
+                namespace[name] = func.__globals__[name]
+
+        closure = tuple(CellType(captured[name]) if name in captured else cell for name, cell in zip(code.co_freevars, func.__closure__ or ()))
+        defaults = func.__defaults__ or ()
+        defaults = tuple(captured.get(name, value) for name, value in zip(code.co_varnames[code.co_argcount - len(defaults):code.co_argcount], defaults))
+        return FunctionType(code, namespace, func.__name__, defaults or None, closure or None)
+
+    @staticmethod
+    def _validate_args_length(args: List[str], length: int) -> None:
+        if len(args) != length:
+            raise ValueError(f"Lambda MUST have exactly {length} argument(s): {args}")
+
+    @staticmethod
+    def _elements(value) -> List:
+        return list(value) if isinstance(value, (list, tuple)) else [value]
+
+    @staticmethod
+    def _reference(value) -> ColumnReferenceExpression:
+        if isinstance(value, Column) and isinstance(value.expression, ColumnAliasExpression) \
+                and isinstance(value.expression.reference, ColumnReferenceExpression):
+            return value.expression.reference
+        raise ValueError(f"Unsupported Column Reference {value}")
+
+    @staticmethod
+    def _select(value, new_table: Table) -> List[ColumnReferenceExpression]:
+        references = [Tracer._reference(v) for v in Tracer._elements(value)]
+        for reference in references:
+            new_table.columns[reference.name] = None
+        return references
+
+    @staticmethod
+    def _body(value, args: List[str], new_table: Table) -> Expression:
+        expression = _to_expression(value)
+        Tracer._validate(expression, args, new_table)
+        if isinstance(value, (list, tuple)):
+            for aliased in filter(lambda v: isinstance(v, Aliased), Tracer._flatten(value)):
+                new_table.columns[aliased.name] = None
+        return expression
+
+    @staticmethod
+    def _flatten(value) -> List:
+        return [item for v in value for item in (Tracer._flatten(v) if isinstance(v, (list, tuple)) else [v])]
+
+    @staticmethod
+    def _extend(value, args: List[str], new_table: Table) -> List[ComputedColumnAliasExpression]:
+        extends = []
+        for aliased in Tracer._elements(value):
+            if not isinstance(aliased, Aliased):
+                raise ValueError(f"Not a valid extend statement {aliased}: use .alias()")
+            new_table.columns[aliased.name] = None
+            expression = _to_expression(aliased.column)
+            Tracer._validate(expression, args, new_table)
+            extends.append(ComputedColumnAliasExpression(aliased.name, LambdaExpression(args, expression)))
+        return extends
+
+    @staticmethod
+    def _rename(value) -> List[ColumnAliasExpression]:
+        renames = []
+        for aliased in Tracer._elements(value):
+            if not isinstance(aliased, Aliased):
+                raise ValueError(f"Unsupported Rename {aliased}")
+            renames.append(ColumnAliasExpression(aliased.name, Tracer._reference(aliased.column)))
+        return renames
+
+    @staticmethod
+    def _group_by(value, args: List[str], new_table: Table) -> GroupByExpression:
+        if not isinstance(value, Aggregate):
+            raise ValueError(f"Unsupported GroupBy expression {value}")
+
+        group_by_table = Table(new_table.table, {})
+        selections = Tracer._select(value.columns, group_by_table)
+
+        expressions = []
+        for aliased in Tracer._elements(value.functions):
+            column = aliased.column if isinstance(aliased, Aliased) else None
+            if column is None or not isinstance(column.expression, FunctionExpression) or not column.expression.parameters:
+                raise ValueError(f"Unsupported GroupBy expression {aliased}")
+            group_by_table.columns[aliased.name] = None
+            new_table.columns[aliased.name] = None
+            function = column.expression
+            Tracer._validate(function.parameters[0], args, new_table)
+            map_expression = LambdaExpression(args, function.parameters[0])
+            reduce_expression = LambdaExpression(args, FunctionExpression(function.function, [VariableAliasExpression(args[0])]))
+            expressions.append(ComputedColumnAliasExpression(aliased.name, MapReduceExpression(map_expression, reduce_expression)))
+
+        having = Tracer._body(value.having, args, group_by_table) if value.having is not None else None
+        new_table.columns = group_by_table.columns
+        return GroupByExpression(selections, expressions, having)
+
+    @staticmethod
+    def _order_by(value) -> List[OrderByExpression]:
+        orderings = []
+        for ordered in Tracer._elements(value):
+            if not isinstance(ordered, Ordered):
+                ordered = Ordered(AscendingOrderType(), ordered)
+            if not isinstance(ordered.column, Column):
+                raise ValueError(f"Not a valid sort statement {ordered.column}")
+            orderings.append(OrderByExpression(ordered.direction, Tracer._reference(ordered.column)))
+        return orderings
+
+    @staticmethod
+    def _validate(expression, args: List[str], table: Table) -> None:
+        # the same check the Parser makes for every row attribute
+        if isinstance(expression, list):
+            for e in expression:
+                Tracer._validate(e, args, table)
+        elif isinstance(expression, ColumnAliasExpression) and expression.alias in args \
+                and isinstance(expression.reference, ColumnReferenceExpression):
+            if not table.validate_column(expression.reference.name):
+                raise ValueError(f"Column '{expression.reference.name}' not found in table '{table}'")
+        elif isinstance(expression, Expression):
+            for child in (getattr(expression, f.name) for f in fields(expression)):
+                if isinstance(child, (Expression, list)):
+                    Tracer._validate(child, args, table)
@@ -0,0 +1,101 @@
+"""
+Stable 128-bit fingerprints of query plans, the same in every process: they are BLAKE2b digests of an encoding of the
+nodes, never Python's hash(), which is salted per process for str.
+
+A node's digest is computed once and kept on the node, so, with nodes shared across queries (see model.interning), a
+subtree is digested once for all the queries using it. The fingerprint of a clause list is folded clause by clause,
+so that a builder can extend it as it adds clauses.
+"""
+from datetime import date, datetime
+from hashlib import blake2b
+from typing import Dict, List
+
+from model.metamodel import Node, Clause
+
+DIGEST_SIZE = 16
+
+# the fingerprint of no clauses
+EMPTY = bytes(DIGEST_SIZE)
+
+_set_digest = Node._digest.__set__
+
+
+def digest(root: Node) -> bytes:
+    # iterative post-order, trees can be far deeper than the recursion limit
+    pending = [root]
+    while pending:
+        node = pending[-1]
+        if getattr(node, "_digest", None) is not None:
+            pending.pop()
+            continue
+        undigested = [child for child in _children(node._values()) if getattr(child, "_digest", None) is None]
+        if undigested:
+            pending.extend(undigested)
+            continue
+        pending.pop()
+        cls = type(node)
+        h = blake2b(digest_size=DIGEST_SIZE)
+        h.update(_encode(f"{cls.__module__}.{cls.__qualname__}"))
+        for value in node._values():
+            h.update(_encode(value))
+        _set_digest(node, h.digest())
+    return root._digest
+
+
+def extend(fingerprint: bytes, clause: Clause) -> bytes:
+    return blake2b(b"c" + fingerprint + digest(clause), digest_size=DIGEST_SIZE).digest()
+
+
+def of_clauses(clauses: List[Clause]) -> bytes:
+    fingerprint = EMPTY
+    for clause in clauses:
+        fingerprint = extend(fingerprint, clause)
+    return fingerprint
+
+
+def of_query(identity: str, clauses: bytes, parameters: Dict[str, object]) -> bytes:
+    # identity is where the query runs, e.g. its Runtime; parameters the values of its ParameterExpressions
+    h = blake2b(digest_size=DIGEST_SIZE)
+    h.update(_encode(identity))
+    h.update(clauses)
+    for name in sorted(parameters):
+        h.update(_encode(name))
+        h.update(_encode(parameters[name]))
+    return h.digest()
+
+
+def _children(values: tuple) -> List[Node]:
+    children, pending = [], list(values)
+    while pending:
+        value = pending.pop()
+        if isinstance(value, Node):
+            children.append(value)
+        elif isinstance(value, (list, tuple)):
+            pending.extend(value)
+    return children
+
+
+def _encode(value: object) -> bytes:
+    # a tag, then a length prefix where the value has a variable length, so that no two values share an encoding
+    if isinstance(value, Node):
+        return b"n" + digest(value)
+    if isinstance(value, str):
+        encoded = value.encode()
+        return b"s" + len(encoded).to_bytes(8, "big") + encoded
+    if isinstance(value, bool):
+        return b"T" if value else b"F"
+    if isinstance(value, int):
+        return b"i" + _encode(str(value))
+    if isinstance(value, float):
+        return b"f" + _encode(repr(value))
+    if value is None:
+        return b"0"
+    if isinstance(value, datetime):
+        return b"t" + _encode(value.isoformat())
+    if isinstance(value, date):
+        return b"d" + _encode(value.isoformat())
+    if isinstance(value, (list, tuple)):
+        return b"l" + len(value).to_bytes(8, "big") + b"".join(map(_encode, value))
+    if isinstance(value, type):
+        return b"y" + _encode(f"{value.__module__}.{value.__qualname__}")
+    raise ValueError(f"Cannot fingerprint a value of type {type(value)}")
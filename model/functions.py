@@ -1,92 +1,91 @@
-from dataclasses import dataclass
 
-from model.metamodel import Function, ExecutionVisitor
+from model.metamodel import Function, ExecutionVisitor, node
 
 
-@dataclass
+@node
 class AggregationFunction(Function):
     # sum(), min(), max(), count(), avg()
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         raise NotImplementedError()
 
-@dataclass
+@node
 class ScalarFunction(Function):
     # date_diff(), left(), abs() ..
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         raise NotImplementedError()
 
-@dataclass
+@node
 class WindowFunction(Function):
     # rank(), row_number(), first(), last() ..
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         raise NotImplementedError()
 
-@dataclass
+@node
 class RankFunction(WindowFunction):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         raise NotImplementedError()
 
-@dataclass
+@node
 class RowNumberFunction(WindowFunction):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         raise NotImplementedError()
 
-@dataclass
+@node
 class LeadFunction(WindowFunction):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         raise NotImplementedError()
 
-@dataclass
+@node
 class LagFunction(WindowFunction):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         raise NotImplementedError()
 
-@dataclass
+@node
 class LeftFunction(ScalarFunction):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         raise NotImplementedError()
 
-@dataclass
+@node
 class StringConcatFunction(ScalarFunction):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         raise NotImplementedError()
 
-@dataclass
+@node
 class AvgFunction(AggregationFunction):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         raise NotImplementedError()
 
-@dataclass
+@node
 class CountFunction(AggregationFunction):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         raise NotImplementedError()
 
-@dataclass
+@node
 class SumFunction(AggregationFunction):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         raise NotImplementedError()
 
-@dataclass
+@node
 class OverFunction(ScalarFunction):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         raise NotImplementedError()
 
-@dataclass
+@node
 class RowsFunction(ScalarFunction):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         raise NotImplementedError()
 
-@dataclass
+@node
 class RangeFunction(ScalarFunction):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         raise NotImplementedError()
 
-@dataclass
+@node
 class UnboundedFunction(ScalarFunction):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         raise NotImplementedError()
 
-@dataclass
+@node
 class AggregateFunction(ScalarFunction):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         raise NotImplementedError()
@@ -0,0 +1,64 @@
+"""
+Hash-consing of metamodel nodes: building a node structurally equal to a live node returns the live node.
+
+Nodes are built bottom-up from children that are canonical themselves, so a node is found by its hash and compared
+to its fields by identity, in O(1). Equal subtrees of all queries, whether built by the Parser, the Tracer or
+RawLegendQL, are therefore shared, and a node is equal to no other node than itself: nodes compare and hash by
+identity, and a cache may key on a node, or on its id() for as long as it holds the node.
+
+Canonical nodes are held weakly: a node leaves the table as soon as no query uses it.
+"""
+import threading
+from typing import Dict, Tuple, TypeVar, Union
+from weakref import KeyedRef
+
+N = TypeVar("N")
+
+# structural hash -> the canonical node with that hash, or, on the rare collision of different nodes, a tuple of them
+nodes: Dict[int, Union[KeyedRef, Tuple[KeyedRef, ...]]] = {}
+# held to change an entry of the table that is already there. Reentrant, as the garbage collector may remove a dead
+# node, see _remove, while the thread holding it allocates
+_lock = threading.RLock()
+
+
+def intern(node: N, hash_: int) -> N:
+    # the canonical node equal to node, just built: node itself when there is none
+    ref = KeyedRef(node, _remove, hash_)
+    # a first node of its hash is added at once, without the lock: setdefault is atomic
+    if nodes.setdefault(hash_, ref) is ref:
+        return node
+    # an equal node another thread just added, a dead node not yet removed, or a collision
+    with _lock:
+        cls, values = node.__class__, node._values()
+        entry = nodes.get(hash_)
+        refs = () if entry is None else (entry,) if type(entry) is KeyedRef else entry
+        for other in map(lambda r: r(), refs):
+            if other is not None and other.__class__ is cls and _same(other._values(), values):
+                return other
+        live = tuple(r for r in refs if r() is not None)
+        nodes[hash_] = (*live, ref) if live else ref
+        return node
+
+
+def _same(values: tuple, others: tuple) -> bool:
+    # equal values of different types, such as 1 and True, are not the same
+    return values == others and all(type(v) is type(o) for v, o in zip(values, others))
+
+
+def _remove(ref: KeyedRef) -> None:
+    # a dead node leaves the table, unless another node took its place there: the entry is checked and removed under
+    # the lock, so that a node another thread adds in between is kept
+    with _lock:
+        entry = nodes.get(ref.key)
+        if entry is ref:
+            del nodes[ref.key]
+        elif type(entry) is tuple and any(r is ref for r in entry):
+            refs = tuple(r for r in entry if r is not ref)
+            if not refs:
+                del nodes[ref.key]
+            else:
+                nodes[ref.key] = refs if len(refs) > 1 else refs[0]
+
+
+def size() -> int:
+    return len(nodes)
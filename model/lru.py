@@ -0,0 +1,75 @@
+"""
+A bounded LRU cache shared by the caches of parses, models and plans.
+
+Each of them only adds how its keys and entries are made: the entries are looked up, aged out and counted here.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable, Optional
+
+
+@dataclass(frozen=True)
+class CacheInfo:
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+
+class LruCache[V]:
+    """
+    A thread-safe, bounded LRU cache: once maxsize entries are held, putting one drops the least recently used.
+    A maxsize of 0 disables the cache.
+    """
+
+    def __init__(self, maxsize: int):
+        self._check(maxsize)
+        self._maxsize = maxsize
+        self._entries: OrderedDict[Hashable, V] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def put(self, key: Hashable, entry: V) -> None:
+        with self._lock:
+            if self._maxsize == 0:
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def resize(self, maxsize: int) -> None:
+        self._check(maxsize)
+        with self._lock:
+            self._maxsize = maxsize
+            self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._maxsize, len(self._entries))
+
+    def _check(self, maxsize: int) -> None:
+        if maxsize < 0:
+            raise ValueError(f"{type(self).__name__} maxsize must not be negative: {maxsize}")
+
+    def _evict(self) -> None:
+        # called holding the lock
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
@@ -1,10 +1,132 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
 from datetime import date
-from typing import List, Optional
-from dataclasses import dataclass
+from typing import List, Optional, Dict, Type, Tuple, Callable, Iterator, dataclass_transform, TYPE_CHECKING
+from dataclasses import dataclass, field, fields, Field, MISSING
+from operator import attrgetter, is_
+from weakref import KeyedRef
+
+from model import interning
+from model.schema import Database
+
+if TYPE_CHECKING:
+    import pyarrow
+    from optimizer.plans import Plan
+
+
+class Node:
+    """
+    Base of the nodes of a query plan: frozen, slotted dataclasses declared with @node. Nodes are hash-consed, see
+    model.interning: building a node equal to a live one returns the live one, so equal nodes are identical, and nodes
+    compare and hash by identity. The lists a node is given are frozen into FrozenLists: a node and its lists are
+    shared by every query holding it.
+    """
+    # _digest: the stable fingerprint of the node, set when first asked for, see model.fingerprint
+    __slots__ = ("_digest", "__weakref__")
+
+    def _values(self) -> tuple:
+        # the values of the fields, in order; set by @node
+        raise NotImplementedError()
+
+    def __reduce__(self):
+        # built again, so interned again, when unpickled or copied
+        return type(self), self._values()
+
+
+class FrozenList(list):
+    # a list held by a node: it compares, and prints, as a list, but can't be changed
+    __slots__ = ()
+
+    def _changed(self, *args, **kwargs):
+        raise TypeError("The lists of a node can't be changed")
+
+    append = extend = insert = pop = remove = clear = sort = reverse = _changed
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _changed
+
+    def __hash__(self) -> int:
+        return hash(tuple(self))
+
+    def __reduce__(self):
+        return FrozenList, (list(self),)
+
+
+def _frozen(value: object) -> object:
+    return FrozenList(map(_frozen, value)) if type(value) is list else value
+
+
+@dataclass_transform(frozen_default=True)
+def node[N: Node](cls: type[N]) -> type[N]:
+    # no __eq__ nor __hash__: those of object, as equal nodes are identical
+    cls = dataclass(frozen=True, slots=True, eq=False)(cls)
+    fields_ = fields(cls)
+    names = tuple(f.name for f in fields_)
+    getter = attrgetter(*names) if len(names) > 1 else (lambda n: (getattr(n, names[0]),)) if names else (lambda n: ())
+
+    # nodes are built, and interned, by __new__
+    cls.__new__ = _node_new(cls, fields_, getter)
+    cls.__init__ = object.__init__
+    cls._values = lambda self: getter(self)
+    return cls
+
+
+def _node_new(cls: type, fields_: Tuple[Field, ...], getter: Callable[[Node], tuple]) -> Callable:
+    # hashes the values and looks for the canonical node, and only builds a node, setting its slots past the
+    # __setattr__ of frozen dataclasses, when there is none
+    names = tuple(f.name for f in fields_)
+    defaults = {f.name: f.default for f in fields_ if f.default is not MISSING}
+    for f in fields_:
+        if f.default_factory is not MISSING:
+            raise ValueError(f"{cls.__name__}.{f.name}: nodes cannot have a default_factory")
+    setters = tuple(getattr(cls, name).__set__ for name in names)
+    new, nodes, intern = object.__new__, interning.nodes, interning.intern
+    literal = issubclass(cls, Literal)
+
+    def __new__(cls, *args, **kwargs):
+        if kwargs or len(args) != len(names):
+            args = _arguments(cls, names, defaults, args, kwargs)
+        try:
+            h = hash((cls, *args))
+        except TypeError:
+            # a list among the values, which isn't hashable until frozen
+            args = tuple(map(_frozen, args))
+            h = hash((cls, *args))
+        ref = nodes.get(h)
+        if ref.__class__ is KeyedRef:
+            self = ref()
+            if self is not None and self.__class__ is cls:
+                values = getter(self)
+                # equal values of different types, such as 1 and True, must not share a node: only literals hold them
+                if values == args and (not literal or all(map(is_, map(type, values), map(type, args)))):
+                    return self
+        self = new(cls)
+        for set_, value in zip(setters, args):
+            set_(self, value)
+        return intern(self, h)
+
+    __new__.__qualname__ = f"{cls.__qualname__}.__new__"
+    return __new__
+
+
+def _arguments(cls: type, names: Tuple[str, ...], defaults: Dict[str, object], args: tuple, kwargs: Dict[str, object]) -> tuple:
+    # the values of the fields, from arguments given by name or left to their default
+    if len(args) > len(names):
+        raise TypeError(f"{cls.__name__}() takes {len(names)} arguments but {len(args)} were given")
+    values = list(args)
+    for name in names[len(args):]:
+        if name in kwargs:
+            values.append(kwargs.pop(name))
+        elif name in defaults:
+            values.append(defaults[name])
+        else:
+            raise TypeError(f"{cls.__name__}() missing argument: '{name}'")
+    if kwargs:
+        raise TypeError(f"{cls.__name__}() got an unexpected keyword argument '{next(iter(kwargs))}'")
+    return tuple(values)
+
+
+class Literal[T](Node, ABC):
+    __slots__ = ()
 
-class Literal[T](ABC):
     @abstractmethod
     def value(self) -> T:
         pass
@@ -13,11 +135,9 @@ class Literal[T](ABC):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         pass
 
-@dataclass
+@node
 class IntegerLiteral(Literal):
     val: int
-    def __init__(self, val):
-        self.val = val
 
     def value(self) -> int:
         return self.val
@@ -25,11 +145,19 @@ class IntegerLiteral(Literal):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_integer_literal(self, parameter)
 
-@dataclass
+@node
+class FloatLiteral(Literal):
+    val: float
+
+    def value(self) -> float:
+        return self.val
+
+    def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
+        return visitor.visit_float_literal(self, parameter)
+
+@node
 class StringLiteral(Literal):
     val: str
-    def __init__(self, val):
-        self.val = val
 
     def value(self) -> str:
         return self.val
@@ -37,11 +165,9 @@ class StringLiteral(Literal):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_string_literal(self, parameter)
 
-@dataclass
+@node
 class DateLiteral(Literal):
     val: date
-    def __init__(self, val):
-        self.val = val
 
     def value(self) -> date:
         return self.val
@@ -49,11 +175,9 @@ class DateLiteral(Literal):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_date_literal(self, parameter)
 
-@dataclass
+@node
 class BooleanLiteral(Literal):
     val: bool
-    def __init__(self, val):
-        self.val = val
 
     def value(self) -> bool:
         return self.val
@@ -61,150 +185,156 @@ class BooleanLiteral(Literal):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_boolean_literal(self, parameter)
 
-class Function(ABC):
+class Function(Node, ABC):
+    __slots__ = ()
+
     @abstractmethod
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         pass
 
-@dataclass
+@node
 class CountFunction(Function):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_count_function(self, parameter)
 
-@dataclass
+@node
 class AverageFunction(Function):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_average_function(self, parameter)
 
-@dataclass
+@node
 class ModuloFunction(Function):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_modulo_function(self, parameter)
 
-@dataclass
+@node
 class ExponentFunction(Function):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_exponent_function(self, parameter)
 
-class Expression(ABC):
+class Expression(Node, ABC):
+    __slots__ = ()
+
     @abstractmethod
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         pass
 
-class Operator(ABC):
+class Operator(Node, ABC):
+    __slots__ = ()
+
     @abstractmethod
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         pass
 
 class UnaryOperator(Operator, ABC):
-    pass
+    __slots__ = ()
 
-@dataclass
+@node
 class NotUnaryOperator(UnaryOperator):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_not_unary_operator(self, parameter)
 
 class BinaryOperator(Operator, ABC):
-    pass
+    __slots__ = ()
 
-@dataclass
+@node
 class EqualsBinaryOperator(BinaryOperator):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_equals_binary_operator(self, parameter)
 
-@dataclass
+@node
 class NotEqualsBinaryOperator(BinaryOperator):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_not_equals_binary_operator(self, parameter)
 
-@dataclass
+@node
 class GreaterThanBinaryOperator(BinaryOperator):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_greater_than_binary_operator(self, parameter)
 
-@dataclass
+@node
 class GreaterThanEqualsBinaryOperator(BinaryOperator):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_greater_than_equals_operator(self, parameter)
 
-@dataclass
+@node
 class LessThanBinaryOperator(BinaryOperator):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_less_than_binary_operator(self, parameter)
 
-@dataclass
+@node
 class LessThanEqualsBinaryOperator(BinaryOperator):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_less_than_equals_binary_operator(self, parameter)
 
-@dataclass
+@node
 class InBinaryOperator(BinaryOperator):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_in_binary_operator(self, parameter)
 
-@dataclass
+@node
 class NotInBinaryOperator(BinaryOperator):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_not_in_binary_operator(self, parameter)
 
-@dataclass
+@node
 class IsBinaryOperator(BinaryOperator):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_is_binary_operator(self, parameter)
 
-@dataclass
+@node
 class IsNotBinaryOperator(BinaryOperator):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_is_not_binary_operator(self, parameter)
 
-@dataclass
+@node
 class AndBinaryOperator(BinaryOperator):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_and_binary_operator(self, parameter)
 
-@dataclass
+@node
 class OrBinaryOperator(BinaryOperator):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_or_binary_operator(self, parameter)
 
-@dataclass
+@node
 class AddBinaryOperator(BinaryOperator):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_add_binary_operator(self, parameter)
 
-@dataclass
+@node
 class MultiplyBinaryOperator(BinaryOperator):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_multiply_binary_operator(self, parameter)
 
-@dataclass
+@node
 class SubtractBinaryOperator(BinaryOperator):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_subtract_binary_operator(self, parameter)
 
-@dataclass
+@node
 class DivideBinaryOperator(BinaryOperator):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_divide_binary_operator(self, parameter)
 
-@dataclass
+@node
 class BitwiseAndBinaryOperator(BinaryOperator):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_bitwise_and_binary_operator(self, parameter)
 
-@dataclass
+@node
 class BitwiseOrBinaryOperator(BinaryOperator):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_bitwise_or_binary_operator(self, parameter)
 
-@dataclass
+@node
 class OperandExpression(Expression):
     expression: Expression
 
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_operand_expression(self, parameter)
 
-@dataclass
+@node
 class UnaryExpression(Expression):
     operator: UnaryOperator
     expression: OperandExpression
@@ -212,7 +342,7 @@ class UnaryExpression(Expression):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_unary_expression(self, parameter)
 
-@dataclass
+@node
 class BinaryExpression(Expression):
     left: OperandExpression
     right: OperandExpression
@@ -221,42 +351,51 @@ class BinaryExpression(Expression):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_binary_expression(self, parameter)
 
-@dataclass
+@node
 class LiteralExpression(Expression):
     literal: Literal
 
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_literal_expression(self, parameter)
 
-@dataclass
+@node
+class ParameterExpression(Expression):
+    # a named slot whose value is only supplied when a prepared query is bound
+    name: str
+    type_: Optional[Type] = None
+
+    def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
+        return visitor.visit_parameter_expression(self, parameter)
+
+@node
 class AliasExpression(Expression, ABC):
     alias: str = None
 
-@dataclass
+@node
 class VariableAliasExpression(AliasExpression):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_variable_alias_expression(self, parameter)
 
-@dataclass
+@node
 class ColumnReferenceExpression(Expression):
     name: str
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_column_reference_expression(self, parameter)
 
-@dataclass
+@node
 class ColumnAliasExpression(AliasExpression):
     reference: ColumnReferenceExpression = None
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_column_alias_expression(self, parameter)
 
-@dataclass
+@node
 class ComputedColumnAliasExpression(AliasExpression):
     expression: Optional[Expression] = None
 
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_computed_column_alias_expression(self, parameter)
 
-@dataclass
+@node
 class IfExpression(Expression):
     test: Expression
     body: Expression
@@ -266,19 +405,19 @@ class IfExpression(Expression):
         return visitor.visit_if_expression(self, parameter)
 
 class OrderType(Expression, ABC):
-    pass
+    __slots__ = ()
 
-@dataclass
+@node
 class AscendingOrderType(OrderType):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_ascending_order_type(self, parameter)
 
-@dataclass
+@node
 class DescendingOrderType(OrderType):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_descending_order_type(self, parameter)
 
-@dataclass
+@node
 class OrderByExpression(Expression):
     direction: OrderType
     expression: Expression
@@ -286,7 +425,7 @@ class OrderByExpression(Expression):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_order_by_expression(self, parameter)
 
-@dataclass
+@node
 class FunctionExpression(Expression):
     function: Function
     parameters: List[Expression]
@@ -294,24 +433,26 @@ class FunctionExpression(Expression):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_function_expression(self, parameter)
 
-@dataclass
+@node
 class MapReduceExpression(Expression):
     map_expression: Expression
     reduce_expression: Expression
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_map_reduce_expression(self, parameter)
 
-@dataclass
+@node
 class LambdaExpression(Expression):
     parameters: List[str]
     expression: Expression
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_lambda_expression(self, parameter)
 
-class Clause(ABC):
+class Clause(Node, ABC):
+    __slots__ = ()
+
     pass
 
-@dataclass
+@node
 class RenameClause(Clause):
     columnAliases: List[ColumnAliasExpression]
 
@@ -319,35 +460,35 @@ class RenameClause(Clause):
         return visitor.visit_rename_clause(self, parameter)
 
 
-@dataclass
+@node
 class FilterClause(Clause):
     expression: Expression
 
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_filter_clause(self, parameter)
 
-@dataclass
+@node
 class SelectionClause(Clause):
     expressions: List[Expression]
 
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_selection_clause(self, parameter)
 
-@dataclass
+@node
 class ExtendClause(Clause):
     expressions: List[Expression]
 
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_extend_clause(self, parameter)
 
-@dataclass
+@node
 class GroupByClause(Clause):
     expression: Expression
 
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_group_by_clause(self, parameter)
 
-@dataclass
+@node
 class GroupByExpression(Expression):
     selections: List[Expression]
     expressions: List[Expression]
@@ -356,57 +497,59 @@ class GroupByExpression(Expression):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_group_by_expression(self, parameter)
 
-@dataclass
+@node
 class DistinctClause(Clause):
     expressions: List[Expression]
 
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_distinct_clause(self, parameter)
 
-@dataclass
+@node
 class OrderByClause(Clause):
     ordering: List[OrderType]
 
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_order_by_clause(self, parameter)
 
-@dataclass
+@node
 class LimitClause(Clause):
     value: IntegerLiteral
 
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_limit_clause(self, parameter)
 
-@dataclass
+@node
 class FromClause(Clause):
     database: str
     table: str
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_from_clause(self, parameter)
 
-class JoinType(ABC):
+class JoinType(Node, ABC):
+    __slots__ = ()
+
     @abstractmethod
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         pass
 
-@dataclass
+@node
 class InnerJoinType(JoinType):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_inner_join_type(self, parameter)
 
-@dataclass
+@node
 class LeftJoinType(JoinType):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_left_join_type(self, parameter)
 
-@dataclass
+@node
 class JoinExpression(Expression):
     on: Expression
 
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_join_expression(self, parameter)
 
-@dataclass
+@node
 class JoinClause(Clause):
     from_clause: FromClause
     join_type: JoinType
@@ -415,13 +558,31 @@ class JoinClause(Clause):
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_join_clause(self, parameter)
 
-@dataclass
+@node
 class OffsetClause(Clause):
     value: IntegerLiteral
 
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_offset_clause(self, parameter)
 
+@node
+class SliceClause(Clause):
+    # the rows from start up to, not including, stop
+    start: IntegerLiteral
+    stop: IntegerLiteral
+
+    def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
+        return visitor.visit_slice_clause(self, parameter)
+
+@node
+class TopClause(Clause):
+    # the first rows of the given ordering: a sort followed by a limit, which dialects with a top-N operation run as one
+    ordering: List[OrderType]
+    value: IntegerLiteral
+
+    def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
+        return visitor.visit_top_clause(self, parameter)
+
 class Runtime(ABC):
     @abstractmethod
     def eval[T](self, clauses: List[Clause]) -> T:
@@ -431,6 +592,41 @@ class Runtime(ABC):
     def executable_to_string(self, clauses: List[Clause]) -> str:
         pass
 
+    def prepare(self, clauses: List[Clause]) -> object:
+        # compile clauses holding ParameterExpressions once, eval_prepared then runs them with different values
+        return clauses
+
+    def eval_prepared[T](self, prepared: object, parameters: Dict[str, object]) -> T:
+        from model.parameters import bind_parameters
+        return self.eval(bind_parameters(prepared, parameters))
+
+    async def eval_async[T](self, clauses: List[Clause]) -> T:
+        # eval, awaited rather than blocking: only the runtimes whose calls don't block the event loop implement it
+        raise NotImplementedError(f"{type(self).__name__} has no asynchronous evaluation")
+
+    async def eval_prepared_async[T](self, prepared: object, parameters: Dict[str, object]) -> T:
+        from model.parameters import bind_parameters
+        return await self.eval_async(bind_parameters(prepared, parameters))
+
+    def eval_batches(self, clauses: List[Clause], batch_size: int) -> Iterator[Dict[str, list]]:
+        # the result as the values of each column of batch_size rows at a time, the last batch holding what is left
+        raise NotImplementedError(f"{type(self).__name__} has no batched results")
+
+    def eval_arrow(self, clauses: List[Clause], batch_size: int) -> pyarrow.RecordBatchReader:
+        # the result as Arrow record batches of at most batch_size rows; pyarrow is only needed by the runtimes that
+        # implement this
+        raise NotImplementedError(f"{type(self).__name__} has no Arrow results")
+
+    def empty[T](self, columns: Dict[str, Optional[Type]]) -> Optional[T]:
+        # the result of a query returning no rows of these columns, types None when unknown, or None when the runtime
+        # can't make one without running the query
+        return None
+
+    def identity(self) -> str:
+        # where queries run, as part of their fingerprint: the same in every process, and different for runtimes
+        # that would give different results for the same query
+        return f"{type(self).__module__}.{type(self).__qualname__}"
+
     def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
         return visitor.visit_runtime(self, parameter)
 
@@ -438,12 +634,98 @@ class Runtime(ABC):
 class DataFrame(ABC):
     runtime: Runtime
     clauses: List[Clause]
+    parameters: Dict[str, object] = field(default_factory=dict)
+    # model.fingerprint.of_clauses(clauses), when the builder of the clauses already has it
+    clauses_fingerprint: Optional[bytes] = None
+    # the Database the clauses read, which tells the optimizer the columns of its tables
+    database: Optional[Database] = None
+    # send the runtime the clauses as rewritten by the optimizer, see optimizer.optimizer
+    optimize: bool = True
+
+    def fingerprint(self) -> bytes:
+        # of the clauses as written: the optimizer rewrites equal clauses the same way
+        from model import fingerprint
+        clauses = self.clauses_fingerprint if self.clauses_fingerprint is not None else fingerprint.of_clauses(self.clauses)
+        return fingerprint.of_query(self.runtime.identity(), clauses, self.parameters)
+
+    def plan(self) -> List[Clause]:
+        # the clauses the runtime is sent
+        if not self.optimize:
+            return self.clauses
+        return list(self._plan().clauses)
+
+    def _plan(self) -> Plan:
+        # the clauses optimized, with their parameters and the forms runtimes compiled them to, see optimizer.plans
+        from optimizer.optimizer import plan
+        return plan(self.clauses, self.database)
 
     def eval[T](self) -> T:
-        return self.runtime.eval(self.clauses)
+        plan = self._plan() if self.optimize else None
+        clauses = self.clauses if plan is None else list(plan.clauses)
+        if plan is not None:
+            empty = self._empty(clauses)
+            if empty is not None:
+                return empty
+        if self.parameters:
+            if plan is None:
+                # nothing to keep the compiled form with: the values are sent as literals
+                return self.runtime.eval(self._bound(clauses))
+            from model.parameters import validate_parameters
+            validate_parameters(plan.parameters, self.parameters)
+            return self.runtime.eval_prepared(plan.prepared_for(self.runtime), self.parameters)
+        return self.runtime.eval(clauses)
+
+    async def eval_async[T](self) -> T:
+        # eval, for the runtimes that can be awaited: queries are gathered on one event loop rather than run on threads
+        plan = self._plan() if self.optimize else None
+        clauses = self.clauses if plan is None else list(plan.clauses)
+        if plan is not None:
+            empty = self._empty(clauses)
+            if empty is not None:
+                return empty
+        if self.parameters:
+            if plan is None:
+                return await self.runtime.eval_async(self._bound(clauses))
+            from model.parameters import validate_parameters
+            validate_parameters(plan.parameters, self.parameters)
+            return await self.runtime.eval_prepared_async(plan.prepared_for(self.runtime), self.parameters)
+        return await self.runtime.eval_async(clauses)
+
+    def _empty[T](self, clauses: List[Clause]) -> Optional[T]:
+        # the result of clauses the optimizer found return no rows, made by the runtime without running them
+        from optimizer.simplify import proves_empty
+        from optimizer.columns import column_types
+        if not proves_empty(clauses):
+            return None
+        columns = column_types(clauses, self.database)
+        return None if columns is None else self.runtime.empty(columns)
+
+    def to_arrow(self) -> pyarrow.Table:
+        return self.to_arrow_reader().read_all()
+
+    def to_arrow_reader(self, batch_size: int = 65_536) -> pyarrow.RecordBatchReader:
+        # the result read batch by batch, as the runtime makes them
+        return self.runtime.eval_arrow(self._bound_plan(batch_size), batch_size)
+
+    def iter_batches(self, batch_size: int = 65_536) -> Iterator[Dict[str, list]]:
+        # the result in columns of batch_size rows, read as the runtime makes them: a result need not fit in memory
+        return self.runtime.eval_batches(self._bound_plan(batch_size), batch_size)
+
+    def _bound_plan(self, batch_size: int) -> List[Clause]:
+        if batch_size <= 0:
+            raise ValueError(f"batch_size must be positive: {batch_size}")
+        return self._bound(self.plan())
+
+    def _bound(self, clauses: List[Clause]) -> List[Clause]:
+        # the clauses with the values of their parameters as literals
+        if not self.parameters:
+            return clauses
+        from model.parameters import find_parameters, validate_parameters, bind_parameters
+        validate_parameters(self._plan().parameters if self.optimize else find_parameters(clauses), self.parameters)
+        return bind_parameters(clauses, self.parameters)
 
     def executable_to_string(self) -> str:
-        return self.runtime.executable_to_string(self.clauses)
+        return self.runtime.executable_to_string(self._bound(self.plan()))
 
 class ExecutionVisitor(ABC):
     @abstractmethod
@@ -458,6 +740,10 @@ class ExecutionVisitor(ABC):
     def visit_integer_literal[P, T](self, val: IntegerLiteral, parameter: P) -> T:
         raise NotImplementedError()
 
+    @abstractmethod
+    def visit_float_literal[P, T](self, val: FloatLiteral, parameter: P) -> T:
+        raise NotImplementedError()
+
     @abstractmethod
     def visit_string_literal[P, T](self, val: StringLiteral, parameter: P) -> T:
         raise NotImplementedError()
@@ -530,6 +816,10 @@ class ExecutionVisitor(ABC):
     def visit_literal_expression[P, T](self, val: LiteralExpression, parameter: P) -> T:
         raise NotImplementedError()
 
+    @abstractmethod
+    def visit_parameter_expression[P, T](self, val: ParameterExpression, parameter: P) -> T:
+        raise NotImplementedError()
+
     @abstractmethod
     def visit_unary_expression[P, T](self, val: UnaryExpression, parameter: P) -> T:
         raise NotImplementedError()
@@ -652,6 +942,14 @@ class ExecutionVisitor(ABC):
     def visit_offset_clause[P, T](self, val: OffsetClause, parameter: P) -> T:
         raise NotImplementedError()
 
+    @abstractmethod
+    def visit_slice_clause[P, T](self, val: SliceClause, parameter: P) -> T:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def visit_top_clause[P, T](self, val: TopClause, parameter: P) -> T:
+        raise NotImplementedError()
+
     @abstractmethod
     def visit_in_binary_operator[P, T](self, self1, parameter: P) -> T:
         raise NotImplementedError()
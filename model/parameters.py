@@ -0,0 +1,95 @@
+import math
+from datetime import date
+from operator import is_not
+from typing import Dict, Callable
+
+from model.metamodel import Expression, ParameterExpression, LiteralExpression, Literal, IntegerLiteral, FloatLiteral, StringLiteral, \
+    DateLiteral, BooleanLiteral, Node
+
+
+def to_literal(value: object) -> Literal:
+    if isinstance(value, bool):
+        return BooleanLiteral(value)
+    if isinstance(value, int):
+        return IntegerLiteral(value)
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise ValueError(f"Cannot convert non-finite float {value}")
+        return FloatLiteral(value)
+    if isinstance(value, str):
+        return StringLiteral(value)
+    if isinstance(value, date):
+        return DateLiteral(value)
+    raise ValueError(f"Cannot convert literal type {type(value)}")
+
+
+def find_parameters(node: object, found: Dict[str, ParameterExpression] = None) -> Dict[str, ParameterExpression]:
+    found = {} if found is None else found
+    # iterative, expression trees can be far deeper than the recursion limit
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, ParameterExpression):
+            if node.name in found and found[node.name].type_ != node.type_:
+                raise ValueError(f"Parameter '{node.name}' is declared with different types: {found[node.name].type_}, {node.type_}")
+            found.setdefault(node.name, node)
+        elif isinstance(node, list):
+            pending.extend(reversed(node))
+        elif isinstance(node, Node):
+            pending.extend(reversed(node._values()))
+    return found
+
+
+def validate_parameters(declared: Dict[str, ParameterExpression], values: Dict[str, object]) -> None:
+    missing = declared.keys() - values.keys()
+    if missing:
+        raise ValueError(f"Missing value(s) for parameter(s): {sorted(missing)}")
+    unknown = values.keys() - declared.keys()
+    if unknown:
+        raise ValueError(f"Unknown parameter(s): {sorted(unknown)}")
+    for name, parameter in declared.items():
+        if parameter.type_ is not None and not isinstance(values[name], parameter.type_):
+            raise ValueError(f"Parameter '{name}' expects {parameter.type_.__name__}, got {type(values[name]).__name__}")
+
+
+def bind_parameters[N](node: N, values: Dict[str, object]) -> N:
+    """
+    Returns node with every ParameterExpression replaced by the literal of its value. Sub-trees without parameters
+    are shared with the original, not copied.
+    """
+    return _replace_parameters(node, lambda p: LiteralExpression(to_literal(values[p.name])))
+
+
+def rename_parameters[N](node: N, names: Dict[str, str]) -> N:
+    return _replace_parameters(node, lambda p: ParameterExpression(names[p.name], p.type_) if p.name in names else p)
+
+
+def _replace_parameters[N](node: N, replacement: Callable[[ParameterExpression], Expression]) -> N:
+    # iterative, like find_parameters: (value, False) to push its children, then (value, True), below them, to rebuild
+    # it from them once they are replaced. Values are keyed by id, they are all held by node for as long as this runs.
+    replaced: Dict[int, object] = {}
+    pending = [(node, False)]
+    while pending:
+        value, expanded = pending.pop()
+        if id(value) in replaced:
+            continue
+        if isinstance(value, ParameterExpression):
+            replaced[id(value)] = replacement(value)
+            continue
+        if isinstance(value, list):
+            children = value
+        elif isinstance(value, Node):
+            children = value._values()
+        else:
+            replaced[id(value)] = value
+            continue
+        if not expanded:
+            pending.append((value, True))
+            pending.extend((child, False) for child in reversed(children))
+            continue
+        rebuilt = [replaced[id(child)] for child in children]
+        if not any(map(is_not, rebuilt, children)):
+            replaced[id(value)] = value
+        else:
+            replaced[id(value)] = rebuilt if children is value else type(value)(*rebuilt)
+    return replaced[id(node)]
@@ -0,0 +1,263 @@
+"""
+What the optimizer knows of columns: the columns each clause outputs, starting from the tables of the Database the
+query reads, and the columns each expression reads. Both answer None when they cannot tell, and rules then leave
+the clauses as they are.
+"""
+from operator import is_not
+from typing import Callable, Dict, FrozenSet, List, Optional, Set, Type
+from weakref import WeakKeyDictionary
+
+from model.functions import AggregationFunction, WindowFunction, OverFunction
+from model.metamodel import Node, Clause, Expression, FromClause, FilterClause, ExtendClause, RenameClause, \
+    SelectionClause, GroupByClause, GroupByExpression, JoinClause, JoinExpression, DistinctClause, LambdaExpression, \
+    ColumnAliasExpression, ColumnReferenceExpression, ComputedColumnAliasExpression, VariableAliasExpression, \
+    FunctionExpression, MapReduceExpression
+from model.schema import Database, Table
+
+# the columns of a relation, in order, or None when unknown
+Columns = Optional[List[str]]
+# the values rewrite walks into
+_WALKED = (Node, list)
+
+
+def table_columns(from_clause: FromClause, database: Optional[Database]) -> Columns:
+    table = _table(from_clause, database)
+    return None if table is None else list(table.columns)
+
+
+def _table(from_clause: FromClause, database: Optional[Database]) -> Optional[Table]:
+    if database is None or from_clause.database != database.name:
+        return None
+    for table in database.tables:
+        if table.table == from_clause.table:
+            return table
+    return None
+
+
+def output_columns(clause: Clause, columns: Columns, database: Optional[Database]) -> Columns:
+    # the columns of the relation clause outputs, given the columns of the relation it is applied to
+    if isinstance(clause, FromClause):
+        return table_columns(clause, database)
+    if isinstance(clause, ExtendClause):
+        aliases = extended_columns(clause)
+        return None if columns is None or aliases is None else [c for c in columns if c not in aliases] + aliases
+    if isinstance(clause, RenameClause):
+        return None if columns is None else [renamed(clause, c) for c in columns]
+    if isinstance(clause, SelectionClause):
+        return selected_columns(clause.expressions)
+    if isinstance(clause, GroupByClause) and isinstance(clause.expression, GroupByExpression):
+        selections = selected_columns(clause.expression.selections)
+        aggregates = aliases_of(clause.expression.expressions)
+        return None if selections is None or aggregates is None else selections + aggregates
+    if isinstance(clause, JoinClause):
+        right = table_columns(clause.from_clause, database)
+        if columns is None or right is None or join_projection(clause):
+            return None
+        return columns + [c for c in right if c not in columns]
+    if isinstance(clause, DistinctClause):
+        return selected_columns(clause.expressions)
+    # filters, sorts, limits, offsets and slices keep the columns they are given
+    return columns
+
+
+def column_types(clauses: List[Clause], database: Optional[Database]) -> Optional[Dict[str, Optional[Type]]]:
+    # the columns the clauses output and their types, None for the types not known, or None when the columns are not
+    columns: Columns = None
+    types: Dict[str, Optional[Type]] = {}
+    for clause in clauses:
+        columns = output_columns(clause, columns, database)
+        if columns is None:
+            return None
+        if isinstance(clause, FromClause):
+            types = dict(_table(clause, database).columns)
+        elif isinstance(clause, JoinClause):
+            types = {**_table(clause.from_clause, database).columns, **types}
+        elif isinstance(clause, RenameClause):
+            types = {renamed(clause, c): t for c, t in types.items()}
+        elif isinstance(clause, ExtendClause):
+            # the types of computed columns are not known
+            types.update(dict.fromkeys(extended_columns(clause), None))
+        elif isinstance(clause, GroupByClause):
+            types.update(dict.fromkeys(aliases_of(clause.expression.expressions), None))
+    return {c: types.get(c) for c in columns}
+
+
+def extended_columns(clause: ExtendClause) -> Columns:
+    return aliases_of(clause.expressions)
+
+
+def aliases_of(expressions: List[Expression]) -> Columns:
+    if not all(isinstance(e, ComputedColumnAliasExpression) for e in expressions):
+        return None
+    return [e.alias for e in expressions]
+
+
+def selected_columns(expressions: List[Expression]) -> Columns:
+    if not all(isinstance(e, ColumnReferenceExpression) for e in expressions):
+        return None
+    return [e.name for e in expressions]
+
+
+def renamed(clause: RenameClause, column: str) -> str:
+    for alias in clause.columnAliases:
+        if isinstance(alias.reference, ColumnReferenceExpression) and alias.reference.name == column:
+            column = alias.alias
+    return column
+
+
+def join_projection(clause: JoinClause) -> bool:
+    # a join lambda may return the columns it keeps of the joined table, with its condition: [condition, [columns]]
+    on = clause.on_clause.on if isinstance(clause.on_clause, JoinExpression) else clause.on_clause
+    return not isinstance(on, LambdaExpression) or isinstance(on.expression, list)
+
+
+def filter_columns(clause: FilterClause) -> Optional[FrozenSet[str]]:
+    return referenced_columns(clause.expression)
+
+
+def _memoized[N: Node, R](function: Callable[[N], R]) -> Callable[[N], R]:
+    # nodes never change: what is computed of one holds for as long as it lives, as filters moved clause by clause do
+    results: WeakKeyDictionary = WeakKeyDictionary()
+
+    def memoized(node: N) -> R:
+        try:
+            return results[node]
+        except KeyError:
+            result = results[node] = function(node)
+            return result
+    def prime(node: N, result: R) -> None:
+        # what is known of a node without computing it, such as of a node built of others already computed
+        results[node] = result
+    memoized.__doc__ = function.__doc__
+    memoized.prime = prime
+    return memoized
+
+
+@_memoized
+def referenced_columns(expression: Expression) -> Optional[FrozenSet[str]]:
+    """
+    The columns a lambda of one row reads, or None when it reads more than columns of its row: the row as a whole,
+    other rows through a window or an aggregate, or anything the analysis doesn't know.
+    """
+    if not isinstance(expression, LambdaExpression) or len(expression.parameters) != 1 or isinstance(expression.expression, list):
+        return None
+    row = expression.parameters[0]
+    columns = set()
+    # iterative, filters can be far deeper than the recursion limit
+    pending = [expression.expression]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, ColumnAliasExpression) and node.alias == row:
+            if not isinstance(node.reference, ColumnReferenceExpression):
+                return None
+            columns.add(node.reference.name)
+        elif isinstance(node, ColumnReferenceExpression):
+            columns.add(node.name)
+        elif isinstance(node, VariableAliasExpression) and node.alias == row:
+            return None
+        elif not _row_local(node):
+            return None
+        elif isinstance(node, list):
+            pending.extend(node)
+        elif isinstance(node, Node):
+            pending.extend(node._values())
+    return frozenset(columns)
+
+
+@_memoized
+def is_row_local(expression: Expression) -> bool:
+    # whether each row's value depends on that row only: no window, aggregate or nested lambda
+    pending = [expression]
+    while pending:
+        node = pending.pop()
+        if not _row_local(node):
+            return False
+        if isinstance(node, list):
+            pending.extend(node)
+        elif isinstance(node, Node):
+            pending.extend(node._values())
+    return True
+
+
+def read_columns(node: object) -> Optional[Set[str]]:
+    """
+    The columns an expression, or a list of them, reads from any row, windows and aggregates included, or None when
+    it reads a row as a whole. The names of columns extended alongside it are included.
+    """
+    columns = set()
+    # the ids of the nodes and lists walked: a node shared by several others is walked once
+    walked = set()
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        kind = type(node)
+        # classes without subclasses: compared by identity, faster than isinstance on their abstract bases
+        if kind is ColumnReferenceExpression:
+            columns.add(node.name)
+        elif kind is VariableAliasExpression:
+            return None
+        elif kind is MapReduceExpression:
+            # the reduce lambda reads the values mapped, not a row
+            pending.append(node.map_expression)
+        elif isinstance(node, _WALKED) and id(node) not in walked:
+            walked.add(id(node))
+            pending.extend(node if isinstance(node, list) else node._values())
+    return columns
+
+
+@_memoized
+def row_local_extension(clause: ExtendClause) -> Optional[FrozenSet[str]]:
+    # the columns an extend adds, when each row's values depend on that row only, or None
+    extended = extended_columns(clause)
+    if extended is None or not all(is_row_local(e) for e in clause.expressions):
+        return None
+    return frozenset(extended)
+
+
+def _row_local(node: object) -> bool:
+    if isinstance(node, FunctionExpression):
+        return not isinstance(node.function, (AggregationFunction, WindowFunction, OverFunction))
+    return not isinstance(node, MapReduceExpression)
+
+
+def rewrite[N](root: N, replace: Callable[[Node], Optional[Node]], after: Optional[Callable[[Node], Node]] = None) -> N:
+    """
+    Returns root with every node for which replace returns a node replaced by it, and the nodes above rebuilt.
+    Sub-trees without replacements are shared with root, not copied. after, if given, is called on each node replace
+    returned None for once its children are rewritten, children first, and returns the node to put in its place.
+    """
+    done: Dict[int, object] = {}
+    # (value, None) to replace the value or push its children, then (value, children), below them, to rebuild it from
+    # them once they are done, at once when they already are. A value is done once, however many nodes hold it.
+    pending = [(root, None)]
+    pop, push = pending.pop, pending.append
+    while pending:
+        value, children = pop()
+        key = id(value)
+        if key in done:
+            continue
+        if children is None:
+            if isinstance(value, Node):
+                replacement = replace(value)
+                if replacement is not None:
+                    done[key] = replacement
+                    continue
+                children = value._values()
+            elif isinstance(value, list):
+                children = value
+            else:
+                done[key] = value
+                continue
+            undone = [(c, None) for c in children if isinstance(c, _WALKED) and id(c) not in done]
+            if undone:
+                push((value, children))
+                pending.extend(undone)
+                continue
+        rewritten = [done[id(c)] if isinstance(c, _WALKED) else c for c in children]
+        result = value
+        if any(map(is_not, rewritten, children)):
+            result = rewritten if children is value else type(value)(*rewritten)
+        if after is not None and children is not value:
+            result = after(result)
+        done[key] = result
+    return done[id(root)]
@@ -0,0 +1,354 @@
+"""
+Common subexpression elimination: a costly expression of a row written in several filters, extends or group_by keys
+is computed once, as a hidden column extended before its first use, and read from that column afterwards. The hidden
+columns are selected out at the end, unless a selection or an aggregation after their last use drops them already.
+"""
+from typing import Dict, FrozenSet, Iterator, List, Optional, Set, Tuple
+
+from model.functions import AggregationFunction, WindowFunction, OverFunction
+from model.metamodel import Node, Clause, Expression, FilterClause, ExtendClause, GroupByClause, GroupByExpression, \
+    SelectionClause, DistinctClause, RenameClause, JoinClause, LambdaExpression, BinaryExpression, UnaryExpression, \
+    IfExpression, FunctionExpression, MapReduceExpression, ComputedColumnAliasExpression, ColumnAliasExpression, \
+    ColumnReferenceExpression, VariableAliasExpression, LiteralExpression, AddBinaryOperator, \
+    SubtractBinaryOperator, MultiplyBinaryOperator, DivideBinaryOperator, AndBinaryOperator, OrBinaryOperator, \
+    ModuloFunction, ExponentFunction, FrozenList
+from model.schema import Database
+from optimizer.columns import output_columns, extended_columns, rewrite
+from optimizer.rule import Pass
+
+# the name of the row in the hidden columns' lambdas, and in the expressions compared
+ROW = "row"
+PREFIX = "__cse_"
+# arithmetic is worth a column from this many operations on: a single multiplication costs less than the column
+MIN_ARITHMETIC_OPERATIONS = 3
+# the lists walked: those being built, and those held by nodes
+_LISTS = (list, FrozenList)
+
+_ARITHMETIC = (AddBinaryOperator, SubtractBinaryOperator, MultiplyBinaryOperator, DivideBinaryOperator)
+_OPERATIONS = (BinaryExpression, UnaryExpression, FunctionExpression, IfExpression)
+# the clauses after which hidden columns are no longer there, or may read other values: the first three drop them
+_DROPPING = (SelectionClause, GroupByClause, DistinctClause)
+_BARRIERS = _DROPPING + (RenameClause, JoinClause)
+
+# an expression as computed at some point of the clauses: written with ROW as its row, the barriers passed, and how
+# many times each column it reads has been extended by then
+Key = Tuple[Expression, int, Tuple[Tuple[str, int], ...]]
+
+
+class CommonSubexpressions(Pass):
+    def run(self, clauses: List[Clause], database: Optional[Database]) -> List[Clause]:
+        sites = _sites(clauses)
+        if not any(sites):
+            return clauses
+
+        # occurrences first counted everywhere, then only where not part of a larger expression repeated as well
+        counts: Dict[Key, int] = {}
+        for clause_sites in sites:
+            for _, _, keys, occurrences in clause_sites:
+                for key in occurrences:
+                    counts[key] = counts.get(key, 0) + 1
+        repeated = {k for k, n in counts.items() if n > 1}
+        if not repeated:
+            return clauses
+        counts = _count(sites, lambda key: key in repeated)
+        hoisted = {k for k, n in counts.items() if n > 1}
+
+        # the hidden columns left at the end need a selection of the columns the clauses output
+        columns = None
+        for clause in clauses:
+            columns = output_columns(clause, columns, database)
+        dropped = _dropped_epochs(clauses)
+        if columns is None:
+            hoisted = {k for k in hoisted if k[1] in dropped}
+        if not hoisted:
+            return clauses
+
+        taken = _names(clauses)
+        names: Dict[Key, str] = {}
+        defined: Set[Key] = set()
+        result = []
+        for clause, clause_sites in zip(clauses, sites):
+            used = []
+            rewritten = {}
+            for site, row, keys, _ in clause_sites:
+                body = _replace(site.expression, row, keys, hoisted, names, taken, used)
+                if body is not site.expression:
+                    rewritten[site] = LambdaExpression(site.parameters, body)
+            # the hidden columns are extended right before the clause first reading them
+            new = [k for k in used if k not in defined]
+            defined.update(new)
+            if new:
+                result.append(ExtendClause([ComputedColumnAliasExpression(names[k], LambdaExpression([ROW], k[0])) for k in new]))
+            result.append(_rebuild(clause, rewritten) if rewritten else clause)
+        if any(k[1] not in dropped for k in names):
+            result.append(SelectionClause([ColumnReferenceExpression(c) for c in columns]))
+        return result
+
+
+# a lambda of one row, its row, the keys of the expressions it holds by their id, and the keys of each occurrence
+Site = Tuple[LambdaExpression, str, Dict[int, Key], List[Key]]
+
+
+def _sites(clauses: List[Clause]) -> List[List[Site]]:
+    # the lambdas of one row of each clause, with the keys of their candidate expressions
+    sites = []
+    epoch = 0
+    extended: Dict[str, int] = {}
+    for clause in clauses:
+        clause_sites = []
+        for site in _lambdas(clause):
+            row = site.parameters[0]
+            keys, occurrences = {}, []
+            normalized = None
+            for node in _candidates(site.expression):
+                if normalized is None:
+                    normalized = _normalized(site.expression, row)
+                if id(node) not in keys:
+                    keys[id(node)] = _key(normalized.get(id(node)), epoch, extended)
+                if keys[id(node)] is not None:
+                    occurrences.append(keys[id(node)])
+            clause_sites.append((site, row, keys, occurrences))
+        sites.append(clause_sites)
+        if isinstance(clause, ExtendClause):
+            for alias in extended_columns(clause) or []:
+                extended[alias] = extended.get(alias, 0) + 1
+        if _is_barrier(clause):
+            epoch += 1
+    return sites
+
+
+def _lambdas(clause: Clause) -> Iterator[LambdaExpression]:
+    if isinstance(clause, FilterClause):
+        expressions = [clause.expression]
+    elif isinstance(clause, ExtendClause):
+        expressions = [e.expression for e in clause.expressions if isinstance(e, ComputedColumnAliasExpression)]
+    elif isinstance(clause, GroupByClause) and isinstance(clause.expression, GroupByExpression):
+        expressions = [e.expression.map_expression for e in clause.expression.expressions
+                       if isinstance(e, ComputedColumnAliasExpression) and isinstance(e.expression, MapReduceExpression)]
+    else:
+        expressions = []
+    for expression in expressions:
+        if isinstance(expression, LambdaExpression) and len(expression.parameters) == 1 and isinstance(expression.expression, Expression):
+            yield expression
+
+
+def _candidates(body: Expression, stop=lambda node: False) -> Iterator[Expression]:
+    """
+    The expressions worth a column, outermost first, not those within one for which stop is true. Those that may not
+    be evaluated, in the branches of an if or right of an and or an or, only when they can't fail: what skips them may
+    be what guards them from a division by zero, and their column is computed for every row.
+    """
+    pending = [(body, False)]
+    failing = None
+    while pending:
+        node, guarded = pending.pop()
+        # exact types: isinstance of the abstract node classes costs more than the walk
+        kind = type(node)
+        if kind in _LISTS:
+            pending.extend((n, guarded) for n in node)
+            continue
+        if not isinstance(node, Node):
+            continue
+        if _costly(node) and guarded and failing is None:
+            failing = _failing(body)
+        if _costly(node) and not (guarded and id(node) in failing):
+            yield node
+            if stop(node):
+                continue
+        if kind is IfExpression:
+            pending.extend([(node.orelse, True), (node.body, True), (node.test, guarded)])
+        elif kind is BinaryExpression and type(node.operator) in (AndBinaryOperator, OrBinaryOperator):
+            pending.extend([(node.right, True), (node.left, guarded)])
+        elif kind is not LambdaExpression and kind is not MapReduceExpression:
+            pending.extend((n, guarded) for n in node._values())
+
+
+def _costly(node: Node) -> bool:
+    kind = type(node)
+    if kind is IfExpression:
+        return True
+    if kind is FunctionExpression:
+        return not isinstance(node.function, (AggregationFunction, WindowFunction, OverFunction))
+    if kind is BinaryExpression and type(node.operator) in _ARITHMETIC:
+        return _operations(node, MIN_ARITHMETIC_OPERATIONS) >= MIN_ARITHMETIC_OPERATIONS
+    return False
+
+
+def _failing(body: Expression) -> Set[int]:
+    # the ids of the nodes of body that may fail, children first in one walk: ifs nest as deep as they are long
+    failing, done, pending = set(), set(), [body]
+    while pending:
+        value = pending[-1]
+        if id(value) in done:
+            pending.pop()
+            continue
+        children = value if type(value) in _LISTS else value._values() if isinstance(value, Node) else ()
+        undone = [c for c in children if id(c) not in done]
+        if undone:
+            pending.extend(undone)
+            continue
+        pending.pop()
+        done.add(id(value))
+        if _may_fail(value) or any(id(c) in failing for c in children):
+            failing.add(id(value))
+    return failing
+
+
+def _may_fail(value: object) -> bool:
+    if type(value) is BinaryExpression:
+        return type(value.operator) is DivideBinaryOperator
+    return type(value) is FunctionExpression and type(value.function) in (ModuloFunction, ExponentFunction)
+
+
+def _operations(node: Node, limit: int) -> int:
+    # the number of operations of the expression, counted up to limit
+    count, pending = 0, [node]
+    while pending and count < limit:
+        value = pending.pop()
+        if type(value) in _LISTS:
+            pending.extend(value)
+        elif isinstance(value, Node):
+            if type(value) in _OPERATIONS:
+                count += 1
+            pending.extend(value._values())
+    return count
+
+
+def _normalized(body: Expression, row: str) -> Dict[int, Tuple[Expression, FrozenSet[str]]]:
+    """
+    The expressions of the body of columns of the row only, by id: each written with ROW as its row, with the columns
+    it reads. Computed children first, in one walk: nested candidates would otherwise be walked once each.
+    """
+    # the expression written with ROW and the columns it reads, or None, for each node and list walked
+    done: Dict[int, Optional[Tuple[object, FrozenSet[str]]]] = {}
+    pending = [body]
+    while pending:
+        value = pending[-1]
+        if id(value) in done:
+            pending.pop()
+            continue
+        kind = type(value)
+        if kind is ColumnAliasExpression:
+            pending.pop()
+            valid = value.alias == row and type(value.reference) is ColumnReferenceExpression
+            done[id(value)] = (ColumnAliasExpression(ROW, value.reference), frozenset([value.reference.name])) if valid else None
+            continue
+        # rows as a whole, other rows, and values not known
+        if kind in (VariableAliasExpression, ColumnReferenceExpression, LambdaExpression, MapReduceExpression) or \
+                (kind is FunctionExpression and isinstance(value.function, (AggregationFunction, WindowFunction, OverFunction))):
+            pending.pop()
+            done[id(value)] = None
+            continue
+        children = value if kind in _LISTS else value._values() if isinstance(value, Node) else None
+        if children is None:
+            pending.pop()
+            done[id(value)] = (value, frozenset())
+            continue
+        undone = [c for c in children if id(c) not in done]
+        if undone:
+            pending.extend(undone)
+            continue
+        pending.pop()
+        results = [done[id(c)] for c in children]
+        if any(r is None for r in results):
+            done[id(value)] = None
+            continue
+        written = [r[0] for r in results]
+        if not all(w is c for w, c in zip(written, children)):
+            written = written if kind in _LISTS else kind(*written)
+        else:
+            written = value
+        done[id(value)] = (written, frozenset().union(*(r[1] for r in results)))
+    return {i: r for i, r in done.items() if r is not None}
+
+
+def _key(normalized: Optional[Tuple[Expression, FrozenSet[str]]], epoch: int, extended: Dict[str, int]) -> Optional[Key]:
+    # the key of an expression of columns of the row only, or None
+    if normalized is None or not normalized[1]:
+        return None
+    expression, read = normalized
+    return expression, epoch, tuple(sorted((c, extended.get(c, 0)) for c in read))
+
+
+def _count(sites: List[List[Site]], stop) -> Dict[Key, int]:
+    counts: Dict[Key, int] = {}
+    for clause_sites in sites:
+        for site, _, keys, _ in clause_sites:
+            for node in _candidates(site.expression, lambda n: stop(keys.get(id(n)))):
+                key = keys.get(id(node))
+                if key is not None:
+                    counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def _replace(body: Expression, row: str, keys: Dict[int, Key], hoisted: Set[Key], names: Dict[Key, str],
+             taken: Set[str], used: List[Key]) -> Expression:
+    # the body reading the hidden columns of the hoisted expressions it holds
+    def replace(node: Node) -> Optional[Node]:
+        key = keys.get(id(node))
+        if key in hoisted:
+            if key not in names:
+                names[key] = _name(taken)
+            if key not in used:
+                used.append(key)
+            return ColumnAliasExpression(row, ColumnReferenceExpression(names[key]))
+        if isinstance(node, (LambdaExpression, MapReduceExpression, LiteralExpression)):
+            return node
+        return None
+
+    return rewrite(body, replace)
+
+
+def _rebuild(clause: Clause, rewritten: Dict[LambdaExpression, LambdaExpression]) -> Clause:
+    if isinstance(clause, FilterClause):
+        return FilterClause(rewritten.get(clause.expression, clause.expression))
+    if isinstance(clause, ExtendClause):
+        return ExtendClause([ComputedColumnAliasExpression(e.alias, rewritten.get(e.expression, e.expression))
+                             if isinstance(e, ComputedColumnAliasExpression) else e for e in clause.expressions])
+    expression = clause.expression
+    aggregates = [ComputedColumnAliasExpression(e.alias, MapReduceExpression(rewritten.get(e.expression.map_expression, e.expression.map_expression), e.expression.reduce_expression))
+                  if isinstance(e, ComputedColumnAliasExpression) and isinstance(e.expression, MapReduceExpression) else e
+                  for e in expression.expressions]
+    return GroupByClause(GroupByExpression(expression.selections, aggregates, expression.having))
+
+
+def _dropped_epochs(clauses: List[Clause]) -> Set[int]:
+    # the epochs ended by a clause that drops the hidden columns
+    dropped, epoch = set(), 0
+    for clause in clauses:
+        if _is_barrier(clause):
+            if isinstance(clause, _DROPPING):
+                dropped.add(epoch)
+            epoch += 1
+    return dropped
+
+
+def _is_barrier(clause: Clause) -> bool:
+    # extends of columns not known may change any column
+    return isinstance(clause, _BARRIERS) or (isinstance(clause, ExtendClause) and extended_columns(clause) is None)
+
+
+def _names(clauses: List[Clause]) -> Set[str]:
+    # the column names the clauses use, that hidden columns must not take
+    names, pending = set(), list(clauses)
+    while pending:
+        node = pending.pop()
+        if isinstance(node, ColumnReferenceExpression):
+            names.add(node.name)
+        elif isinstance(node, ComputedColumnAliasExpression):
+            names.add(node.alias)
+            pending.append(node.expression)
+        elif isinstance(node, list):
+            pending.extend(node)
+        elif isinstance(node, Node):
+            pending.extend(node._values())
+    return names
+
+
+def _name(taken: Set[str]) -> str:
+    n = 0
+    while f"{PREFIX}{n}" in taken:
+        n += 1
+    name = f"{PREFIX}{n}"
+    taken.add(name)
+    return name
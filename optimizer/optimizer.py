@@ -0,0 +1,114 @@
+"""
+Rule-based rewriting of the clause list of a query, between the builder and the Runtime: DataFrame and
+PreparedQuery send the runtime the optimized clauses, which return the same rows as the clauses written.
+
+The rules rewrite a few consecutive clauses at a time, the passes then rewrite the list as a whole, after which the
+rules run again on what the passes changed. Each applied rule or pass is logged at DEBUG level to the
+"optimizer.optimizer" logger. The plans of an Optimizer are cached, see optimizer.plans: a plan found in the cache is
+not optimized again, nor logged.
+"""
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from model.metamodel import Clause
+from model.parameters import find_parameters
+from model.schema import Database
+from optimizer.columns import Columns, output_columns
+from optimizer.cse import CommonSubexpressions
+from optimizer.plans import Plan, PlanCache
+from optimizer.properties import RedundancyElimination
+from optimizer.pruning import ProjectionPruning
+from optimizer.rule import Rule, Pass
+from optimizer.simplify import Simplification
+from optimizer.rules import MergeFilters, PushFilterBelowExtend, PushFilterBelowRename, PushFilterBelowJoin, \
+    FoldLimits, FuseTopN, DropNoOpSelection, MergeSelections
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Optimizer:
+    rules: List[Rule] = field(default_factory=list)
+    passes: List[Pass] = field(default_factory=list)
+    # at most this many rewrites of one clause list, should rules ever undo each other
+    max_rewrites: int = 100_000
+    # the plans optimized, see plan
+    plans: PlanCache = field(default_factory=PlanCache, repr=False, compare=False)
+
+    def plan(self, clauses: List[Clause], database: Optional[Database] = None) -> Plan:
+        # the clauses optimized, once for as long as the plan stays in the cache
+        key = PlanCache.key(clauses, database)
+        plan = self.plans.get(key) if key is not None else None
+        if plan is None:
+            optimized = self.optimize(clauses, database)
+            plan = Plan(tuple(optimized), find_parameters(optimized))
+            if key is not None:
+                self.plans.put(key, plan)
+        return plan
+
+    def optimize(self, clauses: List[Clause], database: Optional[Database] = None) -> List[Clause]:
+        clauses = self._apply_rules(list(clauses), database)
+        changed = False
+        for pass_ in self.passes:
+            result = pass_.run(clauses, database)
+            if result != clauses:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("%s: %s -> %s", pass_.name, clauses, result)
+                clauses, changed = result, True
+        return self._apply_rules(clauses, database) if changed else clauses
+
+    def _apply_rules(self, clauses: List[Clause], database: Optional[Database]) -> List[Clause]:
+        rules_by_type: Dict[type, List[Rule]] = {}
+        # inputs[i]: the columns of the relation clauses[i] is applied to, computed when a rule first reads them
+        inputs: List[Columns] = [None]
+        rewrites, i = 0, 0
+        while i < len(clauses):
+            rules = rules_by_type.get(type(clauses[i]))
+            if rules is None:
+                rules = rules_by_type[type(clauses[i])] = [r for r in self.rules if isinstance(clauses[i], r.first)]
+            for rule in rules:
+                window = tuple(clauses[i:i + rule.span])
+                if len(window) < rule.span:
+                    continue
+                if rule.reads_columns:
+                    while len(inputs) <= i:
+                        inputs.append(output_columns(clauses[len(inputs) - 1], inputs[-1], database))
+                replacement = rule.apply(window, inputs[i] if rule.reads_columns else None, database)
+                if replacement is None:
+                    continue
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("%s at clause %d: %s -> %s", rule.name, i, window, replacement)
+                clauses[i:i + rule.span] = replacement
+                del inputs[i + 1:]
+                rewrites += 1
+                if rewrites >= self.max_rewrites:
+                    return clauses
+                # the clause before may now be rewritten with the new ones, e.g. a filter pushed further down
+                i = max(0, i - 1)
+                break
+            else:
+                i += 1
+        return clauses
+
+
+def default_rules() -> List[Rule]:
+    # filters are pushed down first, so that they meet, and merge with, the filters below
+    return [PushFilterBelowExtend(), PushFilterBelowRename(), PushFilterBelowJoin(), MergeFilters(), FoldLimits(),
+            FuseTopN(), DropNoOpSelection(), MergeSelections()]
+
+
+def default_passes() -> List[Pass]:
+    # simplified filters are merged and pushed down by the rules, that run again, before the columns are pruned
+    return [Simplification(), RedundancyElimination(), CommonSubexpressions(), ProjectionPruning()]
+
+
+DEFAULT = Optimizer(default_rules(), default_passes())
+
+
+def optimize(clauses: List[Clause], database: Optional[Database] = None) -> List[Clause]:
+    return DEFAULT.optimize(clauses, database)
+
+
+def plan(clauses: List[Clause], database: Optional[Database] = None) -> Plan:
+    return DEFAULT.plan(clauses, database)
@@ -0,0 +1,73 @@
+"""
+Memoization of optimized plans.
+
+The clauses the optimizer rewrites a query to only depend on the clauses written and the schema of the tables of the
+Database the query reads. Nodes are interned, so the clauses of equal queries are the same nodes, and a list of them
+hashes and compares as fast as their ids: a query evaluated, printed or read in batches over again, or built again
+alike, is optimized once, and compiled once by each runtime it is evaluated with values for its parameters.
+"""
+import functools
+import threading
+import weakref
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from model.lru import LruCache
+from model.metamodel import Clause, ParameterExpression, Runtime
+from model.schema import Database
+
+
+@dataclass(frozen=True)
+class Plan:
+    # the clauses optimized, shared by the queries that hit the entry: callers copy them to a list
+    clauses: Tuple[Clause, ...]
+    # the parameters the clauses hold, see model.parameters.find_parameters
+    parameters: Dict[str, ParameterExpression]
+    # id of a runtime -> a weak reference to it, and its compiled form of the clauses, see prepared_for: the runtimes,
+    # and the connections they hold, don't live as long as the plan
+    _prepared: Dict[int, Tuple[weakref.ref, object]] = field(default_factory=dict, init=False, repr=False, compare=False)
+    # reentrant: a runtime may die, see _forget, while the thread holding it prepares for another
+    _lock: threading.RLock = field(default_factory=threading.RLock, init=False, repr=False, compare=False)
+
+    def prepared_for(self, runtime: Runtime) -> object:
+        # the clauses as compiled by the runtime, see Runtime.prepare: once per runtime for as long as both live
+        entry = self._prepared.get(id(runtime))
+        if entry is None or entry[0]() is not runtime:
+            with self._lock:
+                entry = self._prepared.get(id(runtime))
+                if entry is None or entry[0]() is not runtime:
+                    # the entry is dropped with the runtime, before its id can be reused by another one
+                    ref = weakref.ref(runtime, functools.partial(_forget, self._prepared, self._lock, id(runtime)))
+                    entry = (ref, runtime.prepare(list(self.clauses)))
+                    self._prepared[id(runtime)] = entry
+        return entry[1]
+
+
+def _forget(prepared: Dict[int, Tuple[weakref.ref, object]], lock: threading.RLock, key: int, ref: weakref.ref) -> None:
+    # called when a runtime dies: its compiled form goes with it, unless another runtime's took its place
+    with lock:
+        if prepared.get(key, (None,))[0] is ref:
+            del prepared[key]
+
+
+class PlanCache(LruCache[Plan]):
+    """
+    A thread-safe, bounded LRU cache of optimized plans.
+
+    Entries are keyed on the clauses, by identity as nodes are interned, and on the name and ordered schema of every
+    table of the Database: a schema changed in place is a new key, and the plan of the old one ages out.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        super().__init__(maxsize)
+
+    @staticmethod
+    def key(clauses: List[Clause], database: Optional[Database]) -> Optional[Hashable]:
+        try:
+            schemas = None if database is None else (database.name, tuple((t.table, tuple(t.columns.items())) for t in database.tables))
+            key = (tuple(clauses), schemas)
+            hash(key)
+        except TypeError:
+            # unhashable column types, don't cache
+            return None
+        return key
@@ -0,0 +1,129 @@
+"""
+The physical properties of the relation each clause outputs: the ordering of its rows, and the sets of columns no two
+of its rows have the same values of. RedundancyElimination uses them to drop the sorts of rows already sorted, the
+sorts whose order nothing reads before the rows are sorted again, and the distincts of rows already distinct.
+"""
+from dataclasses import dataclass
+from typing import FrozenSet, List, Optional, Set, Tuple
+
+from model.metamodel import Clause, FilterClause, ExtendClause, RenameClause, SelectionClause, GroupByClause, \
+    GroupByExpression, DistinctClause, OrderByClause, OrderByExpression, TopClause, LimitClause, OffsetClause, \
+    SliceClause, ColumnReferenceExpression
+from model.schema import Database
+from optimizer.columns import extended_columns, row_local_extension, selected_columns, renamed
+from optimizer.rule import Pass
+
+
+@dataclass(frozen=True)
+class Properties:
+    # the ordering of the rows, or None when they may be in any order
+    ordering: Optional[Tuple[OrderByExpression, ...]] = None
+    # the sets of columns unique among the rows: the empty set when there is at most one row
+    keys: Tuple[FrozenSet[str], ...] = ()
+
+
+UNKNOWN = Properties()
+
+
+def properties_after(clause: Clause, properties: Properties) -> Properties:
+    # the properties of the relation clause outputs, given those of the relation it is applied to
+    if isinstance(clause, (FilterClause, LimitClause, OffsetClause, SliceClause)):
+        return properties
+    if isinstance(clause, (OrderByClause, TopClause)):
+        return Properties(tuple(clause.ordering), properties.keys)
+    if isinstance(clause, ExtendClause):
+        extended = extended_columns(clause)
+        if extended is None:
+            return UNKNOWN
+        keys = tuple(k for k in properties.keys if k.isdisjoint(extended))
+        sorted_by = _columns(properties.ordering)
+        # windows may leave the rows in another order
+        keep = row_local_extension(clause) is not None and sorted_by is not None and sorted_by.isdisjoint(extended)
+        return Properties(properties.ordering if keep else None, keys)
+    if isinstance(clause, SelectionClause):
+        selected = selected_columns(clause.expressions)
+        if selected is None:
+            return UNKNOWN
+        sorted_by = _columns(properties.ordering)
+        keep = sorted_by is not None and sorted_by <= set(selected)
+        return Properties(properties.ordering if keep else None, tuple(k for k in properties.keys if k <= set(selected)))
+    if isinstance(clause, RenameClause):
+        if not all(isinstance(a.reference, ColumnReferenceExpression) for a in clause.columnAliases):
+            return UNKNOWN
+        ordering = properties.ordering
+        if ordering is not None and _columns(ordering) is not None:
+            ordering = tuple(OrderByExpression(o.direction, ColumnReferenceExpression(renamed(clause, o.expression.name))) for o in ordering)
+        return Properties(ordering, tuple(frozenset(renamed(clause, c) for c in k) for k in properties.keys))
+    if isinstance(clause, GroupByClause) and isinstance(clause.expression, GroupByExpression):
+        selections = selected_columns(clause.expression.selections)
+        return UNKNOWN if selections is None else Properties(None, (frozenset(selections),))
+    if isinstance(clause, DistinctClause):
+        selected = selected_columns(clause.expressions)
+        if selected is None:
+            return UNKNOWN
+        return Properties(None, (frozenset(selected),) + tuple(k for k in properties.keys if k <= set(selected)))
+    # joins may repeat rows and leave them in any order
+    return UNKNOWN
+
+
+class RedundancyElimination(Pass):
+    def run(self, clauses: List[Clause], database: Optional[Database]) -> List[Clause]:
+        properties = UNKNOWN
+        result = []
+        for i, clause in enumerate(clauses):
+            if isinstance(clause, OrderByClause):
+                ordering = _trimmed(clause.ordering, properties.keys)
+                if _sorted_by(properties.ordering, ordering) or _overridden(clauses, i):
+                    continue
+                if len(ordering) < len(clause.ordering):
+                    clause = OrderByClause(ordering)
+            elif isinstance(clause, TopClause):
+                ordering = _trimmed(clause.ordering, properties.keys)
+                if _sorted_by(properties.ordering, ordering):
+                    clause = LimitClause(clause.value)
+                elif len(ordering) < len(clause.ordering):
+                    clause = TopClause(ordering, clause.value)
+            elif isinstance(clause, DistinctClause):
+                selected = selected_columns(clause.expressions)
+                if selected is not None and any(k <= set(selected) for k in properties.keys):
+                    # the rows are distinct already, only the selection of the columns is left
+                    clause = SelectionClause(clause.expressions)
+            properties = properties_after(clause, properties)
+            result.append(clause)
+        return result
+
+
+def _columns(ordering: Optional[Tuple[OrderByExpression, ...]]) -> Optional[Set[str]]:
+    # the columns the rows are sorted by, or None when not sorted by columns
+    if ordering is None or not all(isinstance(o, OrderByExpression) and isinstance(o.expression, ColumnReferenceExpression) for o in ordering):
+        return None
+    return {o.expression.name for o in ordering}
+
+
+def _sorted_by(ordering: Optional[Tuple[OrderByExpression, ...]], then: List[OrderByExpression]) -> bool:
+    # rows sorted by a, b are sorted by a
+    return ordering is not None and len(then) <= len(ordering) and list(ordering[:len(then)]) == list(then)
+
+
+def _trimmed(ordering: List[OrderByExpression], keys: Tuple[FrozenSet[str], ...]) -> List[OrderByExpression]:
+    # the ordering up to the first of its prefixes that is unique: no two rows are then ordered by what follows
+    seen = set()
+    for n, order in enumerate(ordering):
+        if not isinstance(order, OrderByExpression) or not isinstance(order.expression, ColumnReferenceExpression):
+            return ordering
+        seen.add(order.expression.name)
+        if any(k <= seen for k in keys):
+            return ordering[:n + 1]
+    return ordering
+
+
+def _overridden(clauses: List[Clause], i: int) -> bool:
+    # whether the rows clauses[i] sorts are sorted again before anything reads their order
+    for clause in clauses[i + 1:]:
+        if isinstance(clause, (OrderByClause, TopClause)):
+            return True
+        if isinstance(clause, ExtendClause) and row_local_extension(clause) is not None:
+            continue
+        if not isinstance(clause, (FilterClause, SelectionClause, RenameClause)):
+            return False
+    return False
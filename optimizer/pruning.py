@@ -0,0 +1,134 @@
+"""
+Projection pruning: a pass from the last clause back to the first that keeps track of the columns still read after
+each clause, drops the extended columns nothing reads and selects the columns read right after the FromClause and
+after each join, so that the engine reads and moves no other column.
+"""
+from typing import List, Optional, Set, Tuple
+
+from model.metamodel import Node, Clause, FromClause, FilterClause, ExtendClause, RenameClause, SelectionClause, \
+    GroupByClause, GroupByExpression, JoinClause, JoinExpression, DistinctClause, OrderByClause, LimitClause, \
+    OffsetClause, SliceClause, TopClause, LambdaExpression, ColumnAliasExpression, ColumnReferenceExpression, \
+    VariableAliasExpression, ComputedColumnAliasExpression
+from model.schema import Database
+from optimizer.columns import Columns, output_columns, read_columns, selected_columns, table_columns, \
+    join_projection
+from optimizer.rule import Pass
+
+# the columns read after a clause, or None when all of them may be
+Live = Optional[Set[str]]
+
+
+class ProjectionPruning(Pass):
+    def run(self, clauses: List[Clause], database: Optional[Database]) -> List[Clause]:
+        # inputs[i]: the columns of the relation clauses[i] is applied to, inputs[-1] those of the query
+        inputs: List[Columns] = [None]
+        for clause in clauses:
+            inputs.append(output_columns(clause, inputs[-1], database))
+
+        live: Live = None if inputs[-1] is None else set(inputs[-1])
+        pruned: List[Clause] = []
+        for i in range(len(clauses) - 1, -1, -1):
+            clause = clauses[i]
+            if isinstance(clause, (FromClause, JoinClause)) and not (pruned and isinstance(pruned[-1], SelectionClause)):
+                selection = _selection(inputs[i + 1], live)
+                if selection is not None:
+                    pruned.append(selection)
+            clause, live = _prune(clause, live, inputs[i], database)
+            if clause is not None:
+                pruned.append(clause)
+        pruned.reverse()
+        return pruned
+
+
+def _selection(columns: Columns, live: Live) -> Optional[SelectionClause]:
+    # the selection of the live columns, when there are fewer of them than columns
+    if columns is None or live is None:
+        return None
+    kept = [c for c in columns if c in live]
+    if not kept or len(kept) == len(columns):
+        return None
+    return SelectionClause([ColumnReferenceExpression(c) for c in kept])
+
+
+def _prune(clause: Clause, live: Live, columns: Columns, database: Optional[Database]) -> Tuple[Optional[Clause], Live]:
+    # the clause without what nothing reads, or None when nothing reads any of it, and the columns read before it
+    if isinstance(clause, (LimitClause, OffsetClause, SliceClause)):
+        return clause, live
+    if isinstance(clause, (SelectionClause, DistinctClause)):
+        selected = selected_columns(clause.expressions)
+        return clause, set(selected) if selected is not None else read_columns(clause.expressions)
+    if isinstance(clause, GroupByClause) and isinstance(clause.expression, GroupByExpression):
+        # the rows are grouped by the selections and aggregated: nothing else of them is read, whatever is read after
+        return clause, read_columns([clause.expression.selections, clause.expression.expressions])
+    if live is None:
+        return clause, None
+    if isinstance(clause, (FilterClause, OrderByClause, TopClause)):
+        return clause, _union(live, read_columns(clause))
+    if isinstance(clause, ExtendClause):
+        return _prune_extend(clause, live)
+    if isinstance(clause, RenameClause):
+        if not all(isinstance(a.reference, ColumnReferenceExpression) for a in clause.columnAliases):
+            return clause, None
+        before = set(live)
+        for alias in reversed(clause.columnAliases):
+            # the columns renamed must be there to be renamed, read afterwards or not
+            before.discard(alias.alias)
+            before.add(alias.reference.name)
+        return clause, before
+    if isinstance(clause, JoinClause):
+        right = table_columns(clause.from_clause, database)
+        if columns is None or right is None or join_projection(clause):
+            return clause, None
+        read = _left_columns(clause.on_clause.on if isinstance(clause.on_clause, JoinExpression) else clause.on_clause)
+        return clause, None if read is None else (live | read) & set(columns)
+    return clause, None
+
+
+def _prune_extend(clause: ExtendClause, live: Set[str]) -> Tuple[Optional[Clause], Live]:
+    if not all(isinstance(e, ComputedColumnAliasExpression) for e in clause.expressions):
+        return clause, _union(live, read_columns(clause.expressions))
+    # the extended columns may read the ones extended before them, so they are looked at last to first
+    needed = set(live)
+    kept = []
+    for expression in reversed(clause.expressions):
+        if expression.alias not in needed:
+            continue
+        read = read_columns(expression.expression)
+        if read is None:
+            return clause, None
+        needed.discard(expression.alias)
+        needed |= read
+        kept.append(expression)
+    kept.reverse()
+    if not kept:
+        return None, live
+    return clause if len(kept) == len(clause.expressions) else ExtendClause(kept), needed
+
+
+def _left_columns(on: LambdaExpression) -> Live:
+    # the columns a join condition reads of its left row, telling them from the columns of the right row of same name
+    if len(on.parameters) != 2:
+        return None
+    left, right = on.parameters
+    columns = set()
+    pending = [on.expression]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, ColumnAliasExpression) and node.alias in (left, right):
+            if not isinstance(node.reference, ColumnReferenceExpression):
+                return None
+            if node.alias == left:
+                columns.add(node.reference.name)
+        elif isinstance(node, ColumnReferenceExpression):
+            columns.add(node.name)
+        elif isinstance(node, VariableAliasExpression):
+            return None
+        elif isinstance(node, list):
+            pending.extend(node)
+        elif isinstance(node, Node):
+            pending.extend(node._values())
+    return columns
+
+
+def _union(live: Live, read: Live) -> Live:
+    return None if live is None or read is None else live | read
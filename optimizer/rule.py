@@ -0,0 +1,39 @@
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple, Type
+
+from model.metamodel import Clause
+from model.schema import Database
+from optimizer.columns import Columns
+
+
+class Rule(ABC):
+    # the number of consecutive clauses the rule looks at
+    span: int = 2
+    # the types of the first of them the rule may apply to
+    first: Tuple[Type[Clause], ...] = (Clause,)
+    # whether the rule reads the columns of its input, which are None when it doesn't
+    reads_columns: bool = False
+
+    @property
+    def name(self) -> str:
+        return type(self).__name__
+
+    @abstractmethod
+    def apply(self, clauses: Tuple[Clause, ...], columns: Columns, database: Optional[Database]) -> Optional[List[Clause]]:
+        """
+        The clauses that replace the span clauses given, whose input has the columns given, or None when the rule
+        does not apply to them.
+        """
+        pass
+
+
+class Pass(ABC):
+    # a rewrite of the clause list as a whole, run once the rules no longer apply
+
+    @property
+    def name(self) -> str:
+        return type(self).__name__
+
+    @abstractmethod
+    def run(self, clauses: List[Clause], database: Optional[Database]) -> List[Clause]:
+        pass
@@ -0,0 +1,192 @@
+"""
+The logical rewrites of the default Optimizer. Each returns the same rows as the clauses it replaces, and applies only
+when it can tell so from the columns of the clauses.
+"""
+from typing import List, Optional, Tuple
+
+from model.metamodel import Node, Clause, FilterClause, ExtendClause, RenameClause, JoinClause, SelectionClause, \
+    LimitClause, OffsetClause, SliceClause, OrderByClause, TopClause, IntegerLiteral, LambdaExpression, \
+    BinaryExpression, OperandExpression, AndBinaryOperator, ColumnAliasExpression, \
+    ColumnReferenceExpression, VariableAliasExpression
+from model.schema import Database
+from optimizer.columns import Columns, filter_columns, row_local_extension, table_columns, \
+    join_projection, selected_columns, referenced_columns, rewrite
+from optimizer.rule import Rule
+
+
+class MergeFilters(Rule):
+    # filter(a)->filter(b) is filter(a and b)
+    first = (FilterClause,)
+
+    def apply(self, clauses: Tuple[Clause, ...], columns: Columns, database: Optional[Database]) -> Optional[List[Clause]]:
+        first, second = clauses
+        if not isinstance(first, FilterClause) or not isinstance(second, FilterClause):
+            return None
+        read, then_read = filter_columns(first), filter_columns(second)
+        if read is None or then_read is None:
+            return None
+        left, right = first.expression, second.expression
+        row = left.parameters[0]
+        body = right.expression
+        if right.parameters[0] != row:
+            body = _rename_row(body, right.parameters[0], row)
+            if body is None:
+                return None
+        merged = LambdaExpression([row], BinaryExpression(OperandExpression(left.expression), OperandExpression(body), AndBinaryOperator()))
+        # it reads the columns both read, which saves walking filters merged again and again
+        referenced_columns.prime(merged, read | then_read)
+        return [FilterClause(merged)]
+
+
+class PushFilterBelowExtend(Rule):
+    # extend(c)->filter(f) is filter(f)->extend(c) when f doesn't read c, and c of each row depends on the row only
+    first = (ExtendClause,)
+
+    def apply(self, clauses: Tuple[Clause, ...], columns: Columns, database: Optional[Database]) -> Optional[List[Clause]]:
+        extend, filter_ = clauses
+        if not isinstance(extend, ExtendClause) or not isinstance(filter_, FilterClause):
+            return None
+        read, extended = filter_columns(filter_), row_local_extension(extend)
+        if read is None or extended is None or not read.isdisjoint(extended):
+            return None
+        return [filter_, extend]
+
+
+class PushFilterBelowRename(Rule):
+    # rename(~a, ~b)->filter($r.b) is filter($r.a)->rename(~a, ~b)
+    first = (RenameClause,)
+
+    def apply(self, clauses: Tuple[Clause, ...], columns: Columns, database: Optional[Database]) -> Optional[List[Clause]]:
+        rename, filter_ = clauses
+        if not isinstance(rename, RenameClause) or not isinstance(filter_, FilterClause):
+            return None
+        if filter_columns(filter_) is None or not all(isinstance(a.reference, ColumnReferenceExpression) for a in rename.columnAliases):
+            return None
+
+        def original(name: str) -> str:
+            for alias in reversed(rename.columnAliases):
+                if alias.alias == name:
+                    name = alias.reference.name
+            return name
+
+        def replace(node: Node) -> Optional[Node]:
+            if isinstance(node, ColumnReferenceExpression):
+                return ColumnReferenceExpression(original(node.name))
+            return None
+
+        return [FilterClause(rewrite(filter_.expression, replace)), rename]
+
+
+class PushFilterBelowJoin(Rule):
+    # join(t, ..)->filter(f) is filter(f)->join(t, ..) when f reads columns of the left relation only
+    first = (JoinClause,)
+    reads_columns = True
+
+    def apply(self, clauses: Tuple[Clause, ...], columns: Columns, database: Optional[Database]) -> Optional[List[Clause]]:
+        join, filter_ = clauses
+        if not isinstance(join, JoinClause) or not isinstance(filter_, FilterClause) or join_projection(join):
+            return None
+        read, right = filter_columns(filter_), table_columns(join.from_clause, database)
+        if read is None or columns is None or right is None:
+            return None
+        if not read <= set(columns) or not read.isdisjoint(right):
+            return None
+        return [filter_, join]
+
+
+class FoldLimits(Rule):
+    # consecutive limits, offsets and slices are one slice of rows: drop(10)->limit(5) is slice(10, 15)
+    first = (LimitClause, OffsetClause, SliceClause,)
+
+    def apply(self, clauses: Tuple[Clause, ...], columns: Columns, database: Optional[Database]) -> Optional[List[Clause]]:
+        first, second = map(_rows, clauses)
+        if first is None or second is None:
+            return None
+        (start, stop), (then_start, then_stop) = first, second
+        new_start, new_stop = start + then_start, None if then_stop is None else start + then_stop
+        if stop is not None:
+            new_start = min(new_start, stop)
+            new_stop = stop if new_stop is None else min(new_stop, stop)
+
+        if new_stop is None:
+            return [OffsetClause(IntegerLiteral(new_start))]
+        if new_start == 0:
+            return [LimitClause(IntegerLiteral(new_stop))]
+        return [SliceClause(IntegerLiteral(new_start), IntegerLiteral(new_stop))]
+
+
+class FuseTopN(Rule):
+    # sort(o)->limit(n) is top(o, n), which engines with a top-N operation run keeping n rows rather than sorting all,
+    # and sort(o)->slice(a, b) is top(o, b)->drop(a)
+    first = (OrderByClause, TopClause)
+
+    def apply(self, clauses: Tuple[Clause, ...], columns: Columns, database: Optional[Database]) -> Optional[List[Clause]]:
+        sort, rows = clauses[0], _rows(clauses[1])
+        if rows is None or rows[1] is None:
+            return None
+        start, stop = rows
+        if isinstance(sort, TopClause):
+            if not _is_int(sort.value):
+                return None
+            stop = min(stop, sort.value.val)
+        top = TopClause(sort.ordering, IntegerLiteral(stop))
+        return [top] if start == 0 else [top, OffsetClause(IntegerLiteral(start))]
+
+
+class DropNoOpSelection(Rule):
+    # a selection of all the columns, in order, selects nothing
+    span = 1
+    first = (SelectionClause,)
+    reads_columns = True
+
+    def apply(self, clauses: Tuple[Clause, ...], columns: Columns, database: Optional[Database]) -> Optional[List[Clause]]:
+        selection, = clauses
+        if not isinstance(selection, SelectionClause) or columns is None:
+            return None
+        return [] if selected_columns(selection.expressions) == columns else None
+
+
+class MergeSelections(Rule):
+    # select(~[a, b])->select(~[b]) is select(~[b])
+    first = (SelectionClause,)
+
+    def apply(self, clauses: Tuple[Clause, ...], columns: Columns, database: Optional[Database]) -> Optional[List[Clause]]:
+        first, second = clauses
+        if not isinstance(first, SelectionClause) or not isinstance(second, SelectionClause):
+            return None
+        selected, then_selected = selected_columns(first.expressions), selected_columns(second.expressions)
+        if selected is None or then_selected is None or not set(then_selected) <= set(selected):
+            return None
+        return [second]
+
+
+def _rows(clause: Clause) -> Optional[Tuple[int, Optional[int]]]:
+    # the rows a limit, offset or slice keeps: from start up to stop, or to the end when stop is None
+    if isinstance(clause, LimitClause) and _is_int(clause.value):
+        return 0, clause.value.val
+    if isinstance(clause, OffsetClause) and _is_int(clause.value):
+        return clause.value.val, None
+    if isinstance(clause, SliceClause) and _is_int(clause.start) and _is_int(clause.stop):
+        return clause.start.val, clause.stop.val
+    return None
+
+
+def _is_int(literal: object) -> bool:
+    return isinstance(literal, IntegerLiteral) and type(literal.val) is int and literal.val >= 0
+
+
+def _rename_row(expression: object, name: str, new_name: str) -> Optional[object]:
+    # the expression reading the row new_name instead of name, or None when it already uses new_name for another value
+    clash = []
+
+    def replace(node: Node) -> Optional[Node]:
+        if isinstance(node, (ColumnAliasExpression, VariableAliasExpression)) and node.alias == new_name:
+            clash.append(node)
+        elif isinstance(node, ColumnAliasExpression) and node.alias == name:
+            return ColumnAliasExpression(new_name, node.reference)
+        elif isinstance(node, VariableAliasExpression) and node.alias == name:
+            return VariableAliasExpression(new_name)
+        return None
+
+    renamed = rewrite(expression, replace)
+    return None if clash else renamed
@@ -0,0 +1,280 @@
+"""
+Simplification of the expressions of filters and extends: sub-expressions of literals only are folded to a literal,
+boolean logic with literals is reduced, and the conditions the conjuncts of a filter put on each column are checked
+against each other, so that a filter no row can pass is the filter false, and a query with one is known to be empty.
+Bounds are only moved by one, x > 5 being x >= 6, on the columns the Database declares of integers or of dates.
+"""
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple, Type
+
+from model.metamodel import Node, Clause, Expression, FilterClause, ExtendClause, GroupByClause, GroupByExpression, \
+    LambdaExpression, BinaryExpression, UnaryExpression, OperandExpression, IfExpression, LiteralExpression, Literal, \
+    IntegerLiteral, StringLiteral, DateLiteral, BooleanLiteral, ColumnAliasExpression, ColumnReferenceExpression, \
+    ComputedColumnAliasExpression, NotUnaryOperator, AndBinaryOperator, OrBinaryOperator, EqualsBinaryOperator, \
+    NotEqualsBinaryOperator, GreaterThanBinaryOperator, GreaterThanEqualsBinaryOperator, LessThanBinaryOperator, \
+    LessThanEqualsBinaryOperator, AddBinaryOperator, SubtractBinaryOperator, MultiplyBinaryOperator
+from model.schema import Database
+from optimizer.columns import column_types, rewrite
+from optimizer.rule import Pass
+
+TRUE = LiteralExpression(BooleanLiteral(True))
+FALSE = LiteralExpression(BooleanLiteral(False))
+
+# the comparison with its operands swapped, and the comparison that is its negation
+_SWAPPED = {EqualsBinaryOperator: EqualsBinaryOperator, NotEqualsBinaryOperator: NotEqualsBinaryOperator,
+            GreaterThanBinaryOperator: LessThanBinaryOperator, LessThanBinaryOperator: GreaterThanBinaryOperator,
+            GreaterThanEqualsBinaryOperator: LessThanEqualsBinaryOperator,
+            LessThanEqualsBinaryOperator: GreaterThanEqualsBinaryOperator}
+_NEGATED = {EqualsBinaryOperator: NotEqualsBinaryOperator, NotEqualsBinaryOperator: EqualsBinaryOperator,
+            GreaterThanBinaryOperator: LessThanEqualsBinaryOperator, LessThanEqualsBinaryOperator: GreaterThanBinaryOperator,
+            LessThanBinaryOperator: GreaterThanEqualsBinaryOperator, GreaterThanEqualsBinaryOperator: LessThanBinaryOperator}
+
+_COMPARISONS = {EqualsBinaryOperator: lambda a, b: a == b, NotEqualsBinaryOperator: lambda a, b: a != b,
+                GreaterThanBinaryOperator: lambda a, b: a > b, GreaterThanEqualsBinaryOperator: lambda a, b: a >= b,
+                LessThanBinaryOperator: lambda a, b: a < b, LessThanEqualsBinaryOperator: lambda a, b: a <= b}
+_ARITHMETIC = {AddBinaryOperator: lambda a, b: a + b, SubtractBinaryOperator: lambda a, b: a - b,
+               MultiplyBinaryOperator: lambda a, b: a * b}
+
+# the values databases order the way Python does, by day for dates: strings are ordered by their collation
+_ORDERED = (int, date)
+# the column types without values between two consecutive integers, or days: a datetime is a date, and is not one
+_DISCRETE = (int, date)
+_INT64 = (-2 ** 63, 2 ** 63 - 1)
+_FOLDED = frozenset({BinaryExpression, UnaryExpression, IfExpression})
+
+
+class Simplification(Pass):
+    def run(self, clauses: List[Clause], database: Optional[Database]) -> List[Clause]:
+        simplified = []
+        for i, clause in enumerate(clauses):
+            if isinstance(clause, FilterClause) and _is_lambda(clause.expression):
+                types = column_types(clauses[:i], database) if i else None
+                condition = simplify_condition(clause.expression.expression, clause.expression.parameters[0], types)
+                if condition == TRUE:
+                    continue
+                if condition is not clause.expression.expression:
+                    clause = FilterClause(LambdaExpression(clause.expression.parameters, condition))
+            elif isinstance(clause, ExtendClause):
+                expressions = [_simplify_extension(e) for e in clause.expressions]
+                if any(e is not o for e, o in zip(expressions, clause.expressions)):
+                    clause = ExtendClause(expressions)
+            simplified.append(clause)
+        return simplified
+
+
+def simplify(expression: Expression) -> Expression:
+    # the expression with its literal sub-expressions folded, the expression itself when there are none
+    return rewrite(expression, lambda node: None, _fold)
+
+
+def simplify_condition(condition: Expression, row: str, types: Optional[Dict[str, Optional[Type]]] = None) -> Expression:
+    # the condition on the row simplified, FALSE when no row can satisfy it; types: those of the columns of the row
+    condition = simplify(condition)
+    return FALSE if _contradicts(_conjuncts(condition), row, types or {}) else condition
+
+
+def proves_empty(clauses: List[Clause]) -> bool:
+    # whether the clauses return no rows whatever the tables hold: a filter false, and no aggregate of all rows after it
+    for i, clause in enumerate(clauses):
+        if isinstance(clause, FilterClause) and isinstance(clause.expression, LambdaExpression) and clause.expression.expression == FALSE:
+            return not any(isinstance(c, GroupByClause) and not (isinstance(c.expression, GroupByExpression) and c.expression.selections)
+                           for c in clauses[i + 1:])
+    return False
+
+
+def _is_lambda(expression: Expression) -> bool:
+    return isinstance(expression, LambdaExpression) and len(expression.parameters) == 1 and not isinstance(expression.expression, list)
+
+
+def _simplify_extension(expression: Expression) -> Expression:
+    if isinstance(expression, ComputedColumnAliasExpression) and isinstance(expression.expression, LambdaExpression):
+        body = simplify(expression.expression.expression)
+        if body is not expression.expression.expression:
+            return ComputedColumnAliasExpression(expression.alias, LambdaExpression(expression.expression.parameters, body))
+    return expression
+
+
+def _fold(node: Node) -> Node:
+    # called on every node of the expressions simplified: most are none of those folded
+    if type(node) not in _FOLDED:
+        return node
+    if isinstance(node, BinaryExpression):
+        return _fold_binary(node)
+    if isinstance(node, UnaryExpression) and isinstance(node.operator, NotUnaryOperator):
+        operand = node.expression.expression
+        value = _value(operand)
+        if type(value) is bool:
+            return _literal(not value)
+        if isinstance(operand, UnaryExpression) and isinstance(operand.operator, NotUnaryOperator):
+            return operand.expression.expression
+        if isinstance(operand, BinaryExpression) and type(operand.operator) in _NEGATED:
+            return BinaryExpression(operand.left, operand.right, _NEGATED[type(operand.operator)]())
+        return node
+    if isinstance(node, IfExpression):
+        test = _value(node.test)
+        return node if type(test) is not bool else node.body if test else node.orelse
+    return node
+
+
+def _fold_binary(node: BinaryExpression) -> Expression:
+    left, right = node.left.expression, node.right.expression
+    a, b = _value(left), _value(right)
+    if isinstance(node.operator, (AndBinaryOperator, OrBinaryOperator)):
+        # x and false is false, x and true is x, x or true is true, x or false is x, unknown values of x included
+        absorbing = isinstance(node.operator, OrBinaryOperator)
+        if a is absorbing or b is absorbing:
+            return _literal(absorbing)
+        if a is not absorbing and type(a) is bool:
+            return right
+        if b is not absorbing and type(b) is bool:
+            return left
+        return node
+    if a is None or b is None or type(a) is not type(b):
+        return node
+    operator = type(node.operator)
+    if operator in _COMPARISONS and (operator in (EqualsBinaryOperator, NotEqualsBinaryOperator) or type(a) in _ORDERED):
+        return _literal(_COMPARISONS[operator](a, b))
+    if operator in _ARITHMETIC and (type(a) is int or (operator is AddBinaryOperator and type(a) is str)):
+        value = _ARITHMETIC[operator](a, b)
+        # out of range of 64 bits the database raises an error, that folding would hide
+        if type(value) is int and not _INT64[0] <= value <= _INT64[1]:
+            return node
+        return _literal(value)
+    return node
+
+
+def _value(expression: Expression) -> object:
+    # the value of a literal expression, or None
+    if isinstance(expression, OperandExpression):
+        expression = expression.expression
+    if not isinstance(expression, LiteralExpression) or not isinstance(expression.literal, Literal):
+        return None
+    literal = expression.literal
+    if isinstance(literal, BooleanLiteral):
+        return literal.val if type(literal.val) is bool else None
+    if isinstance(literal, IntegerLiteral):
+        return literal.val if type(literal.val) is int else None
+    if isinstance(literal, (StringLiteral, DateLiteral)):
+        return literal.val
+    return None
+
+
+def _literal(value: object) -> LiteralExpression:
+    if type(value) is bool:
+        return TRUE if value else FALSE
+    if type(value) is int:
+        return LiteralExpression(IntegerLiteral(value))
+    if isinstance(value, str):
+        return LiteralExpression(StringLiteral(value))
+    return LiteralExpression(DateLiteral(value))
+
+
+def _conjuncts(condition: Expression) -> List[Expression]:
+    # the conditions of a conjunction, iteratively: merged filters are long chains of ands
+    conjuncts, pending = [], [condition]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, OperandExpression):
+            pending.append(node.expression)
+        elif isinstance(node, BinaryExpression) and isinstance(node.operator, AndBinaryOperator):
+            pending.extend([node.right, node.left])
+        else:
+            conjuncts.append(node)
+    return conjuncts
+
+
+def _contradicts(conjuncts: List[Expression], row: str, types: Dict[str, Optional[Type]]) -> bool:
+    # whether the comparisons of columns of the row with literals among the conjuncts can't all hold
+    conditions: Dict[str, List[Tuple[type, object]]] = {}
+    for conjunct in conjuncts:
+        if conjunct == FALSE:
+            return True
+        condition = _comparison(conjunct, row)
+        if condition is not None:
+            column, operator, value = condition
+            conditions.setdefault(column, []).append((operator, value))
+    return any(_unsatisfiable(c, types.get(column)) for column, c in conditions.items())
+
+
+def _comparison(expression: Expression, row: str) -> Optional[Tuple[str, type, object]]:
+    # $row.column <op> literal, or literal <op> $row.column, as (column, op, value)
+    if not isinstance(expression, BinaryExpression) or type(expression.operator) not in _SWAPPED:
+        return None
+    operator = type(expression.operator)
+    left, right = expression.left.expression, expression.right.expression
+    if _value(left) is not None:
+        left, right, operator = right, left, _SWAPPED[operator]
+    value = _value(right)
+    if value is None or not isinstance(left, ColumnAliasExpression) or left.alias != row:
+        return None
+    if not isinstance(left.reference, ColumnReferenceExpression):
+        return None
+    return left.reference.name, operator, value
+
+
+def _unsatisfiable(conditions: List[Tuple[type, object]], column_type: Optional[Type]) -> bool:
+    # whether no value of the column satisfies all the comparisons with literals
+    if len({type(value) for _, value in conditions}) != 1:
+        return False
+    values = [value for _, value in conditions]
+    ordered = type(values[0]) in _ORDERED
+    # bounds excluded are made included on integer and date columns; on others, a float or a datetime, they stay
+    # excluded: 5 < x < 6 holds for 5.5
+    discrete = column_type in _DISCRETE and column_type is type(values[0])
+    # the least and the greatest value allowed, each with whether it is excluded
+    lowest: Optional[Tuple[object, bool]] = None
+    highest: Optional[Tuple[object, bool]] = None
+    equal, different = set(), set()
+    for operator, value in conditions:
+        if operator is EqualsBinaryOperator:
+            equal.add(value)
+        elif operator is NotEqualsBinaryOperator:
+            different.add(value)
+        elif not ordered:
+            continue
+        elif operator in (GreaterThanBinaryOperator, GreaterThanEqualsBinaryOperator):
+            bound = _bound(value, operator is GreaterThanBinaryOperator, _next if discrete else None)
+            # the greater bound, or the excluded one of two equal bounds
+            lowest = bound if lowest is None else max(lowest, bound)
+        else:
+            bound = _bound(value, operator is LessThanBinaryOperator, _previous if discrete else None)
+            highest = bound if highest is None else min(highest, bound, key=lambda b: (b[0], not b[1]))
+    if len(equal) > 1:
+        return True
+    if equal:
+        value, = equal
+        return value in different or not _within(value, lowest, highest)
+    if lowest is not None and highest is not None:
+        if lowest[0] == highest[0]:
+            return lowest[1] or highest[1] or lowest[0] in different
+        return lowest[0] > highest[0]
+    return False
+
+
+def _bound(value: object, excluded: bool, step) -> Tuple[object, bool]:
+    # the bound, made included by a step to the next value in its direction when there is one
+    if excluded and step is not None:
+        moved = step(value)
+        if moved != value:
+            return moved, False
+    return value, excluded
+
+
+def _within(value: object, lowest: Optional[Tuple[object, bool]], highest: Optional[Tuple[object, bool]]) -> bool:
+    if lowest is not None and (value < lowest[0] or (value == lowest[0] and lowest[1])):
+        return False
+    return highest is None or not (value > highest[0] or (value == highest[0] and highest[1]))
+
+
+def _next(value: object) -> object:
+    try:
+        return value + (timedelta(days=1) if isinstance(value, date) else 1)
+    except OverflowError:
+        return value
+
+
+def _previous(value: object) -> object:
+    try:
+        return value - (timedelta(days=1) if isinstance(value, date) else 1)
+    except OverflowError:
+        return value
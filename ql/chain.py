@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List, Optional
+
+from model import fingerprint
+from model.metamodel import Clause
+
+
+@dataclass(frozen=True, slots=True)
+class ClauseChain:
+    """
+    An immutable clause list, linked from its last clause back to its first: appending a clause builds one link and
+    shares every clause before it, so any number of queries can grow from a common prefix without copying it.
+    """
+    clause: Clause
+    previous: Optional[ClauseChain]
+    length: int
+    # fingerprint.of_clauses(self.clauses()), built up link by link
+    fingerprint: bytes
+
+    @classmethod
+    def of(cls, clauses: List[Clause]) -> Optional[ClauseChain]:
+        chain = None
+        for clause in clauses:
+            chain = ClauseChain.append_to(chain, clause)
+        return chain
+
+    @staticmethod
+    def append_to(chain: Optional[ClauseChain], clause: Clause) -> ClauseChain:
+        if chain is None:
+            return ClauseChain(clause, None, 1, fingerprint.extend(fingerprint.EMPTY, clause))
+        return ClauseChain(clause, chain, chain.length + 1, fingerprint.extend(chain.fingerprint, clause))
+
+    def append(self, clause: Clause) -> ClauseChain:
+        return ClauseChain.append_to(self, clause)
+
+    def clauses(self) -> List[Clause]:
+        clauses = [None] * self.length
+        link = self
+        for i in range(self.length - 1, -1, -1):
+            clauses[i] = link.clause
+            link = link.previous
+        return clauses
@@ -1,29 +1,53 @@
 from __future__ import annotations
 
-from typing import Callable, Type, Dict, List
+from copy import copy
+from typing import Callable, Type, Dict, List, Optional
 
 from dsl import parser
+from dsl.tracer import Tracer
 from model.metamodel import FromClause, OrderByClause, LimitClause, IntegerLiteral, OffsetClause, RenameClause, \
     LeftJoinType, InnerJoinType, Runtime, DataFrame
 from dsl.parser import ParseType
 from model.metamodel import SelectionClause, ExtendClause, FilterClause, GroupByClause, JoinClause, JoinType, Clause
 from model.schema import Table, Database
+from ql.prepared import PreparedQuery
 from ql.rawlegendql import RawLegendQL
 
 
 class LegendQL:
+    # build queries by calling each lambda with proxy rows (dsl.tracer) instead of parsing it, for every query
+    tracing: bool = False
+    # each call returns a new query sharing the clauses of this one, which stays as it is, so that any number of
+    # queries can be forked from a common prefix in O(1) and without parsing it again
+    persistent: bool = False
     _internal: RawLegendQL
 
-    def __init__(self, database: Database, table: Table):
-        self._internal = RawLegendQL.from_table(database, table)
+    def __init__(self, database: Database, table: Table, tracing: Optional[bool] = None, persistent: Optional[bool] = None):
+        if tracing is not None:
+            self.tracing = tracing
+        if persistent is not None:
+            self.persistent = persistent
+        self._internal = RawLegendQL.from_table(database, table, self.persistent)
 
     @classmethod
-    def from_table(cls, database: Database, table: Table) -> LegendQL:
-        return LegendQL(database, table)
+    def from_table(cls, database: Database, table: Table, tracing: Optional[bool] = None, persistent: Optional[bool] = None) -> LegendQL:
+        return LegendQL(database, table, tracing, persistent)
 
     @classmethod
-    def from_db(cls, database: Database, table: str, columns: Dict[str, Type]) -> LegendQL:
-        return LegendQL.from_table(database, Table(table, columns))
+    def from_db(cls, database: Database, table: str, columns: Dict[str, Type], tracing: Optional[bool] = None, persistent: Optional[bool] = None) -> LegendQL:
+        return LegendQL.from_table(database, Table(table, columns), tracing, persistent)
+
+    def _parse(self, internal: RawLegendQL, func: Callable, tables: List[Table], ptype: ParseType):
+        expression, table = Tracer.parse(func, tables, ptype) if self.tracing else parser.Parser.parse(func, tables, ptype)
+        return internal._capture(expression, parser.Parser.captured(func)), table
+
+    def _with(self, internal: RawLegendQL) -> LegendQL:
+        # this query, or the new one a persistent query derived internal for
+        if internal is self._internal:
+            return self
+        query = copy(self)
+        query._internal = internal
+        return query
 
     def bind[R: Runtime](self, runtime: R) -> DataFrame:
         return self._internal.bind(runtime)
@@ -31,41 +55,53 @@ class LegendQL:
     def eval[R: Runtime, T](self, runtime: R) -> T:
         return self._internal.eval(runtime)
 
+    def prepare(self) -> PreparedQuery:
+        return self._internal.prepare()
+
+    def fingerprint(self) -> bytes:
+        return self._internal.fingerprint()
+
     def select(self, columns: Callable) -> LegendQL:
-        expression_and_table = parser.Parser.parse(columns, [self._internal._table], ParseType.select)
-        self._internal._add_clause(SelectionClause(expression_and_table[0]))
-        self._internal._update_table(expression_and_table[1])
-        return self
+        internal = self._internal._derive()
+        expression_and_table = self._parse(internal, columns, [internal._table], ParseType.select)
+        internal._add_clause(SelectionClause(expression_and_table[0]))
+        internal._update_table(expression_and_table[1])
+        return self._with(internal)
 
     def extend(self, columns: Callable) -> LegendQL:
-        expression_and_table = parser.Parser.parse(columns, [self._internal._table], ParseType.extend)
-        self._internal._add_clause(ExtendClause(expression_and_table[0]))
-        self._internal._update_table(expression_and_table[1])
-        return self
+        internal = self._internal._derive()
+        expression_and_table = self._parse(internal, columns, [internal._table], ParseType.extend)
+        internal._add_clause(ExtendClause(expression_and_table[0]))
+        internal._update_table(expression_and_table[1])
+        return self._with(internal)
 
     def rename(self, columns: Callable) -> LegendQL:
-        expression_and_table = parser.Parser.parse(columns, [self._internal._table], ParseType.rename)
-        self._internal._add_clause(RenameClause(expression_and_table[0]))
-        self._internal._update_table(expression_and_table[1])
-        return self
+        internal = self._internal._derive()
+        expression_and_table = self._parse(internal, columns, [internal._table], ParseType.rename)
+        internal._add_clause(RenameClause(expression_and_table[0]))
+        internal._update_table(expression_and_table[1])
+        return self._with(internal)
 
     def filter(self, condition: Callable) -> LegendQL:
-        expression_and_table = parser.Parser.parse(condition, [self._internal._table], ParseType.filter)
-        self._internal._add_clause(FilterClause(expression_and_table[0]))
-        self._internal._update_table(expression_and_table[1])
-        return self
+        internal = self._internal._derive()
+        expression_and_table = self._parse(internal, condition, [internal._table], ParseType.filter)
+        internal._add_clause(FilterClause(expression_and_table[0]))
+        internal._update_table(expression_and_table[1])
+        return self._with(internal)
 
     def group_by(self, aggr: Callable) -> LegendQL:
-        expression_and_table = parser.Parser.parse(aggr, [self._internal._table], ParseType.group_by)
-        self._internal._add_clause(GroupByClause(expression_and_table[0]))
-        self._internal._update_table(expression_and_table[1])
-        return self
+        internal = self._internal._derive()
+        expression_and_table = self._parse(internal, aggr, [internal._table], ParseType.group_by)
+        internal._add_clause(GroupByClause(expression_and_table[0]))
+        internal._update_table(expression_and_table[1])
+        return self._with(internal)
 
     def _join(self, lq: LegendQL, join: Callable, join_type: JoinType) -> LegendQL:
-        expression_and_table = parser.Parser.parse(join, [self._internal._table, lq._internal._table], ParseType.join)
-        self._internal._add_clause(JoinClause(FromClause(lq._internal._database.name, lq._internal._table.table), join_type, expression_and_table[0]))
-        self._internal._update_table(expression_and_table[1])
-        return self
+        internal = self._internal._derive()
+        expression_and_table = self._parse(internal, join, [internal._table, lq._internal._table], ParseType.join)
+        internal._add_clause(JoinClause(FromClause(lq._internal._database.name, lq._internal._table.table), join_type, expression_and_table[0]))
+        internal._update_table(expression_and_table[1])
+        return self._with(internal)
 
     def join(self, lq: LegendQL, join: Callable) -> LegendQL:
         return self._join(lq, join, InnerJoinType())
@@ -74,25 +110,29 @@ class LegendQL:
         return self._join(lq, join, LeftJoinType())
 
     def order_by(self, columns: Callable) -> LegendQL:
-        expression_and_table = parser.Parser.parse(columns, [self._internal._table], ParseType.order_by)
-        self._internal._add_clause(OrderByClause(expression_and_table[0]))
-        self._internal._update_table(expression_and_table[1])
-        return self
+        internal = self._internal._derive()
+        expression_and_table = self._parse(internal, columns, [internal._table], ParseType.order_by)
+        internal._add_clause(OrderByClause(expression_and_table[0]))
+        internal._update_table(expression_and_table[1])
+        return self._with(internal)
 
     def limit(self, limit: int) -> LegendQL:
+        internal = self._internal._derive()
         clause = LimitClause(IntegerLiteral(limit))
-        self._internal._add_clause(clause)
-        return self
+        internal._add_clause(clause)
+        return self._with(internal)
 
     def offset(self, offset: int) -> LegendQL:
+        internal = self._internal._derive()
         clause = OffsetClause(IntegerLiteral(offset))
-        self._internal._add_clause(clause)
-        return self
+        internal._add_clause(clause)
+        return self._with(internal)
 
     def take(self, offset: int, limit: int) -> LegendQL:
+        internal = self._internal._derive()
         clause = OffsetClause(IntegerLiteral(offset))
-        self._internal._add_clause(clause)
+        internal._add_clause(clause)
 
         clause = LimitClause(IntegerLiteral(limit))
-        self._internal._add_clause(clause)
-        return self
+        internal._add_clause(clause)
+        return self._with(internal)
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from model.metamodel import Clause, Runtime, ParameterExpression, DataFrame
+from model.parameters import find_parameters, validate_parameters, bind_parameters
+from model.schema import Database
+from optimizer import optimizer
+from optimizer.plans import Plan
+
+
+class PreparedQuery:
+    """
+    A query whose values are supplied late through named ParameterExpressions, e.g. lambda r: r.id > param("min_id").
+
+    Each Runtime compiles the query once, on first use; binding values and evaluating then reuses that compiled form.
+    Parameters for captured variables default to the captured values. The clauses are those of the query as rewritten
+    by the optimizer, unless optimize is False.
+    """
+
+    def __init__(self, clauses: List[Clause], defaults: Dict[str, object] = None, database: Optional[Database] = None,
+                 optimize: bool = True):
+        # the plan, and the forms runtimes compiled it to, are shared with the queries written alike, see optimizer.plans
+        self._plan = optimizer.plan(clauses, database) if optimize else Plan(tuple(clauses), find_parameters(clauses))
+        self.clauses = list(self._plan.clauses)
+        self.parameters: Dict[str, ParameterExpression] = dict(self._plan.parameters)
+        self.defaults = dict(defaults or {})
+
+    def bind(self, **parameters: object) -> BoundQuery:
+        parameters = {**self.defaults, **parameters}
+        validate_parameters(self.parameters, parameters)
+        return BoundQuery(self, parameters)
+
+    def prepared_for(self, runtime: Runtime) -> object:
+        return self._plan.prepared_for(runtime)
+
+
+@dataclass
+class BoundQuery:
+    query: PreparedQuery
+    parameters: Dict[str, object]
+
+    def eval[R: Runtime, T](self, runtime: R) -> T:
+        return runtime.eval_prepared(self.query.prepared_for(runtime), self.parameters)
+
+    async def eval_async[R: Runtime, T](self, runtime: R) -> T:
+        return await runtime.eval_prepared_async(self.query.prepared_for(runtime), self.parameters)
+
+    def bind[R: Runtime](self, runtime: R) -> DataFrame:
+        return DataFrame(runtime, bind_parameters(self.query.clauses, self.parameters), optimize=False)
+
+    def executable_to_string[R: Runtime](self, runtime: R) -> str:
+        return runtime.executable_to_string(bind_parameters(self.query.clauses, self.parameters))
@@ -1,72 +1,128 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, field, replace
 from typing import List, Tuple, Type, Dict
 
 from model.metamodel import SelectionClause, Runtime, DataFrame, FilterClause, ExtendClause, GroupByClause, \
     LimitClause, JoinClause, JoinType, JoinExpression, Clause, FromClause, Expression, IntegerLiteral, \
     GroupByExpression, ColumnReferenceExpression, RenameClause, ColumnAliasExpression, OffsetClause, OrderByExpression, \
     OrderByClause
+from model import fingerprint
+from model.parameters import find_parameters, rename_parameters
 from model.schema import Table, Database
+from ql.chain import ClauseChain
+from ql.prepared import PreparedQuery
 
 
 @dataclass
 class RawLegendQL:
     _database: Database
     _table: Table
-    _clauses: List[Clause]
+    _chain: ClauseChain
+    # values of the ParameterExpressions that stand for variables captured by the lambdas
+    _parameters: Dict[str, object] = field(default_factory=dict)
+    # each call returns a new query sharing this one's clauses, which stays as it is, instead of changing this one
+    _persistent: bool = False
 
     @classmethod
-    def from_table(cls, database: Database, table: Table) -> RawLegendQL:
-        return RawLegendQL(database, Table(table.table, table.columns.copy()), [FromClause(database.name, table.table)])
+    def from_table(cls, database: Database, table: Table, persistent: bool = False) -> RawLegendQL:
+        return RawLegendQL(database, Table(table.table, table.columns.copy()), ClauseChain.of([FromClause(database.name, table.table)]), _persistent=persistent)
 
     @classmethod
-    def from_db(cls, database: Database, table: str, columns: Dict[str, Type]) -> RawLegendQL:
-        return RawLegendQL.from_table(database, Table(table, columns))
+    def from_db(cls, database: Database, table: str, columns: Dict[str, Type], persistent: bool = False) -> RawLegendQL:
+        return RawLegendQL.from_table(database, Table(table, columns), persistent)
+
+    @property
+    def _clauses(self) -> List[Clause]:
+        return self._chain.clauses()
+
+    @property
+    def _fingerprint(self) -> bytes:
+        # fingerprint.of_clauses(self._clauses), extended as each clause is added
+        return self._chain.fingerprint
 
     def bind[R: Runtime](self, runtime: R) -> DataFrame:
-        return DataFrame(runtime, self._clauses)
+        return DataFrame(runtime, self._clauses, self._parameters, self._fingerprint, self._database)
+
+    def fingerprint(self) -> bytes:
+        # stable across processes, see model.fingerprint; DataFrame.fingerprint tells runtimes apart as well
+        return fingerprint.of_query(self._database.name, self._fingerprint, self._parameters)
 
     def eval[R: Runtime, T](self, runtime: R) -> T:
         return self.bind(runtime).eval()
 
+    def prepare(self) -> PreparedQuery:
+        return PreparedQuery(self._clauses, self._parameters, self._database)
+
+    def _derive(self) -> RawLegendQL:
+        # the query the next clause is added to: this one, or when persistent a new one sharing its clauses, with its
+        # own copies of the table and the parameters, which parsing and capturing a lambda add to
+        if not self._persistent:
+            return self
+        return replace(self, _table=Table(self._table.table, self._table.columns.copy()), _parameters=self._parameters.copy())
+
     def _add_clause(self, clause: Clause) -> None:
-        self._clauses.append(clause)
+        self._chain = self._chain.append(clause)
+
+    def _capture[E](self, expression: E, captured: Dict[str, object]) -> E:
+        # a name already standing for another value is renamed, so that each parameter keeps a single value
+        renames = {}
+        for name in find_parameters(expression):
+            if name not in captured:
+                continue
+            value = captured[name]
+            new_name, i = name, 0
+            while new_name in self._parameters and (type(self._parameters[new_name]), self._parameters[new_name]) != (type(value), value):
+                i += 1
+                new_name = f"{name}_{i}"
+            self._parameters[new_name] = value
+            if new_name != name:
+                renames[name] = new_name
+        return rename_parameters(expression, renames) if renames else expression
 
     def _update_table(self, table: Table) -> None:
         self._table = table
 
     def select(self, *names: str) -> RawLegendQL:
-        self._add_clause(SelectionClause(list(map(lambda name: ColumnReferenceExpression(name), names))))
-        return self
+        query = self._derive()
+        query._add_clause(SelectionClause(list(map(lambda name: ColumnReferenceExpression(name), names))))
+        return query
 
     def rename(self, *renames: Tuple[str, str]) -> RawLegendQL:
-        self._add_clause(RenameClause(list(map(lambda rename: ColumnAliasExpression(alias=rename[1], reference=ColumnReferenceExpression(name=rename[0])), renames))))
-        return self
+        query = self._derive()
+        query._add_clause(RenameClause(list(map(lambda rename: ColumnAliasExpression(alias=rename[1], reference=ColumnReferenceExpression(name=rename[0])), renames))))
+        return query
 
     def extend(self, extend: List[Expression]) -> RawLegendQL:
-        self._add_clause(ExtendClause(extend))
-        return self
+        query = self._derive()
+        query._add_clause(ExtendClause(extend))
+        return query
 
     def filter(self, filter_clause: Expression) -> RawLegendQL:
-        self._add_clause(FilterClause(filter_clause))
-        return self
+        query = self._derive()
+        query._add_clause(FilterClause(filter_clause))
+        return query
 
     def group_by(self, selections: List[Expression], group_by: List[Expression], having: Expression = None) -> RawLegendQL:
-        self._add_clause(GroupByClause(GroupByExpression(selections, group_by, having)))
-        return self
+        query = self._derive()
+        query._add_clause(GroupByClause(GroupByExpression(selections, group_by, having)))
+        return query
 
     def limit(self, limit: int) -> RawLegendQL:
-        self._add_clause(LimitClause(IntegerLiteral(limit)))
-        return self
+        query = self._derive()
+        query._add_clause(LimitClause(IntegerLiteral(limit)))
+        return query
 
     def offset(self, offset: int) -> RawLegendQL:
-        self._add_clause(OffsetClause(IntegerLiteral(offset)))
-        return self
+        query = self._derive()
+        query._add_clause(OffsetClause(IntegerLiteral(offset)))
+        return query
 
     def order_by(self, *ordering: OrderByExpression) -> RawLegendQL:
-        self._add_clause(OrderByClause(list(ordering)))
-        return self
+        query = self._derive()
+        query._add_clause(OrderByClause(list(ordering)))
+        return query
 
     def join(self, database: str, table: str, join_type: JoinType, on_clause: Expression) -> RawLegendQL:
-        self._add_clause(JoinClause(FromClause(database, table), join_type, JoinExpression(on_clause)))
-        return self
+        query = self._derive()
+        query._add_clause(JoinClause(FromClause(database, table), join_type, JoinExpression(on_clause)))
+        return query
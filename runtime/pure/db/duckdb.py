@@ -1,9 +1,10 @@
 from dataclasses import dataclass
 from datetime import date
-from typing import Type
+from functools import lru_cache
+from typing import Tuple, Type
 
 from model.schema import Table, Database
-from runtime.pure.executionserver.runtime import DatabaseType
+from runtime.pure.db.type import DatabaseType, element
 
 @dataclass
 class DuckDBDatabaseType(DatabaseType):
@@ -42,19 +43,7 @@ RelationalDatabaseConnection local::DuckDuckConnection
 """
 
     def generate_pure_database(self, database: Database) -> str:
-        columns = []
-        tables = ""
-        for table in database.tables:
-
-            for (col, typ) in table.columns.items():
-                columns.append(f"{col} {self._python_type_to_db_type(typ)}")
-            tables += f"""
-  Table {table.table}
-  (
-    {",\n".join(columns)}
-  )
-  
-"""
+        tables = "".join(_table_text(table.table, tuple(table.columns.items())) for table in database.tables)
         return f"""
 ###Relational
 Database {database.name}
@@ -63,11 +52,57 @@ Database {database.name}
 )
 """
 
-    def _python_type_to_db_type(self, typ: Type):
-        if typ == str:
-            return "VARCHAR(0)"
-        if typ == int:
-            return "BIGINT"
-        if type == date:
-            return "DATE"
-        raise ValueError(f"Unsupported type {typ}")
\ No newline at end of file
+    def generate_runtime_data(self, name: str, database: Database) -> dict:
+        connection = {"id": "connection", "connection": {"_type": "connectionPointer", "connection": "local::DuckDuckConnection"}}
+        runtime = {"_type": "engineRuntime", "mappings": [], "connectionStores": [],
+                   "connections": [{"store": {"type": "STORE", "path": database.name}, "storeConnections": [connection]}]}
+        return element("runtime", name, runtimeValue=runtime)
+
+    def generate_connection_data(self) -> dict:
+        connection = {"_type": "RelationalDatabaseConnection", "type": "DuckDB", "databaseType": "DuckDB", "postProcessors": [],
+                      "datasourceSpecification": {"_type": "duckDB", "path": self.path}, "authenticationStrategy": {"_type": "test"}}
+        return element("connection", "local::DuckDuckConnection", connectionValue=connection)
+
+    def generate_database_data(self, database: Database) -> dict:
+        tables = [_table_data(table.table, tuple(table.columns.items())) for table in database.tables]
+        return element("relational", database.name, includedStores=[], joins=[], filters=[],
+                       schemas=[{"name": "default", "tables": tables, "views": [], "tabularFunctions": []}])
+
+
+# the tables of the models, built once for each schema of a table and shared by the models including it: a catalog of
+# many tables is not generated again for each query, nor for each set of tables queries read
+@lru_cache(maxsize=4096)
+def _table_text(table: str, columns: Tuple[Tuple[str, Type], ...]) -> str:
+    return f"""
+  Table {table}
+  (
+    {",\n".join(f"{col} {_db_type(typ)}" for col, typ in columns)}
+  )
+  
+"""
+
+
+@lru_cache(maxsize=4096)
+def _table_data(table: str, columns: Tuple[Tuple[str, Type], ...]) -> dict:
+    return {"name": table, "primaryKey": [], "milestoning": [],
+            "columns": [{"name": col, "type": _db_type_data(typ), "nullable": True} for col, typ in columns]}
+
+
+def _db_type(typ: Type) -> str:
+    if typ == str:
+        return "VARCHAR(0)"
+    if typ == int:
+        return "BIGINT"
+    if typ == date:
+        return "DATE"
+    raise ValueError(f"Unsupported type {typ}")
+
+
+def _db_type_data(typ: Type) -> dict:
+    if typ == str:
+        return {"_type": "Varchar", "size": 0}
+    if typ == int:
+        return {"_type": "BigInt"}
+    if typ == date:
+        return {"_type": "Date"}
+    raise ValueError(f"Unsupported type {typ}")
@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 from typing import List
 
+from model.metamodel import Clause, FromClause, JoinClause
 from model.schema import Table, Database
 
 
@@ -8,6 +9,11 @@ class DatabaseType(ABC):
     def generate_model(self, runtime: str, database: Database) -> str:
         return f"{self.generate_pure_runtime(runtime, database)}\n\n{self.generate_pure_connection()}\n\n{self.generate_pure_database(database)}"
 
+    def generate_model_data(self, runtime: str, database: Database) -> dict:
+        # the PureModelContextData grammarToJson/model returns for generate_model's text, the runtime first
+        return {"_type": "data", "elements": [self.generate_runtime_data(runtime, database), self.generate_connection_data(),
+                                              self.generate_database_data(database)]}
+
     @abstractmethod
     def generate_pure_runtime(self, name: str, database: Database) -> str:
         pass
@@ -19,3 +25,29 @@ class DatabaseType(ABC):
     @abstractmethod
     def generate_pure_database(self, database: Database) -> str:
         pass
+
+    @abstractmethod
+    def generate_runtime_data(self, name: str, database: Database) -> dict:
+        pass
+
+    @abstractmethod
+    def generate_connection_data(self) -> dict:
+        pass
+
+    @abstractmethod
+    def generate_database_data(self, database: Database) -> dict:
+        pass
+
+
+def element(type_: str, path: str, **values: object) -> dict:
+    # a packageable element of the protocol: local::DuckDuckDatabase is the element DuckDuckDatabase of package local
+    package, _, name = path.rpartition("::")
+    return {"_type": type_, "package": package, "name": name, **values}
+
+
+def referenced_database(database: Database, clauses: List[Clause]) -> Database:
+    # the database with only the tables the clauses read, in the order of the database: the model sent with a query
+    # need not hold the rest of the catalog
+    froms = [c.from_clause if type(c) is JoinClause else c for c in clauses if type(c) in (FromClause, JoinClause)]
+    names = {f.table for f in froms if f.database == database.name}
+    return Database(database.name, [t for t in database.tables if t.table in names])
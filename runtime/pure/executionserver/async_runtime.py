@@ -0,0 +1,104 @@
+"""
+An execution server runtime whose calls to the server are awaited: the Pure, the protocol and the models are made as
+ExecutionServerRuntime makes them, the requests are sent with aiohttp. aiohttp is imported by the first call, it is
+not needed otherwise.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, TYPE_CHECKING
+
+from dialect.purerelation.protocol import to_protocol
+from model.metamodel import Clause, DataFrame
+from runtime.pure.executionserver.runtime import ExecutionServerRuntime, PreparedExecution
+from runtime.pure.executionserver.session import EXECUTION_PATH, GRAMMAR_PATH, RETRIED_STATUSES
+
+if TYPE_CHECKING:
+    import aiohttp
+
+
+async def eval_all(frames: Iterable[DataFrame], return_exceptions: bool = False) -> list:
+    # the results of the frames, in their order, evaluated at once: each runtime limits the calls it makes at a time
+    return await asyncio.gather(*(frame.eval_async() for frame in frames), return_exceptions=return_exceptions)
+
+
+@dataclass
+class AsyncExecutionServerRuntime(ExecutionServerRuntime):
+    # the calls made to the server at once, the others waiting for one to end; None for http.pool_size
+    max_concurrency: Optional[int] = None
+    _client: Optional[aiohttp.ClientSession] = field(default=None, init=False, repr=False, compare=False)
+    _semaphore: Optional[asyncio.Semaphore] = field(default=None, init=False, repr=False, compare=False)
+    _loop: Optional[asyncio.AbstractEventLoop] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.max_concurrency is not None and self.max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be positive, was {self.max_concurrency}")
+
+    async def eval_async(self, clauses: List[Clause]) -> dict:
+        model = self._model(clauses)
+        try:
+            function = to_protocol(clauses, self)
+        except RecursionError:
+            function = await self._parse_lambda_async("|" + self.executable_to_string(clauses))
+        return await self._execute_async(self._input(function, model.runtime, model.pmcd))
+
+    async def eval_prepared_async(self, prepared: PreparedExecution, parameters: Dict[str, object]) -> dict:
+        parameter_types = self._parameter_types(prepared, parameters)
+        signature = tuple(parameter_types.values())
+        if signature not in prepared.functions:
+            prepared.functions[signature] = await self._parse_lambda_async(prepared.template.to_lambda(parameter_types))
+        return await self._execute_async(self._prepared_input(prepared, prepared.functions[signature], parameters))
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+        self.close()
+
+    async def __aenter__(self) -> AsyncExecutionServerRuntime:
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def _parse_lambda_async(self, lam: str) -> dict:
+        return await self._post_async(GRAMMAR_PATH + "grammarToJson/lambda", lam.encode(), None, idempotent=True)
+
+    async def _execute_async(self, input: dict) -> dict:
+        return await self._post_async(EXECUTION_PATH + "execute?serializationFormat=DEFAULT", self._json(input), "application/json", idempotent=False)
+
+    async def _post_async(self, path: str, data: bytes, content_type: Optional[str], idempotent: bool) -> dict:
+        # retried as ExecutionServerRuntime's session retries: whatever failed when idempotent, otherwise only when the
+        # request could not be sent. Cancelling the awaiting task closes the connection of the request.
+        import aiohttp
+        client, semaphore = self._connect()
+        data, headers = self._body(data, content_type)
+        for attempt in range(self.http.retries + 1):
+            last = attempt == self.http.retries
+            try:
+                async with semaphore:
+                    async with client.post(self.host + path, data=data, headers=headers) as response:
+                        if not (idempotent and response.status in RETRIED_STATUSES) or last:
+                            return json.loads(await response.read())
+            except (aiohttp.ClientConnectorError, aiohttp.ConnectionTimeoutError):
+                if last:
+                    raise
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if last or not idempotent:
+                    raise
+            await asyncio.sleep(self.http.backoff * 2 ** attempt)
+
+    def _connect(self) -> tuple[aiohttp.ClientSession, asyncio.Semaphore]:
+        # made on the first call: an aiohttp session can't be used, nor closed, by another loop than its own
+        import aiohttp
+        loop = asyncio.get_running_loop()
+        if self._client is not None and not self._client.closed and self._loop is not loop:
+            raise ValueError("An AsyncExecutionServerRuntime can't be used from another event loop while its session is open: await aclose() first")
+        if self._client is None or self._client.closed:
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.http.connect_timeout, sock_read=self.http.read_timeout)
+            self._client = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.http.pool_size), timeout=timeout)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency or self.http.pool_size)
+            self._loop = loop
+        return self._client, self._semaphore
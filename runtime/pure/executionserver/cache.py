@@ -0,0 +1,43 @@
+"""
+Memoization of the models queries are run with.
+
+The PureModelContextData an ExecutionServerRuntime sends with each query, and the runtime taken from it, only depend
+on the runtime's name, its DatabaseType and the schema of the tables the query reads, so they are generated once and
+shared by every query reading the same tables.
+"""
+from dataclasses import dataclass
+from typing import Hashable, Optional
+
+from model.lru import LruCache
+from model.schema import Database
+
+
+@dataclass(frozen=True)
+class ModelCacheEntry:
+    pmcd: dict
+    runtime: dict
+
+
+class ModelCache(LruCache[ModelCacheEntry]):
+    """
+    A thread-safe, bounded LRU cache of generated models.
+
+    Entries are keyed on the runtime's name, the DatabaseType and the ordered schema of every table the query reads:
+    a schema changed in place is a new key, and the model of the old one ages out. The dicts of an entry are shared by
+    the queries that hit it, and must not be changed.
+    """
+
+    def __init__(self, maxsize: int = 64):
+        super().__init__(maxsize)
+
+    @staticmethod
+    def key(name: str, database_type: object, database: Database) -> Optional[Hashable]:
+        try:
+            schemas = tuple((t.table, tuple(t.columns.items())) for t in database.tables)
+            # the repr of the DatabaseType holds its settings, e.g. the path of a DuckDB database
+            key = (name, repr(database_type), database.name, schemas)
+            hash(key)
+        except TypeError:
+            # unhashable column types, don't cache
+            return None
+        return key
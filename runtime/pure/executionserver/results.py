@@ -0,0 +1,45 @@
+"""
+The tabular results of the execution server as Arrow: the rows of result.rows are turned into one array per column,
+typed by the column types of the tdsBuilder. pyarrow is imported when a result is first converted, it is not needed
+otherwise.
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Sequence, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pyarrow
+
+# the Pure types of the builder's columns whose values are written as strings in the JSON
+_TEMPORAL = {"StrictDate", "Date", "DateTime"}
+
+
+def _arrow_types() -> Dict[str, pyarrow.DataType]:
+    import pyarrow
+    return {"Integer": pyarrow.int64(), "Float": pyarrow.float64(), "Number": pyarrow.float64(),
+            "Decimal": pyarrow.float64(), "String": pyarrow.string(), "Boolean": pyarrow.bool_(),
+            "StrictDate": pyarrow.date32(), "Date": pyarrow.date32(), "DateTime": pyarrow.timestamp("ms")}
+
+
+def record_batch(columns: List[dict], rows: Sequence[Sequence]) -> pyarrow.RecordBatch:
+    # columns are the builder's, rows the values of rows of result.rows
+    import pyarrow
+    types = _arrow_types()
+    # the rows turned into columns in one pass over them
+    values = list(zip(*rows)) if rows else [() for _ in columns]
+    arrays = [_array(list(v), c.get("type"), types) for c, v in zip(columns, values)]
+    return pyarrow.RecordBatch.from_arrays(arrays, names=[c["name"] for c in columns])
+
+
+def _array(values: list, pure_type: str, types: Dict[str, pyarrow.DataType]) -> pyarrow.Array:
+    import pyarrow
+    arrow_type = types.get(pure_type)
+    if pure_type in _TEMPORAL:
+        # parsed by Arrow from their ISO text; left as text when their format isn't one it reads
+        text = pyarrow.array(values, pyarrow.string())
+        try:
+            return text.cast(arrow_type)
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowNotImplementedError):
+            return text
+    return pyarrow.array(values, arrow_type)
+
@@ -1,12 +1,41 @@
-from dataclasses import dataclass
-from typing import List
+from __future__ import annotations
+
+import gzip
+import json
+import threading
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from itertools import batched, chain, islice
+from typing import ClassVar, Iterator, List, Dict, Optional, Tuple, Type, TYPE_CHECKING
 
 import requests
 
-from dialect.purerelation.dialect import PureRuntime
+from dialect.purerelation.dialect import PureRuntime, PureTemplate, pure_type
+from dialect.purerelation.protocol import to_protocol
 from model.metamodel import Clause
 from model.schema import Table, Database
-from runtime.pure.db.type import DatabaseType
+from runtime.pure.db.type import DatabaseType, referenced_database
+from runtime.pure.executionserver import results
+from runtime.pure.executionserver.cache import ModelCache, ModelCacheEntry
+from runtime.pure.executionserver.session import EXECUTION_PATH, GRAMMAR_PATH, HttpSettings
+from runtime.pure.executionserver.stream import TdsStream
+
+if TYPE_CHECKING:
+    import pyarrow
+
+# the bytes of a streamed result read at a time
+CHUNK_SIZE = 1 << 16
+
+
+@dataclass
+class PreparedExecution:
+    template: PureTemplate
+    pmcd: dict
+    runtime: dict
+    # the parsed lambda for each set of parameter types it was run with
+    functions: Dict[Tuple[Type, ...], dict] = field(default_factory=dict)
+    # held to parse a lambda, so that threads running the query with new types at once parse it once
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
 
 
 @dataclass
@@ -14,25 +43,165 @@ class ExecutionServerRuntime(PureRuntime):
     database_type: DatabaseType
     host: str
     database: Database
+    http: HttpSettings = field(default_factory=HttpSettings)
+    _session: Optional[requests.Session] = field(default=None, init=False, repr=False, compare=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+    # the models generated for the schemas queries were run against, shared by all runtimes
+    model_cache: ClassVar[ModelCache] = ModelCache()
+
+    def identity(self) -> str:
+        return f"{super().identity()}:{self.host}:{self.database.name}:{self.database_type!r}"
 
     def eval(self, clauses: List[Clause]) -> dict:
-        lam = self.executable_to_string(clauses)
-        model = self._generate_model()
-        query = self._parse_lambda(lam)
-        pmcd = self._parse_model(model)
-        runtime = pmcd["elements"][0]["runtimeValue"]
+        return self._execute(self._execution_input(clauses))
+
+    def eval_batches(self, clauses: List[Clause], batch_size: int) -> Iterator[Dict[str, list]]:
+        # the rows read as the server sends them: only the batch being filled is held
+        stream = TdsStream(self._execute_stream(self._execution_input(clauses)))
+        for batch in batched(stream.rows(), batch_size):
+            yield dict(zip([c["name"] for c in stream.columns], map(list, zip(*batch))))
+
+    def eval_arrow(self, clauses: List[Clause], batch_size: int) -> pyarrow.RecordBatchReader:
+        import pyarrow
+        batches = self._record_batches(clauses, batch_size)
+        # the schema is the first batch's: it is read before the reader is returned
+        first = next(batches)
+        return pyarrow.RecordBatchReader.from_batches(first.schema, chain([first], batches))
+
+    def _record_batches(self, clauses: List[Clause], batch_size: int) -> Iterator[pyarrow.RecordBatch]:
+        stream = TdsStream(self._execute_stream(self._execution_input(clauses)))
+        rows = stream.rows()
+        # a first batch even of no rows, which gives the schema: the columns are known once it is read
+        first = list(islice(rows, batch_size))
+        yield results.record_batch(stream.columns, first)
+        for batch in batched(rows, batch_size):
+            yield results.record_batch(stream.columns, batch)
+
+    def _execution_input(self, clauses: List[Clause]) -> dict:
+        # the lambda and the model are sent as protocol JSON: the execute call is the only one made
+        model = self._model(clauses)
+        return self._input(self._lambda(clauses), model.runtime, model.pmcd)
+
+    @staticmethod
+    def _input(function: dict, runtime: dict, pmcd: dict, **rest: object) -> dict:
+        return {"clientVersion": "vX_X_X", "context": {"_type": "BaseExecutionContext"}, "function": function, "runtime": runtime, "model": pmcd, **rest}
+
+    def _lambda(self, clauses: List[Clause]) -> dict:
+        try:
+            return to_protocol(clauses, self)
+        except RecursionError:
+            # expressions nested deeper than the protocol can be built and sent: the server parses their text instead
+            return self._parse_lambda(self.executable_to_string(clauses))
 
-        execution_input = {"clientVersion": "vX_X_X", "context": {"_type": "BaseExecutionContext"}, "function": query, "runtime": runtime, "model": pmcd}
-        return self._execute(execution_input)
+    def empty(self, columns: Dict[str, Optional[Type]]) -> dict:
+        # the tabular result the execution server returns for no rows
+        builder = [self._column(name, type_) for name, type_ in columns.items()]
+        return {"builder": {"_type": "tdsBuilder", "columns": builder}, "activities": [],
+                "result": {"columns": list(columns), "rows": []}}
 
-    def _parse_model(self, model: str) -> dict:
-        return requests.post(self.host + "/api/pure/v1/grammar/grammarToJson/model", data=model).json()
+    @staticmethod
+    def _column(name: str, type_: Optional[Type]) -> dict:
+        try:
+            return {"name": name, "type": pure_type(type_)}
+        except (TypeError, ValueError):
+            # computed columns, and columns of types Pure has no name for
+            return {"name": name}
+
+    def prepare(self, clauses: List[Clause]) -> PreparedExecution:
+        model = self._model(clauses)
+        return PreparedExecution(super().prepare(clauses), model.pmcd, model.runtime)
+
+    def eval_prepared(self, prepared: PreparedExecution, parameters: Dict[str, object]) -> dict:
+        # the values are sent as lambda parameters, so only the execute call is made once the lambda has been parsed
+        parameter_types = self._parameter_types(prepared, parameters)
+        signature = tuple(parameter_types.values())
+        function = prepared.functions.get(signature)
+        if function is None:
+            with prepared.lock:
+                function = prepared.functions.get(signature)
+                if function is None:
+                    function = self._parse_lambda_with_parameters(prepared.template.to_lambda(parameter_types))
+                    prepared.functions[signature] = function
+        return self._execute(self._prepared_input(prepared, function, parameters))
+
+    @staticmethod
+    def _parameter_types(prepared: PreparedExecution, parameters: Dict[str, object]) -> Dict[str, Type]:
+        return {name: p.type_ or type(parameters[name]) for name, p in prepared.template.parameters.items()}
+
+    def _prepared_input(self, prepared: PreparedExecution, function: dict, parameters: Dict[str, object]) -> dict:
+        parameter_values = [{"name": name, "value": self._parameter_value(value)} for name, value in parameters.items()]
+        return self._input(function, prepared.runtime, prepared.pmcd, parameterValues=parameter_values)
+
+    @staticmethod
+    def _parameter_value(value: object) -> dict:
+        if isinstance(value, bool):
+            return {"_type": "boolean", "value": value}
+        if isinstance(value, int):
+            return {"_type": "integer", "value": value}
+        if isinstance(value, float):
+            return {"_type": "float", "value": value}
+        if isinstance(value, str):
+            return {"_type": "string", "value": value}
+        if isinstance(value, datetime):
+            return {"_type": "dateTime", "value": value.isoformat()}
+        if isinstance(value, date):
+            return {"_type": "strictDate", "value": value.isoformat()}
+        raise ValueError(f"Cannot convert parameter type {type(value)}")
 
     def _parse_lambda(self, lam: str) -> dict:
-        return requests.post(self.host + "/api/pure/v1/grammar/grammarToJson/lambda", data="|" + lam).json()
+        return self._post(GRAMMAR_PATH + "grammarToJson/lambda", ("|" + lam).encode()).json()
+
+    def _parse_lambda_with_parameters(self, lam: str) -> dict:
+        return self._post(GRAMMAR_PATH + "grammarToJson/lambda", lam.encode()).json()
 
     def _execute(self, input: dict) -> dict:
-        return requests.post(self.host + "/api/pure/v1/execution/execute?serializationFormat=DEFAULT", json=input).json()
+        return self._post(EXECUTION_PATH + "execute?serializationFormat=DEFAULT", self._json(input), "application/json").json()
+
+    def _execute_stream(self, input: dict) -> Iterator[bytes]:
+        # the response is closed once read, or once the generator is: its connection then goes back to the pool
+        with self._post(EXECUTION_PATH + "execute?serializationFormat=DEFAULT", self._json(input), "application/json", stream=True) as response:
+            yield from response.iter_content(CHUNK_SIZE)
+
+    @staticmethod
+    def _json(input: dict) -> bytes:
+        return json.dumps(input, allow_nan=False).encode()
+
+    def _post(self, path: str, data: bytes, content_type: Optional[str] = None, stream: bool = False) -> requests.Response:
+        data, headers = self._body(data, content_type)
+        return self.session().post(self.host + path, data=data, headers=headers, timeout=self.http.timeout(), stream=stream)
+
+    def _body(self, data: bytes, content_type: Optional[str]) -> Tuple[bytes, Dict[str, str]]:
+        headers = {"Content-Type": content_type} if content_type else {}
+        if self.http.gzip:
+            data = gzip.compress(data, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+        return data, headers
+
+    def session(self) -> requests.Session:
+        # made once, by the first call: threads share it and its pool of connections
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self.http.session(self.host)
+        return self._session
+
+    def close(self) -> None:
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def _model(self, clauses: List[Clause]) -> ModelCacheEntry:
+        # the model of the tables the query reads: queries reading the same tables share it
+        database = referenced_database(self.database, clauses)
+        key = ModelCache.key(self.name, self.database_type, database)
+        entry = self.model_cache.get(key) if key is not None else None
+        if entry is None:
+            pmcd = self._generate_model_data(database)
+            entry = ModelCacheEntry(pmcd, pmcd["elements"][0]["runtimeValue"])
+            if key is not None:
+                self.model_cache.put(key, entry)
+        return entry
 
-    def _generate_model(self) -> str:
-        return self.database_type.generate_model(self.name, self.database)
\ No newline at end of file
+    def _generate_model_data(self, database: Database) -> dict:
+        return self.database_type.generate_model_data(self.name, database)
@@ -0,0 +1,52 @@
+"""
+The HTTP connections of an execution server runtime: one requests.Session per runtime, whose pooled connections are
+kept alive between calls rather than opened for each.
+"""
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+GRAMMAR_PATH = "/api/pure/v1/grammar/"
+EXECUTION_PATH = "/api/pure/v1/execution/"
+# the statuses of an overloaded or restarting server, on which grammar calls are retried
+RETRIED_STATUSES = (429, 502, 503, 504)
+
+
+@dataclass(frozen=True)
+class HttpSettings:
+    # the connections kept open to the server: as many calls can be made at once without opening more
+    pool_size: int = 10
+    # seconds to connect, and then to wait for each read; None waits for ever
+    connect_timeout: Optional[float] = 5.0
+    read_timeout: Optional[float] = 300.0
+    # attempts after the first, waiting backoff * 2^n seconds between them
+    retries: int = 3
+    backoff: float = 0.25
+    # the request bodies sent gzipped, which the server inflates
+    gzip: bool = False
+
+    def __post_init__(self):
+        if self.pool_size < 1:
+            raise ValueError(f"pool_size must be positive, was {self.pool_size}")
+        if self.retries < 0:
+            raise ValueError(f"retries must not be negative, was {self.retries}")
+
+    def timeout(self) -> Tuple[Optional[float], Optional[float]]:
+        return self.connect_timeout, self.read_timeout
+
+    def session(self, host: str) -> requests.Session:
+        session = requests.Session()
+        # parsing grammar has no side effect: it is retried whatever failed, and on RETRIED_STATUSES
+        grammar = Retry(total=self.retries, allowed_methods=None, status_forcelist=RETRIED_STATUSES,
+                        backoff_factor=self.backoff, raise_on_status=False)
+        # an execution is retried only when it could not connect, so was never sent
+        execution = Retry(total=self.retries, read=0, other=0, status=0, backoff_factor=self.backoff)
+        session.mount(host + GRAMMAR_PATH, self._adapter(grammar))
+        session.mount(host + EXECUTION_PATH, self._adapter(execution))
+        return session
+
+    def _adapter(self, retry: Retry) -> HTTPAdapter:
+        return HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
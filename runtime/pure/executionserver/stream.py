@@ -0,0 +1,115 @@
+"""
+Reads a tabular result of the execution server as it arrives, rather than once all of it has.
+
+The document is walked key by key down to result.rows: the values passed on the way, such as the builder, are decoded
+whole. The rows are then decoded one at a time, so that only the ones not yet read are held, whatever the number of
+rows of the result.
+"""
+import codecs
+import json
+import re
+from typing import Iterable, Iterator, List, Optional
+
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+class TdsStream:
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._decode = codecs.getincrementaldecoder("utf-8")().decode
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._rows = False
+        # the builder's columns, {"name": .., "type": ..}: read from the stream before the rows
+        self.columns: Optional[List[dict]] = None
+
+    def rows(self) -> Iterator[list]:
+        # the values of each row, in the order of the columns
+        if not self._rows:
+            self._open()
+        match, decode = _SEPARATORS.match, self._decoder.raw_decode
+        while True:
+            # the rows complete in the buffer, then the next chunk: a row is an object, whole once decoded
+            buffer, pos = self._buffer, self._pos
+            while True:
+                pos = match(buffer, pos).end()
+                if pos == len(buffer):
+                    break
+                if buffer[pos] == "]":
+                    self._pos = pos + 1
+                    return
+                try:
+                    row, pos = decode(buffer, pos)
+                except json.JSONDecodeError:
+                    break
+                yield row["values"]
+            self._pos = pos
+            if not self._fill():
+                raise ValueError("The result ended before it was complete")
+
+    def _open(self) -> None:
+        self._expect("{")
+        in_result = False
+        while True:
+            c = self._peek()
+            if c == "}":
+                if not in_result:
+                    raise ValueError(f"Not a tabular result: {self._buffer[:1000]}")
+                self._pos += 1
+                in_result = False
+                continue
+            key = self._value()
+            self._expect(":")
+            if not in_result and key == "result":
+                self._expect("{")
+                in_result = True
+            elif in_result and key == "rows":
+                self._expect("[")
+                self._rows = True
+                return
+            else:
+                value = self._value()
+                if not in_result and key == "builder":
+                    self.columns = value["columns"]
+                elif in_result and key == "columns" and self.columns is None:
+                    self.columns = [{"name": name} for name in value]
+
+    def _peek(self) -> str:
+        # the next character that isn't a space or a comma
+        while True:
+            self._pos = _SEPARATORS.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError("The result ended before it was complete")
+
+    def _expect(self, c: str) -> None:
+        if self._peek() != c:
+            raise ValueError(f"Expected '{c}' in the result at: {self._buffer[self._pos:self._pos + 100]}")
+        self._pos += 1
+
+    def _value(self) -> object:
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                # a number ending the buffer may go on in the next chunk
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+    def _fill(self) -> bool:
+        # the next chunk appended to what is left of the buffer
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + self._decode(chunk)
+        self._pos = 0
+        return True
@@ -1,6 +1,6 @@
-from typing import List
+from typing import List, Dict
 
-from dialect.purerelation.dialect import PureRuntime
+from dialect.purerelation.dialect import PureRuntime, PureTemplate
 from model.metamodel import Clause
 from runtime.pure.repl.repl_utils import send_to_repl
 
@@ -8,3 +8,7 @@ from runtime.pure.repl.repl_utils import send_to_repl
 class ReplRuntime(PureRuntime):
     def eval(self, clauses: List[Clause]) -> str:
         return send_to_repl(self.executable_to_string(clauses))
+
+    def eval_prepared(self, prepared: PureTemplate, parameters: Dict[str, object]) -> str:
+        # the repl has no parameters, splice the values into the prepared executable
+        return send_to_repl(self.prepared_to_string(prepared, parameters))
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, TYPE_CHECKING
+
+import duckdb
+
+from dialect.sql.dialect import SqlRuntime, SqlTemplate
+from model.metamodel import Clause
+
+if TYPE_CHECKING:
+    import pyarrow
+
+
+@dataclass
+class DuckDBRuntime(SqlRuntime):
+    # runs queries in this process, on the DuckDB database at path: no server, nor model, between them and the data
+    path: str
+    read_only: bool = False
+    _connection: Optional[duckdb.DuckDBPyConnection] = field(default=None, init=False, repr=False, compare=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+
+    def identity(self) -> str:
+        return f"{super().identity()}:{self.path}"
+
+    def eval(self, clauses: List[Clause]) -> dict:
+        return self._execute(self.executable_to_string(clauses), None)
+
+    def eval_prepared(self, prepared: SqlTemplate, parameters: Dict[str, object]) -> dict:
+        # the values are bound by DuckDB, not written into the statement
+        return self._execute(prepared.sql, parameters)
+
+    def eval_batches(self, clauses: List[Clause], batch_size: int) -> Iterator[Dict[str, list]]:
+        with self.connection().cursor() as cursor:
+            cursor.execute(self.executable_to_string(clauses))
+            names = [d[0] for d in cursor.description]
+            while rows := cursor.fetchmany(batch_size):
+                yield dict(zip(names, map(list, zip(*rows))))
+
+    def eval_arrow(self, clauses: List[Clause], batch_size: int) -> pyarrow.RecordBatchReader:
+        # DuckDB writes the batches itself, no Python object is made of a value; the cursor is closed once the reader
+        # no longer needs it
+        cursor = self.connection().cursor()
+        cursor.execute(self.executable_to_string(clauses))
+        return cursor.to_arrow_reader(batch_size)
+
+    def connection(self) -> duckdb.DuckDBPyConnection:
+        # opened once, by the first query: each query runs on a cursor of its own, so that threads can share it
+        if self._connection is None:
+            with self._lock:
+                if self._connection is None:
+                    self._connection = duckdb.connect(self.path, read_only=self.read_only)
+        return self._connection
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _execute(self, sql: str, parameters: Optional[Dict[str, object]]) -> dict:
+        with self.connection().cursor() as cursor:
+            cursor.execute(sql, parameters)
+            return {"columns": [d[0] for d in cursor.description], "rows": cursor.fetchall()}
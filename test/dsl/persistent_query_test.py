@@ -0,0 +1,56 @@
+import unittest
+
+from dialect.purerelation.dialect import NonExecutablePureRuntime
+from model.schema import Table, Database
+from ql.legendql import LegendQL
+from ql.rawlegendql import RawLegendQL
+
+
+class TestPersistentQuery(unittest.TestCase):
+
+    def _query(self, persistent: bool = True) -> LegendQL:
+        table = Table("employee", {"id": int, "name": str, "salary": float})
+        return LegendQL.from_table(Database("local::DuckDuckDatabase", [table]), table, persistent=persistent)
+
+    def test_forks_share_their_prefix(self):
+        base = self._query().filter(lambda e: e.salary > 100)
+        high = base.filter(lambda e: e.id > 10)
+        low = base.filter(lambda e: e.id < 10)
+
+        self.assertEqual(2, len(base._internal._clauses))
+        self.assertEqual(3, len(high._internal._clauses))
+        self.assertIsNot(high, low)
+        self.assertIs(base._internal._chain, high._internal._chain.previous)
+        self.assertIs(base._internal._chain, low._internal._chain.previous)
+
+    def test_in_place_by_default(self):
+        query = self._query(persistent=False)
+        self.assertIs(query, query.filter(lambda e: e.id > 10))
+        self.assertEqual(2, len(query._internal._clauses))
+
+    def test_forks_do_not_change_the_base(self):
+        base = self._query()
+        minimum = 10
+        base.extend(lambda e: (bonus := e.salary * 2)).filter(lambda e: e.id > minimum)
+
+        self.assertNotIn("bonus", base._internal._table.columns)
+        self.assertEqual({}, base._internal._parameters)
+        self.assertEqual(1, len(base._internal._clauses))
+
+    def test_forks_are_the_queries_built_in_place(self):
+        runtime = NonExecutablePureRuntime("local::DuckDuckRuntime")
+        base = self._query().extend(lambda e: (bonus := e.salary * 2))
+        for minimum in [1, 2]:
+            fork = base.filter(lambda e: e.bonus > minimum).select(lambda e: [e.id, e.bonus])
+            in_place = (self._query(persistent=False).extend(lambda e: (bonus := e.salary * 2))
+                        .filter(lambda e: e.bonus > minimum).select(lambda e: [e.id, e.bonus]))
+
+            self.assertEqual(in_place.bind(runtime).executable_to_string(), fork.bind(runtime).executable_to_string())
+            self.assertEqual(in_place.fingerprint(), fork.fingerprint())
+
+    def test_raw_forks(self):
+        table = Table("employee", {"id": int})
+        base = RawLegendQL.from_table(Database("db", [table]), table, persistent=True).select("id")
+
+        self.assertEqual(3, len(base.limit(5)._clauses))
+        self.assertEqual(2, len(base._clauses))
@@ -0,0 +1,148 @@
+import gc
+import threading
+import time
+import unittest
+import weakref
+from datetime import date
+from typing import List, Dict
+from unittest import mock
+
+from dialect.purerelation.dialect import NonExecutablePureRuntime, PureRuntime, PureTemplate
+from dsl.functions import param
+from model.metamodel import Clause, ParameterExpression
+from model.schema import Table, Database
+from ql.legendql import LegendQL
+from runtime.pure.db.duckdb import DuckDBDatabaseType
+from runtime.pure.executionserver.runtime import ExecutionServerRuntime
+
+
+class RecordingPureRuntime(PureRuntime):
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.prepared = 0
+
+    def eval(self, clauses: List[Clause]) -> str:
+        return self.executable_to_string(clauses)
+
+    def prepare(self, clauses: List[Clause]) -> PureTemplate:
+        self.prepared += 1
+        return super().prepare(clauses)
+
+    def eval_prepared(self, prepared: PureTemplate, parameters: Dict[str, object]) -> str:
+        return self.prepared_to_string(prepared, parameters)
+
+
+class TestPreparedQuery(unittest.TestCase):
+
+    def _query(self, tracing: bool = False) -> LegendQL:
+        table = Table("table", {"id": int, "name": str, "start": date})
+        return LegendQL.from_table(Database("local::DuckDuckDatabase", [table]), table, tracing)
+
+    def test_parameters(self):
+        prepared = (self._query()
+                    .filter(lambda e: e.id > param("min_id", int) and e.name != param("name"))
+                    .prepare())
+        self.assertEqual({"min_id": ParameterExpression("min_id", int), "name": ParameterExpression("name")}, prepared.parameters)
+
+    def test_bind_and_eval(self):
+        runtime = RecordingPureRuntime("local::DuckDuckRuntime")
+        prepared = (self._query()
+                    .filter(lambda e: e.id > param("min_id") and e.start < param("before", date))
+                    .select(lambda e: [e.id])
+                    .prepare())
+
+        first = prepared.bind(min_id=1, before=date(2021, 1, 1)).eval(runtime)
+        second = prepared.bind(min_id=20, before=date(2022, 1, 1)).eval(runtime)
+
+        self.assertEqual("#>{local::DuckDuckDatabase.table}#->select(~[id, start])->filter(e | $e.id>1and$e.start<%2021-01-01)->select(~[id])->from(local::DuckDuckRuntime)", first)
+        self.assertEqual("#>{local::DuckDuckDatabase.table}#->select(~[id, start])->filter(e | $e.id>20and$e.start<%2022-01-01)->select(~[id])->from(local::DuckDuckRuntime)", second)
+        self.assertEqual(1, runtime.prepared)
+
+    def test_bound_matches_literal_query(self):
+        runtime = NonExecutablePureRuntime("local::DuckDuckRuntime")
+        literal = self._query().filter(lambda e: e.name == "x").bind(runtime).executable_to_string()
+        bound = self._query().filter(lambda e: e.name == param("name")).prepare().bind(name="x").executable_to_string(runtime)
+        traced = self._query(True).filter(lambda e: e.name == param("name")).prepare().bind(name="x").executable_to_string(runtime)
+
+        self.assertEqual(literal, bound)
+        self.assertEqual(literal, traced)
+
+    def test_template_declares_lambda_parameters(self):
+        template = NonExecutablePureRuntime("rt").prepare(self._query().filter(lambda e: e.id > param("min_id")).prepare().clauses)
+        self.assertEqual("{min_id:Integer[1]|#>{local::DuckDuckDatabase.table}#->filter(e | $e.id>$min_id)->from(rt)}", template.to_lambda({"min_id": int}))
+
+    def test_invalid_bindings(self):
+        prepared = self._query().filter(lambda e: e.id > param("min_id", int)).prepare()
+        with self.assertRaises(ValueError):
+            prepared.bind()
+        with self.assertRaises(ValueError):
+            prepared.bind(min_id=1, other=2)
+        with self.assertRaises(ValueError):
+            prepared.bind(min_id="1")
+
+    def test_execution_server_parses_once(self):
+        table = Table("table", {"id": int})
+        database = Database("local::DuckDuckDatabase", [table])
+        runtime = ExecutionServerRuntime("local::DuckDuckRuntime", DuckDBDatabaseType("/tmp/duck"), "http://localhost:6300", database)
+        prepared = LegendQL.from_table(database, table).filter(lambda e: e.id > param("min_id")).prepare()
+
+        with mock.patch.object(ExecutionServerRuntime, "_parse_lambda_with_parameters", return_value={"body": []}) as parse_lambda, \
+                mock.patch.object(ExecutionServerRuntime, "_execute", side_effect=lambda execution_input: execution_input) as execute:
+            prepared.bind(min_id=1).eval(runtime)
+            execution_input = prepared.bind(min_id=2).eval(runtime)
+
+        self.assertEqual(runtime.database_type.generate_model_data(runtime.name, database), execution_input["model"])
+        parse_lambda.assert_called_once_with("{min_id:Integer[1]|#>{local::DuckDuckDatabase.table}#->filter(e | $e.id>$min_id)->from(local::DuckDuckRuntime)}")
+        self.assertEqual(2, execute.call_count)
+        self.assertEqual([{"name": "min_id", "value": {"_type": "integer", "value": 2}}], execution_input["parameterValues"])
+
+    def test_captured_values_parsed_once(self):
+        table = Table("table", {"id": int})
+        database = Database("local::DuckDuckDatabase", [table])
+        runtime = ExecutionServerRuntime("local::DuckDuckRuntime", DuckDBDatabaseType("/tmp/duck"), "http://localhost:6300", database)
+
+        def query(min_id):
+            return LegendQL.from_table(database, table).filter(lambda e: e.id > min_id)
+
+        with mock.patch.object(ExecutionServerRuntime, "_parse_lambda_with_parameters", return_value={"body": []}) as parse_lambda, \
+                mock.patch.object(ExecutionServerRuntime, "_execute", side_effect=lambda execution_input: execution_input) as execute:
+            inputs = [query(min_id).bind(runtime).eval() for min_id in (1, 2, 3)]
+
+        parse_lambda.assert_called_once()
+        self.assertEqual(3, execute.call_count)
+        self.assertEqual([1, 2, 3], [i["parameterValues"][0]["value"]["value"] for i in inputs])
+
+    def test_runtimes_are_not_kept_alive(self):
+        runtime = RecordingPureRuntime("local::DuckDuckRuntime")
+        prepared = self._query().filter(lambda e: e.id > param("min_id")).prepare()
+        prepared.bind(min_id=1).eval(runtime)
+
+        ref = weakref.ref(runtime)
+        del runtime
+        gc.collect()
+        self.assertIsNone(ref())
+        self.assertEqual({}, prepared._plan._prepared)
+
+    def test_execution_server_parses_once_across_threads(self):
+        table = Table("table", {"id": int})
+        database = Database("local::DuckDuckDatabase", [table])
+        runtime = ExecutionServerRuntime("local::DuckDuckRuntime", DuckDBDatabaseType("/tmp/duck"), "http://localhost:6300", database)
+        prepared = LegendQL.from_table(database, table).filter(lambda e: e.id > param("min_id")).prepare()
+
+        def parse(lam: str) -> dict:
+            time.sleep(0.05)
+            return {"body": []}
+
+        with mock.patch.object(ExecutionServerRuntime, "_parse_lambda_with_parameters", side_effect=parse) as parse_lambda, \
+                mock.patch.object(ExecutionServerRuntime, "_execute", side_effect=lambda execution_input: execution_input):
+            threads = [threading.Thread(target=lambda i=i: prepared.bind(min_id=i).eval(runtime)) for i in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        parse_lambda.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+from unittest import mock
+
+from dialect.purerelation.dialect import NonExecutablePureRuntime
+from dialect.purerelation.protocol import to_protocol
+from model.schema import Table, Database
+from ql.legendql import LegendQL
+from runtime.pure.db.duckdb import DuckDBDatabaseType
+from runtime.pure.executionserver.runtime import ExecutionServerRuntime
+
+
+def _var(name):
+    return {"_type": "var", "name": name}
+
+
+def _property(row, column):
+    return {"_type": "property", "property": column, "parameters": [_var(row)]}
+
+
+def _integer(value):
+    return {"_type": "integer", "value": value}
+
+
+class TestDslToPureProtocol(unittest.TestCase):
+
+    def setUp(self):
+        self.table = Table("table", {"id": int, "departmentId": int, "first": str, "last": str})
+        self.database = Database("local::DuckDuckDatabase", [self.table])
+
+    def _protocol(self, data_frame):
+        return to_protocol(data_frame._internal._clauses, NonExecutablePureRuntime("local::DuckDuckRuntime"))
+
+    def test_select_with_filter(self):
+        data_frame = (LegendQL.from_table(self.database, self.table)
+                      .select(lambda e: [e.id, e.departmentId])
+                      .filter(lambda e: e.id != 1))
+        accessor = {"_type": "classInstance", "type": ">", "value": {"path": ["local::DuckDuckDatabase", "table"]}}
+        select = {"_type": "func", "function": "select", "parameters": [accessor, {"_type": "classInstance", "type": "colSpecArray", "value": {"colSpecs": [
+            {"_type": "classInstance", "type": "colSpec", "value": {"name": "id"}},
+            {"_type": "classInstance", "type": "colSpec", "value": {"name": "departmentId"}}]}}]}
+        condition = {"_type": "func", "function": "not", "parameters": [{"_type": "func", "function": "equal", "parameters": [_property("e", "id"), _integer(1)]}]}
+        filter_ = {"_type": "func", "function": "filter", "parameters": [select, {"_type": "lambda", "body": [condition], "parameters": [_var("e")]}]}
+        from_ = {"_type": "func", "function": "from", "parameters": [filter_, {"_type": "packageableElementPtr", "fullPath": "local::DuckDuckRuntime"}]}
+        self.assertEqual({"_type": "lambda", "body": [from_], "parameters": []}, self._protocol(data_frame))
+
+    def test_extend_with_arithmetic(self):
+        data_frame = (LegendQL.from_table(self.database, self.table)
+                      .extend(lambda e: [new_col := e.id + 1]))
+        extend = self._protocol(data_frame)["body"][0]["parameters"][0]
+        plus = {"_type": "func", "function": "plus", "parameters": [
+            {"_type": "collection", "multiplicity": {"lowerBound": 2, "upperBound": 2}, "values": [_property("e", "id"), _integer(1)]}]}
+        self.assertEqual("extend", extend["function"])
+        self.assertEqual({"_type": "classInstance", "type": "colSpecArray", "value": {"colSpecs": [{"_type": "classInstance", "type": "colSpec", "value": {
+            "name": "new_col", "function1": {"_type": "lambda", "body": [plus], "parameters": [_var("e")]}}}]}}, extend["parameters"][1])
+
+    def test_eval_executes_only(self):
+        runtime = ExecutionServerRuntime("local::DuckDuckRuntime", DuckDBDatabaseType("/tmp/duck"), "http://localhost:6300", self.database)
+        data_frame = LegendQL.from_table(self.database, self.table).limit(1).bind(runtime)
+        with mock.patch.object(ExecutionServerRuntime, "_parse_lambda") as parse_lambda, \
+                mock.patch.object(ExecutionServerRuntime, "_execute", side_effect=lambda execution_input: execution_input):
+            execution_input = data_frame.eval()
+
+        parse_lambda.assert_not_called()
+        self.assertEqual("limit", execution_input["function"]["body"][0]["parameters"][0]["function"])
+        elements = execution_input["model"]["elements"]
+        self.assertEqual(["runtime", "connection", "relational"], [e["_type"] for e in elements])
+        self.assertEqual(elements[0]["runtimeValue"], execution_input["runtime"])
+        self.assertEqual(("local", "DuckDuckDatabase"), (elements[2]["package"], elements[2]["name"]))
+        self.assertEqual([{"name": "id", "type": {"_type": "BigInt"}, "nullable": True}, {"name": "departmentId", "type": {"_type": "BigInt"}, "nullable": True},
+                          {"name": "first", "type": {"_type": "Varchar", "size": 0}, "nullable": True}, {"name": "last", "type": {"_type": "Varchar", "size": 0}, "nullable": True}],
+                         elements[2]["schemas"][0]["tables"][0]["columns"])
+
+    def test_deep_eval_sends_text(self):
+        runtime = ExecutionServerRuntime("local::DuckDuckRuntime", DuckDBDatabaseType("/tmp/duck"), "http://localhost:6300", self.database)
+        namespace = {}
+        exec("f = lambda e: " + " and ".join(f"e.id != {i}" for i in range(3000)), namespace)
+        data_frame = LegendQL.from_table(self.database, self.table).filter(namespace["f"]).bind(runtime)
+        with mock.patch.object(ExecutionServerRuntime, "_parse_lambda", return_value={"body": []}) as parse_lambda, \
+                mock.patch.object(ExecutionServerRuntime, "_execute", side_effect=lambda execution_input: execution_input):
+            execution_input = data_frame.eval()
+
+        parse_lambda.assert_called_once_with(data_frame.executable_to_string())
+        self.assertEqual({"body": []}, execution_input["function"])
+
+
+if __name__ == '__main__':
+    unittest.main()
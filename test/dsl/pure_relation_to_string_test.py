@@ -1,6 +1,6 @@
 import unittest
 
-from dialect.purerelation.dialect import NonExecutablePureRuntime
+from dialect.purerelation.dialect import NonExecutablePureRuntime, PureRelationExpressionVisitor
 from dsl.functions import aggregate
 from model.schema import Table, Database
 from ql.legendql import LegendQL
@@ -70,3 +70,41 @@ class TestDslToPureRelationDialect(unittest.TestCase):
                       .bind(runtime))
         pure_relation = data_frame.executable_to_string()
         self.assertEqual("#>{local::DuckDuckDatabase.table}#->select(~[id, departmentId])->limit(1)->from(local::DuckDuckRuntime)", pure_relation)
+
+    def test_deep_filter(self):
+        # the conditions and-ed fold into an expression deeper than the recursion limit
+        runtime = NonExecutablePureRuntime("local::DuckDuckRuntime")
+        table = Table("table", {"id": int, "departmentId": int, "first": str, "last": str})
+        database = Database("local::DuckDuckDatabase", [table])
+        namespace = {}
+        exec("f = lambda e: " + " and ".join(f"e.id != {i}" for i in range(3000)), namespace)
+        data_frame = (LegendQL.from_table(database, table)
+                      .filter(namespace["f"])
+                      .bind(runtime))
+        pure_relation = data_frame.executable_to_string()
+        conditions = "and".join(f"$e.id!={i}" for i in range(3000))
+        self.assertEqual("#>{local::DuckDuckDatabase.table}#->filter(e | " + conditions + ")->from(local::DuckDuckRuntime)", pure_relation)
+
+    def test_operands_binding_looser_are_parenthesized(self):
+        runtime = NonExecutablePureRuntime("local::DuckDuckRuntime")
+        table = Table("table", {"id": int, "departmentId": int, "first": str, "last": str})
+        database = Database("local::DuckDuckDatabase", [table])
+        data_frame = (LegendQL.from_table(database, table)
+                      .filter(lambda e: e.id > 1 and (e.departmentId > 2 or not (e.id < 5 and e.id > 0)))
+                      .extend(lambda e: [x := (e.id + 1) * (e.departmentId - (e.id - 2)) - e.id - 1])
+                      .bind(runtime))
+        data_frame.optimize = False
+        pure_relation = data_frame.executable_to_string()
+        self.assertEqual("#>{local::DuckDuckDatabase.table}#->filter(e | $e.id>1and($e.departmentId>2or!($e.id<5and$e.id>0)))"
+                         "->extend(~[x:e | ($e.id+1)*($e.departmentId-($e.id-2))-$e.id-1])->from(local::DuckDuckRuntime)", pure_relation)
+
+    def test_visit_expression(self):
+        runtime = NonExecutablePureRuntime("local::DuckDuckRuntime")
+        table = Table("table", {"id": int, "departmentId": int, "first": str, "last": str})
+        database = Database("local::DuckDuckDatabase", [table])
+        clauses = (LegendQL.from_table(database, table)
+                   .extend(lambda e: [new_col := e.id + 1 if e.departmentId > 2 else e.id])
+                   ._internal._clauses)
+        visitor = PureRelationExpressionVisitor(runtime)
+        self.assertEqual("extend(~[new_col:e | if($e.departmentId>2, | $e.id+1, | $e.id)])", clauses[1].visit(visitor, ""))
+        self.assertEqual("e | if($e.departmentId>2, | $e.id+1, | $e.id)", clauses[1].expressions[0].expression.visit(visitor, ""))
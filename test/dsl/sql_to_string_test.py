@@ -0,0 +1,79 @@
+import unittest
+
+from dsl.functions import over, avg, sum, rank, rows, range, unbounded
+from dialect.sql.dialect import NonExecutableSqlRuntime, to_sql
+from model.metamodel import FromClause, GroupByClause, GroupByExpression, ColumnReferenceExpression, \
+    ComputedColumnAliasExpression, MapReduceExpression, LambdaExpression, ColumnAliasExpression, FunctionExpression, \
+    VariableAliasExpression, BinaryExpression, OperandExpression, LiteralExpression, IntegerLiteral, \
+    GreaterThanBinaryOperator, OrderByExpression, AscendingOrderType, LimitClause, OffsetClause, \
+    TopClause, CountFunction
+from model.schema import Table, Database
+from ql.legendql import LegendQL
+
+
+class TestDslToSqlDialect(unittest.TestCase):
+
+    def setUp(self):
+        self.runtime = NonExecutableSqlRuntime()
+        self.table = Table("employees", {"id": int, "departmentId": int, "first": str, "last": str})
+        self.department = Table("department", {"id": int, "name": str})
+        self.database = Database("local::DuckDuckDatabase", [self.table, self.department])
+
+    def _sql(self, query: LegendQL) -> str:
+        return query.bind(self.runtime).executable_to_string()
+
+    def test_select_with_filter(self):
+        sql = self._sql(LegendQL.from_table(self.database, self.table)
+                        .select(lambda e: [e.id, e.first])
+                        .filter(lambda e: e.id == 1 and e.first != "J'o"))
+        self.assertEqual("""SELECT * FROM (SELECT "id", "first" FROM "employees") WHERE (("id" = 1) AND ("first" <> 'J''o'))""", sql)
+
+    def test_extend_sort_and_limit_in_one_select(self):
+        sql = self._sql(LegendQL.from_table(self.database, self.table)
+                        .extend(lambda e: [(next_id := e.id + 1), (code := 1 if e.id > 2 else 0)])
+                        .order_by(lambda e: [-e.next_id])
+                        .take(5, 10))
+        self.assertEqual("""SELECT *, ("id" + 1) AS "next_id", CASE WHEN ("id" > 2) THEN 1 ELSE 0 END AS "code" """
+                         """FROM "employees" ORDER BY "next_id" DESC LIMIT 10 OFFSET 5""", sql)
+
+    def test_window_functions(self):
+        sql = self._sql(LegendQL.from_table(self.database, self.table)
+                        .extend(lambda e: [(average := over(e.departmentId, avg(e.id))),
+                                           (running := over([e.departmentId, e.last], sum(e.id), sort=[e.first, e.id], frame=rows(unbounded(), 0))),
+                                           (ranked := over(e.departmentId, rank(), sort=e.id, frame=range(-1, 2)))]))
+        self.assertEqual("""SELECT *, avg("id") OVER (PARTITION BY "departmentId") AS "average", """
+                         """sum("id") OVER (PARTITION BY "departmentId", "last" ORDER BY "first", "id" ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS "running", """
+                         """rank() OVER (PARTITION BY "departmentId" ORDER BY "id" RANGE BETWEEN 1 PRECEDING AND 2 FOLLOWING) AS "ranked" """
+                         'FROM "employees"', sql)
+
+    def test_join(self):
+        sql = self._sql(LegendQL.from_table(self.database, self.table)
+                        .left_join(LegendQL.from_table(self.database, self.department),
+                                   lambda e, d: (e.departmentId == d.id, [(department := d.name)])))
+        self.assertEqual("""SELECT "l".*, "r"."name" AS "department" FROM "employees" AS "l" LEFT JOIN "department" AS "r" """
+                         """ON ("l"."departmentId" = "r"."id")""", sql)
+
+    def test_rename(self):
+        sql = self._sql(LegendQL.from_table(self.database, self.table).rename(lambda e: (ident := e.id)))
+        self.assertEqual("""SELECT * RENAME ("id" AS "ident") FROM "employees\"""", sql)
+
+    def test_group_by_with_having(self):
+        count = ComputedColumnAliasExpression("n", MapReduceExpression(
+            LambdaExpression(["r"], ColumnAliasExpression("r", ColumnReferenceExpression("id"))),
+            LambdaExpression(["a"], FunctionExpression(CountFunction(), [VariableAliasExpression("a")]))))
+        having = BinaryExpression(OperandExpression(ColumnReferenceExpression("n")), OperandExpression(LiteralExpression(IntegerLiteral(1))), GreaterThanBinaryOperator())
+        clauses = [FromClause("local::DuckDuckDatabase", "employees"),
+                   GroupByClause(GroupByExpression([ColumnReferenceExpression("last")], [count], having))]
+        self.assertEqual("""SELECT * FROM (SELECT "last", count("id") AS "n" FROM "employees" GROUP BY "last") WHERE ("n" > 1)""",
+                         to_sql(clauses, self.runtime))
+
+    def test_slices_merge_and_sorts_select_from_them(self):
+        ordering = [OrderByExpression(AscendingOrderType(), ColumnReferenceExpression("id"))]
+        clauses = [FromClause("local::DuckDuckDatabase", "employees"), LimitClause(IntegerLiteral(10)),
+                   OffsetClause(IntegerLiteral(2)), TopClause(ordering, IntegerLiteral(3))]
+        self.assertEqual("""SELECT * FROM (SELECT * FROM "employees" LIMIT 8 OFFSET 2) ORDER BY "id" ASC LIMIT 3""",
+                         to_sql(clauses, self.runtime))
+
+
+if __name__ == '__main__':
+    unittest.main()
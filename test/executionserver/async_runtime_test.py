@@ -0,0 +1,85 @@
+import asyncio
+import importlib.util
+import json
+import unittest
+
+from dsl.functions import param
+from model.schema import Table, Database
+from ql.legendql import LegendQL
+from runtime.pure.db.duckdb import DuckDBDatabaseType
+from runtime.pure.executionserver.async_runtime import AsyncExecutionServerRuntime, eval_all
+from runtime.pure.executionserver.session import HttpSettings
+from test.executionserver.testutils import LocalHttpServer
+
+
+@unittest.skipUnless(importlib.util.find_spec("aiohttp"), "aiohttp is not installed")
+class AsyncExecutionServerRuntimeTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.server = LocalHttpServer.start()
+        self.addCleanup(self.server.stop)
+        self.table = Table("employee", {"id": int, "name": str})
+        self.database = Database("local::DuckDuckDatabase", [self.table])
+
+    def _runtime(self, max_concurrency=None, **settings) -> AsyncExecutionServerRuntime:
+        runtime = AsyncExecutionServerRuntime("local::DuckDuckRuntime", DuckDBDatabaseType("/tmp/duck"), self.server.host, self.database,
+                                              HttpSettings(**settings), max_concurrency)
+        self.addAsyncCleanup(runtime.aclose)
+        return runtime
+
+    def _query(self) -> LegendQL:
+        return LegendQL.from_table(self.database, self.table).select(lambda e: [e.id, e.name])
+
+    async def test_same_input_as_blocking_runtime(self):
+        runtime = self._runtime()
+        df = self._query().bind(runtime)
+
+        self.assertEqual({"status": 200}, await df.eval_async())
+        self.assertEqual([json.dumps(runtime._execution_input(df.plan())).encode()], self.server.bodies)
+
+    async def test_prepared_lambda_parsed_once_and_retried(self):
+        runtime = self._runtime(backoff=0)
+        prepared = self._query().filter(lambda e: e.id > param("min_id", int)).prepare()
+        self.server.failures = [503]
+
+        self.assertEqual([{"status": 200}] * 2, [await prepared.bind(min_id=i).eval_async(runtime) for i in range(2)])
+        # the lambda sent again after the 503, then the two executions
+        self.assertEqual(4, len(self.server.bodies))
+        self.assertEqual(self.server.bodies[0], self.server.bodies[1])
+        self.assertEqual([0, 1], [json.loads(body)["parameterValues"][0]["value"]["value"] for body in self.server.bodies[2:]])
+
+    async def test_concurrency_limited(self):
+        runtime = self._runtime(max_concurrency=2)
+        self.server.delay = 0.05
+        results = await eval_all([self._query().bind(runtime)] * 6)
+
+        self.assertEqual([{"status": 200}] * 6, results)
+        self.assertEqual(2, self.server.most_active)
+
+    async def test_cancel_closes_the_request(self):
+        runtime = self._runtime()
+        self.server.stall = True
+        task = asyncio.create_task(self._query().bind(runtime).eval_async())
+        while not self.server.bodies:
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertTrue(await asyncio.to_thread(self.server.disconnected.wait, 5))
+
+    async def test_another_loop_refused_while_open(self):
+        df = self._query().bind(self._runtime())
+        await df.eval_async()
+
+        with self.assertRaises(ValueError):
+            await asyncio.to_thread(asyncio.run, df.eval_async())
+        self.assertEqual(1, len(self.server.bodies))
+
+    async def test_invalid_concurrency(self):
+        with self.assertRaises(ValueError):
+            self._runtime(max_concurrency=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from datetime import date
+from unittest import mock
+
+from model.schema import Table, Database
+from ql.legendql import LegendQL
+from runtime.pure.db.duckdb import DuckDBDatabaseType
+from runtime.pure.executionserver.runtime import ExecutionServerRuntime
+
+
+class ModelCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        ExecutionServerRuntime.model_cache.clear()
+        self.table = Table("employee", {"id": int, "name": str})
+        self.database = Database("local::DuckDuckDatabase", [self.table])
+
+    def tearDown(self):
+        ExecutionServerRuntime.model_cache.clear()
+
+    def _eval(self, runtime: ExecutionServerRuntime) -> dict:
+        with mock.patch.object(ExecutionServerRuntime, "_execute", side_effect=lambda execution_input: execution_input):
+            return LegendQL.from_table(self.database, self.table).limit(1).bind(runtime).eval()
+
+    def _runtime(self, path: str = "/tmp/duck") -> ExecutionServerRuntime:
+        return ExecutionServerRuntime("local::DuckDuckRuntime", DuckDBDatabaseType(path), "http://localhost:6300", self.database)
+
+    def test_model_generated_once(self):
+        with mock.patch.object(DuckDBDatabaseType, "generate_model_data", wraps=self._runtime().database_type.generate_model_data) as generate:
+            first = self._eval(self._runtime())
+            second = self._eval(self._runtime())
+
+        self.assertEqual(1, generate.call_count)
+        self.assertIs(first["model"], second["model"])
+        self.assertIs(first["model"]["elements"][0]["runtimeValue"], second["runtime"])
+        info = ExecutionServerRuntime.model_cache.info()
+        self.assertEqual((1, 1, 1), (info.hits, info.misses, info.currsize))
+
+    def test_changed_schema_misses(self):
+        first = self._eval(self._runtime())
+        self.table.columns["start"] = int
+        second = self._eval(self._runtime())
+
+        self.assertEqual(["id", "name"], [c["name"] for c in first["model"]["elements"][2]["schemas"][0]["tables"][0]["columns"]])
+        self.assertEqual(["id", "name", "start"], [c["name"] for c in second["model"]["elements"][2]["schemas"][0]["tables"][0]["columns"]])
+        self.assertEqual(2, ExecutionServerRuntime.model_cache.info().misses)
+
+    def test_only_referenced_tables(self):
+        department = Table("department", {"id": int, "opened": date})
+        self.database.tables.insert(0, department)
+        first = self._eval(self._runtime())
+        # a table no query reads does not change their model
+        self.database.tables.append(Table("location", {"id": int}))
+        second = self._eval(self._runtime())
+        with mock.patch.object(ExecutionServerRuntime, "_execute", side_effect=lambda execution_input: execution_input):
+            joined = (LegendQL.from_table(self.database, self.table)
+                      .join(LegendQL.from_table(self.database, department), lambda e, d: e.id == d.id)
+                      .bind(self._runtime()).eval())
+
+        tables = [[t["name"] for t in r["model"]["elements"][2]["schemas"][0]["tables"]] for r in (first, second, joined)]
+        self.assertEqual([["employee"], ["employee"], ["department", "employee"]], tables)
+        self.assertIs(first["model"], second["model"])
+
+    def test_text_columns_per_table(self):
+        database = Database("local::DuckDuckDatabase", [self.table, Table("department", {"opened": date})])
+        text = DuckDBDatabaseType("/tmp/duck").generate_pure_database(database)
+
+        self.assertIn("Table employee\n  (\n    id BIGINT,\nname VARCHAR(0)\n  )", text)
+        self.assertIn("Table department\n  (\n    opened DATE\n  )", text)
+
+    def test_database_types_apart(self):
+        first = self._eval(self._runtime("/tmp/one"))
+        second = self._eval(self._runtime("/tmp/two"))
+
+        self.assertEqual("/tmp/one", first["model"]["elements"][1]["connectionValue"]["datasourceSpecification"]["path"])
+        self.assertEqual("/tmp/two", second["model"]["elements"][1]["connectionValue"]["datasourceSpecification"]["path"])
+
+
+if __name__ == '__main__':
+    unittest.main()
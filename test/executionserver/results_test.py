@@ -0,0 +1,57 @@
+import importlib.util
+import json
+import unittest
+from datetime import date
+from unittest import mock
+
+from model.schema import Table, Database
+from ql.legendql import LegendQL
+from runtime.pure.db.duckdb import DuckDBDatabaseType
+from runtime.pure.executionserver.runtime import ExecutionServerRuntime
+
+
+@unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+class ArrowResultsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.table = Table("employee", {"id": int, "name": str, "start": date})
+        self.database = Database("local::DuckDuckDatabase", [self.table])
+        self.runtime = ExecutionServerRuntime("local::DuckDuckRuntime", DuckDBDatabaseType("/tmp/duck"), "http://localhost:6300", self.database)
+
+    def _df(self):
+        return LegendQL.from_table(self.database, self.table).select(lambda e: [e.id, e.name, e.start]).bind(self.runtime)
+
+    def _stream(self, result: dict):
+        # the result sent in chunks of a few bytes, cutting through values
+        data = json.dumps(result).encode()
+        return mock.patch.object(ExecutionServerRuntime, "_execute_stream", side_effect=lambda execution_input: (data[i:i + 7] for i in range(0, len(data), 7)))
+
+    def _result(self, rows: list) -> dict:
+        columns = [{"name": "id", "type": "Integer"}, {"name": "name", "type": "String"}, {"name": "start", "type": "StrictDate"}]
+        return {"builder": {"_type": "tdsBuilder", "columns": columns}, "activities": [],
+                "result": {"columns": ["id", "name", "start"], "rows": [{"values": values} for values in rows]}}
+
+    def test_columns_typed_by_builder(self):
+        result = self._result([[1, "John", "2020-01-01"], [2, None, "2022-01-01"], [3, "Anna", None]])
+        with self._stream(result):
+            table = self._df().to_arrow()
+
+        self.assertEqual(["int64", "string", "date32[day]"], [str(t) for t in table.schema.types])
+        self.assertEqual({"id": [1, 2, 3], "name": ["John", None, "Anna"], "start": [date(2020, 1, 1), date(2022, 1, 1), None]},
+                         table.to_pydict())
+
+    def test_batches(self):
+        with self._stream(self._result([[i, "x", "2020-01-01"] for i in range(5)])):
+            reader = self._df().to_arrow_reader(batch_size=2)
+            self.assertEqual([2, 2, 1], [batch.num_rows for batch in reader])
+
+    def test_no_rows(self):
+        with self._stream(self._result([])):
+            table = self._df().to_arrow()
+
+        self.assertEqual(0, table.num_rows)
+        self.assertEqual(["id", "name", "start"], table.column_names)
+
+
+if __name__ == '__main__':
+    unittest.main()
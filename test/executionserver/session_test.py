@@ -0,0 +1,66 @@
+import json
+import unittest
+
+import requests
+
+from model.schema import Table, Database
+from runtime.pure.db.duckdb import DuckDBDatabaseType
+from runtime.pure.executionserver.runtime import ExecutionServerRuntime
+from runtime.pure.executionserver.session import HttpSettings
+from test.executionserver.testutils import LocalHttpServer
+
+
+class HttpSessionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalHttpServer.start()
+        self.addCleanup(self.server.stop)
+        self.host = self.server.host
+
+    def _runtime(self, **settings) -> ExecutionServerRuntime:
+        database = Database("local::DuckDuckDatabase", [Table("employee", {"id": int})])
+        runtime = ExecutionServerRuntime("local::DuckDuckRuntime", DuckDBDatabaseType("/tmp/duck"), self.host, database, HttpSettings(**settings))
+        self.addCleanup(runtime.close)
+        return runtime
+
+    def test_connection_kept_alive(self):
+        runtime = self._runtime()
+        for _ in range(5):
+            runtime._execute({"function": {}})
+            runtime._parse_lambda("1")
+        self.assertEqual(10, len(self.server.bodies))
+        # one connection for the executions, one for the grammar
+        self.assertEqual(2, len(self.server.connections))
+
+    def test_grammar_retried(self):
+        runtime = self._runtime(backoff=0)
+        self.server.failures = [503, 502]
+        self.assertEqual({"status": 200}, runtime._parse_lambda("1"))
+        self.assertEqual([b"|1"] * 3, self.server.bodies)
+
+    def test_execution_not_retried(self):
+        runtime = self._runtime(backoff=0)
+        self.server.failures = [503]
+        self.assertEqual({"status": 503}, runtime._execute({"function": {}}))
+        self.assertEqual(1, len(self.server.bodies))
+
+    def test_gzip(self):
+        runtime = self._runtime(gzip=True)
+        runtime._execute({"name": "é" * 100})
+        runtime._parse_lambda_with_parameters("{x: Integer[1] | $x}")
+        self.assertEqual([json.dumps({"name": "é" * 100}).encode(), b"{x: Integer[1] | $x}"], self.server.bodies)
+
+    def test_read_timeout(self):
+        runtime = self._runtime(read_timeout=0.2)
+        self.server.stall = True
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            runtime._execute({"function": {}})
+        self.assertEqual(1, len(self.server.bodies))
+
+    def test_invalid_settings(self):
+        with self.assertRaises(ValueError):
+            HttpSettings(pool_size=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import json
+import unittest
+from unittest import mock
+
+from model.schema import Table, Database
+from ql.legendql import LegendQL
+from runtime.pure.db.duckdb import DuckDBDatabaseType
+from runtime.pure.executionserver.runtime import ExecutionServerRuntime
+from runtime.pure.executionserver.stream import TdsStream
+
+
+def _chunks(data: bytes, size: int):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+class TdsStreamTest(unittest.TestCase):
+
+    def _result(self, rows: list) -> dict:
+        return {"builder": {"_type": "tdsBuilder", "columns": [{"name": "id", "type": "Integer"}, {"name": "name", "type": "String"}]},
+                "activities": [{"_type": "RelationalExecutionActivity", "sql": "select \"id\", [name] from t"}],
+                "result": {"columns": ["id", "name"], "rows": [{"values": values} for values in rows]}}
+
+    def test_rows_across_chunks(self):
+        rows = [[i * 1001, "é,\"]}{" + str(i)] for i in range(50)]
+        data = json.dumps(self._result(rows), indent=2).encode()
+        for size in (1, 3, 64, len(data)):
+            stream = TdsStream(_chunks(data, size))
+            self.assertEqual(rows, list(stream.rows()), size)
+            self.assertEqual(["id", "name"], [c["name"] for c in stream.columns])
+
+    def test_columns_of_the_result_without_builder(self):
+        stream = TdsStream([b'{"result": {"columns": ["a"], "rows": [{"values": [1]}]}}'])
+        self.assertEqual([[1]], list(stream.rows()))
+        self.assertEqual([{"name": "a"}], stream.columns)
+
+    def test_holds_only_the_rows_not_read(self):
+        rows = ({"values": [i, "x" * 100]} for i in range(10_000))
+        chunks = (json.dumps(row).encode() + b"," for row in rows)
+        stream = TdsStream(iter([b'{"builder": {"columns": []}, "result": {"rows": [', *chunks, b"]}}"]))
+        read = stream.rows()
+        for _ in range(5_000):
+            next(read)
+        self.assertLess(len(stream._buffer), 1_000)
+
+    def test_not_a_result(self):
+        with self.assertRaises(ValueError):
+            list(TdsStream([b'{"message": "Error executing", "trace": []}']).rows())
+        with self.assertRaises(ValueError):
+            list(TdsStream([b'{"result": {"rows": [{"values": [1]}']).rows())
+
+
+class IterBatchesTest(unittest.TestCase):
+
+    def test_fixed_size_batches(self):
+        table = Table("employee", {"id": int, "name": str})
+        database = Database("local::DuckDuckDatabase", [table])
+        runtime = ExecutionServerRuntime("local::DuckDuckRuntime", DuckDBDatabaseType("/tmp/duck"), "http://localhost:6300", database)
+        result = {"builder": {"columns": [{"name": "id"}, {"name": "name"}]},
+                  "result": {"columns": ["id", "name"], "rows": [{"values": [i, str(i)]} for i in range(5)]}}
+        data = json.dumps(result).encode()
+
+        with mock.patch.object(ExecutionServerRuntime, "_execute_stream", side_effect=lambda execution_input: _chunks(data, 16)) as execute:
+            batches = LegendQL.from_table(database, table).bind(runtime).iter_batches(batch_size=2)
+            self.assertEqual(0, execute.call_count)
+            self.assertEqual([{"id": [0, 1], "name": ["0", "1"]}, {"id": [2, 3], "name": ["2", "3"]}, {"id": [4], "name": ["4"]}],
+                             list(batches))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,12 @@
+import gzip
+import json
 import os
+import socket
 import subprocess
 import threading
 import queue
 import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 
 class TestExecutionServer:
@@ -46,6 +50,72 @@ class TestExecutionServer:
             self.process.terminate()
 
 
+class LocalHttpServer(ThreadingHTTPServer):
+    # answers every POST with {"status": ..}, recording what it was sent
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _LocalHttpHandler)
+        self.host = f"http://127.0.0.1:{self.server_address[1]}"
+        self.connections = set()
+        self.bodies = []
+        # the statuses answered before the requests that succeed
+        self.failures = []
+        # when set, requests are not answered: the server waits for the client to close the connection
+        self.stall = False
+        self.disconnected = threading.Event()
+        # seconds each request takes, and the most requests answered at once
+        self.delay = 0
+        self.active = 0
+        self.most_active = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def start(cls):
+        server = cls()
+        threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True).start()
+        return server
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _LocalHttpHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.server.connections.add(self.client_address)
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        self.server.bodies.append(body)
+        if self.server.stall:
+            self.connection.settimeout(5)
+            try:
+                if self.rfile.read(1) == b"":
+                    self.server.disconnected.set()
+            except socket.timeout:
+                pass
+            self.close_connection = True
+            return
+        with self.server._lock:
+            self.server.active += 1
+            self.server.most_active = max(self.server.most_active, self.server.active)
+        time.sleep(self.server.delay)
+        with self.server._lock:
+            self.server.active -= 1
+        status = self.server.failures.pop(0) if self.server.failures else 200
+        data = json.dumps({"status": status}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
 
 def main():
     exec_server = TestExecutionServer(".")
@@ -55,4 +125,4 @@ def main():
     exec_server.stop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
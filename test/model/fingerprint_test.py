@@ -0,0 +1,74 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from dialect.purerelation.dialect import NonExecutablePureRuntime
+from model import fingerprint
+from model.metamodel import *
+from model.schema import Table, Database
+from ql.legendql import LegendQL
+
+QUERY = """
+from model.schema import Table, Database
+from ql.legendql import LegendQL
+
+table = Table("employee", {"id": int, "name": str})
+lq = LegendQL.from_table(Database("db", [table]), table).filter(lambda e: e.name == "x" and e.id > 10).select(lambda e: [e.id, e.name])
+print(lq.fingerprint().hex())
+"""
+
+
+def query(database: str = "db", limit: int = 10) -> LegendQL:
+    table = Table("employee", {"id": int, "name": str})
+    return (LegendQL.from_table(Database(database, [table]), table)
+            .filter(lambda e: e.name == "x" and e.id > limit)
+            .select(lambda e: [e.id, e.name]))
+
+
+class FingerprintTest(unittest.TestCase):
+
+    def test_fingerprint_is_stable_across_processes(self):
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        fingerprints = {subprocess.run([sys.executable, "-c", QUERY], capture_output=True, text=True, check=True, cwd=root,
+                                       env={**os.environ, "PYTHONPATH": root, "PYTHONHASHSEED": seed}).stdout.strip()
+                        for seed in ["1", "2"]}
+
+        self.assertEqual(1, len(fingerprints))
+        self.assertEqual(32, len(fingerprints.pop()))
+
+    def test_equal_queries_have_equal_fingerprints(self):
+        self.assertEqual(query().fingerprint(), query().fingerprint())
+        self.assertEqual(16, len(query().fingerprint()))
+
+    def test_fingerprint_differs_by_query_database_and_parameters(self):
+        fingerprints = {query().fingerprint(), query("other").fingerprint(), query(limit=20).fingerprint(),
+                        query().limit(5).fingerprint()}
+
+        self.assertEqual(4, len(fingerprints))
+
+    def test_fingerprint_differs_by_runtime(self):
+        lq = query()
+
+        self.assertEqual(lq.bind(NonExecutablePureRuntime("local::Runtime")).fingerprint(),
+                         lq.bind(NonExecutablePureRuntime("local::Runtime")).fingerprint())
+        self.assertNotEqual(lq.bind(NonExecutablePureRuntime("local::Runtime")).fingerprint(),
+                            lq.bind(NonExecutablePureRuntime("local::Other")).fingerprint())
+
+    def test_incremental_fingerprint_is_the_fingerprint_of_the_clauses(self):
+        lq = query().limit(5)
+        runtime = NonExecutablePureRuntime("local::Runtime")
+
+        self.assertEqual(fingerprint.of_clauses(lq._internal._clauses), lq._internal._fingerprint)
+        self.assertEqual(lq.bind(runtime).fingerprint(), DataFrame(runtime, lq._internal._clauses, lq._internal._parameters).fingerprint())
+
+    def test_values_of_different_types_have_different_digests(self):
+        self.assertNotEqual(fingerprint.digest(IntegerLiteral(1)), fingerprint.digest(IntegerLiteral(True)))
+        self.assertNotEqual(fingerprint.digest(StringLiteral("1")), fingerprint.digest(IntegerLiteral(1)))
+
+    def test_deep_trees(self):
+        expression = LiteralExpression(IntegerLiteral(0))
+        for i in range(20_000):
+            expression = BinaryExpression(OperandExpression(expression), OperandExpression(LiteralExpression(IntegerLiteral(i))), AddBinaryOperator())
+
+        self.assertEqual(16, len(fingerprint.digest(FilterClause(expression))))
@@ -0,0 +1,78 @@
+import gc
+import threading
+import unittest
+
+from dsl.parser import Parser, ParseType
+from model import interning
+from model.metamodel import *
+from model.schema import Table, Database
+from ql.legendql import LegendQL
+
+
+class InterningTest(unittest.TestCase):
+
+    def test_equal_nodes_are_shared(self):
+        first = ColumnAliasExpression("e", ColumnReferenceExpression("id"))
+        second = ColumnAliasExpression(alias="e", reference=ColumnReferenceExpression(name="id"))
+
+        self.assertIs(first, second)
+        self.assertIs(first.reference, second.reference)
+        self.assertIs(FunctionExpression(CountFunction(), [first]), FunctionExpression(CountFunction(), [second]))
+
+    def test_equal_values_of_different_types_are_not_shared(self):
+        self.assertIsNot(IntegerLiteral(1), IntegerLiteral(True))
+        self.assertIs(bool, type(IntegerLiteral(True).val))
+
+    def test_parsed_subtrees_are_shared(self):
+        table = Table("employee", {"id": int, "name": str})
+        both = Parser.parse(lambda e: e.id > 10 and e.name == "x", [table], ParseType.filter)[0]
+        one = Parser.parse(lambda e: e.id > 10, [table], ParseType.filter)[0]
+
+        self.assertIs(one.expression, both.expression.left.expression)
+
+    def test_queries_share_clauses(self):
+        table = Table("employee", {"id": int})
+        database = Database("db", [table])
+        first = LegendQL.from_table(database, table).filter(lambda e: e.id > 10)
+        second = LegendQL.from_table(database, table).filter(lambda e: e.id > 10).select(lambda e: e.id)
+
+        self.assertIs(first._internal._clauses[0], second._internal._clauses[0])
+        self.assertIs(first._internal._clauses[1], second._internal._clauses[1])
+
+    def test_dead_nodes_leave_the_table(self):
+        size = interning.size()
+        node = ColumnReferenceExpression("only used by test_dead_nodes_leave_the_table")
+        self.assertEqual(size + 1, interning.size())
+
+        del node
+        gc.collect()
+        self.assertEqual(size, interning.size())
+
+    def test_threads_share_the_nodes_they_build_at_once(self):
+        built, start = [], threading.Barrier(8)
+
+        def build():
+            start.wait()
+            built.append([ColumnReferenceExpression(f"built by threads {i}") for i in range(2_000)])
+
+        threads = [threading.Thread(target=build) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for nodes in built[1:]:
+            self.assertTrue(all(a is b for a, b in zip(built[0], nodes)))
+
+    def test_deep_trees(self):
+        tree = LiteralExpression(IntegerLiteral(0))
+        for i in range(20_000):
+            tree = BinaryExpression(OperandExpression(tree), OperandExpression(LiteralExpression(IntegerLiteral(i))), AddBinaryOperator())
+        again = LiteralExpression(IntegerLiteral(0))
+        for i in range(20_000):
+            again = BinaryExpression(OperandExpression(again), OperandExpression(LiteralExpression(IntegerLiteral(i))), AddBinaryOperator())
+
+        self.assertIs(tree, again)
+
+
+if __name__ == '__main__':
+    unittest.main()
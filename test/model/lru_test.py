@@ -0,0 +1,38 @@
+import unittest
+
+from model.lru import LruCache
+
+
+class LruCacheTest(unittest.TestCase):
+
+    def test_least_recently_used_dropped(self):
+        cache = LruCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+
+        self.assertEqual((1, None, 3), (cache.get("a"), cache.get("b"), cache.get("c")))
+        info = cache.info()
+        self.assertEqual((3, 1, 2, 2), (info.hits, info.misses, info.maxsize, info.currsize))
+
+    def test_resize_and_disable(self):
+        cache = LruCache(maxsize=3)
+        for i in range(3):
+            cache.put(i, i)
+        cache.resize(1)
+        self.assertEqual([None, None, 2], [cache.get(i) for i in range(3)])
+
+        cache.resize(0)
+        cache.put(3, 3)
+        self.assertEqual(0, cache.info().currsize)
+
+    def test_negative_maxsize(self):
+        with self.assertRaisesRegex(ValueError, "LruCache maxsize must not be negative"):
+            LruCache(maxsize=-1)
+        with self.assertRaises(ValueError):
+            LruCache(maxsize=1).resize(-1)
+
+
+if __name__ == '__main__':
+    unittest.main()
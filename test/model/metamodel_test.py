@@ -0,0 +1,76 @@
+import pickle
+import unittest
+from dataclasses import FrozenInstanceError, replace
+
+from model.functions import SumFunction
+from model.metamodel import *
+
+
+class MetamodelTest(unittest.TestCase):
+
+    @staticmethod
+    def _filter(value: int) -> FilterClause:
+        return FilterClause(BinaryExpression(
+            OperandExpression(ColumnAliasExpression("e", ColumnReferenceExpression("id"))),
+            OperandExpression(LiteralExpression(IntegerLiteral(value))),
+            GreaterThanBinaryOperator()))
+
+    def test_structural_equality_and_hash(self):
+        plans = {(self._filter(1), ExtendClause([ColumnReferenceExpression("a")])): "first"}
+
+        first, second = self._filter(1), self._filter(1)
+        self.assertEqual(first, second)
+        self.assertEqual(hash(first), hash(second))
+        self.assertNotEqual(self._filter(1), self._filter(2))
+        self.assertNotEqual(IntegerLiteral(1), BooleanLiteral(True))
+        self.assertEqual("first", plans[(self._filter(1), ExtendClause([ColumnReferenceExpression("a")]))])
+
+    def test_nodes_are_frozen_and_slotted(self):
+        node = ColumnReferenceExpression("id")
+        with self.assertRaises(FrozenInstanceError):
+            node.name = "other"
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertFalse(hasattr(self._filter(1), "__dict__"))
+
+    def test_lists_are_frozen_copies(self):
+        columns = [ColumnReferenceExpression("a")]
+        clause = ExtendClause(columns)
+        columns.append(ColumnReferenceExpression("b"))
+
+        self.assertEqual([ColumnReferenceExpression("a")], clause.expressions)
+        self.assertIs(clause, ExtendClause([ColumnReferenceExpression("a")]))
+        for change in (lambda l: l.append(None), lambda l: l.__setitem__(0, None), lambda l: l.sort(), lambda l: l.__iadd__([])):
+            with self.assertRaises(TypeError):
+                change(clause.expressions)
+        self.assertEqual([ColumnReferenceExpression("a"), None], clause.expressions + [None])
+        self.assertIs(clause, pickle.loads(pickle.dumps(clause)))
+
+    def test_repr_is_unchanged(self):
+        self.assertEqual("FunctionExpression(function=SumFunction(), parameters=[ColumnReferenceExpression(name='a')])",
+                         repr(FunctionExpression(SumFunction(), [ColumnReferenceExpression("a")])))
+
+    def test_copies_are_interned(self):
+        node, other = self._filter(1), self._filter(2)
+        self.assertIs(node, pickle.loads(pickle.dumps(node)))
+        self.assertIs(other, replace(node, expression=other.expression))
+
+    def test_equal_nodes_colliding_with_others_are_shared(self):
+        # the nodes of one hash, whose values differ: each is still found by the nodes equal to it
+        first, second = IntegerLiteral(1), IntegerLiteral(True)
+        self.assertIsNot(first, second)
+        self.assertIs(first, IntegerLiteral(1))
+        self.assertIs(second, IntegerLiteral(True))
+        self.assertNotEqual(first, second)
+
+    def test_arguments_by_name_and_default(self):
+        expression = GroupByExpression(selections=[], expressions=[])
+        self.assertIsNone(expression.having)
+        self.assertIs(expression, GroupByExpression([], [], None))
+        with self.assertRaises(TypeError):
+            GroupByExpression([])
+        with self.assertRaises(TypeError):
+            GroupByExpression([], [], other=None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+from dialect.purerelation.dialect import NonExecutablePureRuntime
+from dsl.parser import Parser, ParseType
+from model.metamodel import FromClause, ExtendClause, FilterClause, SelectionClause, GroupByClause, GroupByExpression, \
+    ComputedColumnAliasExpression, MapReduceExpression, LambdaExpression, ColumnAliasExpression, \
+    ColumnReferenceExpression, FunctionExpression, CountFunction, VariableAliasExpression
+from model.schema import Table, Database
+from optimizer.optimizer import optimize
+from ql.legendql import LegendQL
+
+
+class CommonSubexpressionsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.runtime = NonExecutablePureRuntime("rt")
+        self.employee = Table("employee", {"id": int, "name": str, "salary": int, "dept_id": int})
+        self.database = Database("db", [self.employee])
+
+    def _query(self) -> LegendQL:
+        return LegendQL.from_table(self.database, self.employee)
+
+    def _pure(self, query) -> str:
+        return query.bind(self.runtime).executable_to_string()
+
+    def test_repeated_expressions_are_computed_once(self):
+        query = (self._query()
+                 .filter(lambda r: ("high" if r.salary > 100 else "low") == "high")
+                 .extend(lambda e: (bucket := "high" if e.salary > 100 else "low")))
+
+        self.assertEqual("#>{db.employee}#->extend(~[__cse_0:row | if($row.salary>100, | 'high', | 'low')])"
+                         "->filter(r | $r.__cse_0=='high')->extend(~[bucket:e | $e.__cse_0])"
+                         "->select(~[id, name, salary, dept_id, bucket])->from(rt)", self._pure(query))
+
+    def test_hidden_columns_are_dropped_by_selections(self):
+        query = (self._query()
+                 .extend(lambda e: [(a := (e.salary * 2 + e.id * 3) - e.dept_id), (b := ((e.salary * 2 + e.id * 3) - e.dept_id) * 2)])
+                 .select(lambda e: [e.id, e.a, e.b]))
+
+        self.assertEqual("#>{db.employee}#->select(~[id, salary, dept_id])"
+                         "->extend(~[__cse_0:row | $row.salary*2+$row.id*3-$row.dept_id])"
+                         "->extend(~[a:e | $e.__cse_0, b:e | $e.__cse_0*2])->select(~[id, a, b])->from(rt)", self._pure(query))
+
+    def test_group_keys_read_hidden_columns(self):
+        filter_ = Parser.parse(lambda r: ("high" if r.salary > 100 else "low") != "none", [self.employee], ParseType.filter)[0]
+        key = Parser.parse(lambda a: "high" if a.salary > 100 else "low", [self.employee], ParseType.filter)[0]
+        count = MapReduceExpression(key, LambdaExpression(["a"], FunctionExpression(CountFunction(), [VariableAliasExpression("a")])))
+        group = GroupByClause(GroupByExpression([ColumnReferenceExpression("dept_id")], [ComputedColumnAliasExpression("n", count)]))
+
+        plan = optimize([FromClause("db", "employee"), FilterClause(filter_), group], self.database)
+        self.assertEqual([FromClause, SelectionClause, ExtendClause, FilterClause, GroupByClause], [type(c) for c in plan])
+        self.assertEqual(ColumnAliasExpression("a", ColumnReferenceExpression("__cse_0")), plan[4].expression.expressions[0].expression.map_expression.expression)
+
+    def test_guarded_divisions_are_left_in_place(self):
+        query = (self._query()
+                 .extend(lambda e: (ratio := e.salary / e.id if e.id != 0 else 0))
+                 .filter(lambda e: e.id != 0 and e.salary / e.id > 2))
+
+        self.assertNotIn("__cse_", self._pure(query))
+
+    def test_expressions_of_columns_extended_again_are_not_shared(self):
+        query = (self._query()
+                 .extend(lambda e: (a := "x" if e.salary > 1 else "y"))
+                 .extend(lambda e: (salary := e.salary + 1))
+                 .extend(lambda e: (b := "x" if e.salary > 1 else "y")))
+
+        self.assertNotIn("__cse_", self._pure(query))
@@ -0,0 +1,124 @@
+import unittest
+
+from dialect.purerelation.dialect import NonExecutablePureRuntime
+from dsl.functions import over, avg
+from dsl.parser import Parser, ParseType
+from model.metamodel import FilterClause, ExtendClause, FromClause
+from model.schema import Table, Database
+from optimizer.optimizer import Optimizer, DEFAULT, optimize
+from optimizer.rules import FoldLimits
+from ql.legendql import LegendQL
+from ql.rawlegendql import RawLegendQL
+
+
+class OptimizerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.runtime = NonExecutablePureRuntime("rt")
+        self.employee = Table("employee", {"id": int, "name": str, "salary": int, "dept_id": int})
+        self.department = Table("department", {"id": int, "title": str})
+        self.database = Database("db", [self.employee, self.department])
+        DEFAULT.plans.clear()
+
+    def _query(self) -> LegendQL:
+        return LegendQL.from_table(self.database, self.employee)
+
+    def _pure(self, query) -> str:
+        return query.bind(self.runtime).executable_to_string()
+
+    def test_filters_are_pushed_below_extends_and_merged(self):
+        query = (self._query()
+                 .filter(lambda e: e.id > 1)
+                 .extend(lambda e: (bonus := e.salary * 2))
+                 .filter(lambda r: r.salary > 5))
+
+        self.assertEqual("#>{db.employee}#->filter(e | $e.id>1and$e.salary>5)->extend(~[bonus:e | $e.salary*2])->from(rt)", self._pure(query))
+
+    def test_filters_reading_extended_columns_stay(self):
+        query = self._query().extend(lambda e: (bonus := e.salary * 2)).filter(lambda e: e.bonus > 5)
+
+        self.assertEqual("#>{db.employee}#->extend(~[bonus:e | $e.salary*2])->filter(e | $e.bonus>5)->from(rt)", self._pure(query))
+
+    def test_filters_stay_above_windows(self):
+        query = self._query().extend(lambda e: (average := over(e.dept_id, avg(e.salary)))).filter(lambda e: e.id > 1)
+
+        self.assertEqual([ExtendClause, FilterClause], [type(c) for c in query.bind(self.runtime).plan()[1:]])
+
+    def test_filters_are_pushed_below_renames(self):
+        pay = Parser.parse(lambda e: e.pay > 5, [Table("employee", {"pay": int})], ParseType.filter)[0]
+        query = RawLegendQL.from_table(self.database, self.employee).rename(("salary", "pay")).filter(pay)
+
+        self.assertEqual("#>{db.employee}#->filter(e | $e.salary>5)->rename(~salary, ~pay)->from(rt)", self._pure(query))
+
+    def test_filters_of_the_left_relation_are_pushed_below_joins(self):
+        department = LegendQL.from_table(self.database, self.department)
+        left = self._query().join(department, lambda e, d: e.dept_id == d.id).filter(lambda r: r.salary > 5)
+        right = self._query().join(department, lambda e, d: e.dept_id == d.id).filter(lambda r: r.title == "x")
+
+        self.assertEqual("#>{db.employee}#->filter(r | $r.salary>5)->join(#>{db.department}#, JoinKind.INNER, e, d | $e.dept_id==$d.id)->from(rt)", self._pure(left))
+        self.assertEqual("#>{db.employee}#->join(#>{db.department}#, JoinKind.INNER, e, d | $e.dept_id==$d.id)->filter(r | $r.title=='x')->from(rt)", self._pure(right))
+
+    def test_ors_are_merged_in_parentheses(self):
+        query = self._query().filter(lambda e: e.id > 1 or e.id < 0).filter(lambda e: e.salary > 5)
+        nested = self._query().filter(lambda e: e.id > 1 and (e.salary > 2 or e.dept_id > 3)).filter(lambda e: e.id < 10)
+
+        self.assertEqual("#>{db.employee}#->filter(e | ($e.id>1or$e.id<0)and$e.salary>5)->from(rt)", self._pure(query))
+        self.assertEqual("#>{db.employee}#->filter(e | $e.id>1and($e.salary>2or$e.dept_id>3)and$e.id<10)->from(rt)", self._pure(nested))
+
+    def test_limits_and_offsets_are_folded(self):
+        def pure(query) -> str:
+            return self._pure(query).removeprefix("#>{db.employee}#->").removesuffix("->from(rt)")
+
+        self.assertEqual("slice(10, 15)", pure(self._query().take(10, 5)))
+        self.assertEqual("limit(3)", pure(self._query().limit(5).limit(3)))
+        self.assertEqual("drop(5)", pure(self._query().offset(2).offset(3)))
+        self.assertEqual("slice(12, 14)", pure(self._query().offset(2).limit(20).offset(10).limit(2)))
+        self.assertEqual("slice(5, 5)", pure(self._query().limit(5).offset(10)))
+
+    def test_no_op_selections_are_dropped(self):
+        def raw() -> RawLegendQL:
+            return RawLegendQL.from_table(self.database, self.employee)
+
+        self.assertEqual("#>{db.employee}#->from(rt)", self._pure(raw().select("id", "name", "salary", "dept_id")))
+        self.assertEqual("#>{db.employee}#->select(~[name, id, salary, dept_id])->from(rt)", self._pure(raw().select("name", "id", "salary", "dept_id")))
+        self.assertEqual("#>{db.employee}#->select(~[id])->from(rt)", self._pure(raw().select("id", "name").select("id")))
+
+    def test_rules_are_logged(self):
+        with self.assertLogs("optimizer.optimizer", "DEBUG") as logs:
+            self._query().filter(lambda e: e.id > 1).filter(lambda e: e.id < 9).bind(self.runtime).plan()
+
+        self.assertEqual(1, len(logs.output))
+        self.assertIn("MergeFilters", logs.output[0])
+
+    def test_optimizer_can_be_turned_off(self):
+        data_frame = self._query().filter(lambda e: e.id > 1).filter(lambda e: e.id < 9).bind(self.runtime)
+        data_frame.optimize = False
+
+        self.assertEqual(data_frame.clauses, data_frame.plan())
+        self.assertEqual(2, len(Optimizer([FoldLimits()]).optimize(data_frame.clauses[1:])))
+
+    def test_plans_are_cached(self):
+        data_frame = self._query().filter(lambda e: e.id > 1).filter(lambda e: e.id < 9).bind(self.runtime)
+        plan = data_frame.plan()
+        plan.clear()
+        again = self._query().filter(lambda e: e.id > 1).filter(lambda e: e.id < 9).bind(self.runtime)
+
+        self.assertEqual(data_frame.plan(), again.plan())
+        self.assertEqual(2, len(again.plan()))
+        self.assertEqual("#>{db.employee}#->filter(e | $e.id>1and$e.id<9)->from(rt)", again.executable_to_string())
+        info = DEFAULT.plans.info()
+        self.assertEqual((4, 1, 1), (info.hits, info.misses, info.currsize))
+
+    def test_changed_schema_is_planned_again(self):
+        data_frame = self._query().select(lambda e: [e.id, e.name]).bind(self.runtime)
+        self.assertEqual("#>{db.employee}#->select(~[id, name])->from(rt)", data_frame.executable_to_string())
+        # a column dropped in place: the selection is no longer pruned the same way
+        del self.employee.columns["salary"], self.employee.columns["dept_id"]
+
+        self.assertEqual("#>{db.employee}#->from(rt)", data_frame.executable_to_string())
+        self.assertEqual(2, DEFAULT.plans.info().misses)
+
+    def test_unknown_tables_are_left_as_they_are(self):
+        clauses = [FromClause("other", "employee"), *self._query().select(lambda e: [e.id, e.name, e.salary, e.dept_id]).bind(self.runtime).clauses[1:]]
+
+        self.assertEqual(clauses, optimize(clauses, self.database))
@@ -0,0 +1,81 @@
+import unittest
+
+from dialect.purerelation.dialect import NonExecutablePureRuntime
+from model.metamodel import FromClause, OrderByClause, TopClause, LimitClause, OffsetClause, FilterClause, \
+    SelectionClause, GroupByClause, GroupByExpression, DistinctClause, OrderByExpression, AscendingOrderType, \
+    DescendingOrderType, ColumnReferenceExpression, ComputedColumnAliasExpression, MapReduceExpression, \
+    LambdaExpression, ColumnAliasExpression, FunctionExpression, CountFunction, VariableAliasExpression, IntegerLiteral
+from model.schema import Table, Database
+from optimizer.optimizer import optimize
+from ql.legendql import LegendQL
+from ql.rawlegendql import RawLegendQL
+
+
+def _ascending(name: str) -> OrderByExpression:
+    return OrderByExpression(AscendingOrderType(), ColumnReferenceExpression(name))
+
+
+def _descending(name: str) -> OrderByExpression:
+    return OrderByExpression(DescendingOrderType(), ColumnReferenceExpression(name))
+
+
+class PropertiesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.runtime = NonExecutablePureRuntime("rt")
+        self.employee = Table("employee", {"id": int, "name": str, "salary": int, "dept_id": int})
+        self.database = Database("db", [self.employee])
+        self.source = FromClause("db", "employee")
+
+    def _raw(self) -> RawLegendQL:
+        return RawLegendQL.from_table(self.database, self.employee)
+
+    def _plan(self, query) -> list:
+        return [type(c) for c in query.bind(self.runtime).plan()]
+
+    def _by_department(self) -> GroupByClause:
+        count = MapReduceExpression(LambdaExpression(["a"], ColumnAliasExpression("a", ColumnReferenceExpression("id"))),
+                                    LambdaExpression(["a"], FunctionExpression(CountFunction(), [VariableAliasExpression("a")])))
+        return GroupByClause(GroupByExpression([ColumnReferenceExpression("dept_id")], [ComputedColumnAliasExpression("total", count)]))
+
+    def test_sorts_then_limits_are_top_n(self):
+        query = LegendQL.from_table(self.database, self.employee).order_by(lambda e: [-e.salary]).limit(10)
+
+        self.assertEqual([FromClause, TopClause], self._plan(query))
+        self.assertEqual("#>{db.employee}#->sort([~salary->descending()])->limit(10)->from(rt)",
+                         query.bind(self.runtime).executable_to_string())
+
+    def test_sorts_then_slices_are_top_n_then_drops(self):
+        clauses = optimize([self.source, OrderByClause([_ascending("id")]), LimitClause(IntegerLiteral(20)), OffsetClause(IntegerLiteral(5))])
+
+        self.assertEqual([self.source, TopClause([_ascending("id")], IntegerLiteral(20)), OffsetClause(IntegerLiteral(5))], clauses)
+
+    def test_sorts_sorted_again_are_dropped(self):
+        query = self._raw().order_by(_ascending("name")).select("id", "salary").order_by(_descending("salary"))
+
+        self.assertEqual([FromClause, SelectionClause, OrderByClause], self._plan(query))
+
+    def test_sorts_read_by_limits_are_kept(self):
+        query = self._raw().order_by(_ascending("name")).limit(5).order_by(_descending("salary"))
+
+        self.assertEqual([FromClause, TopClause, OrderByClause], self._plan(query))
+
+    def test_sorts_of_sorted_rows_are_dropped(self):
+        sort = OrderByClause([_ascending("name"), _ascending("id")])
+        clauses = optimize([self.source, sort, LimitClause(IntegerLiteral(5)), OrderByClause([_ascending("name")])])
+
+        self.assertEqual([self.source, TopClause(sort.ordering, IntegerLiteral(5))], clauses)
+
+    def test_groups_are_unique(self):
+        by_department = self._by_department()
+        clauses = optimize([self.source, by_department, OrderByClause([_ascending("dept_id"), _descending("total")]),
+                            DistinctClause([ColumnReferenceExpression("dept_id")])])
+
+        self.assertEqual([self.source, by_department, OrderByClause([_ascending("dept_id")]),
+                          SelectionClause([ColumnReferenceExpression("dept_id")])], clauses)
+
+    def test_distincts_of_rows_not_known_unique_are_kept(self):
+        distinct = DistinctClause([ColumnReferenceExpression("dept_id")])
+        clauses = [self.source, FilterClause(LambdaExpression(["e"], ColumnAliasExpression("e", ColumnReferenceExpression("id")))), distinct]
+
+        self.assertEqual(clauses, optimize(clauses))
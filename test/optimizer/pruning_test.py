@@ -0,0 +1,71 @@
+import unittest
+
+from dialect.purerelation.dialect import NonExecutablePureRuntime
+from model.metamodel import SelectionClause, ExtendClause, FromClause, JoinClause, FilterClause
+from model.schema import Table, Database
+from optimizer.optimizer import optimize
+from ql.legendql import LegendQL
+
+
+class ProjectionPruningTest(unittest.TestCase):
+
+    def setUp(self):
+        self.runtime = NonExecutablePureRuntime("rt")
+        self.employee = Table("employee", {"id": int, "name": str, "salary": int, "dept_id": int})
+        self.department = Table("department", {"id": int, "title": str, "budget": int})
+        self.database = Database("db", [self.employee, self.department])
+
+    def _query(self) -> LegendQL:
+        return LegendQL.from_table(self.database, self.employee)
+
+    def _plan(self, query):
+        return query.bind(self.runtime).plan()
+
+    def test_unread_columns_are_not_read_from_the_table(self):
+        query = self._query().filter(lambda e: e.salary > 5).select(lambda e: [e.id, e.name])
+
+        self.assertEqual("#>{db.employee}#->select(~[id, name, salary])->filter(e | $e.salary>5)->select(~[id, name])->from(rt)",
+                         query.bind(self.runtime).executable_to_string())
+
+    def test_unread_extended_columns_are_dropped(self):
+        query = self._query()
+        for i in range(40):
+            query = query.extend(eval(f"lambda e: (c{i} := e.salary + {i})"))
+        query = query.extend(lambda e: (last := e.c3 * 2)).select(lambda e: [e.id, e.c1, e.last])
+
+        plan = self._plan(query)
+        extends = [c for c in plan if isinstance(c, ExtendClause)]
+        self.assertEqual([["c1"], ["c3"], ["last"]], [[e.alias for e in c.expressions] for c in extends])
+        self.assertEqual([FromClause, SelectionClause], [type(c) for c in plan[:2]])
+        self.assertEqual(["id", "salary"], [e.name for e in plan[1].expressions])
+
+    def test_extended_columns_read_by_later_ones_are_kept(self):
+        query = self._query().extend(lambda e: [(a := e.salary + 1), (b := e.a * 2), (c := e.id)]).select(lambda e: [e.b])
+
+        extend = next(c for c in self._plan(query) if isinstance(c, ExtendClause))
+        self.assertEqual(["a", "b"], [e.alias for e in extend.expressions])
+
+    def test_joins_read_the_columns_of_their_condition(self):
+        department = LegendQL.from_table(self.database, self.department)
+        query = self._query().join(department, lambda e, d: e.dept_id == d.id).select(lambda r: [r.name, r.title])
+
+        plan = self._plan(query)
+        self.assertEqual([FromClause, SelectionClause, JoinClause, SelectionClause], [type(c) for c in plan])
+        self.assertEqual(["name", "dept_id"], [e.name for e in plan[1].expressions])
+
+    def test_joins_are_followed_by_the_columns_read_after_them(self):
+        department = LegendQL.from_table(self.database, self.department)
+        query = (self._query().join(department, lambda e, d: e.dept_id == d.id)
+                 .filter(lambda r: r.budget > 5).select(lambda r: [r.name, r.title]))
+
+        plan = self._plan(query)
+        self.assertEqual([FromClause, SelectionClause, JoinClause, SelectionClause, FilterClause, SelectionClause], [type(c) for c in plan])
+        self.assertEqual(["name", "title", "budget"], [e.name for e in plan[3].expressions])
+
+    def test_queries_of_unknown_tables_are_left_as_they_are(self):
+        query = self._query().filter(lambda e: e.salary > 5).select(lambda e: [e.id])
+        clauses = query._internal._clauses
+
+        self.assertEqual([FromClause, FilterClause, SelectionClause], [type(c) for c in optimize(clauses)])
+        self.assertEqual([FromClause, SelectionClause, FilterClause, SelectionClause],
+                         [type(c) for c in optimize(clauses, self.database)])
@@ -0,0 +1,73 @@
+import unittest
+from datetime import date, datetime
+
+from dialect.purerelation.dialect import NonExecutablePureRuntime
+from model.schema import Table, Database
+from ql.legendql import LegendQL
+from runtime.pure.db.duckdb import DuckDBDatabaseType
+from runtime.pure.executionserver.runtime import ExecutionServerRuntime
+
+
+class SimplifyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.runtime = NonExecutablePureRuntime("rt")
+        self.employee = Table("employee", {"id": int, "name": str, "salary": int})
+        self.database = Database("db", [self.employee])
+
+    def _query(self) -> LegendQL:
+        return LegendQL.from_table(self.database, self.employee)
+
+    def _pure(self, query) -> str:
+        return query.bind(self.runtime).executable_to_string()
+
+    def test_literals_are_folded(self):
+        query = self._query().filter(lambda e: e.salary > 10 * 60).extend(lambda e: (pay := e.salary + (2 - 1)))
+
+        self.assertEqual("#>{db.employee}#->filter(e | $e.salary>600)->extend(~[pay:e | $e.salary+1])->from(rt)", self._pure(query))
+
+    def test_boolean_logic_with_literals_is_reduced(self):
+        self.assertEqual("#>{db.employee}#->filter(e | $e.id>1)->from(rt)",
+                         self._pure(self._query().filter(lambda e: True and e.id > 1)))
+        self.assertEqual("#>{db.employee}#->filter(e | $e.id<=1)->from(rt)",
+                         self._pure(self._query().filter(lambda e: not (not (not (e.id > 1))))))
+        self.assertEqual("#>{db.employee}#->from(rt)",
+                         self._pure(self._query().filter(lambda e: e.id > 1 or 2 > 1)))
+
+    def test_contradictions_are_false(self):
+        for query in [self._query().filter(lambda e: e.salary > 5 and e.salary < 3),
+                      self._query().filter(lambda e: e.id > 5).filter(lambda e: e.id < 6),
+                      self._query().filter(lambda e: e.name == "a" and e.name == "b"),
+                      self._query().filter(lambda e: e.id == 4 and e.id != 4)]:
+            self.assertEqual("#>{db.employee}#->filter(e | false)->from(rt)", self._pure(query))
+
+    def test_satisfiable_ranges_are_kept(self):
+        query = self._query().filter(lambda e: e.id >= 5 and e.id <= 5 and e.name != "a")
+
+        self.assertEqual("#>{db.employee}#->filter(e | $e.id>=5and$e.id<=5and$e.name!='a')->from(rt)", self._pure(query))
+
+    def test_excluded_bounds_of_floats_and_datetimes_are_kept(self):
+        table = Table("trade", {"id": int, "price": float, "at": datetime, "day": date})
+        database = Database("db", [table])
+
+        def query() -> LegendQL:
+            return LegendQL.from_table(database, table)
+
+        self.assertEqual("#>{db.trade}#->filter(r | $r.price>5and$r.price<6)->from(rt)",
+                         self._pure(query().filter(lambda r: r.price > 5 and r.price < 6)))
+        self.assertEqual("#>{db.trade}#->filter(r | $r.at>%2020-01-01and$r.at<%2020-01-02)->from(rt)",
+                         self._pure(query().filter(lambda r: r.at > date(2020, 1, 1) and r.at < date(2020, 1, 2))))
+        for contradiction in [lambda r: r.price > 5 and r.price <= 5, lambda r: r.price == 6 and r.price < 6,
+                              lambda r: r.id > 5 and r.id < 6, lambda r: r.day > date(2020, 1, 1) and r.day < date(2020, 1, 2)]:
+            self.assertEqual("#>{db.trade}#->filter(r | false)->from(rt)", self._pure(query().filter(contradiction)))
+
+    def test_empty_results_are_made_locally(self):
+        # nothing listens on this host: eval would fail if it sent the query
+        runtime = ExecutionServerRuntime("rt", DuckDBDatabaseType("db.duck"), "http://localhost:1", self.database)
+        query = self._query().filter(lambda e: e.salary > 5 and e.salary < 3).extend(lambda e: (bonus := e.salary * 2))
+
+        result = query.bind(runtime).eval()
+        self.assertEqual([], result["result"]["rows"])
+        self.assertEqual(["id", "name", "salary", "bonus"], result["result"]["columns"])
+        self.assertEqual([{"name": "id", "type": "Integer"}, {"name": "name", "type": "String"},
+                          {"name": "salary", "type": "Integer"}, {"name": "bonus"}], result["builder"]["columns"])
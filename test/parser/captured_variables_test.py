@@ -0,0 +1,100 @@
+import unittest
+from datetime import date
+
+from dialect.purerelation.dialect import NonExecutablePureRuntime
+from dsl.parser import Parser, ParseType
+from dsl.tracer import Tracer
+from model.metamodel import *
+from model.schema import Table, Database
+from ql.legendql import LegendQL
+
+MIN_ID = 5
+
+
+class CapturedVariablesTest(unittest.TestCase):
+
+    def setUp(self):
+        Parser.cache.clear()
+
+    def _table(self) -> Table:
+        return Table("employee", {"id": int, "name": str})
+
+    def _filter(self, parameter: ParameterExpression) -> LambdaExpression:
+        return LambdaExpression(["e"], BinaryExpression(
+            left=OperandExpression(ColumnAliasExpression("e", ColumnReferenceExpression("id"))),
+            right=OperandExpression(parameter),
+            operator=GreaterThanBinaryOperator()))
+
+    def test_closure_global_and_default(self):
+        threshold = 10
+        for func, name in [(lambda e: e.id > threshold, "threshold"),
+                           (lambda e: e.id > MIN_ID, "MIN_ID"),
+                           (lambda e, low=1: e.id > low, "low")]:
+            with self.subTest(name=name):
+                self.assertEqual(self._filter(ParameterExpression(name, int)), Parser.parse(func, [self._table()], ParseType.filter)[0])
+                self.assertEqual(self._filter(ParameterExpression(name, int)), Tracer.parse(func, [self._table()], ParseType.filter)[0])
+
+    def test_values_share_a_parse(self):
+        def query(threshold):
+            return LegendQL.from_table(Database("db", [self._table()]), self._table()).filter(lambda e: e.id > threshold)
+
+        first, second = query(10), query(20)
+
+        self.assertEqual(first._internal._clauses, second._internal._clauses)
+        self.assertEqual(1, Parser.cache.info().hits)
+        runtime = NonExecutablePureRuntime("rt")
+        self.assertEqual("#>{db.employee}#->filter(e | $e.id>10)->from(rt)", first.bind(runtime).executable_to_string())
+        self.assertEqual("#>{db.employee}#->filter(e | $e.id>20)->from(rt)", second.bind(runtime).executable_to_string())
+
+    def test_types_do_not_share_a_parse(self):
+        def parse(name):
+            return Parser.parse(lambda e: e.name == name, [self._table()], ParseType.filter)[0]
+
+        parse("x")
+        parse(1)
+        self.assertEqual(0, Parser.cache.info().hits)
+
+    def test_same_name_with_different_values(self):
+        lq = LegendQL.from_table(Database("db", [self._table()]), self._table())
+        for low in [1, 2]:
+            lq.filter(lambda e, low=low: e.id > low)
+
+        self.assertEqual({"low": 1, "low_1": 2}, lq._internal._parameters)
+        self.assertEqual("#>{db.employee}#->filter(e | $e.id>1and$e.id>2)->from(rt)", lq.bind(NonExecutablePureRuntime("rt")).executable_to_string())
+        self.assertEqual("#>{db.employee}#->filter(e | $e.id>7and$e.id>2)->from(rt)", lq.prepare().bind(low=7).executable_to_string(NonExecutablePureRuntime("rt")))
+
+    def test_float_values(self):
+        table = Table("employee", {"id": int, "salary": float})
+        low = 1.5
+        lq = LegendQL.from_table(Database("db", [table]), table).filter(lambda e: e.salary > low).filter(lambda e: e.salary < 1e-05)
+
+        self.assertEqual({"low": 1.5}, lq._internal._parameters)
+        self.assertEqual("#>{db.employee}#->filter(e | $e.salary>1.5and$e.salary<1.0e-05)->from(rt)", lq.bind(NonExecutablePureRuntime("rt")).executable_to_string())
+
+    def test_unsupported_values(self):
+        low = [1, 2]
+        with self.assertRaisesRegex(ValueError, "Cannot capture 'low' of type list"):
+            Parser.parse(lambda e: e.id > low, [self._table()], ParseType.filter)
+
+    def test_deep_filter(self):
+        # the conditions and-ed fold into an expression deeper than the recursion limit, the value is bound in it
+        namespace = {"low": 5}
+        exec("f = lambda e: e.id > low and " + " and ".join(f"e.id != {i}" for i in range(3000)), namespace)
+        for optimize in [True, False]:
+            with self.subTest(optimize=optimize):
+                df = LegendQL.from_table(Database("db", [self._table()]), self._table()).filter(namespace["f"]).bind(NonExecutablePureRuntime("rt"))
+                df.optimize = optimize
+                conditions = "and".join(["$e.id>5"] + [f"$e.id!={i}" for i in range(3000)])
+                self.assertEqual("#>{db.employee}#->filter(e | " + conditions + ")->from(rt)", df.executable_to_string())
+
+    def test_captured_values_in_date(self):
+        table = Table("employee", {"id": int, "start": date})
+        year, start = 2020, date(2020, 1, 1)
+
+        with self.assertRaisesRegex(ValueError, "Captured values are not supported in date()"):
+            Parser.parse(lambda e: e.start > date(year, 1, 1), [table], ParseType.filter)
+        self.assertEqual(ParameterExpression("start", date), Parser.parse(lambda e: e.start > start, [table], ParseType.filter)[0].expression.right.expression)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import ast
+import inspect
+import unittest
+
+from dsl.decoder import LambdaDecoder
+from dsl.functions import aggregate, count, avg, left
+from dsl.parser import Parser, ParseType
+from model.metamodel import *
+from model.schema import Table
+
+
+class LambdaDecoderTest(unittest.TestCase):
+
+    def setUp(self):
+        Parser.cache.clear()
+
+    def assertDecodesLikeSource(self, func):
+        source = inspect.getsource(func).strip().rstrip(",")
+        expected = ast.parse(source[source.index("lambda"):]).body[0].value
+        self.assertEqual(ast.dump(expected), ast.dump(LambdaDecoder.decode(func)))
+
+    def test_decodes_like_source(self):
+        for func in [
+            lambda e: e.id > 10,
+            lambda e: e.a and e.b or e.c,
+            lambda e: e.a or e.b and e.c,
+            lambda e: (e.a or e.b) and e.c,
+            lambda e: e.a and e.b and e.c,
+            lambda e: not e.a,
+            lambda e: e.x % 2 ** e.y - e.z / 3 * 4 | 5 & e.q,
+            lambda e: [(gross_salary := e.salary + 10), (gross_cost := gross_salary + e.benefits)],
+            lambda e: [+e.sum_gross_cost, -e.country],
+            lambda e: (new_id := f"{e.title}_{e.country}"),
+            lambda e: (country_code := left(e.country, 2)),
+            lambda e: e.start_date > date(2021, 1, 1),
+            lambda e, d: (e.dept_id == d.id, [(new_dept_id := d.id), (new_dept_name := d.name)]),
+            lambda r: aggregate([r.id, r.name], [s := sum(r.salary + 1), c := count(r.d)], having=s > 100_000),
+            lambda r: aggregate(r.title, avg_salary := avg(r.salary)),
+        ]:
+            with self.subTest(func=func):
+                self.assertDecodesLikeSource(func)
+
+    def test_conditional_expressions(self):
+        for func in [
+            lambda e: e.salary if e.salary > 10 else e.min_salary,
+            lambda e: e.s if (e.a > 1 or e.b) and not e.c else e.m,
+            lambda e: e.x if e.t is not None else e.z,
+            lambda e: e.x if e.y else e.z if e.w else e.v,
+            lambda e: (bucket := 'low' if e.salary < 10 else 'high'),
+            lambda e: [e.a if e.b and e.c else e.d, e.e],
+            lambda e: (e.x if e.t else e.y) + 1,
+        ]:
+            with self.subTest(func=func):
+                self.assertDecodesLikeSource(func)
+
+    def test_long_displays_and_chains(self):
+        namespace = {}
+        source = ("lambda e: ([" + ", ".join(f"e.c{i}" for i in range(40)) + "], (" + ", ".join(f"e.c{i}" for i in range(40)) + "), "
+                  + " and ".join(f"e.c{i} > {i}" for i in range(2000)) + ")")
+        exec(f"f = {source}", namespace)
+        self.assertEqual(ast.dump(ast.parse(source).body[0].value), ast.dump(LambdaDecoder.decode(namespace["f"])))
+
+    def test_lambdas_without_source(self):
+        namespace = {}
+        exec("f = lambda e: [(plus_one := e.id + 1)]", namespace)
+        table = Table("employee", {"id": int})
+
+        with self.assertRaises(OSError):
+            inspect.getsource(namespace["f"])
+        p = Parser.parse(namespace["f"], [table], ParseType.extend)[0]
+
+        self.assertEqual([ComputedColumnAliasExpression(
+            alias="plus_one",
+            expression=LambdaExpression(["e"], BinaryExpression(
+                left=OperandExpression(ColumnAliasExpression("e", ColumnReferenceExpression("id"))),
+                right=OperandExpression(LiteralExpression(IntegerLiteral(1))),
+                operator=AddBinaryOperator())))], p)
+
+    def test_folded_constants_parsed_from_source(self):
+        # CPython folds 10 / 5 to the constant 2.0: the division is parsed from source, as written
+        table = Table("employee", {"id": int})
+        func = lambda e: e.id > 10 / 5
+
+        with self.assertRaises(ValueError):
+            LambdaDecoder.decode(func)
+        p = Parser.parse(func, [table], ParseType.filter)[0]
+
+        self.assertEqual(BinaryExpression(
+            left=OperandExpression(LiteralExpression(IntegerLiteral(10))),
+            right=OperandExpression(LiteralExpression(IntegerLiteral(5))),
+            operator=DivideBinaryOperator()), p.expression.right.expression)
+
+    def test_several_lambdas_on_one_line(self):
+        table = Table("employee", {"id": int, "name": str})
+        first, second = lambda e: e.id > 1, lambda e: e.name == "x"
+        p = Parser.parse(second, [table], ParseType.filter)[0]
+
+        self.assertEqual(LambdaExpression(["e"], BinaryExpression(
+            left=OperandExpression(ColumnAliasExpression("e", ColumnReferenceExpression("name"))),
+            right=OperandExpression(LiteralExpression(StringLiteral("x"))),
+            operator=EqualsBinaryOperator())), p)
+
+
+if __name__ == '__main__':
+    unittest.main()
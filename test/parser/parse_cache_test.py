@@ -0,0 +1,85 @@
+import unittest
+
+from dsl.cache import ParseCache
+from dsl.parser import Parser, ParseType
+from model.metamodel import *
+from model.schema import Table
+
+
+class ParseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        Parser.cache.clear()
+
+    def tearDown(self):
+        Parser.cache.resize(1024)
+        Parser.cache.clear()
+
+    def _filter(self, table: Table):
+        return Parser.parse(lambda e: e.id > 10, [table], ParseType.filter)
+
+    def test_repeated_parse_hits(self):
+        first = self._filter(Table("employee", {"id": int}))[0]
+        second = self._filter(Table("employee", {"id": int}))[0]
+
+        self.assertIs(first, second)
+        info = Parser.cache.info()
+        self.assertEqual((1, 1, 1), (info.hits, info.misses, info.currsize))
+
+    def test_different_schema_misses(self):
+        self._filter(Table("employee", {"id": int}))
+        self._filter(Table("employee", {"id": int, "name": str}))
+
+        info = Parser.cache.info()
+        self.assertEqual((0, 2, 2), (info.hits, info.misses, info.currsize))
+
+    def test_hit_replays_table_changes(self):
+        def extend(t):
+            return Parser.parse(lambda e: (new_id := e.id + 1), [t], ParseType.extend)
+
+        extend(Table("employee", {"id": int}))
+        table = Table("employee", {"id": int})
+        expression, new_table = extend(table)
+
+        self.assertEqual(1, Parser.cache.info().hits)
+        self.assertIs(table, new_table)
+        self.assertEqual({"id": int, "new_id": None}, table.columns)
+        self.assertEqual("new_id", expression[0].alias)
+
+    def test_hit_returns_new_table_for_select(self):
+        def select(t):
+            return Parser.parse(lambda e: [e.id], [t], ParseType.select)
+
+        first = select(Table("employee", {"id": int, "name": str}))[1]
+        second = select(Table("employee", {"id": int, "name": str}))[1]
+
+        self.assertIsNot(first, second)
+        self.assertEqual({"id": None}, second.columns)
+        second.columns["other"] = None
+        self.assertEqual({"id": None}, select(Table("employee", {"id": int, "name": str}))[1].columns)
+
+    def test_lru_eviction(self):
+        cache = ParseCache(maxsize=2)
+        for i in range(3):
+            cache.put(i, ParseCache.entry(i, [], Table("t", {})))
+        self.assertIsNone(cache.get(0))
+        self.assertIsNotNone(cache.get(1))
+
+        cache.put(3, ParseCache.entry(3, [], Table("t", {})))
+        self.assertIsNone(cache.get(2))
+        self.assertIsNotNone(cache.get(1))
+
+        cache.resize(1)
+        self.assertEqual(1, cache.info().currsize)
+
+    def test_disabled_cache(self):
+        Parser.cache.resize(0)
+        self._filter(Table("employee", {"id": int}))
+        self._filter(Table("employee", {"id": int}))
+
+        info = Parser.cache.info()
+        self.assertEqual((0, 2, 0), (info.hits, info.misses, info.currsize))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+from dsl.parser import Parser, ParseType
+from dsl.registry import FunctionRegistry
+from dsl.tracer import Tracer
+from model.functions import ScalarFunction, AvgFunction, RowNumberFunction
+from model.metamodel import *
+from model.schema import Table
+
+
+@node
+class UpperFunction(ScalarFunction):
+    def visit[P, T](self, visitor: ExecutionVisitor, parameter: P) -> T:
+        raise NotImplementedError()
+
+
+class FunctionRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        Parser.cache.clear()
+        self.functions = Parser.functions
+
+    def tearDown(self):
+        Parser.functions = self.functions
+
+    def test_dsl_functions_are_registered(self):
+        registry = FunctionRegistry.from_dsl()
+        self.assertIs(AvgFunction, registry.lookup("avg"))
+        self.assertIs(RowNumberFunction, registry.lookup("row_number"))
+        self.assertNotIn("param", registry)
+
+    def test_register_new_function(self):
+        Parser.functions = FunctionRegistry.from_dsl()
+        Parser.functions.register("upper", UpperFunction)
+        table = Table("employee", {"name": str})
+        expected = [ComputedColumnAliasExpression("loud", LambdaExpression(["e"], FunctionExpression(
+            UpperFunction(), [ColumnAliasExpression("e", ColumnReferenceExpression("name"))])))]
+
+        self.assertEqual(expected, Parser.parse(lambda e: (loud := upper(e.name)), [table], ParseType.extend)[0])
+        self.assertEqual(expected, Tracer.parse(lambda e: upper(e.name).alias("loud"), [Table("employee", {"name": str})], ParseType.extend)[0])
+
+    def test_unknown_function(self):
+        with self.assertRaises(ValueError):
+            Parser.parse(lambda e: (loud := shout(e.name)), [Table("employee", {"name": str})], ParseType.extend)
+
+    def test_only_functions_can_be_registered(self):
+        with self.assertRaises(ValueError):
+            Parser.functions.register("upper", str)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+from datetime import date
+
+from dsl.functions import aggregate, count, left, sum
+from dsl.parser import Parser, ParseType
+from dsl.tracer import Tracer
+from model.metamodel import *
+from model.schema import Table, Database
+from ql.legendql import LegendQL
+
+
+class TracerTest(unittest.TestCase):
+
+    def setUp(self):
+        Parser.cache.clear()
+
+    def _employees(self) -> Table:
+        return Table("employee", {"id": int, "name": str, "dept_id": int, "salary": float, "benefits": float,
+                                  "start_date": date, "title": str, "country": str, "active": bool})
+
+    def assertTracesLikeParser(self, parsed, traced, ptype: ParseType, *extra: Table):
+        parser_table, tracer_table = self._employees(), self._employees()
+        expected = Parser.parse(parsed, [parser_table, *extra], ptype)
+        actual = Tracer.parse(traced, [tracer_table, *extra], ptype)
+
+        self.assertEqual(expected[0], actual[0])
+        self.assertEqual(expected[1].table, actual[1].table)
+        self.assertEqual(expected[1].columns, actual[1].columns)
+
+    def test_select(self):
+        self.assertTracesLikeParser(lambda e: [e.id, e.name], lambda e: [e.id, e.name], ParseType.select)
+
+    def test_filter(self):
+        self.assertTracesLikeParser(
+            lambda e: e.start_date > date(2021, 1, 1) and (e.salary < 10 or not e.title == "CEO"),
+            lambda e: (e.start_date > date(2021, 1, 1)) & ((e.salary < 10) | ~(e.title == "CEO")),
+            ParseType.filter)
+
+    def test_bool_comparison(self):
+        self.assertTracesLikeParser(lambda e: e.active == True, lambda e: e.active == True, ParseType.filter)
+
+    def test_extend(self):
+        self.assertTracesLikeParser(
+            lambda e: [(gross_salary := e.salary + 10), (gross_cost := gross_salary + e.benefits), (code := left(e.country, 2))],
+            lambda e: [(e.salary + 10).alias("gross_salary"), (e.gross_salary + e.benefits).alias("gross_cost"), left(e.country, 2).alias("code")],
+            ParseType.extend)
+
+    def test_arithmetic(self):
+        self.assertTracesLikeParser(
+            lambda e: (x := e.id % 2 ** e.dept_id - e.salary / 3 * 4),
+            lambda e: (e.id % 2 ** e.dept_id - e.salary / 3 * 4).alias("x"),
+            ParseType.extend)
+
+    def test_rename(self):
+        self.assertTracesLikeParser(
+            lambda e: [department_id := e.dept_id, full_name := e.name],
+            lambda e: [e.dept_id.alias("department_id"), e.name.alias("full_name")],
+            ParseType.rename)
+
+    def test_join(self):
+        self.assertTracesLikeParser(
+            lambda e, d: (e.dept_id == d.id, [(new_dept_id := d.id)]),
+            lambda e, d: (e.dept_id == d.id, [d.id.alias("new_dept_id")]),
+            ParseType.join, Table("department", {"id": int}))
+
+    def test_group_by(self):
+        self.assertTracesLikeParser(
+            lambda r: aggregate([r.id, r.name], [sum_salary := sum(r.salary + 1), count_dept := count(r.dept_id)]),
+            lambda r: aggregate([r.id, r.name], [sum(r.salary + 1).alias("sum_salary"), count(r.dept_id).alias("count_dept")]),
+            ParseType.group_by)
+
+    def test_order_by(self):
+        self.assertTracesLikeParser(lambda e: [e.id, -e.name], lambda e: [e.id, -e.name], ParseType.order_by)
+
+    def test_unknown_column(self):
+        with self.assertRaises(ValueError):
+            Tracer.parse(lambda e: e.unknown > 1, [self._employees()], ParseType.filter)
+
+    def test_boolean_keywords_are_rejected(self):
+        with self.assertRaises(ValueError):
+            Tracer.parse(lambda e: e.id > 1 and e.salary > 1, [self._employees()], ParseType.filter)
+
+    def test_legendql_switch(self):
+        def query(tracing: bool, extend) -> LegendQL:
+            table = self._employees()
+            return (LegendQL.from_table(Database("employee", [table]), table, tracing)
+                    .filter(lambda e: e.salary > 10)
+                    .extend(extend)
+                    .select(lambda e: [e.id, e.cost]))
+
+        parsed = query(False, lambda e: [(cost := e.salary + e.benefits)])
+        traced = query(True, lambda e: [(e.salary + e.benefits).alias("cost")])
+        self.assertEqual(parsed._internal._clauses, traced._internal._clauses)
+        self.assertFalse(LegendQL.tracing)
+
+
+if __name__ == '__main__':
+    unittest.main()
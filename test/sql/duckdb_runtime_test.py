@@ -0,0 +1,102 @@
+import importlib.util
+import threading
+import unittest
+from datetime import date
+
+from dsl.functions import aggregate, count, param, over, avg
+from model.schema import Table, Database
+from ql.legendql import LegendQL
+from runtime.sql.duckdb.runtime import DuckDBRuntime
+
+
+class TestDuckDBRuntime(unittest.TestCase):
+
+    def setUp(self):
+        self.runtime = DuckDBRuntime(":memory:")
+        connection = self.runtime.connection()
+        connection.execute("CREATE TABLE employees (id BIGINT, departmentId BIGINT, first VARCHAR, last VARCHAR, start DATE)")
+        connection.execute("INSERT INTO employees VALUES (1, 1, 'John', 'Doe', DATE '2020-01-01'), (2, 1, 'Jane', 'Doe', DATE '2022-01-01'), "
+                           "(3, 2, 'Anna', 'Smith', DATE '2023-01-01')")
+        connection.execute("CREATE TABLE department (id BIGINT, name VARCHAR)")
+        connection.execute("INSERT INTO department VALUES (1, 'WidgetFactory'), (2, 'GadgetFactory')")
+        self.table = Table("employees", {"id": int, "departmentId": int, "first": str, "last": str, "start": date})
+        self.department = Table("department", {"id": int, "name": str})
+        self.database = Database("local::DuckDuckDatabase", [self.table, self.department])
+
+    def tearDown(self):
+        self.runtime.close()
+
+    def _query(self) -> LegendQL:
+        return LegendQL.from_table(self.database, self.table)
+
+    def test_select_filter_and_sort(self):
+        result = (self._query()
+                  .filter(lambda e: e.departmentId == 1)
+                  .select(lambda e: [e.id, e.first])
+                  .order_by(lambda e: [-e.id])
+                  .bind(self.runtime)
+                  .eval())
+        self.assertEqual({"columns": ["id", "first"], "rows": [(2, "Jane"), (1, "John")]}, result)
+
+    def test_join_and_group_by(self):
+        result = (self._query()
+                  .left_join(LegendQL.from_table(self.database, self.department), lambda e, d: (e.departmentId == d.id, [(department := d.name)]))
+                  .group_by(lambda r: aggregate([r.department], [employees := count(r.id)]))
+                  .order_by(lambda r: [r.department])
+                  .bind(self.runtime)
+                  .eval())
+        self.assertEqual([("GadgetFactory", 1), ("WidgetFactory", 2)], result["rows"])
+
+    def test_window(self):
+        result = (self._query()
+                  .extend(lambda e: (average := over(e.departmentId, avg(e.id))))
+                  .select(lambda e: [e.id, e.average])
+                  .order_by(lambda e: [e.id])
+                  .bind(self.runtime)
+                  .eval())
+        self.assertEqual([(1, 1.5), (2, 1.5), (3, 3.0)], result["rows"])
+
+    def test_prepared_parameters_bound_by_duckdb(self):
+        prepared = self._query().filter(lambda e: e.start > param("after", date)).select(lambda e: [e.id]).prepare()
+
+        self.assertEqual([(2,), (3,)], prepared.bind(after=date(2021, 1, 1)).eval(self.runtime)["rows"])
+        self.assertEqual([(3,)], prepared.bind(after=date(2022, 6, 1)).eval(self.runtime)["rows"])
+
+    def test_captured_float(self):
+        def query(low):
+            return self._query().filter(lambda e: e.id > low).select(lambda e: [e.id]).bind(self.runtime)
+
+        self.assertEqual([(2,), (3,)], query(1.5).eval()["rows"])
+        self.assertEqual([(3,)], query(2.5).eval()["rows"])
+
+    def test_empty_without_running(self):
+        result = self._query().filter(lambda e: e.id > 1 and e.id < 1).select(lambda e: [e.id]).bind(self.runtime).eval()
+        self.assertEqual({"columns": ["id"], "rows": []}, result)
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+    def test_arrow(self):
+        prepared = self._query().filter(lambda e: e.id > param("min_id")).select(lambda e: [e.id, e.start]).prepare()
+        df = prepared.bind(min_id=1).bind(self.runtime)
+
+        table = df.to_arrow()
+        self.assertEqual(["id", "start"], table.column_names)
+        self.assertEqual({"id": [2, 3], "start": [date(2022, 1, 1), date(2023, 1, 1)]}, table.to_pydict())
+        self.assertEqual([1, 1], [batch.num_rows for batch in df.to_arrow_reader(batch_size=1)])
+
+    def test_iter_batches(self):
+        batches = self._query().select(lambda e: [e.id, e.last]).bind(self.runtime).iter_batches(batch_size=2)
+        self.assertEqual([{"id": [1, 2], "last": ["Doe", "Doe"]}, {"id": [3], "last": ["Smith"]}], list(batches))
+
+    def test_threads_share_the_connection(self):
+        df = self._query().select(lambda e: [e.id]).bind(self.runtime)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(len(df.eval()["rows"]))) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual([3] * 8, results)
+
+
+if __name__ == '__main__':
+    unittest.main()